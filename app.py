@@ -1,10 +1,26 @@
 ﻿import streamlit as st
 import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.subplots as sp
 from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
-from parametres_fiscaux import TAUX_COTISATIONS_TNS, MICRO_BIC, MICRO_BNC, MICRO_BIC_VENTE, MICRO_BIC_SERVICES, TAUX_COTISATIONS_SALARIE, TAUX_COTISATIONS_PATRONALES, PLAFOND_ABONDEMENT_PEE, TAUX_ABONDEMENT_MAX
+from grille_scenarios import ScenarioGrid, ALIAS_COLONNES
+from service_optimisation import (normaliser_parametres, cle_canonique, executer_optimisation_persistante,
+                                  parametres_comparaison, executer_comparaison, charger_instantane,
+                                  CACHE_MAX_ENTREES, CACHE_TTL)
+from packs_fiscaux import charger_pack, PACKS_DISPONIBLES, ANNEE_FISCALE_DEFAUT
+from profilage import profiler
+
+@st.cache_data(max_entries=CACHE_MAX_ENTREES, ttl=CACHE_TTL, show_spinner=False)
+def optimisation_en_cache(cle, _parametres):
+    """Optimisation mise en cache par clé canonique (les paramètres eux-mêmes ne sont pas hachés)
+
+    Hors du cache mémoire du processus, le résultat est servi par le cache
+    persistant partagé entre workers et redémarrages, sinon calculé.
+    """
+    return executer_optimisation_persistante(_parametres)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTREES, ttl=CACHE_TTL, show_spinner=False)
+def comparaison_en_cache(cle, _parametres_formes):
+    """Comparaison de toutes les formes mise en cache par clé canonique"""
+    return executer_comparaison(_parametres_formes)
 
 def main():
     st.set_page_config(
@@ -21,6 +37,15 @@ def main():
     with st.sidebar:
         st.header("🔧 Configuration")
         
+        # Année fiscale : pack de paramètres fiscaux (barèmes, PASS, plafonds)
+        annee_fiscale = st.selectbox(
+            "📅 Année fiscale",
+            PACKS_DISPONIBLES,
+            index=PACKS_DISPONIBLES.index(ANNEE_FISCALE_DEFAUT),
+            help="Barème IR, PASS, plafonds et taux de l'année choisie"
+        )
+        pack_fiscal = charger_pack(annee_fiscale)
+
         # Sélection de la forme juridique
         st.subheader("🏢 Forme Juridique")
         forme_juridique = st.selectbox(
@@ -101,7 +126,8 @@ def main():
         
         # Créer l'optimiseur pour connaître les optimisations disponibles
         optimiseur_temp = creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultat_initial, 
-                                          charges_existantes=charges_existantes, parts_fiscales=parts_fiscales)
+                                          charges_existantes=charges_existantes, parts_fiscales=parts_fiscales,
+                                          pack_fiscal=pack_fiscal)
         optimisations_disponibles = optimiseur_temp.get_optimisations_disponibles()
         
         # Optimisations fiscales - Niveau Entreprise
@@ -116,7 +142,7 @@ def main():
             if 'madelin' in optimisations_disponibles:
                 use_madelin = st.checkbox(
                     "🏥 Contrat Madelin Retraite TNS",
-                    help="Charge déductible pour les TNS (max 84,000€ en 2024)"
+                    help=f"Charge déductible pour les TNS (max {pack_fiscal.PLAFOND_MADELIN_TNS:,}€ en {annee_fiscale})"
                 )
                 if use_madelin:
                     madelin_max = st.slider(
@@ -149,7 +175,7 @@ def main():
             # PER (disponible pour tous sauf certains cas)
             use_per = False
             per_max = 0
-            plafond_per_disponible = 32419  # Valeur par défaut
+            plafond_per_disponible = pack_fiscal.PLAFOND_PER  # Valeur par défaut
             if 'per' in optimisations_disponibles:
                 use_per = st.checkbox(
                     "📈 Plan d'Épargne Retraite (PER)",
@@ -160,9 +186,9 @@ def main():
                         "📋 Plafond PER disponible (€)",
                         min_value=0,
                         max_value=100000,
-                        value=32419,
+                        value=pack_fiscal.PLAFOND_PER,
                         step=1000,
-                        help="Votre plafond PER réel selon votre avis fiscal (10% revenus N-1 + reports non utilisés). Défaut : 32,419€ (8 PASS 2024)"
+                        help=f"Votre plafond PER réel selon votre avis fiscal (10% revenus N-1 + reports non utilisés). Défaut : {pack_fiscal.PLAFOND_PER:,}€ ({annee_fiscale})"
                     )
                     per_max = st.slider(
                         "Montant PER à verser (€)",
@@ -200,16 +226,15 @@ def main():
                     help="Versement salarié + abondement employeur. Le versement est exonéré d'IR et l'abondement (max 7,418€) est une charge déductible de l'IS."
                 )
                 if use_pee:
-                    # Calcul du versement max qui peut être abondé : 7,418€ / 300% = 2,473€
-                    import math
-                    versement_max_abonde = math.ceil(PLAFOND_ABONDEMENT_PEE / TAUX_ABONDEMENT_MAX)
+                    # Versement max qui peut être abondé : plafond d'abondement / 300% (arrondi supérieur)
+                    versement_max_abonde = pack_fiscal.VERSEMENT_MAX_ABONDE
                     versement_pee = st.slider(
                         "Versement salarié (€)",
                         min_value=0,
                         max_value=versement_max_abonde,
                         value=min(2000, versement_max_abonde),
                         step=100,
-                        help=f"Votre versement (max {versement_max_abonde:,.0f}€ pour abondement complet). L'abondement employeur sera de 300% (max {PLAFOND_ABONDEMENT_PEE:,.0f}€)."
+                        help=f"Votre versement (max {versement_max_abonde:,.0f}€ pour abondement complet). L'abondement employeur sera de 300% (max {pack_fiscal.PLAFOND_ABONDEMENT_PEE:,.0f}€)."
                     )
         else:
             use_per = False
@@ -221,11 +246,28 @@ def main():
         
         # Paramètres de calcul
         st.subheader("⚙️ Paramètres de calcul")
+        methodes_calcul = {
+            "Balayage à pas fixe": 'balayage',
+            "Adaptatif (raffinement à l'euro)": 'adaptatif',
+            "Optimum exact (points de rupture)": 'points_rupture'
+        }
+        strategie_calcul = methodes_calcul[st.selectbox(
+            "Méthode de calcul",
+            options=list(methodes_calcul),
+            index=0,
+            help="Le mode adaptatif raffine un balayage grossier jusqu'à l'euro ; les points de rupture (tranches, plafonds) donnent l'optimum exact à l'euro en quelques dizaines de scénarios"
+        )]
         pas_calcul = st.selectbox(
             "Précision du calcul",
             options=[1000, 2500, 5000, 10000],
             index=0,
-            help="Plus le pas est petit, plus le calcul est précis mais plus long"
+            help="Plus le pas est petit, plus le calcul est précis mais plus long (en mode adaptatif : pas du balayage initial)",
+            disabled=strategie_calcul == 'points_rupture'
+        )
+        profilage_actif = st.checkbox(
+            "⏱️ Profilage",
+            value=False,
+            help="Affiche la durée de chaque étape de l'optimisation, des graphiques et du tableau, et le nombre d'appels aux calculs d'impôts"
         )
         
         # Bouton de calcul
@@ -236,279 +278,42 @@ def main():
     if 'run_calculation' not in st.session_state:
         st.session_state.run_calculation = False
     
-    if st.session_state.run_calculation:
-        # Initialisation de l'optimiseur selon la forme juridique
-        with st.spinner("🔄 Calcul en cours..."):
-            optimiseur = creer_optimiseur(
-                forme_juridique,
-                resultat_avant_remuneration=resultat_initial,
-                charges_existantes=charges_existantes,
-                parts_fiscales=parts_fiscales,
-                plafond_per_disponible=plafond_per_disponible
-            )
-            
-            # Optimisation selon la forme juridique
-            if forme_juridique == "Micro-entreprise":
-                meilleur_global, tous_scenarios = optimiseur.optimiser(
-                    type_activite=type_activite,
-                    pas=pas_calcul,
-                    per_max=per_max if use_per else 0,
-                    madelin_max=madelin_max if use_madelin else 0,
-                    versement_pee=versement_pee if use_pee else 0,
-                    acre=use_acre
-                )
-                # Adapter format pour compatibilité
-                tous_scenarios_niches = [{'scenarios': tous_scenarios, 'meilleur': meilleur_global}]
-            elif forme_juridique == "SARL + Holding":
-                # Utiliser la méthode optimiser
-                meilleur_global, tous_scenarios = optimiseur.optimiser(
-                    pas=pas_calcul,
-                    per_max=per_max if use_per else 0,
-                    madelin_max=madelin_max if use_madelin else 0,
-                    girardin_max=girardin_max if use_girardin else 0,
-                    versement_pee=versement_pee if use_pee else 0
-                )
-                # Adapter format pour compatibilité
-                tous_scenarios_niches = [{'scenarios': tous_scenarios, 'meilleur': meilleur_global}]
-            else:
-                # Autres formes juridiques
-                meilleur_global, tous_scenarios = optimiseur.optimiser(
-                    pas=pas_calcul,
-                    per_max=per_max if use_per else 0,
-                    madelin_max=madelin_max if use_madelin else 0,
-                    girardin_max=girardin_max if use_girardin else 0,
-                    versement_pee=versement_pee if use_pee else 0
-                )
-                # Adapter format pour compatibilité
-                tous_scenarios_niches = [{'scenarios': tous_scenarios, 'meilleur': meilleur_global}]
-            
-            # Utiliser directement le meilleur global pour toutes les formes
-            meilleur_avec_niches = meilleur_global
-            
-            # Récupérer les scénarios pour les graphiques
-            scenarios_avec_niches = None
-            if tous_scenarios_niches and len(tous_scenarios_niches) > 0:
-                if forme_juridique == "SARL + Holding":
-                    # Pour SARL + Holding, chercher la stratégie du meilleur global
-                    for strategie in tous_scenarios_niches:
-                        if strategie['meilleur'] == meilleur_global:
-                            scenarios_avec_niches = strategie['scenarios']
-                            break
-                else:
-                    # Pour les autres formes, utiliser les scénarios du premier élément
-                    scenarios_avec_niches = tous_scenarios_niches[0]['scenarios']
-            
-            # Scénario de référence sans optimisations pour comparaison
-            if forme_juridique == "Micro-entreprise":
-                scenario_ref = optimiseur.calculer_scenario(meilleur_avec_niches['chiffre_affaires'], type_activite=type_activite, acre=False)
-            elif forme_juridique == "SAS":
-                scenario_ref = optimiseur.calculer_scenario(meilleur_avec_niches['salaire_brut'])
-            else:
-                scenario_ref = optimiseur.calculer_scenario(meilleur_avec_niches.get('remuneration_brute', meilleur_avec_niches.get('salaire_brut', 0)))
-            meilleur_classique = scenario_ref
-        
-        # Affichage des résultats
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            st.subheader(f"🏆 Résultat Optimal - {forme_juridique}")
-            
-            # Métriques principales adaptées selon la forme
-            placements_optim = meilleur_avec_niches.get('placements_total', 0)
-
-            if forme_juridique == "Micro-entreprise":
-                net_dispo_optimal = meilleur_avec_niches.get('net_final', 0)
-                net_dispo_classique = meilleur_classique.get('net_final', 0)
-                patrimoine_optimal = net_dispo_optimal  # Pas de distinction pour micro
-                patrimoine_classique = net_dispo_classique
-            else:
-                # Net disponible = cash réel après toutes les déductions
-                net_dispo_optimal = meilleur_avec_niches.get('net_disponible_immediat', meilleur_avec_niches.get('total_net', 0))
-                net_dispo_classique = meilleur_classique.get('net_disponible_immediat', meilleur_classique.get('total_net', 0))
-                # Patrimoine = net disponible + placements
-                patrimoine_optimal = meilleur_avec_niches.get('patrimoine_total', meilleur_avec_niches.get('total_net', 0))
-                patrimoine_classique = meilleur_classique.get('patrimoine_total', meilleur_classique.get('total_net', 0))
-
-            # Affichage des deux métriques
-            col_metric1, col_metric2 = st.columns(2)
+    # Optimisation mise en cache : clé canonique des paramètres, partagée entre sessions
+    parametres = normaliser_parametres(
+        forme_juridique,
+        resultat_initial,
+        charges_existantes,
+        parts_fiscales,
+        plafond_per_disponible,
+        per_max=per_max if use_per else 0,
+        madelin_max=madelin_max if use_madelin else 0,
+        girardin_max=girardin_max if use_girardin and forme_juridique != "Micro-entreprise" else 0,
+        versement_pee=versement_pee if use_pee else 0,
+        pas=pas_calcul,
+        strategie=strategie_calcul,
+        type_activite=type_activite if forme_juridique == "Micro-entreprise" else None,
+        acre=use_acre,
+        pack_fiscal=pack_fiscal
+    )
 
-            with col_metric1:
-                delta_dispo = net_dispo_optimal - net_dispo_classique
-                st.metric(
-                    "💵 Net Disponible Immédiat",
-                    f"{net_dispo_optimal:,.0f}€",
-                    delta=f"{delta_dispo:+,.0f}€",
-                    help="Argent disponible immédiatement (après Girardin si applicable)"
-                )
+    if not st.session_state.run_calculation:
+        # Premier affichage : résultat précalculé des paramètres par défaut, sans attendre le calcul
+        instantane = charger_instantane(cle_canonique(parametres))
+        if instantane is not None:
+            st.caption(f"⚡ Résultat précalculé ({instantane['nb_evaluations']:,} scénarios) : "
+                       f"lancez le calcul pour l'analyse détaillée")
+            afficher_resultat_optimal(forme_juridique, instantane['meilleur'], instantane['scenario_reference'])
 
-            with col_metric2:
-                delta_patrimoine = patrimoine_optimal - patrimoine_classique
-                if placements_optim > 0:
-                    st.metric(
-                        "🏦 Patrimoine Total",
-                        f"{patrimoine_optimal:,.0f}€",
-                        delta=f"{delta_patrimoine:+,.0f}€",
-                        help=f"Net disponible + Placements ({placements_optim:,.0f}€ : PER + Madelin Retraite + PEE)"
-                    )
-                else:
-                    st.metric(
-                        "🏦 Patrimoine Total",
-                        f"{patrimoine_optimal:,.0f}€",
-                        delta=f"{delta_patrimoine:+,.0f}€",
-                        help="Identique au net disponible (pas de placements)"
-                    )
-            
-            col_a, col_b, col_c = st.columns(3)
-            
-            # Adapter les métriques selon la forme juridique
-            if forme_juridique == "Micro-entreprise":
-                with col_a:
-                    st.metric(
-                        "💼 CA optimal",
-                        f"{meilleur_avec_niches['chiffre_affaires']:,.0f}€"
-                    )
-                with col_b:
-                    st.metric(
-                        "🏥 Cotisations sociales",
-                        f"{meilleur_avec_niches['cotisations_sociales']:,.0f}€"
-                    )
-                with col_c:
-                    st.metric(
-                        "📉 Taux Prélèvement Global",
-                        f"{meilleur_avec_niches['taux_prelevement_global']:.1f}%"
-                    )
-            elif forme_juridique == "SAS":
-                with col_a:
-                    st.metric(
-                        "💼 Salaire brut",
-                        f"{meilleur_avec_niches['salaire_brut']:,.0f}€"
-                    )
-                with col_b:
-                    st.metric(
-                        "💎 Dividendes nets",
-                        f"{meilleur_avec_niches['dividendes_nets']:,.0f}€"
-                    )
-                with col_c:
-                    st.metric(
-                        "📉 Taux Prélèvement Global",
-                        f"{meilleur_avec_niches['taux_prelevement_global']:.1f}%"
-                    )
-            else:  # SARL et SARL + Holding
-                with col_a:
-                    st.metric(
-                        "💼 Rémunération brute",
-                        f"{meilleur_avec_niches.get('remuneration_brute', 0):,.0f}€"
-                    )
-                with col_b:
-                    if 'dividendes_sarl' in meilleur_avec_niches:
-                        st.metric(
-                            "💎 Dividendes bruts",
-                            f"{meilleur_avec_niches['dividendes_sarl']:,.0f}€"
-                        )
-                    else:
-                        st.metric(
-                            "💎 Dividendes nets",
-                            f"{meilleur_avec_niches.get('dividendes_nets', 0):,.0f}€"
-                        )
-                with col_c:
-                    st.metric(
-                        "📉 Taux Prélèvement Global",
-                        f"{meilleur_avec_niches['taux_prelevement_global']:.1f}%"
-                    )
-            
-            # Détail des optimisations
-            optimisations = meilleur_avec_niches.get('optimisations', {})
-            if any(optimisations.get(k, 0) > 0 or optimisations.get(k, False) for k in ['per', 'madelin', 'girardin', 'pee', 'acre']):
-                st.subheader("🎯 Optimisations Utilisées")
-                
-                # Optimisations niveau entreprise
-                optimisations_entreprise_utilisees = []
-                if optimisations.get('madelin', 0) > 0:
-                    optimisations_entreprise_utilisees.append(f"🏥 Madelin Retraite (charge déductible) : {optimisations['madelin']:,.0f}€")
-                
-                if optimisations.get('acre', False):
-                    acre_economie = meilleur_avec_niches.get('acre_reduction', 0)
-                    optimisations_entreprise_utilisees.append(f"🎆 ACRE : -50% cotisations (économie {acre_economie:,.0f}€)")
-                
-                if optimisations_entreprise_utilisees:
-                    st.markdown("**🏢 Niveau Entreprise :**")
-                    for opt in optimisations_entreprise_utilisees:
-                        st.info(opt)
-                
-                # Optimisations niveau IR personnel
-                optimisations_ir_utilisees = []
-                if optimisations.get('per', 0) > 0:
-                    optimisations_ir_utilisees.append(f"📈 PER (déduction IR) : {optimisations['per']:,.0f}€")
-                
-                if optimisations.get('girardin', 0) > 0:
-                    reduction_girardin = meilleur_avec_niches.get('reduction_girardin', 0)
-                    optimisations_ir_utilisees.append(f"🏭 Girardin (réduction IR) : {optimisations['girardin']:,.0f}€ → -{reduction_girardin:,.0f}€ d'IR")
-
-                if optimisations.get('pee', 0) > 0:
-                    abondement = meilleur_avec_niches.get('abondement_pee', 0)
-                    placements_pee = meilleur_avec_niches.get('placements_pee', 0)
-                    economie_ir_pee = optimisations.get('economies_pee', 0)
-                    economie_is_abondement = meilleur_avec_niches.get('economie_is_abondement', 0)
-                    optimisations_ir_utilisees.append(
-                        f"💼 PEE/PERCO : Versement {optimisations['pee']:,.0f}€ + Abondement {abondement:,.0f}€ = {placements_pee:,.0f}€ de placement (Économie IR: {economie_ir_pee:,.0f}€ + IS: {economie_is_abondement:,.0f}€)"
-                    )
+    if st.session_state.run_calculation:
+        with st.spinner("🔄 Calcul en cours..."), profiler(profilage_actif) as rapport, rapport.section('optimisation'):
+            optimiseur, meilleur_avec_niches, scenarios_avec_niches, meilleur_classique = optimisation_en_cache(
+                cle_canonique(parametres), parametres
+            )
 
-                if optimisations_ir_utilisees:
-                    st.markdown("**👤 Niveau IR Personnel :**")
-                    for opt in optimisations_ir_utilisees:
-                        if "Girardin" in opt:
-                            st.error(opt)  # En rouge car c'est une dépense
-                        else:
-                            st.info(opt)
-                
-                st.success(f"💰 Économies totales : {optimisations.get('economies_totales', 0):,.0f}€")
+        st.caption(f"🔢 {optimiseur.derniere_optimisation['nb_evaluations']:,} scénarios évalués")
         
-        with col2:
-            st.subheader("📊 Répartition du Revenu")
-            
-            # Graphique en camembert adapté selon la forme juridique
-            if forme_juridique == "Micro-entreprise":
-                labels = ['Net Final', 'PER', 'Cotisations Sociales', 'IR']
-                values = [
-                    meilleur_avec_niches.get('net_final', 0),
-                    meilleur_avec_niches.get('optimisations', {}).get('per', 0),
-                    meilleur_avec_niches.get('cotisations_sociales', 0),
-                    meilleur_avec_niches.get('ir', 0)
-                ]
-                colors = ['#2ecc71', '#27ae60', '#e67e22', '#e74c3c']  # Vert foncé, vert, orange, rouge
-            else:
-                # Grouper : Revenus (salaire, dividendes, placements) puis Prélèvements (cotisations, IR, IS, flat tax)
-                placements_total = meilleur_avec_niches.get('placements_total', 0)
-
-                labels = ['Rémunération nette', 'Dividendes nets', 'Placements',
-                         'Cotisations', 'IR', 'IS Total', 'Flat Tax']
-                values = [
-                    meilleur_avec_niches.get('remuneration_nette_apres_ir', 0),
-                    meilleur_avec_niches.get('dividendes_nets', 0),
-                    placements_total,
-                    meilleur_avec_niches.get('cotisations_tns', meilleur_avec_niches.get('cotisations_salariales', 0) + meilleur_avec_niches.get('cotisations_patronales', 0)),
-                    meilleur_avec_niches.get('ir_remuneration', meilleur_avec_niches.get('ir', 0)),
-                    meilleur_avec_niches.get('is_sarl', 0) + meilleur_avec_niches.get('is_holding', 0),
-                    meilleur_avec_niches.get('flat_tax', 0)
-                ]
-                # Palette : verts pour revenus, rouges/oranges pour prélèvements
-                colors = ['#2ecc71', '#27ae60', '#1abc9c', '#e67e22', '#e74c3c', '#c0392b', '#8e44ad']
-
-            fig_pie = go.Figure(data=[go.Pie(
-                labels=labels,
-                values=values,
-                hole=0.4,
-                textinfo='label+percent',
-                textposition='auto',
-                marker=dict(colors=colors)
-            )])
-            
-            fig_pie.update_layout(
-                title=f"Répartition - {forme_juridique}",
-                height=400
-            )
-            
-            st.plotly_chart(fig_pie, use_container_width=True)
+        # Affichage des résultats
+        afficher_resultat_optimal(forme_juridique, meilleur_avec_niches, meilleur_classique)
         
         # Résumé détaillé complet
         st.subheader("📋 Résumé Détaillé de l'Optimisation")
@@ -522,11 +327,11 @@ def main():
             # Pour la micro : détail des cotisations sociales
             type_activite_resultat = meilleur_avec_niches.get('type_activite', 'BIC - Prestations de services')
             if type_activite_resultat == 'BIC - Vente de marchandises':
-                config = MICRO_BIC_VENTE
+                config = pack_fiscal.MICRO_BIC_VENTE
             elif type_activite_resultat in ['BIC - Prestations de services', 'BIC']:
-                config = MICRO_BIC_SERVICES
+                config = pack_fiscal.MICRO_BIC_SERVICES
             else:
-                config = MICRO_BNC
+                config = pack_fiscal.MICRO_BNC
             taux_effectif = meilleur_avec_niches.get('taux_cotisations_effectif', config['cotisations'])
             cotisations_detail_str = f"  • Cotisations sociales ({taux_effectif*100:.1f}%) : {meilleur_avec_niches.get('cotisations_sociales', 0):,.0f}€  \n"
             if meilleur_avec_niches.get('acre_reduction', 0) > 0:
@@ -535,8 +340,8 @@ def main():
             # Pour la SAS : détail des cotisations salariales et patronales
             cotisations_salariales = meilleur_avec_niches.get('cotisations_salariales', 0)
             cotisations_patronales = meilleur_avec_niches.get('cotisations_patronales', 0)
-            taux_salariales = TAUX_COTISATIONS_SALARIE * 100
-            taux_patronales = TAUX_COTISATIONS_PATRONALES * 100
+            taux_salariales = pack_fiscal.TAUX_COTISATIONS_SALARIE * 100
+            taux_patronales = pack_fiscal.TAUX_COTISATIONS_PATRONALES * 100
             cotisations_detail_str = f"  • Cotisations salariales ({taux_salariales:.1f}%) : {cotisations_salariales:,.0f}€  \n"
             cotisations_detail_str += f"  • Cotisations patronales ({taux_patronales:.1f}%) : {cotisations_patronales:,.0f}€  \n"
             cotisations_detail_str += f"  • **Total cotisations :** {cotisations_salariales + cotisations_patronales:,.0f}€  \n"
@@ -552,7 +357,7 @@ def main():
                     'csg_crds': 'CSG/CRDS',
                     'formation': 'Formation'
                 }.get(nom, nom)
-                taux = TAUX_COTISATIONS_TNS.get(nom, 0) * 100
+                taux = pack_fiscal.TAUX_COTISATIONS_TNS.get(nom, 0) * 100
                 cotisations_detail_str += f"  • {nom_affiche} ({taux:.2f}%) : {montant:,.0f}€  \n"
         
         # Préparer les détails IS
@@ -807,14 +612,24 @@ def main():
                      f"{patrimoine_avec:,.0f}€",
                      f"{gain_patrimoine:+,.0f}€ ({amelioration:+.1f}%)")
         
+        # Comparaison de toutes les formes juridiques (une passe vectorisée, en cache)
+        st.subheader("🏛️ Comparaison des Formes Juridiques")
+        parametres_formes = parametres_comparaison(parametres)
+        with profiler(profilage_actif, rapport), rapport.section('comparaison'):
+            comparaison = comparaison_en_cache(cle_canonique(parametres_formes), parametres_formes)
+        st.dataframe(create_comparaison_dataframe(comparaison, forme_juridique), use_container_width=True, hide_index=True)
+        st.plotly_chart(create_comparaison_chart(comparaison), use_container_width=True)
+
         # Graphique d'optimisation unique
         st.subheader("📈 Analyse Détaillée")
-        fig_opt = create_optimization_chart(scenarios_avec_niches)
+        with rapport.section('graphique'):
+            fig_opt = create_optimization_chart(scenarios_avec_niches)
         st.plotly_chart(fig_opt, use_container_width=True)
         
         # Tableau détaillé des données
         st.subheader("📋 Tableau Détaillé des Scénarios")
-        df_scenarios = create_scenarios_dataframe(scenarios_avec_niches, forme_juridique)
+        with rapport.section('tableau'):
+            df_scenarios = create_scenarios_dataframe(scenarios_avec_niches, forme_juridique)
         
         # Affichage avec possibilité de filtrer
         if not df_scenarios.empty:
@@ -885,65 +700,303 @@ def main():
             mime="text/csv"
         )
 
+        if profilage_actif:
+            afficher_profilage(rapport)
 
-def create_scenarios_dataframe(scenarios, forme_juridique):
-    """Crée un DataFrame avec tous les scénarios pour affichage en tableau selon la forme juridique"""
-    data = []
+
+def afficher_profilage(rapport):
+    """Panneau repliable du profilage : sections de la page, étapes de l'optimisation et appels"""
+    import pandas as pd
+
+    profil = rapport.en_dict()
+    with st.expander("⏱️ Profilage"):
+        st.dataframe(pd.DataFrame(
+            [{'Mesure': f"Section {nom}", 'Durée (ms)': duree * 1e3, 'Appels': None}
+             for nom, duree in profil['sections'].items()] +
+            [{'Mesure': f"Étape {etape}", 'Durée (ms)': mesure['duree_s'] * 1e3, 'Appels': mesure['appels']}
+             for etape, mesure in profil['etapes'].items()] +
+            [{'Mesure': "Hors étapes", 'Durée (ms)': profil['autres_s'] * 1e3, 'Appels': None}]
+        ), use_container_width=True, hide_index=True,
+           column_config={'Durée (ms)': st.column_config.NumberColumn('Durée (ms)', format="%.2f")})
+        st.dataframe(pd.DataFrame([
+            {'Fonction': nom, 'Appels': compteur['appels'], 'Valeurs': compteur['valeurs'] if nom.endswith('_vectorise') else None}
+            for nom, compteur in profil['compteurs'].items()
+        ]), use_container_width=True, hide_index=True)
+        if not any(mesure['appels'] for mesure in profil['etapes'].values()):
+            st.caption("Résultats servis par le cache : aucune étape d'optimisation recalculée")
+
+
+def afficher_resultat_optimal(forme_juridique, meilleur_avec_niches, meilleur_classique):
+    """Métriques du meilleur scénario, optimisations utilisées et répartition du revenu"""
+    import plotly.graph_objects as go
+
+    col1, col2 = st.columns([1, 1])
     
-    for s in scenarios:
-        row = {}
+    with col1:
+        st.subheader(f"🏆 Résultat Optimal - {forme_juridique}")
+        
+        # Métriques principales adaptées selon la forme
+        placements_optim = meilleur_avec_niches.get('placements_total', 0)
+
+        if forme_juridique == "Micro-entreprise":
+            net_dispo_optimal = meilleur_avec_niches.get('net_final', 0)
+            net_dispo_classique = meilleur_classique.get('net_final', 0)
+            patrimoine_optimal = net_dispo_optimal  # Pas de distinction pour micro
+            patrimoine_classique = net_dispo_classique
+        else:
+            # Net disponible = cash réel après toutes les déductions
+            net_dispo_optimal = meilleur_avec_niches.get('net_disponible_immediat', meilleur_avec_niches.get('total_net', 0))
+            net_dispo_classique = meilleur_classique.get('net_disponible_immediat', meilleur_classique.get('total_net', 0))
+            # Patrimoine = net disponible + placements
+            patrimoine_optimal = meilleur_avec_niches.get('patrimoine_total', meilleur_avec_niches.get('total_net', 0))
+            patrimoine_classique = meilleur_classique.get('patrimoine_total', meilleur_classique.get('total_net', 0))
+
+        # Affichage des deux métriques
+        col_metric1, col_metric2 = st.columns(2)
+
+        with col_metric1:
+            delta_dispo = net_dispo_optimal - net_dispo_classique
+            st.metric(
+                "💵 Net Disponible Immédiat",
+                f"{net_dispo_optimal:,.0f}€",
+                delta=f"{delta_dispo:+,.0f}€",
+                help="Argent disponible immédiatement (après Girardin si applicable)"
+            )
+
+        with col_metric2:
+            delta_patrimoine = patrimoine_optimal - patrimoine_classique
+            if placements_optim > 0:
+                st.metric(
+                    "🏦 Patrimoine Total",
+                    f"{patrimoine_optimal:,.0f}€",
+                    delta=f"{delta_patrimoine:+,.0f}€",
+                    help=f"Net disponible + Placements ({placements_optim:,.0f}€ : PER + Madelin Retraite + PEE)"
+                )
+            else:
+                st.metric(
+                    "🏦 Patrimoine Total",
+                    f"{patrimoine_optimal:,.0f}€",
+                    delta=f"{delta_patrimoine:+,.0f}€",
+                    help="Identique au net disponible (pas de placements)"
+                )
         
+        col_a, col_b, col_c = st.columns(3)
+        
+        # Adapter les métriques selon la forme juridique
         if forme_juridique == "Micro-entreprise":
-            row = {
-                'Chiffre d\'affaires': s.get('chiffre_affaires', 0),
-                'Total Net': s.get('total_net', 0),
-                'Cotisations Sociales': s.get('cotisations_sociales', 0),
-                'IR': s.get('ir_remuneration', s.get('ir', 0)),
-                'Net Final': s.get('net_final', 0),
-                'Taux Prélèvement (%)': s.get('taux_prelevement_global', 0)
-            }
+            with col_a:
+                st.metric(
+                    "💼 CA optimal",
+                    f"{meilleur_avec_niches['chiffre_affaires']:,.0f}€"
+                )
+            with col_b:
+                st.metric(
+                    "🏥 Cotisations sociales",
+                    f"{meilleur_avec_niches['cotisations_sociales']:,.0f}€"
+                )
+            with col_c:
+                st.metric(
+                    "📉 Taux Prélèvement Global",
+                    f"{meilleur_avec_niches['taux_prelevement_global']:.1f}%"
+                )
         elif forme_juridique == "SAS":
-            row = {
-                'Salaire Brut': s.get('salaire_brut', 0),
-                'Total Net': s.get('total_net', 0),
-                'Salaire Net': s.get('remuneration_nette_apres_ir', 0),
-                'Dividendes Nets': s.get('dividendes_nets', 0),
-                'Cotisations Salariales': s.get('cotisations_salariales', 0),
-                'Cotisations Patronales': s.get('cotisations_patronales', 0),
-                'IR': s.get('ir_remuneration', 0),
-                'IS': s.get('is_sarl', s.get('is_total', 0)),
-                'Flat Tax': s.get('flat_tax', 0),
-                'Taux Prélèvement (%)': s.get('taux_prelevement_global', 0)
-            }
-        elif forme_juridique == "SARL":
-            row = {
-                'Rémunération Brute': s.get('remuneration_brute', 0),
-                'Total Net': s.get('total_net', 0),
-                'Rémunération Nette': s.get('remuneration_nette_apres_ir', 0),
-                'Dividendes Nets': s.get('dividendes_nets', 0),
-                'Cotisations TNS': s.get('cotisations_tns', 0),
-                'IR': s.get('ir_remuneration', 0),
-                'IS': s.get('is_sarl', s.get('is_total', 0)),
-                'Flat Tax': s.get('flat_tax', 0),
-                'Taux Prélèvement (%)': s.get('taux_prelevement_global', 0)
-            }
-        elif forme_juridique == "SARL + Holding":
-            row = {
-                'Rémunération Brute': s.get('remuneration_brute', 0),
-                'Total Net': s.get('total_net', 0),
-                'Rémunération Nette': s.get('remuneration_nette_apres_ir', 0),
-                'Dividendes Nets': s.get('dividendes_nets', 0),
-                'Cotisations TNS': s.get('cotisations_tns', 0),
-                'IR': s.get('ir_remuneration', 0),
-                'IS SARL': s.get('is_sarl', 0),
-                'IS Holding': s.get('is_holding', 0),
-                'Flat Tax': s.get('flat_tax', 0),
-                'Taux Prélèvement (%)': s.get('taux_prelevement_global', 0)
-            }
+            with col_a:
+                st.metric(
+                    "💼 Salaire brut",
+                    f"{meilleur_avec_niches['salaire_brut']:,.0f}€"
+                )
+            with col_b:
+                st.metric(
+                    "💎 Dividendes nets",
+                    f"{meilleur_avec_niches['dividendes_nets']:,.0f}€"
+                )
+            with col_c:
+                st.metric(
+                    "📉 Taux Prélèvement Global",
+                    f"{meilleur_avec_niches['taux_prelevement_global']:.1f}%"
+                )
+        else:  # SARL et SARL + Holding
+            with col_a:
+                st.metric(
+                    "💼 Rémunération brute",
+                    f"{meilleur_avec_niches.get('remuneration_brute', 0):,.0f}€"
+                )
+            with col_b:
+                if 'dividendes_sarl' in meilleur_avec_niches:
+                    st.metric(
+                        "💎 Dividendes bruts",
+                        f"{meilleur_avec_niches['dividendes_sarl']:,.0f}€"
+                    )
+                else:
+                    st.metric(
+                        "💎 Dividendes nets",
+                        f"{meilleur_avec_niches.get('dividendes_nets', 0):,.0f}€"
+                    )
+            with col_c:
+                st.metric(
+                    "📉 Taux Prélèvement Global",
+                    f"{meilleur_avec_niches['taux_prelevement_global']:.1f}%"
+                )
         
-        data.append(row)
+        # Détail des optimisations
+        optimisations = meilleur_avec_niches.get('optimisations', {})
+        if any(optimisations.get(k, 0) > 0 or optimisations.get(k, False) for k in ['per', 'madelin', 'girardin', 'pee', 'acre']):
+            st.subheader("🎯 Optimisations Utilisées")
+            
+            # Optimisations niveau entreprise
+            optimisations_entreprise_utilisees = []
+            if optimisations.get('madelin', 0) > 0:
+                optimisations_entreprise_utilisees.append(f"🏥 Madelin Retraite (charge déductible) : {optimisations['madelin']:,.0f}€")
+            
+            if optimisations.get('acre', False):
+                acre_economie = meilleur_avec_niches.get('acre_reduction', 0)
+                optimisations_entreprise_utilisees.append(f"🎆 ACRE : -50% cotisations (économie {acre_economie:,.0f}€)")
+            
+            if optimisations_entreprise_utilisees:
+                st.markdown("**🏢 Niveau Entreprise :**")
+                for opt in optimisations_entreprise_utilisees:
+                    st.info(opt)
+            
+            # Optimisations niveau IR personnel
+            optimisations_ir_utilisees = []
+            if optimisations.get('per', 0) > 0:
+                optimisations_ir_utilisees.append(f"📈 PER (déduction IR) : {optimisations['per']:,.0f}€")
+            
+            if optimisations.get('girardin', 0) > 0:
+                reduction_girardin = meilleur_avec_niches.get('reduction_girardin', 0)
+                optimisations_ir_utilisees.append(f"🏭 Girardin (réduction IR) : {optimisations['girardin']:,.0f}€ → -{reduction_girardin:,.0f}€ d'IR")
+
+            if optimisations.get('pee', 0) > 0:
+                abondement = meilleur_avec_niches.get('abondement_pee', 0)
+                placements_pee = meilleur_avec_niches.get('placements_pee', 0)
+                economie_ir_pee = optimisations.get('economies_pee', 0)
+                economie_is_abondement = meilleur_avec_niches.get('economie_is_abondement', 0)
+                optimisations_ir_utilisees.append(
+                    f"💼 PEE/PERCO : Versement {optimisations['pee']:,.0f}€ + Abondement {abondement:,.0f}€ = {placements_pee:,.0f}€ de placement (Économie IR: {economie_ir_pee:,.0f}€ + IS: {economie_is_abondement:,.0f}€)"
+                )
+
+            if optimisations_ir_utilisees:
+                st.markdown("**👤 Niveau IR Personnel :**")
+                for opt in optimisations_ir_utilisees:
+                    if "Girardin" in opt:
+                        st.error(opt)  # En rouge car c'est une dépense
+                    else:
+                        st.info(opt)
+            
+            st.success(f"💰 Économies totales : {optimisations.get('economies_totales', 0):,.0f}€")
     
-    df = pd.DataFrame(data)
+    with col2:
+        st.subheader("📊 Répartition du Revenu")
+        
+        # Graphique en camembert adapté selon la forme juridique
+        if forme_juridique == "Micro-entreprise":
+            labels = ['Net Final', 'PER', 'Cotisations Sociales', 'IR']
+            values = [
+                meilleur_avec_niches.get('net_final', 0),
+                meilleur_avec_niches.get('optimisations', {}).get('per', 0),
+                meilleur_avec_niches.get('cotisations_sociales', 0),
+                meilleur_avec_niches.get('ir', 0)
+            ]
+            colors = ['#2ecc71', '#27ae60', '#e67e22', '#e74c3c']  # Vert foncé, vert, orange, rouge
+        else:
+            # Grouper : Revenus (salaire, dividendes, placements) puis Prélèvements (cotisations, IR, IS, flat tax)
+            placements_total = meilleur_avec_niches.get('placements_total', 0)
+
+            labels = ['Rémunération nette', 'Dividendes nets', 'Placements',
+                     'Cotisations', 'IR', 'IS Total', 'Flat Tax']
+            values = [
+                meilleur_avec_niches.get('remuneration_nette_apres_ir', 0),
+                meilleur_avec_niches.get('dividendes_nets', 0),
+                placements_total,
+                meilleur_avec_niches.get('cotisations_tns', meilleur_avec_niches.get('cotisations_salariales', 0) + meilleur_avec_niches.get('cotisations_patronales', 0)),
+                meilleur_avec_niches.get('ir_remuneration', meilleur_avec_niches.get('ir', 0)),
+                meilleur_avec_niches.get('is_sarl', 0) + meilleur_avec_niches.get('is_holding', 0),
+                meilleur_avec_niches.get('flat_tax', 0)
+            ]
+            # Palette : verts pour revenus, rouges/oranges pour prélèvements
+            colors = ['#2ecc71', '#27ae60', '#1abc9c', '#e67e22', '#e74c3c', '#c0392b', '#8e44ad']
+
+        fig_pie = go.Figure(data=[go.Pie(
+            labels=labels,
+            values=values,
+            hole=0.4,
+            textinfo='label+percent',
+            textposition='auto',
+            marker=dict(colors=colors)
+        )])
+        
+        fig_pie.update_layout(
+            title=f"Répartition - {forme_juridique}",
+            height=400
+        )
+        
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+
+# Colonnes du tableau détaillé par forme juridique : (libellé, colonne du scénario)
+COLONNES_TABLEAU = {
+    "Micro-entreprise": [
+        ('Chiffre d\'affaires', 'chiffre_affaires'),
+        ('Total Net', 'total_net'),
+        ('Cotisations Sociales', 'cotisations_sociales'),
+        ('IR', 'ir_final'),
+        ('Net Final', 'net_final'),
+        ('Taux Prélèvement (%)', 'taux_prelevement_global')
+    ],
+    "SAS": [
+        ('Salaire Brut', 'salaire_brut'),
+        ('Total Net', 'total_net'),
+        ('Salaire Net', 'remuneration_nette_apres_ir'),
+        ('Dividendes Nets', 'dividendes_nets'),
+        ('Cotisations Salariales', 'cotisations_salariales'),
+        ('Cotisations Patronales', 'cotisations_patronales'),
+        ('IR', 'ir_final'),
+        ('IS', 'is_sarl'),
+        ('Flat Tax', 'flat_tax'),
+        ('Taux Prélèvement (%)', 'taux_prelevement_global')
+    ],
+    "SARL": [
+        ('Rémunération Brute', 'remuneration_brute'),
+        ('Total Net', 'total_net'),
+        ('Rémunération Nette', 'remuneration_nette_apres_ir'),
+        ('Dividendes Nets', 'dividendes_nets'),
+        ('Cotisations TNS', 'cotisations_tns'),
+        ('IR', 'ir_final'),
+        ('IS', 'is_sarl'),
+        ('Flat Tax', 'flat_tax'),
+        ('Taux Prélèvement (%)', 'taux_prelevement_global')
+    ],
+    "SARL + Holding": [
+        ('Rémunération Brute', 'remuneration_brute'),
+        ('Total Net', 'total_net'),
+        ('Rémunération Nette', 'remuneration_nette_apres_ir'),
+        ('Dividendes Nets', 'dividendes_nets'),
+        ('Cotisations TNS', 'cotisations_tns'),
+        ('IR', 'ir_final'),
+        ('IS SARL', 'is_sarl'),
+        ('IS Holding', 'is_holding'),
+        ('Flat Tax', 'flat_tax'),
+        ('Taux Prélèvement (%)', 'taux_prelevement_global')
+    ]
+}
+
+
+def colonne_scenarios(scenarios, nom, defaut=0.0):
+    """Extrait une colonne NumPy d'une ScenarioGrid ou d'une liste de scénarios (dictionnaires)"""
+    if isinstance(scenarios, ScenarioGrid):
+        return scenarios.colonne(nom, defaut)
+    nom = ALIAS_COLONNES.get(nom, nom)
+    return np.array([s.get(nom, defaut) for s in scenarios], dtype=float)
+
+
+def create_scenarios_dataframe(scenarios, forme_juridique):
+    """Crée un DataFrame avec tous les scénarios pour affichage en tableau selon la forme juridique"""
+    import pandas as pd
+
+    df = pd.DataFrame({
+        libelle: colonne_scenarios(scenarios, nom)
+        for libelle, nom in COLONNES_TABLEAU[forme_juridique]
+    })
     
     # Trier par la première colonne (rémunération/CA)
     if not df.empty:
@@ -952,21 +1005,61 @@ def create_scenarios_dataframe(scenarios, forme_juridique):
     return df
 
 
+def create_comparaison_dataframe(comparaison, forme_juridique):
+    """Tableau de l'optimum de chaque forme juridique, classé du meilleur au moins bon"""
+    import pandas as pd
+
+    classement = comparaison['classement']
+    meilleure_valeur = comparaison['formes'][classement[0]]['valeur'] if classement else 0
+    lignes = []
+    for forme in classement:
+        resultat_forme = comparaison['formes'][forme]
+        lignes.append({
+            'Forme juridique': f"{forme} ✅" if forme == forme_juridique else forme,
+            'Rémunération optimale (€)': f"{resultat_forme['remuneration_optimale']:,.0f}",
+            'Patrimoine optimal (€)': f"{resultat_forme['valeur']:,.0f}",
+            'Écart avec la meilleure (€)': f"{resultat_forme['valeur'] - meilleure_valeur:+,.0f}",
+        })
+    return pd.DataFrame(lignes)
+
+def create_comparaison_chart(comparaison):
+    """Courbes du patrimoine de chaque forme juridique sur la grille commune de rémunérations"""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for forme, resultat_forme in comparaison['formes'].items():
+        fig.add_trace(go.Scatter(
+            x=comparaison['remunerations'],
+            y=resultat_forme['courbe'],
+            mode='lines',
+            name=forme,
+            hovertemplate='Rémunération: %{x:,.0f}€<br>Patrimoine: %{y:,.0f}€<extra>' + forme + '</extra>'
+        ))
+    fig.update_layout(
+        xaxis_title="Rémunération brute (€)",
+        yaxis_title="Patrimoine total (€)",
+        hovermode='x unified',
+        height=450
+    )
+    return fig
+
 def create_optimization_chart(scenarios):
     """Crée le graphique d'optimisation détaillée"""
+    import plotly.graph_objects as go
+    import plotly.subplots as sp
+
     # Utiliser tous les scénarios (dividendes négatifs désormais gérés correctement)
-    scenarios_valides = scenarios
-    
-    remunerations = [s.get('remuneration_brute', s.get('salaire_brut', s.get('chiffre_affaires', 0))) for s in scenarios_valides]
-    totaux_nets = [s.get('total_net', 0) for s in scenarios_valides]
-    taux_prelevements = [s.get('taux_prelevement_global', 0) for s in scenarios_valides]
-    remunerations_nettes = [s.get('remuneration_nette_apres_ir', s.get('net_final', 0)) for s in scenarios_valides]
-    dividendes_nets = [s.get('dividendes_nets', 0) for s in scenarios_valides]
-    cotisations = [s.get('cotisations_tns', s.get('cotisations_salariales', 0) + s.get('cotisations_patronales', 0) + s.get('cotisations_sociales', 0)) for s in scenarios_valides]
-    ir = [s.get('ir_remuneration', s.get('ir', 0)) for s in scenarios_valides]
-    is_sarl = [s.get('is_sarl', s.get('is_total', 0)) for s in scenarios_valides]
-    is_holding = [s.get('is_holding', 0) for s in scenarios_valides]
-    flat_tax = [s.get('flat_tax', 0) for s in scenarios_valides]
+    remunerations = colonne_scenarios(scenarios, 'remuneration_brute')
+    totaux_nets = colonne_scenarios(scenarios, 'total_net')
+    taux_prelevements = colonne_scenarios(scenarios, 'taux_prelevement_global')
+    cotisations = (colonne_scenarios(scenarios, 'cotisations_tns') +
+                   colonne_scenarios(scenarios, 'cotisations_salariales') +
+                   colonne_scenarios(scenarios, 'cotisations_patronales') +
+                   colonne_scenarios(scenarios, 'cotisations_sociales'))
+    ir = colonne_scenarios(scenarios, 'ir_final')
+    is_sarl = colonne_scenarios(scenarios, 'is_sarl')
+    is_holding = colonne_scenarios(scenarios, 'is_holding')
+    flat_tax = colonne_scenarios(scenarios, 'flat_tax')
     
     # Créer des sous-graphiques (2x2 - 1)
     fig = sp.make_subplots(
@@ -980,10 +1073,7 @@ def create_optimization_chart(scenarios):
     )
     
     # Graphique 1 : Total net avec optimum marqué
-    if totaux_nets:  # Vérifier qu'il y a des données
-        max_idx = totaux_nets.index(max(totaux_nets))
-    else:
-        max_idx = 0
+    max_idx = int(np.argmax(totaux_nets)) if len(totaux_nets) else 0
     
     fig.add_trace(
         go.Scatter(
@@ -999,7 +1089,7 @@ def create_optimization_chart(scenarios):
     )
     
     # Marquer l'optimum
-    if totaux_nets:  # Seulement si on a des données
+    if len(totaux_nets):  # Seulement si on a des données
         fig.add_trace(
             go.Scatter(
                 x=[remunerations[max_idx]], 
@@ -1032,7 +1122,7 @@ def create_optimization_chart(scenarios):
     fig.add_trace(
         go.Scatter(
             x=remunerations, 
-            y=[c + i for c, i in zip(cotisations, ir)],
+            y=cotisations + ir,
             mode='lines',
             name='+ IR',
             fill='tonexty',
@@ -1047,14 +1137,14 @@ def create_optimization_chart(scenarios):
     fig.add_trace(
         go.Scatter(
             x=remunerations, 
-            y=[c + i + is_s + is_h for c, i, is_s, is_h in zip(cotisations, ir, is_sarl, is_holding)],
+            y=cotisations + ir + is_sarl + is_holding,
             mode='lines',
             name='+ IS Total',
             fill='tonexty',
             line=dict(color='darkred'),
             hovertemplate='<b>Rémunération:</b> %{x:,.0f}€<br>' +
                          '<b>IS Total:</b> %{customdata:,.0f}€<extra></extra>',
-            customdata=[s + h for s, h in zip(is_sarl, is_holding)]
+            customdata=is_sarl + is_holding
         ),
         row=1, col=2
     )
@@ -1062,7 +1152,7 @@ def create_optimization_chart(scenarios):
     fig.add_trace(
         go.Scatter(
             x=remunerations, 
-            y=[c + i + is_s + is_h + ft for c, i, is_s, is_h, ft in zip(cotisations, ir, is_sarl, is_holding, flat_tax)],
+            y=cotisations + ir + is_sarl + is_holding + flat_tax,
             mode='lines',
             name='+ Flat tax',
             fill='tonexty',
@@ -1087,7 +1177,22 @@ def create_optimization_chart(scenarios):
         ),
         row=2, col=1
     )
-    
+
+    # Taux marginal effectif : dérivée analytique sur les colonnes de la grille, sans nouveau balayage
+    if isinstance(scenarios, ScenarioGrid) and len(scenarios):
+        fig.add_trace(
+            go.Scatter(
+                x=remunerations,
+                y=scenarios.taux_marginal()['total'],
+                mode='lines',
+                name='Taux marginal effectif',
+                line=dict(color='purple', width=2, dash='dot'),
+                hovertemplate='<b>Rémunération:</b> %{x:,.0f}€<br>' +
+                             '<b>Taux marginal:</b> %{y:.1f}%<extra></extra>'
+            ),
+            row=2, col=1
+        )
+
     # Mise en forme
     fig.update_layout(
         height=800,  # Hauteur normale pour 3 graphiques
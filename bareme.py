@@ -0,0 +1,108 @@
+"""
+Barèmes progressifs compilés (IR, IS) : seuils, taux et impôt cumulé à chaque seuil
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+
+class BaremeCompile:
+    """Barème progressif immuable compilé une seule fois
+
+    Stocke les seuils de début de tranche, les taux et l'impôt cumulé à chaque
+    seuil (sommes préfixes) : l'impôt d'un montant se lit en O(log k) par une
+    recherche de tranche, sans parcourir les tranches ni allouer. Les montants
+    sont exprimés dans l'unité du barème (par part pour l'IR) ; `parts` met à
+    l'échelle le revenu et l'impôt.
+    """
+
+    __slots__ = ('seuils', 'taux', 'cumuls', 'largeurs', '_seuils', '_taux', '_cumuls', '_largeurs')
+
+    def __init__(self, seuils, taux):
+        seuils = np.array(seuils, dtype=float)
+        taux = np.array(taux, dtype=float)
+        if len(seuils) != len(taux) or seuils[0] != 0 or np.any(np.diff(seuils) <= 0):
+            raise ValueError("Barème invalide : seuils croissants depuis 0 et un taux par tranche attendus")
+        cumuls = np.concatenate(([0.0], np.cumsum(np.diff(seuils) * taux[:-1])))
+        largeurs = np.append(np.diff(seuils), np.inf)
+
+        for nom, valeurs in (('seuils', seuils), ('taux', taux), ('cumuls', cumuls), ('largeurs', largeurs)):
+            valeurs.flags.writeable = False
+            object.__setattr__(self, nom, valeurs)
+        # Copies Python pour le calcul scalaire (bisect plus rapide que NumPy sur un seul montant)
+        object.__setattr__(self, '_seuils', tuple(seuils.tolist()))
+        object.__setattr__(self, '_taux', tuple(taux.tolist()))
+        object.__setattr__(self, '_cumuls', tuple(cumuls.tolist()))
+        object.__setattr__(self, '_largeurs', tuple(largeurs.tolist()))
+
+    @classmethod
+    def depuis_limites(cls, tranches):
+        """Compile des tranches dont 'limite' est la borne supérieure (format TRANCHES_IR)"""
+        return cls([0.0] + [tranche['limite'] for tranche in tranches[:-1]],
+                   [tranche['taux'] for tranche in tranches])
+
+    @classmethod
+    def depuis_largeurs(cls, tranches):
+        """Compile des tranches dont 'limite' est la largeur de la tranche (format TRANCHES_IS)"""
+        return cls(np.concatenate(([0.0], np.cumsum([tranche['limite'] for tranche in tranches[:-1]]))),
+                   [tranche['taux'] for tranche in tranches])
+
+    def __setattr__(self, nom, valeur):
+        raise AttributeError("BaremeCompile est immuable")
+
+    def __eq__(self, autre):
+        return (isinstance(autre, BaremeCompile)
+                and self._seuils == autre._seuils and self._taux == autre._taux)
+
+    def __hash__(self):
+        return hash((self._seuils, self._taux))
+
+    def __repr__(self):
+        return f"BaremeCompile(seuils={list(self._seuils)}, taux={list(self._taux)})"
+
+    def __len__(self):
+        return len(self._seuils)
+
+    def impot(self, montant, parts=1):
+        """Impôt d'un montant scalaire (0 si le montant est négatif ou nul)"""
+        montant_par_part = montant / parts
+        if montant_par_part <= 0:
+            return 0.0
+        indice = bisect_right(self._seuils, montant_par_part) - 1
+        return (self._cumuls[indice] + (montant_par_part - self._seuils[indice]) * self._taux[indice]) * parts
+
+    def impot_vectorise(self, montants, parts=1):
+        """Impôt d'un tableau de montants en une seule passe (np.searchsorted)"""
+        montants_par_part = np.maximum(np.asarray(montants, dtype=float), 0) / parts
+        indices = np.searchsorted(self.seuils, montants_par_part, side='right') - 1
+        return (self.cumuls[indices] + (montants_par_part - self.seuils[indices]) * self.taux[indices]) * parts
+
+    def taux_marginal(self, montants, parts=1):
+        """Taux de la tranche qui s'applique au prochain euro (scalaire ou tableau)"""
+        if np.ndim(montants) == 0:
+            return self._taux[max(bisect_right(self._seuils, montants / parts) - 1, 0)]
+        montants_par_part = np.maximum(np.asarray(montants, dtype=float), 0) / parts
+        return self.taux[np.searchsorted(self.seuils, montants_par_part, side='right') - 1]
+
+    def montant_pour_impot(self, impots, parts=1):
+        """Inverse de impot_vectorise() : plus grand montant dont l'impôt vaut `impots`
+
+        Les tranches à taux nul sont traversées : un impôt nul donne la fin de
+        la dernière tranche à taux nul.
+        """
+        impots_par_part = np.maximum(np.asarray(impots, dtype=float), 0) / parts
+        indices = np.searchsorted(self.cumuls, impots_par_part, side='right') - 1
+        # Un impôt atteint à un seuil appartient à la première tranche imposée suivante
+        taux = self.taux[indices]
+        indices = np.where(taux > 0, indices, np.minimum(indices + 1, len(self) - 1))
+        return (self.seuils[indices] + (impots_par_part - self.cumuls[indices]) / self.taux[indices]) * parts
+
+    def tranches_utilisees(self, montant_par_part):
+        """Liste des (début, largeur, taux, base) des tranches entamées par un montant positif"""
+        derniere = bisect_left(self._seuils, montant_par_part) - 1
+        tranches = [(self._seuils[indice], self._largeurs[indice], self._taux[indice], self._largeurs[indice])
+                    for indice in range(derniere)]
+        debut = self._seuils[derniere]
+        tranches.append((debut, self._largeurs[derniere], self._taux[derniere], montant_par_part - debut))
+        return tranches
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Benchmark des chemins critiques (formes juridiques, optimiseur, graphiques de l'interface)
+comparé à une référence JSON avec seuils de régression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from fiscal_base import vider_caches_bases, STRATEGIES_OPTIMISATION
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+
+# Référence versionnée avec le code (mesures et seuils de régression)
+FICHIER_REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_reference.json')
+
+# Interface mesurée au démarrage, et modules lourds qu'elle ne doit importer qu'à la demande
+FICHIER_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+CAS_DEMARRAGE = 'app/demarrage'
+MODULES_DIFFERES = ['pandas', 'plotly.subplots']
+
+# Premier affichage de l'interface dans un processus neuf (Streamlit importé, modules de l'interface non importés)
+CODE_DEMARRAGE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+application = AppTest.from_file(sys.argv[1], default_timeout=60)
+debut = time.perf_counter()
+application.run()
+duree = time.perf_counter() - debut
+print(json.dumps({'duree_s': duree, 'exceptions': [str(erreur.value) for erreur in application.exception],
+                  'metriques': [metrique.value for metrique in application.metric],
+                  'modules_charges': [module for module in json.loads(sys.argv[2]) if module in sys.modules]}))
+"""
+
+# Tailles de résultat et pas de balayage mesurés
+RESULTATS_BENCHMARK = [100000, 300000, 1000000]
+PAS_BENCHMARK = [1000, 5000, 25000]
+
+# Seuils par défaut (ratio mesure / référence, après normalisation par l'étalon et la dérive) ;
+# le préfixe de cas le plus long l'emporte, 'defaut' s'applique aux autres
+SEUILS_DEFAUT = {'defaut': 2.0, 'app/': 2.5, CAS_DEMARRAGE: 1.5}
+
+# Seuil de la dérive (ralentissement médian de tous les cas) ; simple avertissement pour un benchmark filtré,
+# dont la médiane ne porte que sur quelques cas semblables
+SEUIL_GLOBAL_DEFAUT = 2.0
+
+# Écart absolu (secondes normalisées) en dessous duquel un ralentissement est ignoré (bruit)
+MARGE_ABSOLUE_DEFAUT = 5e-6
+
+# Durée de mesure par cas et par tour (secondes) ; nombre de tours ; nombre d'appels minimal et maximal
+BUDGET_PAR_CAS = 0.1
+TOURS = 3
+APPELS_MIN = 5
+APPELS_MAX = 2000
+
+
+def mesurer(appel, avant=None, budget=BUDGET_PAR_CAS, appels_min=APPELS_MIN, appels_max=APPELS_MAX):
+    """Durée d'un appel (secondes) : minimum sur des appels répétés pendant `budget` secondes
+
+    `avant` (vidage des caches...) est exécuté hors chronométrage avant chaque
+    appel. Le minimum est l'estimateur le moins sensible aux interruptions.
+    """
+    durees = []
+    debut = time.perf_counter()
+    while len(durees) < appels_min or (len(durees) < appels_max and time.perf_counter() - debut < budget):
+        if avant is not None:
+            avant()
+        depart = time.perf_counter()
+        appel()
+        durees.append(time.perf_counter() - depart)
+    return min(durees)
+
+
+def etalonner(budget=BUDGET_PAR_CAS):
+    """Durée d'une charge de référence (Python et NumPy) : rend les mesures comparables entre machines
+
+    Mesurée avec un budget quintuple : l'erreur sur l'étalon se reporte sur tous les cas.
+    """
+    valeurs = np.linspace(0, 1, 50000)
+
+    def charge():
+        total = 0.0
+        for valeur in range(20000):
+            total += valeur * 0.5
+        np.sort(valeurs[::-1])
+        return total
+
+    return mesurer(charge, budget=5 * budget)
+
+
+def cas_benchmark(filtre=None):
+    """Cas mesurés : liste de (nom, appel, avant)
+
+    Pour chaque forme juridique et taille de résultat : calculer_scenario_base,
+    appliquer_optimisations_personnelles, calculer_scenario (caches vidés) et
+    optimiser() pour chaque stratégie, aux différents pas, en scénarios
+    dictionnaires et en colonnes (caches vidés). Puis create_scenarios_dataframe
+    et create_optimization_chart de l'interface pour chaque forme, et le
+    premier affichage de l'interface (CAS_DEMARRAGE). `filtre` garde les cas
+    dont le nom contient la chaîne.
+    """
+    cas = []
+    for forme in FORMES_JURIDIQUES:
+        for resultat in RESULTATS_BENCHMARK:
+            optimiseur = creer_optimiseur(forme, resultat_avant_remuneration=resultat, charges_existantes=resultat // 10)
+            remuneration = resultat if forme == 'Micro-entreprise' else resultat // 3
+            base = optimiseur.calculer_scenario_base(remuneration)
+            prefixe = f"{forme}/resultat={resultat}"
+            cas += [
+                (f"{prefixe}/calculer_scenario_base", lambda o=optimiseur, r=remuneration: o.calculer_scenario_base(r), None),
+                (f"{prefixe}/appliquer_optimisations_personnelles",
+                 lambda o=optimiseur, b=base: o.appliquer_optimisations_personnelles(b, 5000, 2000), None),
+                (f"{prefixe}/calculer_scenario",
+                 lambda o=optimiseur, r=remuneration: o.calculer_scenario(r, per_montant=5000), vider_caches_bases),
+            ]
+            for strategie in STRATEGIES_OPTIMISATION:
+                for pas in (PAS_BENCHMARK if strategie == 'balayage' else PAS_BENCHMARK[-1:]):
+                    for colonnaire in (False, True):
+                        cas.append((
+                            f"{prefixe}/optimiser[{strategie}{',colonnaire' if colonnaire else ''}]/pas={pas}",
+                            lambda o=optimiseur, p=pas, s=strategie, c=colonnaire: o.optimiser(
+                                pas=p, per_max=5000, strategie=s, colonnaire=c),
+                            vider_caches_bases
+                        ))
+
+    cas += cas_benchmark_app()
+    cas.append((CAS_DEMARRAGE, lambda: premier_affichage()['duree_s'], None))
+    return [un_cas for un_cas in cas if not filtre or filtre in un_cas[0]]
+
+
+def cas_benchmark_app():
+    """Cas de l'interface : tableau et graphique des scénarios de chaque forme (300 000 €, pas 5 000 €)"""
+    import app
+
+    cas = []
+    for forme in FORMES_JURIDIQUES:
+        optimiseur = creer_optimiseur(forme, resultat_avant_remuneration=300000, charges_existantes=50000)
+        for colonnaire in (False, True):
+            _, scenarios = optimiseur.optimiser(pas=5000, per_max=5000, colonnaire=colonnaire)
+            suffixe = '[colonnaire]' if colonnaire else ''
+            cas += [
+                (f"app/{forme}/create_scenarios_dataframe{suffixe}",
+                 lambda s=scenarios, f=forme: app.create_scenarios_dataframe(s, f), None),
+                (f"app/{forme}/create_optimization_chart{suffixe}",
+                 lambda s=scenarios: app.create_optimization_chart(s), None),
+            ]
+    return cas
+
+
+def premier_affichage():
+    """Premier affichage de l'interface (paramètres par défaut) dans un processus neuf
+
+    Retourne {'duree_s', 'exceptions', 'metriques', 'modules_charges'} :
+    'modules_charges' liste les MODULES_DIFFERES importés pendant l'affichage.
+    """
+    sortie = subprocess.run([sys.executable, '-c', CODE_DEMARRAGE, FICHIER_APP, json.dumps(MODULES_DIFFERES)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(sortie.stdout.splitlines()[-1])
+
+
+def executer_benchmark(cas, budget=BUDGET_PAR_CAS, tours=TOURS, afficher=False):
+    """Mesure chaque cas et retourne {'etalon_s': ..., 'mesures': {nom: secondes}}
+
+    Les cas sont mesurés `tours` fois à la suite, l'étalon entre chaque tour
+    (avant le premier et après le dernier compris), et les minimums sont
+    retenus : une dérive passagère de la machine (fréquence, voisins) ne
+    touche ni tous les tours ni toutes les mesures de l'étalon. Le démarrage de
+    l'interface (un processus neuf par tour) est chronométré par son appel.
+    """
+    etalon = float('inf')
+    mesures = {}
+    for tour in range(tours):
+        etalon = min(etalon, etalonner(budget))
+        for nom, appel, avant in cas:
+            duree = appel() if nom == CAS_DEMARRAGE else mesurer(appel, avant, budget)
+            mesures[nom] = min(mesures.get(nom, float('inf')), duree)
+            if afficher and tour == tours - 1:
+                print(f"  {mesures[nom] * 1e3:>10.3f} ms  {nom}", file=sys.stderr)
+    etalon = min(etalon, etalonner(budget))
+    return {'etalon_s': etalon, 'mesures': mesures}
+
+
+def seuil_cas(nom, seuils):
+    """Seuil de régression d'un cas : préfixe le plus long de `seuils`, sinon 'defaut'"""
+    prefixes = [prefixe for prefixe in seuils if prefixe != 'defaut' and nom.startswith(prefixe)]
+    return seuils[max(prefixes, key=len)] if prefixes else seuils['defaut']
+
+
+def comparer_a_reference(resultats, reference):
+    """Compare des mesures à la référence ; retourne (une ligne par cas mesuré, dérive)
+
+    Les durées sont d'abord ramenées à la machine de référence par l'étalon. La
+    dérive est le ratio médian mesure / référence : elle absorbe un
+    ralentissement de toute la machine (fréquence, voisins) et chaque cas est
+    jugé sur son ratio divisé par la dérive. Statut 'regression' si ce ratio
+    dépasse le seuil du cas et que l'écart normalisé dépasse la marge absolue,
+    'nouveau' si le cas n'est pas dans la référence, 'ok' sinon. Une dérive
+    supérieure au seuil global signale un ralentissement de tous les cas.
+    """
+    seuils = reference.get('seuils', SEUILS_DEFAUT)
+    marge = reference.get('marge_absolue_s', MARGE_ABSOLUE_DEFAUT)
+    echelle = reference['etalon_s'] / resultats['etalon_s']
+    durees = {nom: duree * echelle for nom, duree in resultats['mesures'].items()}
+    ratios = [durees[nom] / reference['mesures'][nom] for nom in durees if reference['mesures'].get(nom)]
+    derive = statistics.median(ratios) if ratios else 1.0
+
+    lignes = []
+    for nom, duree in resultats['mesures'].items():
+        ligne = {'cas': nom, 'mesure_s': duree, 'reference_s': reference['mesures'].get(nom),
+                 'ratio': None, 'seuil': seuil_cas(nom, seuils), 'statut': 'nouveau'}
+        if ligne['reference_s']:
+            ligne['ratio'] = durees[nom] / ligne['reference_s'] / derive
+            ecart = durees[nom] / derive - ligne['reference_s']
+            ligne['statut'] = 'regression' if ligne['ratio'] > ligne['seuil'] and ecart > marge else 'ok'
+        lignes.append(ligne)
+    return lignes, derive
+
+
+def charger_reference(chemin=FICHIER_REFERENCE):
+    """Référence JSON (None si le fichier n'existe pas)"""
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def enregistrer_reference(resultats, chemin=FICHIER_REFERENCE, reference=None):
+    """Écrit les mesures comme nouvelle référence en conservant les seuils de l'ancienne
+
+    Avec un benchmark filtré, les cas non mesurés de l'ancienne référence sont conservés.
+    """
+    mesures = dict(reference['mesures']) if reference else {}
+    if reference and reference['etalon_s'] != resultats['etalon_s']:
+        # Ramène les anciennes mesures à l'étalon de cette machine
+        echelle = resultats['etalon_s'] / reference['etalon_s']
+        mesures = {nom: duree * echelle for nom, duree in mesures.items()}
+    mesures.update(resultats['mesures'])
+
+    contenu = {
+        'description': "Durées de référence (secondes, minimum sur appels répétés) ; "
+                       "comparées après normalisation par etalon_s et par la dérive médiane",
+        'seuils': reference.get('seuils', SEUILS_DEFAUT) if reference else SEUILS_DEFAUT,
+        'seuil_global': reference.get('seuil_global', SEUIL_GLOBAL_DEFAUT) if reference else SEUIL_GLOBAL_DEFAUT,
+        'marge_absolue_s': reference.get('marge_absolue_s', MARGE_ABSOLUE_DEFAUT) if reference else MARGE_ABSOLUE_DEFAUT,
+        'etalon_s': float(f"{resultats['etalon_s']:.4g}"),
+        'mesures': {nom: float(f"{duree:.4g}") for nom, duree in sorted(mesures.items())},
+    }
+    with open(chemin, 'w', encoding='utf-8') as fichier:
+        json.dump(contenu, fichier, indent=2, ensure_ascii=False)
+        fichier.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark des performances comparé à la référence')
+    parser.add_argument('--filtre',
+                        help='Ne mesure que les cas dont le nom contient cette chaîne')
+    parser.add_argument('--budget', type=float, default=BUDGET_PAR_CAS,
+                        help=f'Durée de mesure par cas en secondes (défaut: {BUDGET_PAR_CAS})')
+    parser.add_argument('--tours', type=int, default=TOURS,
+                        help=f'Nombre de tours de mesure, minimum retenu (défaut: {TOURS})')
+    parser.add_argument('--reference', default=FICHIER_REFERENCE,
+                        help='Fichier JSON de référence (défaut: bench_reference.json)')
+    parser.add_argument('--enregistrer', action='store_true',
+                        help='Enregistre les mesures comme nouvelle référence au lieu de comparer')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Affiche chaque mesure pendant le benchmark')
+
+    args = parser.parse_args()
+
+    cas = cas_benchmark(args.filtre)
+    if not cas:
+        print(f"Erreur: aucun cas ne correspond au filtre '{args.filtre}'", file=sys.stderr)
+        return 1
+    resultats = executer_benchmark(cas, args.budget, args.tours, args.verbose)
+    reference = charger_reference(args.reference)
+
+    if args.enregistrer:
+        enregistrer_reference(resultats, args.reference, reference)
+        print(f"{len(cas)} cas enregistrés dans {args.reference}")
+        return 0
+    if reference is None:
+        print(f"Erreur: référence {args.reference} absente (lancer avec --enregistrer)", file=sys.stderr)
+        return 1
+
+    lignes, derive = comparer_a_reference(resultats, reference)
+    print(f"{'Cas':<78} {'Réf. ms':>10} {'Mesure ms':>10} {'Ratio':>6} {'Seuil':>6}  Statut")
+    for ligne in lignes:
+        reference_ms = f"{ligne['reference_s'] * 1e3:.3f}" if ligne['reference_s'] else '-'
+        ratio = f"{ligne['ratio']:.2f}" if ligne['ratio'] is not None else '-'
+        print(f"{ligne['cas']:<78} {reference_ms:>10} {ligne['mesure_s'] * 1e3:>10.3f} {ratio:>6} "
+              f"{ligne['seuil']:>6.2f}  {ligne['statut']}")
+
+    regressions = [ligne for ligne in lignes if ligne['statut'] == 'regression']
+    seuil_global = reference.get('seuil_global', SEUIL_GLOBAL_DEFAUT)
+    print(f"\n{len(lignes)} cas, {len(regressions)} régression(s) ; dérive {derive:.2f} (seuil {seuil_global:.2f}), "
+          f"échelle machine {reference['etalon_s'] / resultats['etalon_s']:.2f}")
+    regression_globale = derive > seuil_global and not args.filtre
+    if regression_globale:
+        print(f"Régression globale : tous les cas sont {derive:.2f} fois plus lents que la référence", file=sys.stderr)
+    elif derive > seuil_global:
+        print(f"Avertissement : les cas filtrés sont {derive:.2f} fois plus lents que la référence "
+              f"(dérive non bloquante pour un benchmark filtré)", file=sys.stderr)
+    return 1 if regressions or regression_globale else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
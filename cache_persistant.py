@@ -0,0 +1,144 @@
+"""
+Cache persistant de résultats : base SQLite adressée par contenu, bornée en taille (LRU), partagée entre processus
+"""
+
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+# Taille maximale par défaut des valeurs conservées (octets)
+TAILLE_MAX_DEFAUT = 256 * 2**20
+
+# Attente maximale d'un verrou d'écriture tenu par un autre processus (secondes)
+DELAI_ATTENTE_DEFAUT = 5.0
+
+# Dates d'accès séparées des valeurs : les mettre à jour ne réécrit pas la valeur
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entrees (
+    cle TEXT PRIMARY KEY,
+    taille INTEGER NOT NULL,
+    dernier_acces REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS valeurs (
+    cle TEXT PRIMARY KEY,
+    valeur BLOB NOT NULL
+);
+"""
+
+# Entrées les moins récemment utilisées au-delà de la taille maximale (cumul du plus récent au plus ancien)
+ENTREES_AU_DELA = """
+SELECT cle FROM (
+    SELECT cle, SUM(taille) OVER (ORDER BY dernier_acces DESC, cle) AS cumul FROM entrees
+) WHERE cumul > ?
+"""
+
+
+class CachePersistant:
+    """Valeurs Python (pickle) indexées par une clé de contenu dans une base SQLite
+
+    Plusieurs processus (workers Streamlit, redémarrages du serveur) partagent
+    la même base : journal WAL (les lectures ne sont jamais bloquées par une
+    écriture), écritures sérialisées par SQLite (BEGIN IMMEDIATE, attente du
+    verrou pendant `delai_attente`). Chaque fil ouvre sa propre connexion,
+    conservée entre les opérations (fermer la dernière connexion d'une base
+    WAL la checkpointe) ; un processus fils ouvre les siennes.
+
+    Chaque lecture réussie met à jour la date de dernier accès ; après une
+    écriture, les entrées les moins récemment utilisées sont supprimées jusqu'à
+    ce que la taille cumulée des valeurs ne dépasse plus `taille_max` octets.
+    Une erreur SQLite (verrou tenu trop longtemps, disque plein, répertoire en
+    lecture seule) n'interrompt jamais le calcul : la lecture est traitée
+    comme absente, l'écriture ignorée, et l'erreur signalée sur la sortie d'erreur.
+    """
+
+    def __init__(self, chemin, taille_max=TAILLE_MAX_DEFAUT, delai_attente=DELAI_ATTENTE_DEFAUT):
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.delai_attente = delai_attente
+        self._local = threading.local()
+
+    def _connexion(self):
+        """Connexion du fil courant en mode autocommit (transactions explicites), schéma créé à l'ouverture"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None or self._local.pid != os.getpid():
+            connexion = sqlite3.connect(self.chemin, timeout=self.delai_attente, isolation_level=None)
+            # Grandes pages : une valeur de plusieurs Mo se lit en peu de pages (sans effet sur une base existante)
+            connexion.execute('PRAGMA page_size=65536')
+            connexion.execute('PRAGMA journal_mode=WAL')
+            # En WAL, une validation n'attend plus l'écriture sur disque (la base reste cohérente après un arrêt brutal)
+            connexion.execute('PRAGMA synchronous=NORMAL')
+            connexion.executescript(SCHEMA)
+            self._local.connexion, self._local.pid = connexion, os.getpid()
+        return connexion
+
+    def _signaler(self, operation, erreur):
+        print(f"Cache persistant {self.chemin} : {operation} impossible ({erreur})", file=sys.stderr)
+
+    def lire(self, cle):
+        """Valeur associée à `cle`, ou None si elle est absente ou illisible"""
+        try:
+            connexion = self._connexion()
+            ligne = connexion.execute('SELECT valeur FROM valeurs WHERE cle = ?', (cle,)).fetchone()
+            if ligne is None:
+                return None
+            connexion.execute('UPDATE entrees SET dernier_acces = ? WHERE cle = ?', (time.time(), cle))
+            return pickle.loads(ligne[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as erreur:
+            self._signaler('lecture', erreur)
+            return None
+
+    def ecrire(self, cle, valeur):
+        """Enregistre `valeur` sous `cle` puis évince les entrées les moins récemment utilisées
+
+        Retourne False si la valeur n'a pas été enregistrée (plus grande que
+        le cache entier, ou erreur SQLite).
+        """
+        donnees = pickle.dumps(valeur, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(donnees) > self.taille_max:
+            return False
+        connexion = None
+        try:
+            connexion = self._connexion()
+            connexion.execute('BEGIN IMMEDIATE')
+            connexion.execute('INSERT OR REPLACE INTO valeurs VALUES (?, ?)', (cle, donnees))
+            connexion.execute('INSERT OR REPLACE INTO entrees VALUES (?, ?, ?)', (cle, len(donnees), time.time()))
+            evincees = connexion.execute(ENTREES_AU_DELA, (self.taille_max,)).fetchall()
+            connexion.executemany('DELETE FROM entrees WHERE cle = ?', evincees)
+            connexion.executemany('DELETE FROM valeurs WHERE cle = ?', evincees)
+            connexion.execute('COMMIT')
+            return True
+        except sqlite3.Error as erreur:
+            if connexion is not None and connexion.in_transaction:
+                connexion.execute('ROLLBACK')
+            self._signaler('écriture', erreur)
+            return False
+
+    def statistiques(self):
+        """Nombre d'entrées et taille cumulée des valeurs (octets)"""
+        entrees, taille = self._connexion().execute(
+            'SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM entrees').fetchone()
+        return {'entrees': entrees, 'taille': taille, 'taille_max': self.taille_max}
+
+    def vider(self):
+        """Supprime toutes les entrées"""
+        connexion = self._connexion()
+        connexion.execute('BEGIN IMMEDIATE')
+        connexion.execute('DELETE FROM entrees')
+        connexion.execute('DELETE FROM valeurs')
+        connexion.execute('COMMIT')
+
+
+def ouvrir_cache(chemin, taille_max=TAILLE_MAX_DEFAUT):
+    """CachePersistant sur `chemin` (répertoire créé au besoin), ou None si `chemin` est vide"""
+    if not chemin:
+        return None
+    repertoire = os.path.dirname(os.path.abspath(chemin))
+    try:
+        os.makedirs(repertoire, exist_ok=True)
+    except OSError as erreur:
+        print(f"Cache persistant {chemin} désactivé ({erreur})", file=sys.stderr)
+        return None
+    return CachePersistant(chemin, taille_max)
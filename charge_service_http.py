@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test de charge du service HTTP d'optimisation : connexions persistantes concurrentes,
+latences (p50, p90, p99, max) et débit
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import numpy as np
+
+from formes_juridiques import FORMES_JURIDIQUES
+from service_http import ServiceOptimisation, requete_http, HOTE_DEFAUT, PORT_DEFAUT
+
+PERCENTILES = [50, 90, 99]
+
+
+def generer_profils(nombre, graine=0, pas=5000):
+    """`nombre` profils distincts, reproductibles, répartis sur toutes les formes juridiques"""
+    aleatoire = random.Random(graine)
+    profils = []
+    for indice in range(nombre):
+        forme = FORMES_JURIDIQUES[indice % len(FORMES_JURIDIQUES)]
+        resultat = aleatoire.randrange(40, 400) * 1000
+        if forme == 'Micro-entreprise':
+            resultat = min(resultat, 70000)
+        profils.append({
+            'forme_juridique': forme,
+            'resultat': resultat,
+            'charges': aleatoire.randrange(0, 30) * 1000,
+            'parts': aleatoire.choice([1, 1.5, 2, 2.5, 3]),
+            'per_max': aleatoire.choice([0, 0, 2000, 5000]),
+            'pas': pas,
+        })
+    return profils
+
+
+async def _client(hote, port, file, latences, erreurs):
+    """Connexion persistante qui envoie les requêtes de la file jusqu'à l'épuiser"""
+    lecteur, ecrivain = await asyncio.open_connection(hote, port)
+    try:
+        while file:
+            chemin, corps = file.pop()
+            debut = time.perf_counter()
+            statut, reponse = await requete_http(lecteur, ecrivain, 'POST', chemin, corps)
+            latences.append(time.perf_counter() - debut)
+            if statut != 200:
+                erreurs.append(f"{statut} {reponse.get('erreur')}")
+            else:
+                erreurs.extend(resultat['erreur'] for resultat in reponse.get('resultats', []) if resultat.get('erreur'))
+    finally:
+        ecrivain.close()
+        await ecrivain.wait_closed()
+
+
+async def executer_charge(hote, port, connexions=8, requetes=200, profils=50, lot=0, graine=0):
+    """Envoie `requetes` requêtes sur `connexions` connexions concurrentes
+
+    Chaque requête optimise un profil tiré parmi `profils` profils distincts
+    (des profils répétés sont fusionnés ou servis par le cache du service) ;
+    avec lot > 0, chaque requête est un /lot de `lot` profils. Retourne les
+    latences en secondes, les erreurs, la durée totale, les percentiles et le
+    débit en requêtes par seconde.
+    """
+    catalogue = generer_profils(profils, graine)
+    aleatoire = random.Random(graine)
+    file = []
+    for _ in range(requetes):
+        if lot:
+            file.append(('/lot', {'profils': aleatoire.choices(catalogue, k=lot)}))
+        else:
+            file.append(('/optimiser', aleatoire.choice(catalogue)))
+    file.reverse()
+
+    latences, erreurs = [], []
+    debut = time.perf_counter()
+    await asyncio.gather(*(_client(hote, port, file, latences, erreurs) for _ in range(connexions)))
+    duree = time.perf_counter() - debut
+    return {
+        'latences_s': latences,
+        'erreurs': erreurs,
+        'duree_s': duree,
+        'percentiles_s': {p: float(np.percentile(latences, p)) for p in PERCENTILES} if latences else {},
+        'max_s': max(latences, default=0.0),
+        'debit': len(latences) / duree if duree else 0.0,
+    }
+
+
+def formater_rapport(rapport):
+    lignes = [f"{len(rapport['latences_s'])} requêtes en {rapport['duree_s']:.2f} s "
+              f"({rapport['debit']:.1f} requêtes/s), {len(rapport['erreurs'])} erreurs"]
+    for p, latence in rapport['percentiles_s'].items():
+        lignes.append(f"  p{p:<4} {latence * 1e3:>10.1f} ms")
+    lignes.append(f"  {'max':<5} {rapport['max_s'] * 1e3:>10.1f} ms")
+    for erreur in rapport['erreurs'][:5]:
+        lignes.append(f"  erreur: {erreur}")
+    return '\n'.join(lignes)
+
+
+async def _charger(args):
+    hote, port, service = args.hote, args.port, None
+    if args.demarrer:
+        service = ServiceOptimisation(args.jobs, args.cache)
+        port = (await service.servir(hote, 0)).sockets[0].getsockname()[1]
+    try:
+        return await executer_charge(hote, port, args.connexions, args.requetes, args.profils, args.lot, args.graine)
+    finally:
+        if service is not None:
+            await service.fermer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de charge du service HTTP d\'optimisation')
+    parser.add_argument('--hote', default=HOTE_DEFAUT,
+                        help=f'Adresse du service (défaut: {HOTE_DEFAUT})')
+    parser.add_argument('--port', type=int, default=PORT_DEFAUT,
+                        help=f'Port du service (défaut: {PORT_DEFAUT})')
+    parser.add_argument('--connexions', '-c', type=int, default=8,
+                        help='Connexions concurrentes (défaut: 8)')
+    parser.add_argument('--requetes', '-n', type=int, default=200,
+                        help='Nombre total de requêtes (défaut: 200)')
+    parser.add_argument('--profils', type=int, default=50,
+                        help='Nombre de profils distincts (défaut: 50)')
+    parser.add_argument('--lot', type=int, default=0,
+                        help='Profils par requête /lot (défaut: 0, requêtes /optimiser)')
+    parser.add_argument('--graine', type=int, default=0,
+                        help='Graine des profils et de leur tirage (défaut: 0)')
+    parser.add_argument('--demarrer', action='store_true',
+                        help='Démarre un service dans ce processus (port libre) au lieu de --hote/--port')
+    parser.add_argument('--jobs', '-j', type=int,
+                        help='Avec --demarrer : nombre de processus de calcul (défaut: nombre de CPU)')
+    parser.add_argument('--cache', default='',
+                        help='Avec --demarrer : cache persistant des optimisations (défaut: désactivé)')
+
+    args = parser.parse_args()
+    try:
+        rapport = asyncio.run(_charger(args))
+    except OSError as erreur:
+        print(f"Erreur: service injoignable sur {args.hote}:{args.port} ({erreur})", file=sys.stderr)
+        return 1
+    print(formater_rapport(rapport))
+    return 1 if rapport['erreurs'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Comparaison de toutes les formes juridiques pour un même client en une passe vectorisée
+"""
+
+import numpy as np
+
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from grille_scenarios import ScenarioGrid
+
+# Métriques sur lesquelles toutes les formes sont comparées (la même pour toutes : les valeurs sont comparables)
+METRIQUES_COMPARAISON = ['patrimoine_total', 'net_disponible_immediat']
+
+
+def creer_optimiseurs(formes=None, **parametres_client):
+    """Crée un optimiseur par forme juridique avec les mêmes paramètres client"""
+    return {forme: creer_optimiseur(forme, **parametres_client) for forme in (formes or FORMES_JURIDIQUES)}
+
+
+def parametres_scenario(optimiseur, per_max=0, madelin_max=0, girardin_max=0, versement_pee=0,
+                        type_activite='BIC - Prestations de services', acre=False):
+    """Paramètres de calculer_scenario() pour une forme : les enveloppes indisponibles sont mises à 0"""
+    optimisations = optimiseur.get_optimisations_disponibles()
+    scenario_kwargs = {
+        'per_montant': per_max if 'per' in optimisations else 0,
+        'madelin_montant': madelin_max if 'madelin' in optimisations else 0,
+        'girardin_montant': girardin_max if 'girardin' in optimisations else 0,
+        'versement_pee': versement_pee if 'pee' in optimisations else 0,
+    }
+    if 'acre' in optimisations:
+        scenario_kwargs.update({'acre': acre, 'type_activite': type_activite})
+    return scenario_kwargs
+
+
+def evaluer_formes(optimiseurs, remunerations, scenario_kwargs):
+    """Évalue plusieurs formes juridiques en partageant l'étape des optimisations personnelles
+
+    `remunerations` et `scenario_kwargs` sont indexés par forme. Les colonnes de
+    base de chaque forme sont concaténées (colonnes communes) pour appliquer
+    PER, PEE, Girardin et le noyau IR en un seul appel vectorisé, puis
+    redécoupées par forme. Toutes les formes doivent partager les parts fiscales
+    et le plafond PER (même client).
+    """
+    bases = {}
+    for forme, optimiseur in optimiseurs.items():
+        kwargs = {nom: valeur for nom, valeur in scenario_kwargs[forme].items()
+                  if nom not in ('per_montant', 'girardin_montant')}
+        bases[forme] = optimiseur.calculer_base_vectorisee_en_cache(remunerations[forme], **kwargs)
+
+    formes = list(bases)
+    communes = set.intersection(*(set(colonnes) for colonnes in bases.values()))
+    tailles = [len(remunerations[forme]) for forme in formes]
+    bornes = np.concatenate(([0], np.cumsum(tailles)))
+
+    concatenees = {nom: np.concatenate([np.broadcast_to(bases[forme][nom], (taille,))
+                                        for forme, taille in zip(formes, tailles)])
+                   for nom in communes}
+    per = np.repeat([float(scenario_kwargs[forme]['per_montant']) for forme in formes], tailles)
+    girardin = np.repeat([float(scenario_kwargs[forme]['girardin_montant']) for forme in formes], tailles)
+
+    personnelles = optimiseurs[formes[0]].appliquer_optimisations_vectorisees(concatenees, per, girardin)
+
+    colonnes_formes = {}
+    for indice, forme in enumerate(formes):
+        colonnes = dict(bases[forme])
+        colonnes.update({nom: valeurs[bornes[indice]:bornes[indice + 1]] for nom, valeurs in personnelles.items()
+                         if nom not in communes})
+        colonnes_formes[forme] = colonnes
+    return colonnes_formes
+
+
+def comparer_formes(resultat_avant_remuneration, charges_existantes=0, parts_fiscales=1,
+                    plafond_per_disponible=None, per_max=0, madelin_max=0, girardin_max=0, versement_pee=0,
+                    pas=2500, type_activite='BIC - Prestations de services', acre=False, formes=None, pack_fiscal=None,
+                    metrique='patrimoine_total'):
+    """Compare les formes juridiques pour un même client
+
+    Toutes les formes sont évaluées sur une grille commune de rémunérations
+    (0 au résultat après charges, avec le pas donné) en une seule passe des
+    optimisations personnelles. Toutes les formes sont comparées sur la même
+    `metrique` (METRIQUES_COMPARAISON) : par défaut le patrimoine total, qui
+    compte aussi le PER et le Madelin de la micro-entreprise.
+    `pack_fiscal` : paramètres fiscaux de l'année (voir packs_fiscaux).
+
+    Retourne un dictionnaire :
+    - 'remunerations' : grille commune
+    - 'metrique' : métrique comparée
+    - 'formes' : par forme, {'meilleur', 'remuneration_optimale', 'valeur',
+      'courbe' (métrique sur la grille commune, NaN hors plage ou scénario
+      invalide ; constante pour la micro-entreprise dont le CA est fixé),
+      'scenarios' (ScenarioGrid des scénarios valides)}
+    - 'classement' : formes triées par valeur optimale décroissante
+    - 'nb_evaluations' : nombre total de scénarios évalués
+    """
+    if metrique not in METRIQUES_COMPARAISON:
+        raise ValueError(f"Métrique '{metrique}' non supportée. Choix disponibles: {METRIQUES_COMPARAISON}")
+    optimiseurs = creer_optimiseurs(formes, resultat_avant_remuneration=resultat_avant_remuneration,
+                                    charges_existantes=charges_existantes, parts_fiscales=parts_fiscales,
+                                    plafond_per_disponible=plafond_per_disponible, pack_fiscal=pack_fiscal)
+    grille = np.arange(0, resultat_avant_remuneration - charges_existantes + 1, pas, dtype=float)
+
+    remunerations = {forme: np.asarray(list(optimiseur.get_range_remuneration(pas)), dtype=float)
+                     for forme, optimiseur in optimiseurs.items()}
+    scenario_kwargs = {forme: parametres_scenario(optimiseur, per_max, madelin_max, girardin_max, versement_pee,
+                                                  type_activite, acre)
+                       for forme, optimiseur in optimiseurs.items()}
+    colonnes_formes = evaluer_formes(optimiseurs, remunerations, scenario_kwargs)
+
+    resultats = {}
+    for forme, optimiseur in optimiseurs.items():
+        colonnes = colonnes_formes[forme]
+        masque = np.broadcast_to(optimiseur.masque_valide_vectorise(colonnes), remunerations[forme].shape)
+        valeurs = np.where(masque, colonnes[metrique], np.nan)
+
+        if len(remunerations[forme]) == 1:
+            # Pas de rémunération à choisir (CA fixé) : valeur constante sur la grille
+            courbe = np.full(grille.shape, valeurs[0])
+        else:
+            courbe = np.full(grille.shape, np.nan)
+            positions = np.searchsorted(grille, remunerations[forme])
+            sur_grille = (positions < len(grille)) & (grille[np.minimum(positions, len(grille) - 1)] == remunerations[forme])
+            courbe[positions[sur_grille]] = valeurs[sur_grille]
+
+        resultat_forme = {'meilleur': None, 'remuneration_optimale': None, 'valeur': None, 'courbe': courbe,
+                          'scenarios': ScenarioGrid(optimiseur, remunerations[forme][masque],
+                                                    {nom: valeurs_colonne[masque] for nom, valeurs_colonne
+                                                     in colonnes.items() if np.shape(valeurs_colonne) == masque.shape},
+                                                    scenario_kwargs[forme])}
+        if masque.any():
+            indice = int(np.nanargmax(valeurs))
+            remuneration = remunerations[forme][indice].item()
+            resultat_forme.update({
+                'meilleur': optimiseur.calculer_scenario(remuneration, **scenario_kwargs[forme]),
+                'remuneration_optimale': remuneration,
+                'valeur': float(valeurs[indice]),
+            })
+        resultats[forme] = resultat_forme
+
+    classement = sorted((forme for forme in resultats if resultats[forme]['valeur'] is not None),
+                        key=lambda forme: -resultats[forme]['valeur'])
+
+    return {
+        'remunerations': grille,
+        'metrique': metrique,
+        'formes': resultats,
+        'classement': classement,
+        'nb_evaluations': sum(len(valeurs) for valeurs in remunerations.values()),
+    }
+
+
+def valeurs_optimales(resultat_avant_remuneration, formes=None, **parametres):
+    """Valeur optimale de chaque forme pour un résultat donné (NaN si aucun scénario valide)"""
+    comparaison = comparer_formes(resultat_avant_remuneration, formes=formes, **parametres)
+    return {forme: np.nan if resultat_forme['valeur'] is None else resultat_forme['valeur']
+            for forme, resultat_forme in comparaison['formes'].items()}
+
+
+def trouver_seuils_rentabilite(resultat_min, resultat_max, parts_fiscales=1, nb_points=25, precision=100,
+                               formes=None, pas=1000, **parametres):
+    """Résultats avant rémunération où deux formes juridiques échangent leur rang
+
+    Pour chaque nombre de parts fiscales (un nombre ou une liste), les valeurs
+    optimales de toutes les formes (sur la même métrique, voir comparer_formes())
+    sont évaluées sur `nb_points` résultats
+    répartis entre resultat_min et resultat_max. Chaque changement de signe de
+    l'écart entre deux formes encadre un croisement, affiné par dichotomie
+    jusqu'à `precision` euros ; chaque évaluation donne toutes les formes à la
+    fois et est réutilisée par toutes les paires.
+
+    Retourne {'croisements': [{'parts_fiscales', 'resultat', 'forme_avant',
+    'forme_apres', 'valeur'}], 'series': [{'parts_fiscales', 'resultats',
+    'valeurs': {forme: tableau}}]} ; 'forme_avant' est la meilleure des deux
+    formes sous le seuil, 'forme_apres' au-dessus. Les séries incluent les
+    points de croisement (prêtes pour un graphique).
+    """
+    formes = list(formes or FORMES_JURIDIQUES)
+    croisements = []
+    series = []
+
+    for parts in np.atleast_1d(parts_fiscales):
+        parts = float(parts)
+        evaluations = {}
+
+        def evaluer(resultat):
+            resultat = int(round(resultat))
+            if resultat not in evaluations:
+                evaluations[resultat] = valeurs_optimales(resultat, formes, parts_fiscales=parts, pas=pas,
+                                                          **parametres)
+            return evaluations[resultat]
+
+        points = np.unique(np.linspace(resultat_min, resultat_max, nb_points).round().astype(int))
+        for resultat in points:
+            evaluer(resultat)
+
+        for indice_a, forme_a in enumerate(formes):
+            for forme_b in formes[indice_a + 1:]:
+                def ecart(resultat):
+                    valeurs = evaluer(resultat)
+                    return valeurs[forme_a] - valeurs[forme_b]
+
+                for gauche, droite in zip(points[:-1], points[1:]):
+                    ecart_gauche, ecart_droite = ecart(gauche), ecart(droite)
+                    if np.isnan(ecart_gauche) or np.isnan(ecart_droite) or ecart_gauche * ecart_droite >= 0:
+                        continue
+                    signe_gauche = np.sign(ecart_gauche)
+                    while droite - gauche > precision:
+                        milieu = (gauche + droite) // 2
+                        ecart_milieu = ecart(milieu)
+                        if np.isnan(ecart_milieu):
+                            break
+                        if np.sign(ecart_milieu) == signe_gauche:
+                            gauche = milieu
+                        else:
+                            droite = milieu
+                    seuil = int((gauche + droite) // 2)
+                    croisements.append({
+                        'parts_fiscales': parts,
+                        'resultat': seuil,
+                        'forme_avant': forme_a if signe_gauche > 0 else forme_b,
+                        'forme_apres': forme_b if signe_gauche > 0 else forme_a,
+                        'valeur': float(evaluer(seuil)[forme_a]),
+                    })
+
+        resultats = np.array(sorted(evaluations))
+        series.append({
+            'parts_fiscales': parts,
+            'resultats': resultats,
+            'valeurs': {forme: np.array([evaluations[resultat][forme] for resultat in resultats]) for forme in formes},
+        })
+
+    croisements.sort(key=lambda croisement: (croisement['parts_fiscales'], croisement['resultat']))
+    return {'croisements': croisements, 'series': series}
@@ -4,101 +4,390 @@ Outil CLI pour exporter les données d'optimisation fiscale
 """
 import argparse
 import csv
+import gzip
+import io
+import itertools
+import os
 import sys
-from formes_juridiques import SARLHolding
-
-def afficher_tableau(scenarios, format_output='table'):
-    """Affiche les scénarios sous forme de tableau ou CSV"""
-    
-    # En-têtes
-    headers = [
-        'Remuneration_Brute',
-        'Total_Net',
-        'Remuneration_Nette',
-        'Dividendes_Nets', 
-        'Cotisations_TNS',
-        'IR',
-        'IS_SARL',
-        'IS_Holding',
-        'Flat_Tax',
-        'Total_Cotisations',
-        'Net_Disponible',
-        'Verification_Somme',
-        'Taux_Prelevement_%'
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from profilage import profiler
+
+# Colonnes exportées : (en-tête, colonnes sommées, titre du tableau sur deux lignes, largeur, arrondi)
+# Une colonne source est une colonne du scénario ou l'en-tête d'une colonne précédente.
+_REMUNERATION_BRUTE = ('Remuneration_Brute', ['remuneration_brute'], ('Rémun.', 'Brute'), 9, None)
+_TOTAL_NET = ('Total_Net', ['total_net'], ('Total', 'Net'), 9, None)
+_REMUNERATION_NETTE = ('Remuneration_Nette', ['remuneration_nette_apres_ir'], ('Rémun.', 'Nette'), 9, None)
+_DIVIDENDES_NETS = ('Dividendes_Nets', ['dividendes_nets'], ('Divid.', 'Nets'), 9, None)
+_IR = ('IR', ['ir_remuneration'], ('IR', ''), 8, None)
+_FLAT_TAX = ('Flat_Tax', ['flat_tax'], ('FlatTax', ''), 8, None)
+_COTISATIONS_TNS = ('Cotisations_TNS', ['cotisations_tns'], ('Cotis.', 'TNS'), 9, None)
+_IS_SARL = ('IS_SARL', ['is_sarl'], ('IS_SARL', ''), 8, None)
+
+# Prélèvements (cotisations et impôts) exportés pour chaque forme juridique
+PRELEVEMENTS_PAR_FORME = {
+    'Micro-entreprise': [
+        ('Cotisations_Sociales', ['cotisations_sociales'], ('Cotis.', 'Sociales'), 9, None),
+        _IR,
+    ],
+    'SAS': [
+        ('Cotisations_Patronales', ['cotisations_patronales'], ('Cotis.', 'Patron.'), 9, None),
+        ('Cotisations_Salariales', ['cotisations_salariales'], ('Cotis.', 'Salar.'), 9, None),
+        _IR,
+        ('IS', ['is_sarl'], ('IS', ''), 8, None),
+        _FLAT_TAX,
+    ],
+    'SARL': [_COTISATIONS_TNS, _IR, _IS_SARL, _FLAT_TAX],
+    'SARL + Holding': [
+        _COTISATIONS_TNS, _IR, _IS_SARL,
+        ('IS_Holding', ['is_holding'], ('IS_Hold', ''), 8, None),
+        _FLAT_TAX,
+    ],
+}
+
+# Colonnes du profil ajoutées en tête quand plusieurs profils sont exportés dans un fichier
+COLONNES_PROFIL = [
+    ('Resultat', ['resultat'], ('Résultat', ''), 9, None),
+    ('Charges', ['charges'], ('Charges', ''), 9, None),
+    ('Parts', ['parts'], ('Parts', ''), 5, 2),
+]
+
+# Formats écrits en colonnes (pyarrow) directement depuis les lots vectorisés
+FORMATS_COLONNES = ['parquet', 'arrow']
+
+# Nombre de rémunérations évaluées par lot vectorisé en mode flux
+TAILLE_LOT_FLUX = 4096
+
+# Profils évalués en avance par processus avec --jobs (borne la mémoire si l'écriture est lente)
+TACHES_EN_VOL_PAR_PROCESSUS = 2
+
+
+def schema_export(forme_juridique, profils=False):
+    """Colonnes exportées pour une forme juridique (voir PRELEVEMENTS_PAR_FORME)
+
+    Total_Cotisations somme les prélèvements de la forme, Net_Disponible la
+    rémunération nette et les dividendes. Avec `profils`, les colonnes du
+    profil (résultat, charges, parts) sont ajoutées en tête.
+    """
+    if forme_juridique not in PRELEVEMENTS_PAR_FORME:
+        raise ValueError(f"Forme juridique '{forme_juridique}' non supportée. Choix disponibles: {FORMES_JURIDIQUES}")
+    prelevements = PRELEVEMENTS_PAR_FORME[forme_juridique]
+    revenus = [_REMUNERATION_NETTE] if forme_juridique == 'Micro-entreprise' else [_REMUNERATION_NETTE, _DIVIDENDES_NETS]
+    return (COLONNES_PROFIL if profils else []) + [_REMUNERATION_BRUTE, _TOTAL_NET] + revenus + prelevements + [
+        ('Total_Cotisations', [colonne[0] for colonne in prelevements], ('Tot.Cot', ''), 9, None),
+        ('Net_Disponible', [colonne[0] for colonne in revenus], ('Net', 'Dispo'), 9, None),
+        ('Verification_Somme', ['Total_Cotisations', 'Net_Disponible'], ('Vérif', 'Somme'), 9, None),
+        ('Taux_Prelevement_%', ['taux_prelevement_global'], ('Taux%', ''), 6, 1),
     ]
-    
-    if format_output == 'csv':
-        # Export CSV
-        writer = csv.writer(sys.stdout)
-        writer.writerow(headers)
-        
-        for s in scenarios:
-            total_cotisations = s['cotisations_tns'] + s['ir_remuneration'] + s['is_sarl'] + s['is_holding'] + s['flat_tax']
-            net_disponible = s['remuneration_nette_apres_ir'] + s['dividendes_nets']
-            verification_somme = total_cotisations + net_disponible
-            
-            row = [
-                s['remuneration_brute'],
-                s['total_net'],
-                s['remuneration_nette_apres_ir'],
-                s['dividendes_nets'],
-                s['cotisations_tns'],
-                s['ir_remuneration'],
-                s['is_sarl'],
-                s['is_holding'],
-                s['flat_tax'],
-                total_cotisations,
-                net_disponible,
-                verification_somme,
-                round(s['taux_prelevement_global'], 1)
-            ]
-            writer.writerow(row)
-    
+
+
+def colonnes_scenario(forme_juridique):
+    """Colonnes du scénario lues pour exporter une forme juridique"""
+    schema = schema_export(forme_juridique)
+    entetes = {colonne[0] for colonne in schema}
+    return list(dict.fromkeys(source for colonne in schema for source in colonne[1] if source not in entetes))
+
+
+def colonnes_export(lot, schema, arrondir=True):
+    """Colonnes exportées (en-tête -> tableau numpy) d'un lot, calculées sur les tableaux"""
+    colonnes = {}
+    for entete, sources, _, _, arrondi in schema:
+        valeurs = [colonnes[source] if source in colonnes else lot[source] for source in sources]
+        colonne = sum(valeurs[1:], valeurs[0])
+        colonnes[entete] = np.round(colonne, arrondi) if arrondir and arrondi is not None else colonne
+    return colonnes
+
+
+def generer_lots(optimiseur, min_salaire=0, max_salaire=None, pas=2500, taille_lot=TAILLE_LOT_FLUX, **scenario_kwargs):
+    """Génère paresseusement les scénarios valides de la plage [min_salaire, max_salaire] par lots
+
+    Seules les rémunérations de la plage de l'optimiseur (multiples de `pas`)
+    comprises dans la fenêtre sont évaluées (max_salaire None : toute la plage),
+    par lots vectorisés de `taille_lot` sans passer par les caches : la mémoire
+    reste bornée par la taille d'un lot quelle que soit la longueur de la plage.
+    Chaque lot est un dictionnaire de colonnes numpy (colonnes_scenario() de la
+    forme et 'metrique', la métrique optimisée) réduit aux scénarios valides.
+    """
+    plage = optimiseur.get_range_remuneration(pas)
+    fenetre = plage[bisect_left(plage, min_salaire):
+                    len(plage) if max_salaire is None else bisect_right(plage, max_salaire)]
+    noms = colonnes_scenario(optimiseur.get_nom_forme_juridique())
+    per_montant = scenario_kwargs.pop('per_montant', 0)
+    girardin_montant = scenario_kwargs.pop('girardin_montant', 0)
+
+    for debut in range(0, len(fenetre), taille_lot):
+        remunerations = np.asarray(fenetre[debut:debut + taille_lot])
+        colonnes = optimiseur.appliquer_optimisations_vectorisees(
+            optimiseur.calculer_base_vectorisee(remunerations, **scenario_kwargs), per_montant, girardin_montant)
+        colonnes['ir_remuneration'] = colonnes['ir_final']
+        colonnes['remuneration_brute'] = remunerations  # entiers, comme la plage de optimiser()
+        colonnes['metrique'] = optimiseur.metrique_vectorisee(colonnes)
+        masque = optimiseur.masque_valide_vectorise(colonnes)
+        lot = {nom: np.broadcast_to(colonnes[nom], remunerations.shape)[masque] for nom in noms + ['metrique']}
+        if len(lot['metrique']):
+            yield lot
+
+
+def lot_depuis_scenarios(optimiseur, scenarios):
+    """Lot de colonnes (comme generer_lots()) à partir de scénarios calculés un par un"""
+    lot = {nom: np.array([scenario[nom] for scenario in scenarios])
+           for nom in colonnes_scenario(optimiseur.get_nom_forme_juridique())}
+    lot['metrique'] = np.array([optimiseur.get_metric_for_optimization(scenario) for scenario in scenarios], dtype=float)
+    return lot
+
+
+def suivre_optimum(lots, suivi):
+    """Transmet les lots en relevant au passage le nombre de scénarios et le meilleur
+
+    `suivi` (dictionnaire) reçoit 'nb_scenarios' et 'optimum' (premier
+    scénario de métrique maximale, en valeurs Python), disponibles une fois le
+    flux consommé.
+    """
+    suivi.update(nb_scenarios=0, optimum=None)
+    for lot in lots:
+        suivi['nb_scenarios'] += len(lot['metrique'])
+        indice = int(np.argmax(lot['metrique']))
+        if suivi['optimum'] is None or lot['metrique'][indice] > suivi['optimum']['metrique']:
+            suivi['optimum'] = {nom: valeurs[indice].item() for nom, valeurs in lot.items()}
+        yield lot
+
+
+@contextmanager
+def ouvrir_sortie(chemin=None, compresser=False):
+    """Flux texte de sortie : fichier `chemin` ou sortie standard, compressé en gzip si demandé
+
+    Un chemin terminé par .gz est toujours compressé.
+    """
+    compresser = compresser or bool(chemin and chemin.endswith('.gz'))
+    if chemin and compresser:
+        flux = gzip.open(chemin, 'wt', newline='', encoding='utf-8')
+    elif chemin:
+        flux = open(chemin, 'w', newline='', encoding='utf-8')
+    elif compresser:
+        flux = io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), newline='', encoding='utf-8')
     else:
-        # Affichage tableau formaté
-        print("\n" + "="*170)
-        print("DONNÉES D'OPTIMISATION FISCALE")
-        print("="*170)
-        
-        # En-têtes avec formatage
-        print(f"{'Rémun.':<9} {'Total':<9} {'Rémun.':<9} {'Divid.':<9} {'Cotis.':<9} {'IR':<8} {'IS_SARL':<8} {'IS_Hold':<8} {'FlatTax':<8} {'Tot.Cot':<9} {'Net':<9} {'Vérif':<9} {'Taux%':<6}")
-        print(f"{'Brute':<9} {'Net':<9} {'Nette':<9} {'Nets':<9} {'TNS':<9} {'':<8} {'':<8} {'':<8} {'':<8} {'':<9} {'Dispo':<9} {'Somme':<9} {'':<6}")
-        print("-"*170)
-        
-        for s in scenarios:
-            total_cotisations = s['cotisations_tns'] + s['ir_remuneration'] + s['is_sarl'] + s['is_holding'] + s['flat_tax']
-            net_disponible = s['remuneration_nette_apres_ir'] + s['dividendes_nets']
-            verification_somme = total_cotisations + net_disponible
-            
-            print(f"{s['remuneration_brute']:>9,.0f} "
-                  f"{s['total_net']:>9,.0f} "
-                  f"{s['remuneration_nette_apres_ir']:>9,.0f} "
-                  f"{s['dividendes_nets']:>9,.0f} "
-                  f"{s['cotisations_tns']:>9,.0f} "
-                  f"{s['ir_remuneration']:>8,.0f} "
-                  f"{s['is_sarl']:>8,.0f} "
-                  f"{s['is_holding']:>8,.0f} "
-                  f"{s['flat_tax']:>8,.0f} "
-                  f"{total_cotisations:>9,.0f} "
-                  f"{net_disponible:>9,.0f} "
-                  f"{verification_somme:>9,.0f} "
-                  f"{s['taux_prelevement_global']:>6.1f}")
-        
-        print("-"*170)
-        print(f"Total de {len(scenarios)} scénarios")
-        
-        # Afficher l'optimal
-        optimal = max(scenarios, key=lambda x: x['total_net'])
-        print(f"\n🎯 OPTIMUM: Rémunération {optimal['remuneration_brute']:,.0f}€ → Total net {optimal['total_net']:,.0f}€")
+        yield sys.stdout
+        return
+    with flux:
+        yield flux
+
+
+def ecrire_csv(lots, flux, schema):
+    """Écrit les lots en CSV au fur et à mesure et retourne le suivi (voir suivre_optimum())"""
+    suivi = {}
+    writer = csv.writer(flux)
+    writer.writerow([colonne[0] for colonne in schema])
+    for lot in suivre_optimum(lots, suivi):
+        colonnes = colonnes_export(lot, schema, arrondir=False)
+        # round() Python (arrondi décimal exact) plutôt que np.round pour les colonnes arrondies
+        writer.writerows(zip(*(colonnes[entete].tolist() if arrondi is None
+                               else [round(valeur, arrondi) for valeur in colonnes[entete].tolist()]
+                               for entete, _, _, _, arrondi in schema)))
+    return suivi
+
+
+def ecrire_tableau(lots, flux, schema):
+    """Affiche les lots sous forme de tableau formaté et retourne le suivi (voir suivre_optimum())"""
+    suivi = {}
+    print("\n" + "="*170, file=flux)
+    print("DONNÉES D'OPTIMISATION FISCALE", file=flux)
+    print("="*170, file=flux)
+
+    # En-têtes avec formatage
+    for ligne in range(2):
+        print(' '.join(f"{titres[ligne]:<{largeur}}" for _, _, titres, largeur, _ in schema), file=flux)
+    print("-"*170, file=flux)
+
+    formats = [f">{largeur},.0f" if arrondi is None else f">{largeur}.{arrondi}f" for _, _, _, largeur, arrondi in schema]
+    for lot in suivre_optimum(lots, suivi):
+        colonnes = colonnes_export(lot, schema)
+        for valeurs in zip(*(colonnes[colonne[0]].tolist() for colonne in schema)):
+            print(' '.join(format(valeur, format_colonne) for valeur, format_colonne in zip(valeurs, formats)), file=flux)
+
+    print("-"*170, file=flux)
+    print(f"Total de {suivi['nb_scenarios']} scénarios", file=flux)
+    return suivi
+
+
+def ecrire_colonnes(lots, chemin, format_output, schema):
+    """Écrit les lots dans un fichier Parquet ou Arrow (IPC), un groupe de lignes par lot
+
+    Les colonnes sont typées (entiers pour la rémunération et le profil,
+    montants en float64) et écrites lot par lot sans passer par des lignes
+    Python. Le format Arrow (fichier IPC non compressé) se lit en mémoire mappée
+    (pyarrow.ipc.open_file(pyarrow.memory_map(chemin))). Aucun fichier n'est
+    créé sans scénario. Retourne le suivi (voir suivre_optimum()).
+    """
+    if format_output not in FORMATS_COLONNES:
+        raise ValueError(f"Format '{format_output}' non supporté. Choix disponibles: {FORMATS_COLONNES}")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    suivi = {}
+    writer = None
+    try:
+        for lot in suivre_optimum(lots, suivi):
+            table = pa.Table.from_pydict(colonnes_export(lot, schema))
+            if writer is None:
+                schema_arrow = pa.schema([(champ.name, pa.int64() if pa.types.is_integer(champ.type) else pa.float64())
+                                          for champ in table.schema])
+                writer = (pq.ParquetWriter(chemin, schema_arrow) if format_output == 'parquet'
+                          else pa.ipc.new_file(chemin, schema_arrow))
+            writer.write_table(table.cast(schema_arrow))
+    finally:
+        if writer is not None:
+            writer.close()
+    return suivi
+
+
+def afficher_optimum(optimal, flux=None):
+    """Affiche la rémunération optimale et son total net (rien si aucun scénario)"""
+    if optimal is not None:
+        print(f"\n🎯 OPTIMUM: Rémunération {optimal['remuneration_brute']:,.0f}€ → Total net {optimal['total_net']:,.0f}€",
+              file=flux or sys.stdout)
+
+
+def afficher_tableau(scenarios, format_output='table', flux=None, forme_juridique='SARL + Holding'):
+    """Affiche des scénarios (dictionnaires de optimiser()) sous forme de tableau ou CSV
+
+    Retourne le nombre de scénarios.
+    """
+    flux = flux or sys.stdout
+    lots = []
+    if scenarios:
+        lots.append({nom: np.array([s[nom] for s in scenarios])
+                     for nom in colonnes_scenario(forme_juridique) + ['total_net']})
+        lots[0]['metrique'] = lots[0]['total_net']
+    ecrire = ecrire_csv if format_output == 'csv' else ecrire_tableau
+    suivi = ecrire(lots, flux, schema_export(forme_juridique))
+
+    # Afficher l'optimal (hors du flux CSV, pour ne pas le corrompre)
+    afficher_optimum(suivi['optimum'], sys.stderr if format_output == 'csv' else flux)
+    return suivi['nb_scenarios']
+
+
+def lire_plage(texte, type_valeur=float):
+    """Valeurs d'un paramètre : 'valeur', 'v1,v2,...' ou 'debut:fin:pas' (fin incluse)"""
+    if ':' not in texte:
+        return [type_valeur(valeur) for valeur in texte.split(',')]
+    debut, fin, pas = (type_valeur(valeur) for valeur in texte.split(':'))
+    if pas <= 0 or fin < debut:
+        raise ValueError(f"Plage '{texte}' invalide (debut:fin:pas avec pas > 0)")
+    return [type_valeur(round(debut + i * pas, 10)) for i in range(int(round((fin - debut) / pas, 10)) + 1)]
+
+
+def grille_taches(formes, resultats, charges, parts):
+    """Produit cartésien forme × résultat × charges × parts (forme la plus externe)"""
+    return [{'forme_juridique': forme, 'resultat': resultat, 'charges': charge, 'parts': part}
+            for forme, resultat, charge, part in itertools.product(formes, resultats, charges, parts)]
+
+
+def evaluer_tache(tache, parametres):
+    """Lots des scénarios d'un profil (tâche de grille_taches())
+
+    `parametres` : min_salaire, max_salaire, pas, per, madelin, girardin,
+    type_activite, stream (évaluation par lots, paresseuse) et profils
+    (colonnes du profil ajoutées à chaque lot). Sans stream, les scénarios
+    viennent de optimiser().
+    """
+    optimiseur = creer_optimiseur(
+        tache['forme_juridique'],
+        resultat_avant_remuneration=tache['resultat'],
+        charges_existantes=tache['charges'],
+        parts_fiscales=tache['parts']
+    )
+    kwargs = {'type_activite': parametres['type_activite']} if tache['forme_juridique'] == 'Micro-entreprise' else {}
+
+    if parametres['stream']:
+        # Pipeline de générateurs : évaluation par lots -> suivi de l'optimum -> écriture
+        lots = generer_lots(
+            optimiseur, parametres['min_salaire'], parametres['max_salaire'], parametres['pas'],
+            per_montant=parametres['per'],
+            madelin_montant=parametres['madelin'],
+            girardin_montant=parametres['girardin'],
+            **kwargs
+        )
+    else:
+        # Calcul des scénarios
+        _, tous_scenarios = optimiseur.optimiser(
+            pas=parametres['pas'],
+            per_max=parametres['per'],
+            madelin_max=parametres['madelin'],
+            girardin_max=parametres['girardin'],
+            **kwargs
+        )
+
+        # Filtrer les scénarios selon la plage demandée
+        max_salaire = parametres['max_salaire']
+        scenarios = [
+            s for s in tous_scenarios
+            if parametres['min_salaire'] <= s['remuneration_brute'] and (max_salaire is None or s['remuneration_brute'] <= max_salaire)
+        ]
+        lots = [lot_depuis_scenarios(optimiseur, scenarios)] if scenarios else []
+
+    if parametres['profils']:
+        lots = (dict(lot, **{cle: np.full(len(lot['metrique']), tache[cle]) for cle in ('resultat', 'charges', 'parts')})
+                for lot in lots)
+    return lots
+
+
+def _evaluer_tache(arguments):
+    """Point d'entrée des processus du pool (lots matérialisés pour être renvoyés)"""
+    return list(evaluer_tache(*arguments))
+
+
+def evaluer_taches(taches, parametres, jobs=1):
+    """Génère (tâche, lots) dans l'ordre des tâches
+
+    Avec jobs=1 les lots sont produits paresseusement dans le processus
+    courant. Sinon les tâches sont réparties sur un ProcessPoolExecutor avec au
+    plus TACHES_EN_VOL_PAR_PROCESSUS tâches d'avance par processus : la mémoire
+    reste bornée même si l'écriture est plus lente que le calcul.
+    """
+    if jobs == 1 or len(taches) <= 1:
+        for tache in taches:
+            yield tache, evaluer_tache(tache, parametres)
+        return
+
+    jobs = min(jobs, len(taches))
+    restantes = iter(taches)
+    with ProcessPoolExecutor(max_workers=jobs) as executeur:
+        en_vol = deque((tache, executeur.submit(_evaluer_tache, (tache, parametres)))
+                       for tache in itertools.islice(restantes, jobs * TACHES_EN_VOL_PAR_PROCESSUS))
+        while en_vol:
+            tache, futur = en_vol.popleft()
+            for suivante in itertools.islice(restantes, 1):
+                en_vol.append((suivante, executeur.submit(_evaluer_tache, (suivante, parametres))))
+            yield tache, futur.result()
+
+
+def chemin_par_forme(chemin, forme_juridique):
+    """Fichier de sortie d'une forme juridique : suffixe de la forme avant l'extension
+
+    scenarios.csv.gz -> scenarios_sarl_holding.csv.gz
+    """
+    suffixe = forme_juridique.lower().replace(' + ', '_').replace('-', '_').replace(' ', '_')
+    compresse = chemin.endswith('.gz')
+    racine, extension = os.path.splitext(chemin[:-3] if compresse else chemin)
+    return f"{racine}_{suffixe}{extension}" + ('.gz' if compresse else '')
+
 
 def main():
     parser = argparse.ArgumentParser(description='Export des données d\'optimisation fiscale')
-    parser.add_argument('--resultat', type=int, default=300000, 
-                       help='Résultat avant rémunération (défaut: 300000)')
-    parser.add_argument('--charges', type=int, default=50000,
-                       help='Charges existantes (défaut: 50000)')
-    parser.add_argument('--parts', type=float, default=1.0,
-                       help='Nombre de parts fiscales (défaut: 1.0)')
+    parser.add_argument('--forme', choices=FORMES_JURIDIQUES + ['all'], default='SARL + Holding',
+                       help='Forme juridique, ou all pour toutes (défaut: SARL + Holding)')
+    parser.add_argument('--resultat', type=lambda texte: lire_plage(texte, int), default=[300000],
+                       help='Résultat avant rémunération : valeur, liste v1,v2 ou plage debut:fin:pas (défaut: 300000)')
+    parser.add_argument('--charges', type=lambda texte: lire_plage(texte, int), default=[50000],
+                       help='Charges existantes : valeur, liste ou plage (défaut: 50000)')
+    parser.add_argument('--parts', type=lire_plage, default=[1.0],
+                       help='Nombre de parts fiscales : valeur, liste ou plage (défaut: 1.0)')
     parser.add_argument('--pas', type=int, default=2500,
                        help='Pas de calcul (défaut: 2500)')
     parser.add_argument('--per', type=int, default=0,
@@ -107,59 +396,97 @@ def main():
                        help='Montant Madelin (défaut: 0)')
     parser.add_argument('--girardin', type=int, default=0,
                        help='Montant Girardin (défaut: 0)')
-    parser.add_argument('--format', choices=['table', 'csv'], default='table',
-                       help='Format de sortie (défaut: table)')
+    parser.add_argument('--type-activite', default='BIC - Prestations de services',
+                       help='Type d\'activité de la micro-entreprise (défaut: BIC - Prestations de services)')
+    parser.add_argument('--format', choices=['table', 'csv'] + FORMATS_COLONNES, default='table',
+                       help='Format de sortie (défaut: table ; parquet et arrow exigent -o)')
     parser.add_argument('--min-salaire', type=int, default=0,
                        help='Salaire minimum (défaut: 0)')
-    parser.add_argument('--max-salaire', type=int, 
-                       help='Salaire maximum (défaut: résultat avant rémunération)')
-    
+    parser.add_argument('--max-salaire', type=int,
+                       help='Salaire maximum (défaut: toute la plage de la forme juridique)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Mode flux : scénarios évalués par lots et écrits au fur et à mesure (mémoire constante)')
+    parser.add_argument('-o', '--output',
+                       help='Fichier de sortie (défaut: sortie standard ; compressé si terminé par .gz ; '
+                            'un fichier par forme avec --forme all)')
+    parser.add_argument('--gzip', action='store_true',
+                       help='Compresse la sortie en gzip')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Nombre de processus pour évaluer la grille de profils (défaut: 1)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Affiche sur la sortie d\'erreur la durée des étapes d\'optimisation et les appels aux calculs d\'impôts')
+
     args = parser.parse_args()
-    
-    # Initialisation
-    optimiseur = SARLHolding(
-        resultat_avant_remuneration=args.resultat,
-        charges_existantes=args.charges,
-        parts_fiscales=args.parts
-    )
-    
-    max_salaire = args.max_salaire or args.resultat - args.charges
-    
-    if args.format == 'table':
-        print(f"Configuration:")
-        print(f"  Résultat avant rémunération: {args.resultat:,}€")
-        print(f"  Charges existantes: {args.charges:,}€")
-        print(f"  Parts fiscales: {args.parts}")
-        print(f"  Range salaire: {args.min_salaire:,}€ à {max_salaire:,}€ (pas: {args.pas:,}€)")
-        if args.per > 0:
-            print(f"  PER: {args.per:,}€")
-        if args.madelin > 0:
-            print(f"  Madelin: {args.madelin:,}€")
-        if args.girardin > 0:
-            print(f"  Girardin: {args.girardin:,}€")
-    
-    # Calcul des scénarios
-    meilleur_scenario, tous_scenarios = optimiseur.optimiser(
-        pas=args.pas,
-        per_max=args.per,
-        madelin_max=args.madelin,
-        girardin_max=args.girardin
-    )
-    
-    # Filtrer les scénarios selon la plage demandée
-    scenarios_a_afficher = [
-        s for s in tous_scenarios 
-        if args.min_salaire <= s['remuneration_brute'] <= max_salaire
-    ]
-    
-    if not scenarios_a_afficher:
+    formes = FORMES_JURIDIQUES if args.forme == 'all' else [args.forme]
+    if args.format in FORMATS_COLONNES and (not args.output or args.gzip):
+        parser.error(f"--format {args.format} exige un fichier de sortie (-o) et n'accepte pas --gzip")
+    if args.format == 'csv' and len(formes) > 1 and not args.output:
+        parser.error("--forme all en CSV exige un fichier de sortie (-o) : un fichier par forme juridique")
+    if args.profile and args.jobs > 1:
+        parser.error("--profile n'est disponible qu'avec --jobs 1 (le profilage ne suit pas les autres processus)")
+
+    taches = grille_taches(formes, args.resultat, args.charges, args.parts)
+    parametres = {
+        'min_salaire': args.min_salaire,
+        'max_salaire': args.max_salaire,
+        'pas': args.pas,
+        'per': args.per,
+        'madelin': args.madelin,
+        'girardin': args.girardin,
+        'type_activite': args.type_activite,
+        # Les formats en colonnes sont toujours écrits depuis les lots vectorisés
+        'stream': args.stream or args.format in FORMATS_COLONNES,
+        # Plusieurs profils dans un même fichier : colonnes du profil en tête
+        'profils': len(taches) > len(formes) and args.format != 'table',
+    }
+    with profiler(args.profile) as rapport:
+        resultats = evaluer_taches(taches, parametres, args.jobs)
+        nb_scenarios = 0
+
+        if args.format == 'table':
+            with ouvrir_sortie(args.output, args.gzip) as flux:
+                for tache, lots in resultats:
+                    print(f"Configuration:", file=flux)
+                    print(f"  Forme juridique: {tache['forme_juridique']}", file=flux)
+                    print(f"  Résultat avant rémunération: {tache['resultat']:,}€", file=flux)
+                    print(f"  Charges existantes: {tache['charges']:,}€", file=flux)
+                    print(f"  Parts fiscales: {tache['parts']}", file=flux)
+                    max_salaire = args.max_salaire or tache['resultat'] - tache['charges']
+                    print(f"  Range salaire: {args.min_salaire:,}€ à {max_salaire:,}€ (pas: {args.pas:,}€)", file=flux)
+                    if args.per > 0:
+                        print(f"  PER: {args.per:,}€", file=flux)
+                    if args.madelin > 0:
+                        print(f"  Madelin: {args.madelin:,}€", file=flux)
+                    if args.girardin > 0:
+                        print(f"  Girardin: {args.girardin:,}€", file=flux)
+
+                    suivi = ecrire_tableau(lots, flux, schema_export(tache['forme_juridique']))
+                    afficher_optimum(suivi['optimum'], flux)
+                    nb_scenarios += suivi['nb_scenarios']
+        else:
+            # Un fichier par forme juridique (les tâches d'une forme sont consécutives)
+            for forme, groupe in itertools.groupby(resultats, key=lambda resultat: resultat[0]['forme_juridique']):
+                chemin = chemin_par_forme(args.output, forme) if len(formes) > 1 else args.output
+                schema = schema_export(forme, profils=parametres['profils'])
+                lots = itertools.chain.from_iterable(lots for _, lots in groupe)
+                if args.format == 'csv':
+                    with ouvrir_sortie(chemin, args.gzip) as flux:
+                        suivi = ecrire_csv(lots, flux, schema)
+                else:
+                    suivi = ecrire_colonnes(lots, chemin, args.format, schema)
+                    print(f"{suivi['nb_scenarios']} scénarios écrits dans {chemin}", file=sys.stderr)
+                if len(taches) == 1:
+                    # Afficher l'optimal (hors du flux CSV, pour ne pas le corrompre)
+                    afficher_optimum(suivi['optimum'], sys.stderr)
+                nb_scenarios += suivi['nb_scenarios']
+    if args.profile:
+        print(rapport.formater(), file=sys.stderr)
+
+    if not nb_scenarios:
         print("Erreur: Aucun scénario dans la plage spécifiée", file=sys.stderr)
         return 1
-    
-    # Affichage
-    afficher_tableau(scenarios_a_afficher, args.format)
-    
+
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
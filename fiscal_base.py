@@ -2,16 +2,125 @@
 Classe de base pour les optimisations fiscales
 """
 
+import hashlib
+import threading
 import numpy as np
 from abc import ABC, abstractmethod
-from parametres_fiscaux import *
+from collections import OrderedDict
+from packs_fiscaux import resoudre_pack
+
+
+def montant_vectorise(montant):
+    """Normalise un montant d'optimisation (scalaire vide ou nul -> 0, tableau -> flottants)"""
+    if isinstance(montant, np.ndarray):
+        return montant.astype(float)
+    return float(montant) if montant else 0
+
+
+def pourcentage_vectorise(numerateurs, denominateurs):
+    """Retourne numerateurs / denominateurs en %, 0 lorsque le dénominateur n'est pas positif"""
+    numerateurs, denominateurs = np.broadcast_arrays(np.asarray(numerateurs, dtype=float),
+                                                     np.asarray(denominateurs, dtype=float))
+    resultat = np.zeros(numerateurs.shape)
+    np.divide(numerateurs, denominateurs, out=resultat, where=denominateurs > 0)
+    return resultat * 100
+
+
+class CacheLRU:
+    """Cache borné en nombre d'entrées (et en octets si `octets_max`), l'entrée la moins récemment utilisée est évincée
+
+    Partagé entre optimiseurs (et entre sessions de l'interface) : les accès
+    sont protégés par un verrou, le calcul d'une entrée manquante se fait hors
+    verrou. Avec `octets_max`, la taille de chaque valeur est mesurée par
+    `taille(valeur)` ; une valeur plus grande que `octets_max` est retournée
+    sans être conservée.
+    """
+
+    def __init__(self, taille_max, octets_max=None, taille=None):
+        self.taille_max = taille_max
+        self.octets_max = octets_max
+        self.taille = taille
+        self.entrees = OrderedDict()
+        self.octets = 0
+        self.succes = 0
+        self.echecs = 0
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, calculer):
+        """Retourne la valeur de `cle`, calculée par calculer() si elle n'est pas en cache"""
+        with self._verrou:
+            if cle in self.entrees:
+                self.entrees.move_to_end(cle)
+                self.succes += 1
+                return self.entrees[cle][0]
+            self.echecs += 1
+
+        valeur = calculer()
+        octets = self.taille(valeur) if self.octets_max is not None else 0
+        if self.octets_max is not None and octets > self.octets_max:
+            return valeur
+        with self._verrou:
+            if cle in self.entrees:  # calculée entre-temps par un autre fil
+                self.octets -= self.entrees.pop(cle)[1]
+            self.entrees[cle] = (valeur, octets)
+            self.octets += octets
+            while len(self.entrees) > self.taille_max or (self.octets_max is not None and self.octets > self.octets_max):
+                self.octets -= self.entrees.popitem(last=False)[1][1]
+        return valeur
+
+    def vider(self):
+        with self._verrou:
+            self.entrees.clear()
+            self.octets = 0
+            self.succes = 0
+            self.echecs = 0
+
+    def __len__(self):
+        return len(self.entrees)
+
+
+# Taille maximale des colonnes de scénarios de base conservées (octets) : un lot à pas=1 sur un
+# grand résultat pèse des dizaines de Mo
+OCTETS_MAX_BASES_VECTORISEES = 256 * 2**20
+
+
+def taille_colonnes(colonnes):
+    """Taille en octets d'un dictionnaire de colonnes NumPy"""
+    return sum(np.asarray(valeurs).nbytes for valeurs in colonnes.values())
+
+
+# Scénarios de base (niveau entreprise) réutilisés quand seuls le PER et le Girardin changent :
+# dictionnaires par rémunération (calculer_scenario) et colonnes par lot (evaluer_lot)
+CACHE_BASES_SCALAIRES = CacheLRU(4096)
+CACHE_BASES_VECTORISEES = CacheLRU(32, OCTETS_MAX_BASES_VECTORISEES, taille_colonnes)
+
+
+def copier_imbrique(valeur):
+    """Copie récursive des dictionnaires et listes (les autres valeurs sont immuables)"""
+    if isinstance(valeur, dict):
+        return {nom: copier_imbrique(element) for nom, element in valeur.items()}
+    if isinstance(valeur, list):
+        return [copier_imbrique(element) for element in valeur]
+    return valeur
+
+
+def vider_caches_bases():
+    """Vide les caches de scénarios de base"""
+    CACHE_BASES_SCALAIRES.vider()
+    CACHE_BASES_VECTORISEES.vider()
+
+
+# Stratégies acceptées par OptimisationFiscale.optimiser()
+STRATEGIES_OPTIMISATION = ['balayage', 'points_rupture', 'adaptatif']
 
 
 class OptimisationFiscale(ABC):
     """Classe de base pour tous les régimes fiscaux"""
     
     def __init__(self, resultat_avant_remuneration=300000, charges_existantes=50000, parts_fiscales=1,
-                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None):
+                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None, pack_fiscal=None):
+        # Paramètres fiscaux de l'année (PackFiscal, année '2025' ou empreinte ; année par défaut si absent)
+        self.pack = resoudre_pack(pack_fiscal)
         self.resultat_initial = resultat_avant_remuneration
         self.charges = charges_existantes
         self.resultat_avant_remuneration = resultat_avant_remuneration - charges_existantes
@@ -19,85 +128,77 @@ class OptimisationFiscale(ABC):
 
         # Paramètres d'optimisation
         # Le plafond PER disponible peut être personnalisé (10% revenus N-1 + reports)
-        self.plafond_per_disponible = plafond_per_disponible if plafond_per_disponible is not None else PLAFOND_PER
-        self.per_max = per_max if per_max is not None else PLAFOND_PER
+        self.plafond_per_disponible = plafond_per_disponible if plafond_per_disponible is not None else self.pack.PLAFOND_PER
+        self.per_max = per_max if per_max is not None else self.pack.PLAFOND_PER
         self.madelin_max = madelin_max if madelin_max is not None else 0
         self.girardin_max = girardin_max if girardin_max is not None else 50000
+
+        # Statistiques du dernier appel à optimiser() (stratégie, nombre de scénarios évalués)
+        self.derniere_optimisation = None
+
+    def signature_base(self):
+        """Paramètres de l'optimiseur dont dépend le scénario de base (clé des caches de bases)"""
+        return (type(self).__name__, self.pack.empreinte, self.resultat_initial, self.charges, self.parts_fiscales)
     
-    def calculer_ir(self, revenu_net_imposable):
-        """Calcule l'IR selon le barème progressif - commun à tous"""
+    def calculer_ir(self, revenu_net_imposable, details=True):
+        """Calcule l'IR selon le barème progressif - commun à tous
+
+        Retourne (IR, détail par tranche) ; avec details=False le détail n'est
+        pas construit et vaut None.
+        """
         if revenu_net_imposable <= 0:
-            return 0, []
-            
-        revenu_par_part = revenu_net_imposable / self.parts_fiscales
-        
-        ir_par_part = 0
-        revenu_restant = revenu_par_part
-        details = []
-        tranche_precedente = 0
-        
-        for tranche in TRANCHES_IR:
-            if revenu_restant <= 0:
-                break
-            
-            largeur_tranche = tranche['limite'] - tranche_precedente
-            montant_dans_tranche = min(revenu_restant, largeur_tranche)
-            
-            if montant_dans_tranche > 0:
-                ir_tranche = montant_dans_tranche * tranche['taux']
-                ir_par_part += ir_tranche
-                
-                details.append({
-                    'de': tranche_precedente * self.parts_fiscales,
-                    'a': (tranche_precedente + montant_dans_tranche) * self.parts_fiscales,
-                    'taux': tranche['taux'],
-                    'base': montant_dans_tranche * self.parts_fiscales,
-                    'impot': ir_tranche * self.parts_fiscales
-                })
-            
-            revenu_restant -= montant_dans_tranche
-            tranche_precedente = tranche['limite']
-            
-            if tranche['limite'] == float('inf'):
-                break
-        
-        ir_total = ir_par_part * self.parts_fiscales
-        return ir_total, details
-    
-    def calculer_is(self, benefice_imposable):
-        """Calcule l'IS selon les tranches - commun aux sociétés"""
+            return 0, [] if details else None
+        if not details:
+            return self.pack.BAREME_IR.impot(revenu_net_imposable, self.parts_fiscales), None
+
+        details = [{
+            'de': debut * self.parts_fiscales,
+            'a': (debut + base) * self.parts_fiscales,
+            'taux': taux,
+            'base': base * self.parts_fiscales,
+            'impot': base * taux * self.parts_fiscales
+        } for debut, _, taux, base in self.pack.BAREME_IR.tranches_utilisees(revenu_net_imposable / self.parts_fiscales)]
+
+        return self.pack.BAREME_IR.impot(revenu_net_imposable, self.parts_fiscales), details
+
+    def calculer_ir_vectorise(self, revenus_nets_imposables):
+        """Calcule l'IR sans détail pour un tableau de revenus (parts fiscales de l'optimiseur)"""
+        return self.pack.BAREME_IR.impot_vectorise(revenus_nets_imposables, self.parts_fiscales)
+
+    def calculer_is_vectorise(self, benefices):
+        """Calcule l'IS sans détail pour un tableau de bénéfices (barème du pack de l'optimiseur)"""
+        return self.pack.BAREME_IS.impot_vectorise(benefices)
+
+    def revenu_pour_ir_vectorise(self, impots):
+        """Inverse de calculer_ir_vectorise() : plus grand revenu imposable dont l'IR vaut `impots`"""
+        return self.pack.BAREME_IR.montant_pour_impot(impots, self.parts_fiscales)
+
+    def taux_marginal_ir(self, revenus_nets_imposables):
+        """Tranche marginale d'imposition (TMI) : taux IR du prochain euro imposable"""
+        return self.pack.BAREME_IR.taux_marginal(revenus_nets_imposables, self.parts_fiscales)
+
+    def calculer_is(self, benefice_imposable, details=True):
+        """Calcule l'IS selon les tranches - commun aux sociétés (détail None si details=False)"""
         if benefice_imposable <= 0:
-            return 0, []
-            
-        is_total = 0
-        reste = benefice_imposable
-        details = []
-        
-        for tranche in TRANCHES_IS:
-            if reste <= 0:
-                break
-            
-            montant_tranche = min(reste, tranche['limite'])
-            is_tranche = montant_tranche * tranche['taux']
-            is_total += is_tranche
-            
-            details.append({
-                'tranche': tranche['limite'],
-                'taux': tranche['taux'],
-                'base': montant_tranche,
-                'impot': is_tranche
-            })
-            
-            reste -= montant_tranche
-        
-        return is_total, details
-    
-    def calculer_ir_avec_girardin(self, revenu_imposable, girardin_montant=0):
+            return 0, [] if details else None
+        if not details:
+            return self.pack.BAREME_IS.impot(benefice_imposable), None
+
+        details = [{
+            'tranche': largeur,
+            'taux': taux,
+            'base': base,
+            'impot': base * taux
+        } for _, largeur, taux, base in self.pack.BAREME_IS.tranches_utilisees(benefice_imposable)]
+
+        return self.pack.BAREME_IS.impot(benefice_imposable), details
+
+    def calculer_ir_avec_girardin(self, revenu_imposable, girardin_montant=0, details=True):
         """Calcule l'IR avec réduction Girardin - commun à toutes les formes"""
-        ir_avant_girardin, ir_detail = self.calculer_ir(revenu_imposable)
+        ir_avant_girardin, ir_detail = self.calculer_ir(revenu_imposable, details)
 
         # Girardin
-        reduction_girardin = min(girardin_montant * TAUX_GIRARDIN_INDUSTRIEL, ir_avant_girardin)
+        reduction_girardin = min(girardin_montant * self.pack.TAUX_GIRARDIN_INDUSTRIEL, ir_avant_girardin)
         ir_final = ir_avant_girardin - reduction_girardin
 
         return {
@@ -112,21 +213,20 @@ class OptimisationFiscale(ABC):
 
     def calculer_pee(self, remuneration_brute, versement_pee=0):
         """Calcule le PEE + PERCO (épargne salariale et retraite) - commun à toutes les formes"""
-        import math
         # Limite le versement salarié au montant qui peut être abondé
         # Si abondement max = 7,418€ et abondement = 300% du versement
         # Alors versement max abondable = 7,418€ / 3 = 2,473€ (arrondi supérieur)
-        versement_max_abonde = math.ceil(PLAFOND_ABONDEMENT_PEE / TAUX_ABONDEMENT_MAX)
+        versement_max_abonde = self.pack.VERSEMENT_MAX_ABONDE
 
         # Versement salarié limité à :
         # - 25% du salaire brut (limite légale)
         # - ET au montant qui peut être abondé (optimisation fiscale)
-        versement_pee = min(versement_pee, remuneration_brute * LIMITE_VERSEMENT_PEE_SALARIE, versement_max_abonde)
+        versement_pee = min(versement_pee, remuneration_brute * self.pack.LIMITE_VERSEMENT_PEE_SALARIE, versement_max_abonde)
 
         # Abondement = 300% du versement, plafonné à 16% du PASS (7,418€)
-        abondement_pee = min(versement_pee * TAUX_ABONDEMENT_MAX, PLAFOND_ABONDEMENT_PEE)
+        abondement_pee = min(versement_pee * self.pack.TAUX_ABONDEMENT_MAX, self.pack.PLAFOND_ABONDEMENT_PEE)
         # Coût abondement pour l'entreprise (abondement + CSG/CRDS 9.7%)
-        cout_abondement = abondement_pee * (1 + TAUX_CSG_CRDS_ABONDEMENT)
+        cout_abondement = abondement_pee * (1 + self.pack.TAUX_CSG_CRDS_ABONDEMENT)
         # Économie IS sur l'abondement (charge déductible)
         economie_is_abondement = cout_abondement * 0.25  # Approximation avec taux moyen IS
 
@@ -138,12 +238,253 @@ class OptimisationFiscale(ABC):
             'placements_pee': versement_pee + abondement_pee
         }
 
+    def calculer_pee_vectorise(self, remunerations_brutes, versement_pee=0):
+        """Version vectorisée de calculer_pee() pour un tableau de rémunérations brutes"""
+        versement_max_abonde = self.pack.VERSEMENT_MAX_ABONDE
+        versements = np.minimum(np.minimum(versement_pee, np.asarray(remunerations_brutes) * self.pack.LIMITE_VERSEMENT_PEE_SALARIE),
+                                versement_max_abonde)
+        abondements = np.minimum(versements * self.pack.TAUX_ABONDEMENT_MAX, self.pack.PLAFOND_ABONDEMENT_PEE)
+        couts_abondement = abondements * (1 + self.pack.TAUX_CSG_CRDS_ABONDEMENT)
+
+        return {
+            'versement_pee': versements,
+            'abondement_pee': abondements,
+            'cout_abondement_pee': couts_abondement,
+            'economie_is_abondement': couts_abondement * 0.25
+        }
+
     @abstractmethod
     def calculer_scenario_base(self, remuneration, **kwargs):
         """Méthode abstraite - calcul de base sans PER/Girardin"""
         pass
+
+    @abstractmethod
+    def calculer_base_vectorisee(self, remunerations, **kwargs):
+        """Méthode abstraite - calcul de base sans PER/Girardin pour un tableau de rémunérations
+
+        Retourne un dictionnaire de colonnes NumPy portant les mêmes noms que les
+        clés de calculer_scenario_base(), sans détails ni alias. Les colonnes
+        attendues par appliquer_optimisations_vectorisees() sont : revenu_imposable,
+        remuneration_nette_avant_ir, dividendes_nets, versement_pee, abondement_pee,
+        madelin_charge et economies_base (économies totales du scénario de base).
+        """
+        pass
+
+    def appliquer_optimisations_vectorisees(self, colonnes, per_montant=0, girardin_montant=0):
+        """Version vectorisée de appliquer_optimisations_personnelles()
+
+        Ne modifie pas les colonnes reçues : retourne un nouveau dictionnaire
+        contenant les colonnes de base et celles des optimisations personnelles.
+        Les montants PER et Girardin peuvent être des tableaux, diffusés (broadcast)
+        avec les colonnes pour évaluer plusieurs montants à la fois.
+        """
+        per_montant = montant_vectorise(per_montant)
+        girardin_montant = montant_vectorise(girardin_montant)
+
+        revenu_imposable_base = colonnes['revenu_imposable']
+
+        # 1. PER et PEE/PERCO (mêmes plafonnements que le calcul scalaire)
+        per_deduction = np.minimum(np.minimum(per_montant, self.plafond_per_disponible), revenu_imposable_base)
+        revenu_apres_per = np.maximum(0, revenu_imposable_base - per_deduction)
+        pee_deduction = np.minimum(colonnes['versement_pee'], revenu_apres_per)
+        revenu_imposable_final = np.maximum(0, revenu_apres_per - pee_deduction)
+
+        # 2. Économies PER et PEE réelles
+        ir_sans_per = self.calculer_ir_vectorise(revenu_imposable_base)
+        ir_avec_per_seulement = self.calculer_ir_vectorise(revenu_apres_per)
+        ir_avant_girardin = self.calculer_ir_vectorise(revenu_imposable_final)
+        economies_per = ir_sans_per - ir_avec_per_seulement
+        economies_pee = ir_avec_per_seulement - ir_avant_girardin
+
+        # 3. Girardin
+        reduction_girardin = np.minimum(girardin_montant * self.pack.TAUX_GIRARDIN_INDUSTRIEL, ir_avant_girardin)
+        ir_final = ir_avant_girardin - reduction_girardin
+
+        # 4-7. Net disponible, placements et patrimoine
+        remuneration_nette_apres_ir = colonnes['remuneration_nette_avant_ir'] - ir_final
+        net_disponible_immediat = (remuneration_nette_apres_ir + colonnes['dividendes_nets']
+                                   - girardin_montant - per_deduction - pee_deduction)
+        placements_pee = pee_deduction + colonnes['abondement_pee']
+        placements_total = per_deduction + colonnes['madelin_charge'] + placements_pee
+        patrimoine_total = net_disponible_immediat + placements_total
+
+        # 8. Économies totales
+        economies_girardin_nette = reduction_girardin - girardin_montant
+
+        resultats = dict(colonnes)
+        resultats.update({
+            'per_deduction': per_deduction,
+            'pee_deduction': pee_deduction,
+            'revenu_imposable_final': revenu_imposable_final,
+            'ir_avant_girardin': ir_avant_girardin,
+            'reduction_girardin': reduction_girardin,
+            'ir_final': ir_final,
+            'remuneration_nette_apres_ir': remuneration_nette_apres_ir,
+            'net_disponible_immediat': net_disponible_immediat,
+            'placements_pee': placements_pee,
+            'placements_total': placements_total,
+            'patrimoine_total': patrimoine_total,
+            'total_net': patrimoine_total,
+            'economies_per': economies_per,
+            'economies_pee': economies_pee,
+            'economies_girardin_nette': economies_girardin_nette,
+            'economies_totales': colonnes['economies_base'] + economies_per + economies_girardin_nette + economies_pee
+        })
+        return resultats
+
+    def derivee_pee_vectorisee(self, remunerations_brutes, versement_pee=0):
+        """Dérivées du versement PEE et du coût de l'abondement par rapport à la rémunération brute
+
+        Le versement ne suit la rémunération (25%) que sous le versement demandé
+        et le maximum abondé ; l'abondement (300%) cesse de croître à son plafond.
+        """
+        remunerations_brutes = np.asarray(remunerations_brutes, dtype=float)
+        versement_max_abonde = self.pack.VERSEMENT_MAX_ABONDE
+        versements = np.minimum(np.minimum(float(versement_pee or 0), remunerations_brutes * self.pack.LIMITE_VERSEMENT_PEE_SALARIE),
+                                versement_max_abonde)
+        derivee_versement = np.where(
+            remunerations_brutes * self.pack.LIMITE_VERSEMENT_PEE_SALARIE < min(float(versement_pee or 0), versement_max_abonde),
+            self.pack.LIMITE_VERSEMENT_PEE_SALARIE, 0.0)
+        derivee_abondement = np.where(versements * self.pack.TAUX_ABONDEMENT_MAX < self.pack.PLAFOND_ABONDEMENT_PEE,
+                                      derivee_versement * self.pack.TAUX_ABONDEMENT_MAX, 0.0)
+        return derivee_versement, derivee_abondement * (1 + self.pack.TAUX_CSG_CRDS_ABONDEMENT)
+
+    def taux_marginal_is_vectorise(self, benefices):
+        """Taux IS du prochain euro de bénéfice (0 tant que le bénéfice n'est pas positif)"""
+        benefices = np.asarray(benefices, dtype=float)
+        return np.where(benefices > 0, self.pack.BAREME_IS.taux_marginal(benefices), 0.0)
+
+    @abstractmethod
+    def derivees_base_vectorisees(self, colonnes, versement_pee=0, **kwargs):
+        """Méthode abstraite - dérivées par rapport à la rémunération brute des prélèvements de base
+
+        Calculées en forme fermée à partir des colonnes de calculer_base_vectorisee().
+        Retourne un dictionnaire de tableaux (ou scalaires) : cotisations, is,
+        is_holding, flat_tax, ainsi que revenu_imposable et versement_pee
+        (dérivées utilisées pour la chaîne de l'IR).
+        """
+        pass
+
+    def taux_marginal_vectorise(self, colonnes, versement_pee=0, **kwargs):
+        """Taux marginal effectif (%) : prélèvements supplémentaires pour 1 € de rémunération brute en plus
+
+        Dérivée analytique, colonne par colonne, de la somme cotisations + IR + IS
+        + IS holding + flat tax, à partir des colonnes d'un lot déjà évalué (aucun
+        nouveau calcul de scénario). L'IR suit la chaîne PER, PEE puis Girardin
+        lorsque les colonnes des optimisations personnelles sont présentes, sinon
+        l'IR de base. Retourne un dictionnaire de tableaux en % : cotisations, ir,
+        is, is_holding, flat_tax et total. Un taux négatif signifie que la
+        rémunération supplémentaire réduit les prélèvements (moins d'IS et de
+        flat tax que de cotisations et d'IR).
+        """
+        derivees = self.derivees_base_vectorisees(colonnes, versement_pee=versement_pee, **kwargs)
+        derivee_revenu = derivees['revenu_imposable']
+
+        if 'revenu_imposable_final' in colonnes:
+            # PER : le revenu après PER ne croît plus tant que la déduction absorbe tout le revenu
+            derivee_revenu = np.where(colonnes['per_deduction'] < colonnes['revenu_imposable'], derivee_revenu, 0.0)
+            # PEE : déduction du versement, tant qu'il ne dépasse pas le revenu après PER
+            revenu_apres_per = colonnes['revenu_imposable'] - colonnes['per_deduction']
+            derivee_revenu = np.where(colonnes['pee_deduction'] < revenu_apres_per,
+                                      derivee_revenu - derivees['versement_pee'], 0.0)
+            derivee_ir = self.taux_marginal_ir(colonnes['revenu_imposable_final']) * derivee_revenu
+            # Girardin : IR final nul tant que la réduction couvre tout l'IR
+            derivee_ir = np.where(colonnes['reduction_girardin'] < colonnes['ir_avant_girardin'], derivee_ir, 0.0)
+        else:
+            derivee_ir = self.taux_marginal_ir(colonnes['revenu_imposable']) * derivee_revenu
+
+        forme = np.shape(colonnes['remuneration_brute'])
+        taux = {nom: np.broadcast_to(np.asarray(valeur, dtype=float) * 100, forme) for nom, valeur in (
+            ('cotisations', derivees['cotisations']),
+            ('ir', derivee_ir),
+            ('is', derivees['is']),
+            ('is_holding', derivees['is_holding']),
+            ('flat_tax', derivees['flat_tax']),
+        )}
+        taux['total'] = sum(taux.values())
+        return taux
+
+    def get_points_rupture(self, versement_pee=0, **kwargs):
+        """Rémunérations où le total net change de pente, connues directement
+
+        Par défaut : plafonnements du versement PEE (25% de la rémunération brute)
+        et de l'abondement (atteint avant le versement maximal abondé, arrondi).
+        """
+        versement_pee = float(versement_pee or 0)
+        versement_plafonne = min(versement_pee, self.pack.VERSEMENT_MAX_ABONDE)
+        versement_abondement_plafonne = min(versement_pee, self.pack.PLAFOND_ABONDEMENT_PEE / self.pack.TAUX_ABONDEMENT_MAX)
+        return [versement_plafonne / self.pack.LIMITE_VERSEMENT_PEE_SALARIE,
+                versement_abondement_plafonne / self.pack.LIMITE_VERSEMENT_PEE_SALARIE]
+
+    def get_seuils_rupture(self, per_montant=0, girardin_montant=0, **kwargs):
+        """Seuils de colonnes monotones en la rémunération où le total net change de pente
+
+        Retourne une liste de (colonne, croissante, seuils) : la rémunération
+        correspondant à chaque seuil est retrouvée par recherche sur le lot
+        vectorisé. Par défaut : plafond PER, tranches IR et plafond de la
+        réduction Girardin.
+        """
+        return [
+            ('revenu_imposable', True, [min(float(per_montant or 0), self.plafond_per_disponible)]),
+            ('revenu_imposable_final', True, list(self.pack.BAREME_IR.seuils * self.parts_fiscales)),
+            ('ir_avant_girardin', True, [float(girardin_montant or 0) * self.pack.TAUX_GIRARDIN_INDUSTRIEL]),
+        ]
+
+    def get_seuils_is(self, colonne):
+        """Seuil de rupture (colonne décroissante, tranches IS) pour un bénéfice soumis à l'IS"""
+        return (colonne, False, list(self.pack.BAREME_IS.seuils))
+
+    def get_intervalles_non_lineaires(self, **kwargs):
+        """Intervalles de rémunération où le total net est quadratique plutôt que linéaire"""
+        return []
+
+    def evaluer_lot(self, remunerations, per_montant=0, girardin_montant=0, **kwargs):
+        """Évalue un tableau de rémunérations en une passe (équivalent colonnes de calculer_scenario)
+
+        Pipeline en deux étapes : les colonnes de base (niveau entreprise) sont
+        mises en cache par (rémunérations, Madelin, PEE...) ; un changement de PER
+        ou de Girardin ne refait que l'étape IR.
+        """
+        remunerations = np.asarray(remunerations, dtype=float)
+        colonnes_base = self.calculer_base_vectorisee_en_cache(remunerations, **kwargs)
+        return self.appliquer_optimisations_vectorisees(colonnes_base, per_montant, girardin_montant)
+
+    def calculer_base_vectorisee_en_cache(self, remunerations, **kwargs):
+        """calculer_base_vectorisee() mise en cache ; les colonnes retournées sont en lecture seule"""
+        def calculer():
+            colonnes = self.calculer_base_vectorisee(remunerations, **kwargs)
+            for valeurs in colonnes.values():
+                valeurs.flags.writeable = False
+            return colonnes
+
+        try:
+            cle = (self.signature_base(), remunerations.shape,
+                   hashlib.blake2b(remunerations.tobytes(), digest_size=16).digest(), tuple(sorted(kwargs.items())))
+            hash(cle)
+        except TypeError:  # Paramètres non hachables (tableaux) : pas de cache
+            return self.calculer_base_vectorisee(remunerations, **kwargs)
+        return CACHE_BASES_VECTORISEES.obtenir(cle, calculer)
+
+    def calculer_scenario_base_en_cache(self, remuneration, details=True, **kwargs):
+        """calculer_scenario_base() mise en cache : chaque appel reçoit sa propre copie (détails compris)"""
+        try:
+            cle = (self.signature_base(), remuneration, details, tuple(sorted(kwargs.items())))
+            hash(cle)
+        except TypeError:
+            return self.calculer_scenario_base(remuneration, details=details, **kwargs)
+        def calculer():
+            scenario = self.calculer_scenario_base(remuneration, details=details, **kwargs)
+            return scenario, [nom for nom, valeur in scenario.items() if isinstance(valeur, (dict, list))]
+
+        # Les détails (is_detail, cotisations_detail...) et optimisations imbriqués sont recopiés :
+        # un appelant qui modifie son scénario ne modifie pas le cache partagé par le processus
+        scenario, imbriques = CACHE_BASES_SCALAIRES.obtenir(cle, calculer)
+        copie = dict(scenario)
+        for nom in imbriques:
+            copie[nom] = copier_imbrique(copie[nom])
+        return copie
     
-    def appliquer_optimisations_personnelles(self, scenario_base, per_montant=0, girardin_montant=0):
+    def appliquer_optimisations_personnelles(self, scenario_base, per_montant=0, girardin_montant=0, details=True):
         """Applique PER et Girardin sur un scénario de base - commun à toutes les formes"""
         scenario = scenario_base.copy()
 
@@ -176,17 +517,20 @@ class OptimisationFiscale(ABC):
 
         # 2. Calcul de l'économie PER et PEE réelle
         # Économie = différence d'IR sans PER/PEE vs avec PER/PEE
-        ir_sans_per, _ = self.calculer_ir(revenu_imposable_base)
-        ir_avec_per_pee, _ = self.calculer_ir(revenu_imposable_final)
+        # Pour distinguer l'économie PER de l'économie PEE, on calcule aussi l'IR intermédiaire.
+        # Les trois IR sont évalués en un seul appel du noyau vectorisé (sans détail)
+        ir_sans_per, ir_avec_per_seulement, ir_avec_per_pee = (
+            float(ir) for ir in self.calculer_ir_vectorise(
+                [revenu_imposable_base, revenu_apres_per, revenu_imposable_final]
+            )
+        )
         economie_per_pee = ir_sans_per - ir_avec_per_pee
 
-        # Pour distinguer l'économie PER de l'économie PEE, on calcule l'IR intermédiaire
-        ir_avec_per_seulement, _ = self.calculer_ir(revenu_apres_per)
         economie_per_reelle = ir_sans_per - ir_avec_per_seulement
         economie_pee_reelle = ir_avec_per_seulement - ir_avec_per_pee
 
         # 3. Recalcul de l'IR avec Girardin
-        ir_resultats = self.calculer_ir_avec_girardin(revenu_imposable_final, girardin_montant)
+        ir_resultats = self.calculer_ir_avec_girardin(revenu_imposable_final, girardin_montant, details)
         scenario.update(ir_resultats)
 
         # 4. Mise à jour du net final avec les optimisations personnelles
@@ -219,8 +563,8 @@ class OptimisationFiscale(ABC):
         scenario['total_net'] = patrimoine_total
 
         # 8. Mise à jour des optimisations
-        if 'optimisations' not in scenario:
-            scenario['optimisations'] = {}
+        # Copie : le scénario de base (éventuellement en cache) n'est pas modifié
+        scenario['optimisations'] = dict(scenario.get('optimisations', {}))
 
         scenario['optimisations'].update({
             'per': per_montant,
@@ -245,18 +589,24 @@ class OptimisationFiscale(ABC):
 
         return scenario
     
-    def calculer_scenario(self, remuneration, per_montant=0, girardin_montant=0, **kwargs):
-        """Méthode finale qui combine scénario de base + optimisations personnelles"""
+    def calculer_scenario(self, remuneration, per_montant=0, girardin_montant=0, details=True, **kwargs):
+        """Méthode finale qui combine scénario de base + optimisations personnelles
+
+        Avec details=False (mode léger), les détails par tranche (ir_detail,
+        is_detail) et par cotisation (cotisations_detail) valent None : seuls
+        les montants sont calculés, ce qui suffit pour comparer des scénarios.
+        """
         # Extraction des optimisations personnelles des kwargs
         per_montant = kwargs.pop('per_montant', per_montant)
         girardin_montant = kwargs.pop('girardin_montant', girardin_montant)
         
-        # 1. Calcul du scénario de base (spécifique à chaque forme juridique)
-        scenario_base = self.calculer_scenario_base(remuneration, **kwargs)
+        # 1. Calcul du scénario de base (spécifique à chaque forme juridique), réutilisé
+        # tant que la rémunération et les paramètres de base (Madelin, PEE...) sont inchangés
+        scenario_base = self.calculer_scenario_base_en_cache(remuneration, details, **kwargs)
         
         # 2. Application des optimisations personnelles (communes à toutes les formes)
         scenario_final = self.appliquer_optimisations_personnelles(
-            scenario_base, per_montant, girardin_montant
+            scenario_base, per_montant, girardin_montant, details
         )
         
         return scenario_final
@@ -273,39 +623,132 @@ class OptimisationFiscale(ABC):
     def get_metric_for_optimization(self, scenario):
         """Retourne la métrique à optimiser (peut être surchargé)"""
         return scenario.get('total_net', 0)
-    
-    def optimiser(self, pas=5000, per_max=0, madelin_max=0, girardin_max=0, versement_pee=0, acre=False, **kwargs):
-        """Méthode commune d'optimisation pour toutes les formes juridiques"""
+
+    def masque_valide_vectorise(self, colonnes):
+        """Version vectorisée de is_scenario_valid() (doit rester cohérente avec elle)"""
+        return colonnes['total_net'] > 0
+
+    def metrique_vectorisee(self, colonnes):
+        """Version vectorisée de get_metric_for_optimization()"""
+        return colonnes['total_net']
+
+    def optimiser(self, pas=5000, per_max=0, madelin_max=0, girardin_max=0, versement_pee=0, acre=False,
+                  colonnaire=False, strategie='balayage', precision=1, nb_intervalles=3, **kwargs):
+        """Méthode commune d'optimisation pour toutes les formes juridiques
+
+        Avec colonnaire=True, tous les scénarios sont évalués en une passe vectorisée
+        et retournés sous forme de ScenarioGrid (colonnes NumPy) au lieu d'une liste
+        de dictionnaires ; le meilleur scénario reste un dictionnaire complet.
+
+        strategie choisit les rémunérations évaluées :
+        - 'balayage' : toute la plage avec le pas `pas`
+        - 'points_rupture' : uniquement les points de rupture de la forme juridique,
+          optimum exact à l'euro quel que soit `pas`
+        - 'adaptatif' : balayage grossier avec le pas `pas`, puis raffinement autour
+          des `nb_intervalles` meilleurs maxima locaux jusqu'à `precision` euros
+        Le nombre de scénarios évalués est disponible dans self.derniere_optimisation.
+        """
         meilleur_scenario = None
         tous_scenarios = []
 
+        if strategie not in STRATEGIES_OPTIMISATION:
+            raise ValueError(f"Stratégie d'optimisation '{strategie}' non supportée. Choix disponibles: {STRATEGIES_OPTIMISATION}")
+
         # Obtient la plage de rémunération à tester
         range_remuneration = self.get_range_remuneration(pas)
 
+        # Prépare les arguments pour calculer_scenario avec les montants exacts de l'interface
+        scenario_kwargs = {
+            'per_montant': per_max,
+            'madelin_montant': madelin_max,
+            'girardin_montant': girardin_max,
+            'versement_pee': versement_pee,
+            'acre': acre
+        }
+
+        # Ajoute les autres kwargs spécifiques
+        scenario_kwargs.update(kwargs)
+
+        if strategie == 'points_rupture':
+            from strategies_optimisation import rechercher_points_rupture
+            remunerations, colonnes, nb_evaluations = rechercher_points_rupture(self, scenario_kwargs)
+            self.derniere_optimisation = {'strategie': strategie, 'nb_evaluations': nb_evaluations}
+            return self._construire_resultat(remunerations, colonnes, scenario_kwargs, colonnaire)
+
+        if strategie == 'adaptatif':
+            from strategies_optimisation import rechercher_adaptatif
+            remunerations, colonnes, nb_evaluations = rechercher_adaptatif(self, scenario_kwargs, pas, precision,
+                                                                           nb_intervalles)
+            self.derniere_optimisation = {'strategie': strategie, 'nb_evaluations': nb_evaluations}
+            return self._construire_resultat(remunerations, colonnes, scenario_kwargs, colonnaire)
+
+        self.derniere_optimisation = {'strategie': strategie, 'nb_evaluations': len(range_remuneration)}
+
+        if colonnaire:
+            remunerations = np.asarray(list(range_remuneration))
+            colonnes = self.evaluer_lot(remunerations, **scenario_kwargs)
+            return self._construire_resultat(remunerations, colonnes, scenario_kwargs, colonnaire)
+
+        # Balayage en mode léger (sans détails), seul le meilleur scénario est recalculé avec détails
+        remunerations_valides = []
         for remuneration in range_remuneration:
-            # Prépare les arguments pour calculer_scenario avec les montants exacts de l'interface
-            scenario_kwargs = {
-                'per_montant': per_max,
-                'madelin_montant': madelin_max,
-                'girardin_montant': girardin_max,
-                'versement_pee': versement_pee,
-                'acre': acre
-            }
-            
-            # Ajoute les autres kwargs spécifiques
-            scenario_kwargs.update(kwargs)
-            
-            scenario = self.calculer_scenario(remuneration, **scenario_kwargs)
+            scenario = self.calculer_scenario(remuneration, details=False, **scenario_kwargs)
             
             # Vérifie si le scénario est valide
             if self.is_scenario_valid(scenario):
                 tous_scenarios.append(scenario)
+                remunerations_valides.append(remuneration)
         
         # Trouve le meilleur scénario
         if tous_scenarios:
-            meilleur_scenario = max(tous_scenarios, key=self.get_metric_for_optimization)
+            meilleur_scenario = self._recalculer_meilleur(tous_scenarios, remunerations_valides, scenario_kwargs)
         
         return meilleur_scenario, tous_scenarios
+
+    def _recalculer_meilleur(self, tous_scenarios, remunerations, scenario_kwargs):
+        """Recalcule avec détails le meilleur des scénarios légers et le remplace dans la liste"""
+        indice = max(range(len(tous_scenarios)), key=lambda i: self.get_metric_for_optimization(tous_scenarios[i]))
+        tous_scenarios[indice] = self.calculer_scenario(remunerations[indice], **scenario_kwargs)
+        return tous_scenarios[indice]
+
+    def optimiser_conjoint(self, pas=5000, per_max=None, madelin_max=None, girardin_max=None,
+                           versement_pee_max=None, pas_madelin=1000, pas_pee=250, **kwargs):
+        """Optimise conjointement rémunération, PER, Madelin, PEE et Girardin
+
+        Voir optimisation_conjointe.optimiser_conjoint() : retourne l'optimum pour
+        net_disponible_immediat et pour patrimoine_total.
+        """
+        from optimisation_conjointe import optimiser_conjoint
+        resultat = optimiser_conjoint(self, pas, per_max, madelin_max, girardin_max, versement_pee_max,
+                                      pas_madelin, pas_pee, **kwargs)
+        self.derniere_optimisation = {'strategie': 'conjointe', 'nb_evaluations': resultat['nb_evaluations']}
+        return resultat
+
+    def _construire_resultat(self, remunerations, colonnes, scenario_kwargs, colonnaire):
+        """Filtre les scénarios valides d'un lot évalué et retourne (meilleur scénario, scénarios)
+
+        Les scénarios sont une ScenarioGrid si colonnaire, sinon une liste de
+        dictionnaires recalculés avec calculer_scenario().
+        """
+        from grille_scenarios import ScenarioGrid
+
+        masque = self.masque_valide_vectorise(colonnes)
+        grille = ScenarioGrid(self, remunerations[masque],
+                              {nom: valeurs[masque] for nom, valeurs in colonnes.items()},
+                              scenario_kwargs)
+        if not colonnaire:
+            remunerations_valides = [remuneration.item() for remuneration in grille.remunerations]
+            tous_scenarios = [grille.ligne(indice, details=False) for indice in range(len(grille))]
+            meilleur_scenario = None
+            if tous_scenarios:
+                meilleur_scenario = self._recalculer_meilleur(tous_scenarios, remunerations_valides, scenario_kwargs)
+            return meilleur_scenario, tous_scenarios
+
+        meilleur_scenario = None
+        if len(grille):
+            meilleur_scenario = grille[int(np.argmax(self.metrique_vectorisee(grille.colonnes)))]
+
+        return meilleur_scenario, grille
     
     @abstractmethod
     def get_nom_forme_juridique(self):
@@ -2,17 +2,21 @@
 Optimisation fiscale pour la micro-entreprise
 """
 
-from fiscal_base import OptimisationFiscale
-from parametres_fiscaux import *
+import numpy as np
+from fiscal_base import OptimisationFiscale, pourcentage_vectorise
+from parametres_fiscaux import get_optimisations_disponibles
+
+# Types d'activité reconnus par get_config_activite() (libellés de l'interface)
+TYPES_ACTIVITE = ['BIC - Prestations de services', 'BIC - Vente de marchandises', 'BNC - Professions libérales']
 
 
 class Microentreprise(OptimisationFiscale):
     """Optimisation pour micro-entreprise"""
     
     def __init__(self, resultat_avant_remuneration=300000, charges_existantes=0, parts_fiscales=1,
-                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None):
+                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None, pack_fiscal=None):
         super().__init__(resultat_avant_remuneration, charges_existantes, parts_fiscales,
-                         per_max, madelin_max, girardin_max, plafond_per_disponible)
+                         per_max, madelin_max, girardin_max, plafond_per_disponible, pack_fiscal)
     
     def get_nom_forme_juridique(self):
         return "Micro-entreprise"
@@ -20,22 +24,21 @@ class Microentreprise(OptimisationFiscale):
     def get_optimisations_disponibles(self):
         return get_optimisations_disponibles('Micro-entreprise')
     
-    def calculer_scenario_base(self, chiffre_affaires, type_activite='BIC - Prestations de services', madelin_montant=0, acre=False, **kwargs):
+    def get_config_activite(self, type_activite):
+        """Retourne (configuration micro, type simplifié) selon le type d'activité"""
+        if type_activite == 'BIC - Vente de marchandises':
+            return self.pack.MICRO_BIC_VENTE, 'BIC'
+        elif type_activite in ['BIC - Prestations de services', 'BIC']:
+            return self.pack.MICRO_BIC_SERVICES, 'BIC'
+        else:  # BNC
+            return self.pack.MICRO_BNC, 'BNC'
+
+    def calculer_scenario_base(self, chiffre_affaires, type_activite='BIC - Prestations de services', madelin_montant=0, acre=False, details=True, **kwargs):
         """Calcule un scénario micro-entreprise"""
         resultats = {'forme_juridique': 'Micro-entreprise'}
         
         # Configuration selon le type d'activité (sans vérification de seuil)
-        if type_activite == 'BIC - Vente de marchandises':
-            from parametres_fiscaux import MICRO_BIC_VENTE
-            config = MICRO_BIC_VENTE
-            type_simple = 'BIC'
-        elif type_activite in ['BIC - Prestations de services', 'BIC']:
-            from parametres_fiscaux import MICRO_BIC_SERVICES
-            config = MICRO_BIC_SERVICES
-            type_simple = 'BIC'
-        else:  # BNC
-            config = MICRO_BNC
-            type_simple = 'BNC'
+        config, type_simple = self.get_config_activite(type_activite)
         
         seuil = config['seuil']
         
@@ -50,8 +53,8 @@ class Microentreprise(OptimisationFiscale):
         # Cotisations sociales (avec réduction ACRE si applicable)
         taux_cotisations = config['cotisations']
         if acre:
-            taux_cotisations = taux_cotisations * (1 - TAUX_REDUCTION_ACRE)  # Réduction 50%
-            resultats['acre_reduction'] = chiffre_affaires * config['cotisations'] * TAUX_REDUCTION_ACRE
+            taux_cotisations = taux_cotisations * (1 - self.pack.TAUX_REDUCTION_ACRE)  # Réduction 50%
+            resultats['acre_reduction'] = chiffre_affaires * config['cotisations'] * self.pack.TAUX_REDUCTION_ACRE
         else:
             resultats['acre_reduction'] = 0
             
@@ -65,7 +68,7 @@ class Microentreprise(OptimisationFiscale):
         resultats['revenu_imposable'] = base_imposable  # Pour PER dans la base
         
         # IR de base (sans PER/Girardin - sera recalculé dans la base)
-        ir_base, ir_detail = self.calculer_ir(base_imposable)
+        ir_base, ir_detail = self.calculer_ir(base_imposable, details)
         resultats['ir_base'] = ir_base
         resultats['ir_detail'] = ir_detail
         
@@ -74,7 +77,8 @@ class Microentreprise(OptimisationFiscale):
         # Net de base (avant PER/Girardin - sera recalculé dans la base)
         net_avant_charges = chiffre_affaires - cotisations_sociales - ir_base
         resultats['net_avant_charges'] = net_avant_charges
-        resultats['remuneration_nette_avant_ir'] = net_avant_charges  # Pour calcul final dans la base
+        # Pour calcul final dans la base, qui déduit l'IR final : charges déduites, IR non déduit
+        resultats['remuneration_nette_avant_ir'] = chiffre_affaires - cotisations_sociales - self.charges
         
         # Net final de base (avant PER/Girardin)
         net_final = net_avant_charges - self.charges
@@ -91,7 +95,7 @@ class Microentreprise(OptimisationFiscale):
         resultats['optimisations'] = {
             'madelin': madelin_montant,
             'acre': acre,
-            'economies_totales': madelin_charge * TAUX_ECONOMIE_PER + resultats['acre_reduction']
+            'economies_totales': madelin_charge * self.pack.TAUX_ECONOMIE_PER + resultats['acre_reduction']
         }
         
         # Calcul du taux de prélèvement global
@@ -104,6 +108,54 @@ class Microentreprise(OptimisationFiscale):
         
         return resultats
     
+    def calculer_base_vectorisee(self, chiffres_affaires, type_activite='BIC - Prestations de services', madelin_montant=0, acre=False, **kwargs):
+        """Calcule les colonnes du scénario micro-entreprise pour un tableau de chiffres d'affaires"""
+        chiffres_affaires = np.asarray(chiffres_affaires, dtype=float)
+        config, _ = self.get_config_activite(type_activite)
+
+        taux_cotisations = config['cotisations']
+        if acre:
+            taux_cotisations = taux_cotisations * (1 - self.pack.TAUX_REDUCTION_ACRE)
+            acre_reduction = chiffres_affaires * config['cotisations'] * self.pack.TAUX_REDUCTION_ACRE
+        else:
+            acre_reduction = np.zeros(chiffres_affaires.shape)
+
+        cotisations_sociales = chiffres_affaires * taux_cotisations
+        base_imposable = chiffres_affaires * (1 - config['abattement'])
+        ir_base = self.calculer_ir_vectorise(base_imposable)
+        net_avant_charges = chiffres_affaires - cotisations_sociales - ir_base
+        zeros = np.zeros(chiffres_affaires.shape)
+
+        return {
+            'remuneration_brute': chiffres_affaires,
+            'cotisations_sociales': cotisations_sociales,
+            'acre_reduction': acre_reduction,
+            'revenu_imposable': base_imposable,
+            'ir_base': ir_base,
+            'remuneration_nette_avant_ir': chiffres_affaires - cotisations_sociales - self.charges,
+            'net_final': net_avant_charges - self.charges,
+            'madelin_charge': zeros,
+            'versement_pee': zeros,
+            'abondement_pee': zeros,
+            'dividendes_nets': zeros,
+            'taux_prelevement_global': pourcentage_vectorise(cotisations_sociales + ir_base, chiffres_affaires),
+            'economies_base': acre_reduction
+        }
+
+    def derivees_base_vectorisees(self, colonnes, versement_pee=0, type_activite='BIC - Prestations de services',
+                                  acre=False, **kwargs):
+        """Dérivées des prélèvements micro-entreprise par rapport au chiffre d'affaires"""
+        config, _ = self.get_config_activite(type_activite)
+        taux_cotisations = config['cotisations'] * (1 - self.pack.TAUX_REDUCTION_ACRE) if acre else config['cotisations']
+        return {
+            'cotisations': taux_cotisations,
+            'revenu_imposable': 1 - config['abattement'],
+            'versement_pee': 0.0,
+            'is': 0.0,
+            'is_holding': 0.0,
+            'flat_tax': 0.0,
+        }
+
     def get_range_remuneration(self, pas=5000):
         """Pour micro-entreprise, on optimise sur le CA fixé (pas de plage)"""
         return [self.resultat_initial]  # CA fixé
@@ -112,6 +164,12 @@ class Microentreprise(OptimisationFiscale):
         """Pour micro-entreprise, optimise sur net_final"""
         return scenario.get('net_final', 0)
     
+    def metrique_vectorisee(self, colonnes):
+        return colonnes['net_final']
+
     def is_scenario_valid(self, scenario):
         """Pour micro-entreprise, vérifie qu'il n'y a pas d'erreur"""
-        return 'erreur' not in scenario
\ No newline at end of file
+        return 'erreur' not in scenario
+
+    def masque_valide_vectorise(self, colonnes):
+        return np.ones(colonnes['net_final'].shape, dtype=bool)
\ No newline at end of file
@@ -2,17 +2,19 @@
 Optimisation fiscale pour la SARL
 """
 
-from fiscal_base import OptimisationFiscale
-from parametres_fiscaux import *
+import numpy as np
+from fiscal_base import OptimisationFiscale, pourcentage_vectorise
+from parametres_fiscaux import (get_optimisations_disponibles, calculer_cotisations_tns, calculer_cotisations_tns_vectorise,
+                                derivee_cotisations_tns_vectorisee)
 
 
 class SARL(OptimisationFiscale):
     """Optimisation pour SARL seule (sans holding)"""
     
     def __init__(self, resultat_avant_remuneration=300000, charges_existantes=50000, parts_fiscales=1,
-                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None):
+                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None, pack_fiscal=None):
         super().__init__(resultat_avant_remuneration, charges_existantes, parts_fiscales,
-                         per_max, madelin_max, girardin_max, plafond_per_disponible)
+                         per_max, madelin_max, girardin_max, plafond_per_disponible, pack_fiscal)
     
     def get_nom_forme_juridique(self):
         return "SARL"
@@ -20,11 +22,15 @@ class SARL(OptimisationFiscale):
     def get_optimisations_disponibles(self):
         return get_optimisations_disponibles(self.get_nom_forme_juridique())
     
-    def calculer_cotisations_tns(self, remuneration_brute):
+    def calculer_cotisations_tns(self, remuneration_brute, details=True):
         """Calcule les cotisations TNS"""
-        return calculer_cotisations_tns(remuneration_brute)
+        return calculer_cotisations_tns(remuneration_brute, details, self.pack)
+
+    def calculer_cotisations_tns_vectorise(self, remunerations_brutes):
+        """Calcule les cotisations TNS pour un tableau de rémunérations (totaux, matrice par ligne)"""
+        return calculer_cotisations_tns_vectorise(remunerations_brutes, self.pack)
     
-    def calculer_scenario_base(self, remuneration_gerance, madelin_montant=0, versement_pee=0, **kwargs):
+    def calculer_scenario_base(self, remuneration_gerance, madelin_montant=0, versement_pee=0, details=True, **kwargs):
         """Calcule un scénario SARL"""
         resultats = {'forme_juridique': 'SARL'}
 
@@ -34,32 +40,32 @@ class SARL(OptimisationFiscale):
         cout_abondement = pee_resultats['cout_abondement_pee']
 
         # 1. Cotisations TNS
-        cotisations_tns, detail_cotisations = self.calculer_cotisations_tns(remuneration_gerance)
+        cotisations_tns, detail_cotisations = self.calculer_cotisations_tns(remuneration_gerance, details)
         resultats['remuneration_brute'] = remuneration_gerance
         resultats['cotisations_tns'] = cotisations_tns
         resultats['cotisations_detail'] = detail_cotisations
         resultats['remuneration_nette_avant_ir'] = remuneration_gerance
         
         # 2. Revenu imposable (avant PER)
-        abattement = min(remuneration_gerance * ABATTEMENT_FRAIS_PRO, PLAFOND_ABATTEMENT_FRAIS_PRO)
+        abattement = min(remuneration_gerance * self.pack.ABATTEMENT_FRAIS_PRO, self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO)
         revenu_imposable = remuneration_gerance - abattement
         resultats['abattement_frais_pro'] = abattement
         resultats['revenu_imposable'] = revenu_imposable  # Pour PER dans la base
         
         # 3. IR de base (sans PER/Girardin - sera recalculé dans la base)
-        ir_base, ir_detail = self.calculer_ir(revenu_imposable)
+        ir_base, ir_detail = self.calculer_ir(revenu_imposable, details)
         resultats['ir_base'] = ir_base
         resultats['ir_detail'] = ir_detail
         resultats['remuneration_nette_avant_ir'] = remuneration_gerance
         
         # 4. Madelin Retraite (charge déductible du résultat avant rémunération)
-        madelin_charge = min(madelin_montant, PLAFOND_MADELIN_TNS)
+        madelin_charge = min(madelin_montant, self.pack.PLAFOND_MADELIN_TNS)
         resultat_apres_remuneration = self.resultat_avant_remuneration - madelin_charge - remuneration_gerance - cotisations_tns - cout_abondement
         resultats['madelin_charge'] = madelin_charge
         resultats['resultat_apres_remuneration'] = resultat_apres_remuneration
         
         # 5. IS
-        is_total, is_detail = self.calculer_is(resultat_apres_remuneration)
+        is_total, is_detail = self.calculer_is(resultat_apres_remuneration, details)
         resultats['is_total'] = is_total
         resultats['is_sarl'] = is_total  # Alias pour compatibilité avec l'interface
         resultats['is_detail'] = is_detail
@@ -71,7 +77,7 @@ class SARL(OptimisationFiscale):
 
         # 7. Imposition dividendes - TOUJOURS flat tax (30%)
         # La flat tax (30%) = 12.8% IR + 17.2% prélèvements sociaux
-        flat_tax = dividendes_bruts * TAUX_FLAT_TAX
+        flat_tax = dividendes_bruts * self.pack.TAUX_FLAT_TAX
         dividendes_nets = dividendes_bruts - flat_tax
 
         resultats['option_fiscale'] = 'flat_tax'
@@ -95,7 +101,7 @@ class SARL(OptimisationFiscale):
         resultats['taux_prelevement_dividendes'] = taux_prelevement_dividendes
 
         # Économies totales = Madelin + PEE
-        economie_madelin = madelin_charge * TAUX_ECONOMIE_IS_MADELIN
+        economie_madelin = madelin_charge * self.pack.TAUX_ECONOMIE_IS_MADELIN
         economie_pee_is = resultats['economie_is_abondement']
 
         resultats['optimisations'] = {
@@ -116,7 +122,90 @@ class SARL(OptimisationFiscale):
         
         return resultats
     
+    def calculer_base_vectorisee(self, remunerations_gerance, madelin_montant=0, versement_pee=0, **kwargs):
+        """Calcule les colonnes du scénario SARL pour un tableau de rémunérations"""
+        remunerations_gerance = np.asarray(remunerations_gerance, dtype=float)
+        pee = self.calculer_pee_vectorise(remunerations_gerance, versement_pee)
+
+        cotisations_tns, _ = self.calculer_cotisations_tns_vectorise(remunerations_gerance)
+
+        abattement = np.minimum(remunerations_gerance * self.pack.ABATTEMENT_FRAIS_PRO, self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO)
+        revenu_imposable = remunerations_gerance - abattement
+        ir_base = self.calculer_ir_vectorise(revenu_imposable)
+
+        madelin_charge = min(madelin_montant, self.pack.PLAFOND_MADELIN_TNS)
+        resultat_apres_remuneration = (self.resultat_avant_remuneration - madelin_charge - remunerations_gerance
+                                       - cotisations_tns - pee['cout_abondement_pee'])
+        is_total = self.calculer_is_vectorise(resultat_apres_remuneration)
+
+        dividendes_bruts = resultat_apres_remuneration - is_total
+        flat_tax = dividendes_bruts * self.pack.TAUX_FLAT_TAX
+
+        return {
+            'remuneration_brute': remunerations_gerance,
+            'cotisations_tns': cotisations_tns,
+            'remuneration_nette_avant_ir': remunerations_gerance,
+            'abattement_frais_pro': abattement,
+            'revenu_imposable': revenu_imposable,
+            'ir_base': ir_base,
+            'madelin_charge': np.full(remunerations_gerance.shape, float(madelin_charge)),
+            'resultat_apres_remuneration': resultat_apres_remuneration,
+            'is_sarl': is_total,
+            'dividendes_sarl': dividendes_bruts,
+            'flat_tax': flat_tax,
+            'dividendes_nets': dividendes_bruts - flat_tax,
+            'taux_prelevement_dividendes': pourcentage_vectorise(is_total + flat_tax, resultat_apres_remuneration),
+            'taux_prelevement_global': pourcentage_vectorise(cotisations_tns + ir_base + is_total + flat_tax,
+                                                             self.resultat_initial),
+            **pee,
+            'economies_base': madelin_charge * self.pack.TAUX_ECONOMIE_IS_MADELIN + pee['economie_is_abondement']
+        }
+
+    def derivees_base_vectorisees(self, colonnes, versement_pee=0, **kwargs):
+        """Dérivées des prélèvements SARL par rapport à la rémunération de gérance"""
+        remunerations_gerance = colonnes['remuneration_brute']
+        derivee_versement, derivee_cout_abondement = self.derivee_pee_vectorisee(remunerations_gerance, versement_pee)
+        derivee_cotisations = derivee_cotisations_tns_vectorisee(remunerations_gerance, self.pack)
+
+        # Abattement 10% jusqu'à son plafond, puis revenu imposable = rémunération
+        derivee_revenu = np.where(remunerations_gerance * self.pack.ABATTEMENT_FRAIS_PRO < self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO,
+                                  1 - self.pack.ABATTEMENT_FRAIS_PRO, 1.0)
+
+        derivee_resultat = -1 - derivee_cotisations - derivee_cout_abondement
+        derivee_is = self.taux_marginal_is_vectorise(colonnes['resultat_apres_remuneration']) * derivee_resultat
+
+        return {
+            'cotisations': derivee_cotisations,
+            'revenu_imposable': derivee_revenu,
+            'versement_pee': derivee_versement,
+            'is': derivee_is,
+            'is_holding': 0.0,
+            'flat_tax': (derivee_resultat - derivee_is) * self.pack.TAUX_FLAT_TAX,
+        }
+
+    def get_points_rupture(self, **kwargs):
+        """Plafond de l'abattement frais pro, plafond retraite de base et rampe des allocations familiales"""
+        return super().get_points_rupture(**kwargs) + [
+            self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO / self.pack.ABATTEMENT_FRAIS_PRO,
+            self.pack.PLAFOND_RETRAITE_BASE / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS,
+            self.pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS,
+            self.pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS
+        ]
+
+    def get_seuils_rupture(self, **kwargs):
+        return super().get_seuils_rupture(**kwargs) + [
+            self.get_seuils_is('resultat_apres_remuneration')
+        ]
+
+    def get_intervalles_non_lineaires(self, **kwargs):
+        """Taux progressif des allocations familiales : cotisations quadratiques entre 1 et 1.4 PASS"""
+        return [(self.pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS,
+                 self.pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS)]
+
     def is_scenario_valid(self, scenario):
         """Pour SARL, vérifie que les dividendes et flat_tax ne sont pas négatifs"""
         return scenario.get('flat_tax', -1) >= 0 and scenario.get('dividendes_nets', -1) >= 0
+
+    def masque_valide_vectorise(self, colonnes):
+        return (colonnes['flat_tax'] >= 0) & (colonnes['dividendes_nets'] >= 0)
     
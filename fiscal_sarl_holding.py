@@ -2,17 +2,19 @@
 Optimisation fiscale pour la SARL + Holding
 """
 
-from fiscal_base import OptimisationFiscale
-from parametres_fiscaux import *
+import numpy as np
+from fiscal_base import OptimisationFiscale, pourcentage_vectorise
+from parametres_fiscaux import (get_optimisations_disponibles, calculer_cotisations_tns, calculer_cotisations_tns_vectorise,
+                                derivee_cotisations_tns_vectorisee)
 
 
 class SARLHolding(OptimisationFiscale):
     """Optimisation pour SARL + Holding (code existant adapté)"""
     
     def __init__(self, resultat_avant_remuneration=300000, charges_existantes=50000, parts_fiscales=1,
-                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None):
+                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None, pack_fiscal=None):
         super().__init__(resultat_avant_remuneration, charges_existantes, parts_fiscales,
-                         per_max, madelin_max, girardin_max, plafond_per_disponible)
+                         per_max, madelin_max, girardin_max, plafond_per_disponible, pack_fiscal)
     
     def get_nom_forme_juridique(self):
         return "SARL + Holding"
@@ -20,11 +22,15 @@ class SARLHolding(OptimisationFiscale):
     def get_optimisations_disponibles(self):
         return get_optimisations_disponibles(self.get_nom_forme_juridique())
     
-    def calculer_cotisations_tns(self, remuneration_brute):
+    def calculer_cotisations_tns(self, remuneration_brute, details=True):
         """Calcule les cotisations TNS"""
-        return calculer_cotisations_tns(remuneration_brute)
+        return calculer_cotisations_tns(remuneration_brute, details, self.pack)
+
+    def calculer_cotisations_tns_vectorise(self, remunerations_brutes):
+        """Calcule les cotisations TNS pour un tableau de rémunérations (totaux, matrice par ligne)"""
+        return calculer_cotisations_tns_vectorise(remunerations_brutes, self.pack)
     
-    def calculer_scenario_base(self, remuneration_gerance, madelin_montant=0, versement_pee=0, **kwargs):
+    def calculer_scenario_base(self, remuneration_gerance, madelin_montant=0, versement_pee=0, details=True, **kwargs):
         """Calcule un scénario SARL + Holding (reprise du code existant)"""
         resultats = {'forme_juridique': 'SARL + Holding'}
 
@@ -34,28 +40,28 @@ class SARLHolding(OptimisationFiscale):
         cout_abondement = pee_resultats['cout_abondement_pee']
 
         # 1. Calcul des cotisations TNS
-        cotisations_tns, detail_cotisations = self.calculer_cotisations_tns(remuneration_gerance)
+        cotisations_tns, detail_cotisations = self.calculer_cotisations_tns(remuneration_gerance, details)
         resultats['remuneration_brute'] = remuneration_gerance
         resultats['cotisations_tns'] = cotisations_tns
         resultats['cotisations_detail'] = detail_cotisations
         resultats['remuneration_nette_avant_ir'] = remuneration_gerance
         
         # 2. Calcul du revenu imposable (après abattement 10%, avant PER)
-        abattement = min(resultats['remuneration_nette_avant_ir'] * ABATTEMENT_FRAIS_PRO, 
-                         PLAFOND_ABATTEMENT_FRAIS_PRO)
+        abattement = min(resultats['remuneration_nette_avant_ir'] * self.pack.ABATTEMENT_FRAIS_PRO, 
+                         self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO)
         revenu_imposable = resultats['remuneration_nette_avant_ir'] - abattement
         resultats['abattement_frais_pro'] = abattement
         resultats['revenu_imposable'] = revenu_imposable  # Pour PER dans la base
         
         # 3. IR de base (sans PER/Girardin - sera recalculé dans la base)
-        ir_base, ir_detail = self.calculer_ir(revenu_imposable)
+        ir_base, ir_detail = self.calculer_ir(revenu_imposable, details)
         resultats['ir_base'] = ir_base
         resultats['ir_detail'] = ir_detail
         resultats['madelin_deduction'] = 0  # Madelin Retraite n'est plus une déduction personnelle
 
         # 4. Calcul du résultat après rémunération et charges Madelin Retraite + PEE
         # Madelin Retraite TNS : charge déductible de la SARL (limité au plafond)
-        madelin_charge = min(madelin_montant, PLAFOND_MADELIN_TNS)
+        madelin_charge = min(madelin_montant, self.pack.PLAFOND_MADELIN_TNS)
         resultat_apres_remuneration = self.resultat_avant_remuneration - remuneration_gerance - cotisations_tns - madelin_charge - cout_abondement
         resultats['resultat_apres_remuneration'] = resultat_apres_remuneration
         resultats['madelin_charge'] = madelin_charge
@@ -73,7 +79,7 @@ class SARLHolding(OptimisationFiscale):
         }
         
         # 5. Calcul de l'IS
-        is_total, detail_is = self.calculer_is(resultat_apres_remuneration)
+        is_total, detail_is = self.calculer_is(resultat_apres_remuneration, details)
         resultats['is_sarl'] = is_total
         resultats['is_detail'] = detail_is
         
@@ -82,9 +88,9 @@ class SARLHolding(OptimisationFiscale):
         resultats['dividendes_sarl'] = dividendes_sarl
         
         # 7. Remontée à la holding (régime mère-fille)
-        quote_part_imposable = dividendes_sarl * (1 - TAUX_EXONERATION_MERE_FILLE)
+        quote_part_imposable = dividendes_sarl * (1 - self.pack.TAUX_EXONERATION_MERE_FILLE)
         # L'IS holding est progressif (15% jusqu'à 42,500€, puis 25%)
-        is_holding, detail_is_holding = self.calculer_is(quote_part_imposable)
+        is_holding, detail_is_holding = self.calculer_is(quote_part_imposable, details)
         dividendes_holding = dividendes_sarl - is_holding
 
         resultats['quote_part_imposable'] = quote_part_imposable
@@ -93,7 +99,7 @@ class SARLHolding(OptimisationFiscale):
         resultats['dividendes_holding'] = dividendes_holding
         
         # 8. Distribution finale et flat tax
-        flat_tax = dividendes_holding * TAUX_FLAT_TAX
+        flat_tax = dividendes_holding * self.pack.TAUX_FLAT_TAX
         dividendes_nets = dividendes_holding - flat_tax
         
         resultats['flat_tax'] = flat_tax
@@ -124,6 +130,105 @@ class SARLHolding(OptimisationFiscale):
         
         return resultats
     
+    def calculer_base_vectorisee(self, remunerations_gerance, madelin_montant=0, versement_pee=0, **kwargs):
+        """Calcule les colonnes du scénario SARL + Holding pour un tableau de rémunérations"""
+        remunerations_gerance = np.asarray(remunerations_gerance, dtype=float)
+        pee = self.calculer_pee_vectorise(remunerations_gerance, versement_pee)
+
+        cotisations_tns, _ = self.calculer_cotisations_tns_vectorise(remunerations_gerance)
+
+        abattement = np.minimum(remunerations_gerance * self.pack.ABATTEMENT_FRAIS_PRO, self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO)
+        revenu_imposable = remunerations_gerance - abattement
+        ir_base = self.calculer_ir_vectorise(revenu_imposable)
+
+        madelin_charge = min(madelin_montant, self.pack.PLAFOND_MADELIN_TNS)
+        resultat_apres_remuneration = (self.resultat_avant_remuneration - remunerations_gerance - cotisations_tns
+                                       - madelin_charge - pee['cout_abondement_pee'])
+        is_total = self.calculer_is_vectorise(resultat_apres_remuneration)
+        dividendes_sarl = resultat_apres_remuneration - is_total
+
+        # Remontée à la holding (régime mère-fille) puis distribution finale
+        quote_part_imposable = dividendes_sarl * (1 - self.pack.TAUX_EXONERATION_MERE_FILLE)
+        is_holding = self.calculer_is_vectorise(quote_part_imposable)
+        dividendes_holding = dividendes_sarl - is_holding
+        flat_tax = dividendes_holding * self.pack.TAUX_FLAT_TAX
+
+        prelevements_dividendes = is_total + is_holding + flat_tax
+
+        return {
+            'remuneration_brute': remunerations_gerance,
+            'cotisations_tns': cotisations_tns,
+            'remuneration_nette_avant_ir': remunerations_gerance,
+            'abattement_frais_pro': abattement,
+            'revenu_imposable': revenu_imposable,
+            'ir_base': ir_base,
+            'madelin_charge': np.full(remunerations_gerance.shape, float(madelin_charge)),
+            'resultat_apres_remuneration': resultat_apres_remuneration,
+            'is_sarl': is_total,
+            'dividendes_sarl': dividendes_sarl,
+            'quote_part_imposable': quote_part_imposable,
+            'is_holding': is_holding,
+            'dividendes_holding': dividendes_holding,
+            'flat_tax': flat_tax,
+            'dividendes_nets': dividendes_holding - flat_tax,
+            'prelevements_dividendes': prelevements_dividendes,
+            'taux_prelevement_dividendes': pourcentage_vectorise(prelevements_dividendes, resultat_apres_remuneration),
+            'taux_prelevement_global': pourcentage_vectorise(cotisations_tns + ir_base + prelevements_dividendes,
+                                                             self.resultat_initial),
+            **pee,
+            'economies_base': madelin_charge * 0.25 + pee['economie_is_abondement']
+        }
+
+    def derivees_base_vectorisees(self, colonnes, versement_pee=0, **kwargs):
+        """Dérivées des prélèvements SARL + Holding par rapport à la rémunération de gérance"""
+        remunerations_gerance = colonnes['remuneration_brute']
+        derivee_versement, derivee_cout_abondement = self.derivee_pee_vectorisee(remunerations_gerance, versement_pee)
+        derivee_cotisations = derivee_cotisations_tns_vectorisee(remunerations_gerance, self.pack)
+
+        # Abattement 10% jusqu'à son plafond, puis revenu imposable = rémunération
+        derivee_revenu = np.where(remunerations_gerance * self.pack.ABATTEMENT_FRAIS_PRO < self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO,
+                                  1 - self.pack.ABATTEMENT_FRAIS_PRO, 1.0)
+
+        derivee_resultat = -1 - derivee_cotisations - derivee_cout_abondement
+        derivee_is = self.taux_marginal_is_vectorise(colonnes['resultat_apres_remuneration']) * derivee_resultat
+        derivee_dividendes_sarl = derivee_resultat - derivee_is
+
+        # Quote-part de frais et charges (5%) soumise à l'IS de la holding
+        derivee_is_holding = (self.taux_marginal_is_vectorise(colonnes['quote_part_imposable'])
+                              * derivee_dividendes_sarl * (1 - self.pack.TAUX_EXONERATION_MERE_FILLE))
+
+        return {
+            'cotisations': derivee_cotisations,
+            'revenu_imposable': derivee_revenu,
+            'versement_pee': derivee_versement,
+            'is': derivee_is,
+            'is_holding': derivee_is_holding,
+            'flat_tax': (derivee_dividendes_sarl - derivee_is_holding) * self.pack.TAUX_FLAT_TAX,
+        }
+
+    def get_points_rupture(self, **kwargs):
+        """Plafond de l'abattement frais pro, plafond retraite de base et rampe des allocations familiales"""
+        return super().get_points_rupture(**kwargs) + [
+            self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO / self.pack.ABATTEMENT_FRAIS_PRO,
+            self.pack.PLAFOND_RETRAITE_BASE / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS,
+            self.pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS,
+            self.pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS
+        ]
+
+    def get_seuils_rupture(self, **kwargs):
+        return super().get_seuils_rupture(**kwargs) + [
+            self.get_seuils_is('resultat_apres_remuneration'),
+            self.get_seuils_is('quote_part_imposable')
+        ]
+
+    def get_intervalles_non_lineaires(self, **kwargs):
+        """Taux progressif des allocations familiales : cotisations quadratiques entre 1 et 1.4 PASS"""
+        return [(self.pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS,
+                 self.pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN / self.pack.TAUX_ASSIETTE_COTISATIONS_TNS)]
+
     def is_scenario_valid(self, scenario):
         """Pour SARL + Holding, vérifie que les dividendes ne sont pas négatifs"""
-        return scenario.get('flat_tax', -1) >= 0
\ No newline at end of file
+        return scenario.get('flat_tax', -1) >= 0
+
+    def masque_valide_vectorise(self, colonnes):
+        return colonnes['flat_tax'] >= 0
\ No newline at end of file
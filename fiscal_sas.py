@@ -2,17 +2,18 @@
 Optimisation fiscale pour la SAS
 """
 
-from fiscal_base import OptimisationFiscale
-from parametres_fiscaux import *
+import numpy as np
+from fiscal_base import OptimisationFiscale, pourcentage_vectorise
+from parametres_fiscaux import get_optimisations_disponibles
 
 
 class SAS(OptimisationFiscale):
     """Optimisation pour SAS (dirigeant assimilé salarié)"""
     
     def __init__(self, resultat_avant_remuneration=300000, charges_existantes=50000, parts_fiscales=1,
-                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None):
+                 per_max=None, madelin_max=None, girardin_max=None, plafond_per_disponible=None, pack_fiscal=None):
         super().__init__(resultat_avant_remuneration, charges_existantes, parts_fiscales,
-                         per_max, madelin_max, girardin_max, plafond_per_disponible)
+                         per_max, madelin_max, girardin_max, plafond_per_disponible, pack_fiscal)
     
     def get_nom_forme_juridique(self):
         return "SAS"
@@ -20,7 +21,7 @@ class SAS(OptimisationFiscale):
     def get_optimisations_disponibles(self):
         return get_optimisations_disponibles('SAS')
     
-    def calculer_scenario_base(self, salaire_brut, versement_pee=0, **kwargs):
+    def calculer_scenario_base(self, salaire_brut, versement_pee=0, details=True, **kwargs):
         """Calcule un scénario SAS"""
         resultats = {'forme_juridique': 'SAS'}
 
@@ -33,8 +34,8 @@ class SAS(OptimisationFiscale):
         cout_abondement = pee_resultats['cout_abondement_pee']
         
         # Cotisations
-        cotisations_salariales = salaire_brut * TAUX_COTISATIONS_SALARIE
-        cotisations_patronales = salaire_brut * TAUX_COTISATIONS_PATRONALES
+        cotisations_salariales = salaire_brut * self.pack.TAUX_COTISATIONS_SALARIE
+        cotisations_patronales = salaire_brut * self.pack.TAUX_COTISATIONS_PATRONALES
         cout_total_salaire = salaire_brut + cotisations_patronales
         
         resultats['cotisations_salariales'] = cotisations_salariales
@@ -46,13 +47,13 @@ class SAS(OptimisationFiscale):
         resultats['remuneration_nette_avant_ir'] = remuneration_nette_avant_ir
         
         # Revenu imposable avec abattement 10% (avant PER)
-        abattement = min(remuneration_nette_avant_ir * ABATTEMENT_FRAIS_PRO, PLAFOND_ABATTEMENT_FRAIS_PRO)
+        abattement = min(remuneration_nette_avant_ir * self.pack.ABATTEMENT_FRAIS_PRO, self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO)
         revenu_imposable = remuneration_nette_avant_ir - abattement
         resultats['abattement_frais_pro'] = abattement
         resultats['revenu_imposable'] = revenu_imposable  # Pour PER dans la base
         
         # IR de base (sans PER/Girardin - sera recalculé dans la base)
-        ir_base, ir_detail = self.calculer_ir(revenu_imposable)
+        ir_base, ir_detail = self.calculer_ir(revenu_imposable, details)
         resultats['ir_base'] = ir_base
         resultats['ir_detail'] = ir_detail
         
@@ -64,7 +65,7 @@ class SAS(OptimisationFiscale):
         resultats['resultat_apres_remuneration'] = resultat_apres_remuneration
 
         # IS
-        is_total, is_detail = self.calculer_is(resultat_apres_remuneration)
+        is_total, is_detail = self.calculer_is(resultat_apres_remuneration, details)
         resultats['is_total'] = is_total
         resultats['is_sarl'] = is_total  # Alias pour compatibilité avec l'interface
         resultats['is_detail'] = is_detail
@@ -75,7 +76,7 @@ class SAS(OptimisationFiscale):
         resultats['dividendes_sarl'] = dividendes_bruts  # Alias pour compatibilité
         
         # Flat tax sur dividendes
-        flat_tax = dividendes_bruts * TAUX_FLAT_TAX
+        flat_tax = dividendes_bruts * self.pack.TAUX_FLAT_TAX
         dividendes_nets = dividendes_bruts - flat_tax
         resultats['flat_tax'] = flat_tax
         resultats['dividendes_nets'] = dividendes_nets
@@ -112,8 +113,80 @@ class SAS(OptimisationFiscale):
         
         return resultats
     
+    def calculer_base_vectorisee(self, salaires_bruts, versement_pee=0, **kwargs):
+        """Calcule les colonnes du scénario SAS pour un tableau de salaires bruts"""
+        salaires_bruts = np.asarray(salaires_bruts, dtype=float)
+        pee = self.calculer_pee_vectorise(salaires_bruts, versement_pee)
+
+        cotisations_salariales = salaires_bruts * self.pack.TAUX_COTISATIONS_SALARIE
+        cotisations_patronales = salaires_bruts * self.pack.TAUX_COTISATIONS_PATRONALES
+        cout_total_salaire = salaires_bruts + cotisations_patronales
+        remuneration_nette_avant_ir = salaires_bruts - cotisations_salariales
+
+        abattement = np.minimum(remuneration_nette_avant_ir * self.pack.ABATTEMENT_FRAIS_PRO, self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO)
+        revenu_imposable = remuneration_nette_avant_ir - abattement
+        ir_base = self.calculer_ir_vectorise(revenu_imposable)
+
+        resultat_apres_remuneration = self.resultat_avant_remuneration - cout_total_salaire - pee['cout_abondement_pee']
+        is_total = self.calculer_is_vectorise(resultat_apres_remuneration)
+        dividendes_bruts = resultat_apres_remuneration - is_total
+        flat_tax = dividendes_bruts * self.pack.TAUX_FLAT_TAX
+
+        return {
+            'remuneration_brute': salaires_bruts,
+            'cotisations_salariales': cotisations_salariales,
+            'cotisations_patronales': cotisations_patronales,
+            'cout_total_salaire': cout_total_salaire,
+            'remuneration_nette_avant_ir': remuneration_nette_avant_ir,
+            'abattement_frais_pro': abattement,
+            'revenu_imposable': revenu_imposable,
+            'ir_base': ir_base,
+            'madelin_charge': np.zeros(salaires_bruts.shape),
+            'resultat_apres_remuneration': resultat_apres_remuneration,
+            'is_sarl': is_total,
+            'dividendes_sarl': dividendes_bruts,
+            'flat_tax': flat_tax,
+            'dividendes_nets': dividendes_bruts - flat_tax,
+            'taux_prelevement_dividendes': pourcentage_vectorise(is_total + flat_tax, resultat_apres_remuneration),
+            'taux_prelevement_global': pourcentage_vectorise(
+                cotisations_salariales + cotisations_patronales + ir_base + is_total + flat_tax, self.resultat_initial),
+            **pee,
+            'economies_base': pee['economie_is_abondement']
+        }
+
+    def derivees_base_vectorisees(self, colonnes, versement_pee=0, **kwargs):
+        """Dérivées des prélèvements SAS par rapport au salaire brut"""
+        salaires_bruts = colonnes['remuneration_brute']
+        derivee_versement, derivee_cout_abondement = self.derivee_pee_vectorisee(salaires_bruts, versement_pee)
+
+        # Abattement 10% du salaire net jusqu'à son plafond
+        derivee_revenu = (1 - self.pack.TAUX_COTISATIONS_SALARIE) * np.where(
+            colonnes['remuneration_nette_avant_ir'] * self.pack.ABATTEMENT_FRAIS_PRO < self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO,
+            1 - self.pack.ABATTEMENT_FRAIS_PRO, 1.0)
+
+        derivee_resultat = -1 - self.pack.TAUX_COTISATIONS_PATRONALES - derivee_cout_abondement
+        derivee_is = self.taux_marginal_is_vectorise(colonnes['resultat_apres_remuneration']) * derivee_resultat
+
+        return {
+            'cotisations': self.pack.TAUX_COTISATIONS_SALARIE + self.pack.TAUX_COTISATIONS_PATRONALES,
+            'revenu_imposable': derivee_revenu,
+            'versement_pee': derivee_versement,
+            'is': derivee_is,
+            'is_holding': 0.0,
+            'flat_tax': (derivee_resultat - derivee_is) * self.pack.TAUX_FLAT_TAX,
+        }
+
+    def get_points_rupture(self, **kwargs):
+        """Plafond de l'abattement frais pro (appliqué au salaire net avant IR)"""
+        return super().get_points_rupture(**kwargs) + [
+            self.pack.PLAFOND_ABATTEMENT_FRAIS_PRO / (self.pack.ABATTEMENT_FRAIS_PRO * (1 - self.pack.TAUX_COTISATIONS_SALARIE))
+        ]
+
+    def get_seuils_rupture(self, **kwargs):
+        return super().get_seuils_rupture(**kwargs) + [self.get_seuils_is('resultat_apres_remuneration')]
+
     def get_range_remuneration(self, pas=5000):
         """Pour SAS, limite le salaire brut maximum selon les cotisations patronales"""
-        cout_par_euro_salaire = 1 + TAUX_COTISATIONS_PATRONALES
+        cout_par_euro_salaire = 1 + self.pack.TAUX_COTISATIONS_PATRONALES
         salaire_brut_max = int(self.resultat_avant_remuneration / cout_par_euro_salaire)
         return range(0, salaire_brut_max + 1, pas)
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Résultats d'optimisation en colonnes NumPy (struct-of-arrays)
+"""
+
+import numpy as np
+
+
+# Les dictionnaires de scénarios exposent plusieurs clés pour une même valeur :
+# la grille ne stocke que la colonne canonique et résout les alias à la lecture
+ALIAS_COLONNES = {
+    'salaire_brut': 'remuneration_brute',
+    'chiffre_affaires': 'remuneration_brute',
+    'is_total': 'is_sarl',
+    'dividendes_bruts': 'dividendes_sarl',
+    'ir': 'ir_final',
+    'ir_remuneration': 'ir_final',
+}
+
+
+class ScenarioGrid:
+    """Ensemble de scénarios stockés colonne par colonne
+
+    Chaque métrique est un tableau NumPy aligné sur `remunerations`. Les
+    dictionnaires historiques (avec ir_detail, is_detail, optimisations...)
+    ne sont reconstruits qu'à la demande, ligne par ligne, via
+    optimiseur.calculer_scenario() avec les mêmes paramètres.
+    """
+
+    def __init__(self, optimiseur, remunerations, colonnes, scenario_kwargs=None):
+        self.optimiseur = optimiseur
+        self.remunerations = np.asarray(remunerations)
+        self.colonnes = colonnes
+        self.scenario_kwargs = dict(scenario_kwargs or {})
+
+    def __len__(self):
+        return len(self.remunerations)
+
+    def __getitem__(self, index):
+        """Matérialise la ligne `index` en dictionnaire de scénario complet"""
+        return self.ligne(index)
+
+    def ligne(self, index, details=True):
+        """Matérialise la ligne `index` (sans ir_detail, is_detail... si details=False)"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Indice {index} hors de la grille ({len(self)} scénarios)")
+        return self.optimiseur.calculer_scenario(self.remunerations[index].item(), details=details,
+                                                 **self.scenario_kwargs)
+
+    def __iter__(self):
+        """Itère paresseusement sur les dictionnaires de scénarios"""
+        for index in range(len(self)):
+            yield self[index]
+
+    def __contains__(self, nom):
+        return ALIAS_COLONNES.get(nom, nom) in self.colonnes
+
+    def colonne(self, nom, defaut=0.0):
+        """Retourne la colonne `nom` (ou son alias), remplie par `defaut` si elle n'existe pas"""
+        nom = ALIAS_COLONNES.get(nom, nom)
+        if nom in self.colonnes:
+            return self.colonnes[nom]
+        return np.full(len(self), defaut, dtype=float)
+
+    def taux_marginal(self):
+        """Taux marginal effectif (%) de chaque ligne, par composante (voir taux_marginal_vectorise())"""
+        return self.optimiseur.taux_marginal_vectorise(self.colonnes, **self.scenario_kwargs)
+
+    def indice_optimal(self, metrique='total_net'):
+        """Indice de la ligne qui maximise la colonne `metrique` (premier en cas d'égalité)"""
+        return int(np.argmax(self.colonne(metrique)))
+
+    @property
+    def nbytes(self):
+        """Mémoire occupée par les colonnes (en octets)"""
+        return self.remunerations.nbytes + sum(valeurs.nbytes for valeurs in self.colonnes.values())
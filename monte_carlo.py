@@ -0,0 +1,129 @@
+"""
+Mode Monte Carlo : rémunération choisie avant de connaître le résultat et les charges de l'année
+"""
+
+import numpy as np
+
+from formes_juridiques import creer_optimiseur
+
+# Lois acceptées pour le résultat et les charges, avec leurs paramètres
+LOIS_TIRAGE = {
+    'normale': ('moyenne', 'ecart_type'),
+    'lognormale': ('moyenne', 'ecart_type'),
+    'uniforme': ('min', 'max'),
+    'triangulaire': ('min', 'mode', 'max'),
+}
+
+
+def tirer_echantillons(loi, nb_tirages, generateur):
+    """Tire `nb_tirages` valeurs selon une loi
+
+    `loi` est un nombre (valeur certaine), un tableau de valeurs déjà tirées
+    (de longueur nb_tirages, par exemple corrélées avec une autre grandeur) ou
+    un dictionnaire {'loi': nom, paramètres} ; voir LOIS_TIRAGE. La loi
+    lognormale est paramétrée par la moyenne et l'écart-type de la valeur tirée.
+    """
+    if np.ndim(loi) > 0:
+        valeurs = np.asarray(loi, dtype=float)
+        if valeurs.shape != (nb_tirages,):
+            raise ValueError(f"{len(valeurs)} valeurs fournies pour {nb_tirages} tirages")
+        return valeurs
+    if not isinstance(loi, dict):
+        return np.full(nb_tirages, float(loi))
+
+    nom = loi.get('loi')
+    if nom not in LOIS_TIRAGE:
+        raise ValueError(f"Loi de tirage '{nom}' non supportée. Choix disponibles: {list(LOIS_TIRAGE)}")
+    manquants = [parametre for parametre in LOIS_TIRAGE[nom] if parametre not in loi]
+    if manquants:
+        raise ValueError(f"Loi '{nom}' : paramètres manquants {manquants}")
+
+    if nom == 'normale':
+        return generateur.normal(loi['moyenne'], loi['ecart_type'], nb_tirages)
+    if nom == 'lognormale':
+        variance_log = np.log1p((loi['ecart_type'] / loi['moyenne']) ** 2)
+        return generateur.lognormal(np.log(loi['moyenne']) - variance_log / 2, np.sqrt(variance_log), nb_tirages)
+    if nom == 'uniforme':
+        return generateur.uniform(loi['min'], loi['max'], nb_tirages)
+    return generateur.triangular(loi['min'], loi['mode'], loi['max'], nb_tirages)
+
+
+def simuler_monte_carlo(forme_juridique, resultat, charges=0, parts_fiscales=1, plafond_per_disponible=None,
+                        remunerations=None, nb_remunerations=200, nb_tirages=10000, quantiles=(0.05, 0.25, 0.5),
+                        per_montant=0, girardin_montant=0, graine=None, taille_paquet=1000, pack_fiscal=None,
+                        **scenario_kwargs):
+    """Évalue des rémunérations candidates face à des tirages de (résultat, charges)
+
+    Les optimiseurs sont créés avec des tableaux de tirages (forme (n, 1)) :
+    calculer_base_vectorisee() et appliquer_optimisations_vectorisees() les
+    diffusent contre les rémunérations (forme (m,)), avec exactement les
+    formules de calculer_scenario(). Seules les colonnes qui dépendent du
+    résultat (IS, dividendes, flat tax...) sont calculées sur la matrice
+    tirages × rémunérations, par paquets de `taille_paquet` tirages.
+
+    Un déficit (résultat inférieur au coût de la rémunération) est comblé par
+    le dirigeant : la flat tax négative de la formule n'est pas restituée.
+    Pour la micro-entreprise, le CA est le résultat tiré : une seule colonne.
+    `pack_fiscal` : paramètres fiscaux de l'année (voir packs_fiscaux).
+
+    Par défaut les candidats sont `nb_remunerations` rémunérations réparties sur
+    la plage de l'optimiseur pour le résultat et les charges moyens. Retourne :
+    - 'remunerations', 'tirages' ({'resultat', 'charges'})
+    - 'metriques' : matrice tirages × rémunérations de la métrique
+    - 'esperance', 'ecart_type' : métrique de la forme (patrimoine total, net
+      final en micro) par rémunération
+    - 'quantiles' : {q: tableau par rémunération}
+    - 'probabilite_invalide' : part des tirages où le scénario est invalide
+    - 'optimum_esperance', 'optimum_prudent' : {'remuneration', 'esperance',
+      'quantile'}, qui maximisent l'espérance et le plus bas des quantiles
+    """
+    generateur = np.random.default_rng(graine)
+    resultats = tirer_echantillons(resultat, nb_tirages, generateur)
+    charges_tirees = tirer_echantillons(charges, nb_tirages, generateur)
+    micro = forme_juridique == 'Micro-entreprise'
+
+    if micro:
+        remunerations = np.array([resultats.mean()])
+    elif remunerations is None:
+        nominal = creer_optimiseur(forme_juridique, resultat_avant_remuneration=int(round(resultats.mean())),
+                                   charges_existantes=int(round(charges_tirees.mean())), pack_fiscal=pack_fiscal)
+        remuneration_max = nominal.get_range_remuneration(1)[-1]
+        remunerations = np.linspace(0, remuneration_max, nb_remunerations).round()
+    remunerations = np.asarray(remunerations, dtype=float)
+
+    metriques = np.empty((nb_tirages, len(remunerations)))
+    invalides = np.zeros(len(remunerations))
+    for debut in range(0, nb_tirages, taille_paquet):
+        paquet = slice(debut, debut + taille_paquet)
+        optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultats[paquet, None],
+                                      charges_existantes=charges_tirees[paquet, None], parts_fiscales=parts_fiscales,
+                                      plafond_per_disponible=plafond_per_disponible, pack_fiscal=pack_fiscal)
+        colonnes_base = optimiseur.calculer_base_vectorisee(resultats[paquet, None] if micro else remunerations,
+                                                            **scenario_kwargs)
+        colonnes = optimiseur.appliquer_optimisations_vectorisees(colonnes_base, per_montant, girardin_montant)
+
+        metrique = optimiseur.metrique_vectorisee(colonnes)
+        if 'flat_tax' in colonnes:
+            metrique = metrique + np.minimum(colonnes['flat_tax'], 0)
+        metriques[paquet] = metrique
+        invalides += np.broadcast_to(~optimiseur.masque_valide_vectorise(colonnes), metriques[paquet].shape).sum(axis=0)
+
+    quantiles = tuple(sorted(quantiles))
+    valeurs_quantiles = np.quantile(metriques, quantiles, axis=0)
+    esperance = metriques.mean(axis=0)
+
+    def optimum(indice):
+        return {'remuneration': remunerations[indice].item(), 'esperance': esperance[indice].item(),
+                'quantile': valeurs_quantiles[0][indice].item()}
+
+    return {
+        'remunerations': remunerations,
+        'tirages': {'resultat': resultats, 'charges': charges_tirees},
+        'metriques': metriques,
+        'esperance': esperance,
+        'ecart_type': metriques.std(axis=0),
+        'quantiles': dict(zip(quantiles, valeurs_quantiles)),
+        'probabilite_invalide': invalides / nb_tirages,
+        'optimum_esperance': optimum(int(np.argmax(esperance))),
+        'optimum_prudent': optimum(int(np.argmax(valeurs_quantiles[0]))),
+    }
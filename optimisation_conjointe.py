@@ -0,0 +1,218 @@
+"""
+Optimisation conjointe de la rémunération et des enveloppes (PER, Madelin, PEE, Girardin)
+"""
+
+import numpy as np
+
+
+# Métriques optimisées conjointement
+OBJECTIFS_CONJOINTS = ['net_disponible_immediat', 'patrimoine_total']
+
+
+def _grille_enveloppe(maximum, pas):
+    """Montants testés pour une enveloppe : de 0 au maximum (inclus) avec le pas donné"""
+    if maximum <= 0:
+        return np.zeros(1)
+    return np.unique(np.append(np.arange(0, maximum, max(pas, 1), dtype=float), float(maximum)))
+
+
+def _candidats_per(optimiseur, colonnes_base, per_plafond, girardin_plafond):
+    """Montants PER candidats par rémunération (n, p) : bornes et points de rupture de l'IR
+
+    À rémunération fixée, le net dépend du PER de façon linéaire par morceaux :
+    l'optimum est à 0, au plafond ou à un PER qui amène le revenu imposable final
+    sur un seuil du barème IR, sur le seuil d'IR absorbé par le Girardin maximal,
+    ou qui épuise le revenu imposable.
+    """
+    revenu_imposable = colonnes_base['revenu_imposable'][:, None]
+    revenu_sans_pee = revenu_imposable - colonnes_base['versement_pee'][:, None]
+    seuils = np.concatenate((
+        optimiseur.pack.BAREME_IR.seuils * optimiseur.parts_fiscales,
+        np.atleast_1d(optimiseur.revenu_pour_ir_vectorise(girardin_plafond * optimiseur.pack.TAUX_GIRARDIN_INDUSTRIEL))
+    ))
+    candidats = np.concatenate((
+        np.zeros(revenu_imposable.shape),
+        np.full(revenu_imposable.shape, per_plafond),
+        revenu_imposable,
+        revenu_sans_pee - seuils[None, :]
+    ), axis=1)
+    return np.clip(candidats, 0, per_plafond)
+
+
+def _evaluer_enveloppes_personnelles(optimiseur, colonnes_base, per_plafond, girardin_plafond):
+    """Évalue toutes les combinaisons PER × Girardin candidates pour des rémunérations données
+
+    Pour un PER donné, la meilleure réduction Girardin absorbe exactement l'IR
+    (réduction de 110% de l'investissement) dans la limite du plafond : les
+    montants Girardin candidats sont donc 0, le plafond et IR / 110%.
+    Retourne (colonnes de forme (n, p, 3), montants PER, montants Girardin).
+    """
+    per = _candidats_per(optimiseur, colonnes_base, per_plafond, girardin_plafond)[:, :, None]
+    base = {nom: valeurs[:, None, None] for nom, valeurs in colonnes_base.items()}
+
+    ir_avant_girardin = optimiseur.appliquer_optimisations_vectorisees(base, per, 0)['ir_avant_girardin']
+    girardin = np.concatenate((
+        np.zeros(ir_avant_girardin.shape),
+        np.full(ir_avant_girardin.shape, float(girardin_plafond)),
+        np.minimum(ir_avant_girardin / optimiseur.pack.TAUX_GIRARDIN_INDUSTRIEL, girardin_plafond)
+    ), axis=2)
+    per = np.broadcast_to(per, girardin.shape)
+
+    return optimiseur.appliquer_optimisations_vectorisees(base, per, girardin), per, girardin
+
+
+def _cout_ir_minimal(ir, girardin_plafond, taux_girardin):
+    """Coût minimal d'un IR (IR restant + investissement Girardin), Girardin limité à son plafond
+
+    Effacer un euro d'IR coûte 1/110% d'investissement : l'investissement
+    optimal couvre tout l'IR s'il le peut (coût IR / 110%), sinon il vaut le
+    plafond et le reste de l'IR est payé.
+    """
+    reduction_maximale = girardin_plafond * taux_girardin
+    return np.minimum(ir, reduction_maximale) / taux_girardin + np.maximum(0, ir - reduction_maximale)
+
+
+def _bornes_superieures(optimiseur, colonnes_base, per_plafond, girardin_plafond):
+    """Majorants de chaque objectif par rémunération, quels que soient le PER et le Girardin
+
+    L'IR ne peut coûter moins que _cout_ir_minimal() : au mieux IR / 110%
+    lorsque le plafond Girardin permet de l'effacer entièrement.
+    Le PER coûte plus qu'il ne fait économiser d'IR : le net disponible est
+    maximal sans PER, alors que le patrimoine (qui compte le PER) est majoré
+    avec l'IR du revenu diminué du plafond PER et du versement PEE.
+    """
+    taux_girardin = optimiseur.pack.TAUX_GIRARDIN_INDUSTRIEL
+    revenu_imposable = colonnes_base['revenu_imposable']
+    pee_deduction = np.minimum(colonnes_base['versement_pee'], revenu_imposable)
+    net_avant_ir = colonnes_base['remuneration_nette_avant_ir'] + colonnes_base['dividendes_nets']
+
+    ir_sans_per = optimiseur.calculer_ir_vectorise(revenu_imposable - pee_deduction)
+    ir_per_maximal = optimiseur.calculer_ir_vectorise(np.maximum(0, revenu_imposable - per_plafond - pee_deduction))
+    return {
+        'net_disponible_immediat': (net_avant_ir - pee_deduction
+                                    - _cout_ir_minimal(ir_sans_per, girardin_plafond, taux_girardin)),
+        'patrimoine_total': (net_avant_ir + colonnes_base['madelin_charge'] + colonnes_base['abondement_pee']
+                             - _cout_ir_minimal(ir_per_maximal, girardin_plafond, taux_girardin))
+    }
+
+
+def optimiser_conjoint(optimiseur, pas=5000, per_max=None, madelin_max=None, girardin_max=None,
+                       versement_pee_max=None, pas_madelin=1000, pas_pee=250, **kwargs):
+    """Optimise conjointement rémunération × PER × Madelin × PEE × Girardin
+
+    Les montants maximaux sont bornés par les plafonds légaux (plafond PER
+    disponible, PLAFOND_MADELIN_TNS, versement PEE maximal abondé) et les
+    enveloppes absentes de la forme juridique sont fixées à 0. La rémunération,
+    le Madelin et le PEE sont discrétisés (pas, pas_madelin, pas_pee) ; le PER et
+    le Girardin sont résolus exactement par leurs points de rupture.
+
+    Chaque bloc (Madelin, PEE) est d'abord évalué au niveau entreprise sur toute
+    la plage de rémunération, puis les blocs et rémunérations dont le majorant
+    ne dépasse pas le meilleur résultat déjà trouvé sont élagués avant
+    l'évaluation des combinaisons PER × Girardin. La rémunération du meilleur
+    bloc est enfin affinée à l'euro autour de l'optimum.
+
+    Retourne un dictionnaire avec, pour 'net_disponible_immediat' et
+    'patrimoine_total', les montants optimaux et le scénario complet (None sans
+    rémunération possible, charges supérieures au résultat), ainsi que les
+    statistiques de recherche.
+    """
+    optimisations = optimiseur.get_optimisations_disponibles()
+
+    per_plafond = optimiseur.plafond_per_disponible if per_max is None else min(per_max, optimiseur.plafond_per_disponible)
+    girardin_plafond = optimiseur.girardin_max if girardin_max is None else girardin_max
+    plafond_madelin = optimiseur.pack.PLAFOND_MADELIN_TNS
+    madelin_plafond = plafond_madelin if madelin_max is None else min(madelin_max, plafond_madelin)
+    versement_pee_plafond = optimiseur.pack.VERSEMENT_MAX_ABONDE
+    if versement_pee_max is not None:
+        versement_pee_plafond = min(versement_pee_max, versement_pee_plafond)
+
+    per_plafond = float(per_plafond) if 'per' in optimisations else 0.0
+    girardin_plafond = float(girardin_plafond) if 'girardin' in optimisations else 0.0
+    montants_madelin = _grille_enveloppe(madelin_plafond if 'madelin' in optimisations else 0, pas_madelin)
+    versements_pee = _grille_enveloppe(versement_pee_plafond if 'pee' in optimisations else 0, pas_pee)
+
+    plage = optimiseur.get_range_remuneration(1)
+    if not len(plage):
+        return dict({'nb_evaluations': 0, 'nb_blocs': 0, 'nb_blocs_elagues': 0, 'nb_remunerations_elaguees': 0},
+                    **{objectif: None for objectif in OBJECTIFS_CONJOINTS})
+    borne_min, borne_max = int(plage[0]), int(plage[-1])
+    remunerations = np.unique(np.append(np.asarray(list(optimiseur.get_range_remuneration(pas)), dtype=np.int64),
+                                        borne_max))
+
+    # 1. Niveau entreprise pour chaque bloc (Madelin, PEE) et majorants
+    blocs = []
+    for madelin in montants_madelin:
+        for versement_pee in versements_pee:
+            colonnes_base = optimiseur.calculer_base_vectorisee(remunerations, madelin_montant=madelin,
+                                                                versement_pee=versement_pee, **kwargs)
+            bornes = _bornes_superieures(optimiseur, colonnes_base, per_plafond, girardin_plafond)
+            blocs.append((madelin, versement_pee, colonnes_base, bornes))
+    nb_evaluations = len(blocs) * len(remunerations)
+
+    meilleurs = {objectif: {'valeur': -np.inf} for objectif in OBJECTIFS_CONJOINTS}
+    nb_blocs_elagues = 0
+    nb_remunerations_elaguees = 0
+
+    def evaluer_bloc(madelin, versement_pee, remunerations_bloc, colonnes_base):
+        """Évalue PER × Girardin pour des rémunérations d'un bloc et met à jour les meilleurs"""
+        colonnes, per, girardin = _evaluer_enveloppes_personnelles(optimiseur, colonnes_base,
+                                                                   per_plafond, girardin_plafond)
+        valides = np.broadcast_to(optimiseur.masque_valide_vectorise(colonnes), girardin.shape)
+        for objectif in OBJECTIFS_CONJOINTS:
+            valeurs = np.where(valides, np.broadcast_to(colonnes[objectif], girardin.shape), -np.inf)
+            indice = np.unravel_index(int(np.argmax(valeurs)), valeurs.shape)
+            if valeurs[indice] > meilleurs[objectif]['valeur']:
+                meilleurs[objectif] = {
+                    'valeur': float(valeurs[indice]),
+                    'remuneration': int(remunerations_bloc[indice[0]]),
+                    'per': float(per[indice]),
+                    'madelin': float(madelin),
+                    'versement_pee': float(versement_pee),
+                    'girardin': float(girardin[indice]),
+                }
+        return girardin.size
+
+    # 2. Évaluation des blocs par majorant décroissant avec élagage
+    blocs.sort(key=lambda bloc: -max(np.max(bloc[3][objectif]) for objectif in OBJECTIFS_CONJOINTS))
+    for madelin, versement_pee, colonnes_base, bornes in blocs:
+        utiles = np.zeros(len(remunerations), dtype=bool)
+        for objectif in OBJECTIFS_CONJOINTS:
+            utiles |= bornes[objectif] > meilleurs[objectif]['valeur']
+        if not utiles.any():
+            nb_blocs_elagues += 1
+            continue
+        nb_remunerations_elaguees += int(np.count_nonzero(~utiles))
+        nb_evaluations += evaluer_bloc(madelin, versement_pee, remunerations[utiles],
+                                       {nom: valeurs[utiles] for nom, valeurs in colonnes_base.items()})
+
+    # 3. Affinage à l'euro de la rémunération autour de chaque optimum
+    for objectif in OBJECTIFS_CONJOINTS:
+        meilleur = meilleurs[objectif]
+        if 'remuneration' not in meilleur:
+            continue
+        voisines = np.arange(max(borne_min, meilleur['remuneration'] - pas),
+                             min(borne_max, meilleur['remuneration'] + pas) + 1)
+        colonnes_base = optimiseur.calculer_base_vectorisee(voisines, madelin_montant=meilleur['madelin'],
+                                                            versement_pee=meilleur['versement_pee'], **kwargs)
+        nb_evaluations += len(voisines) + evaluer_bloc(meilleur['madelin'], meilleur['versement_pee'],
+                                                       voisines, colonnes_base)
+
+    resultat = {
+        'nb_evaluations': nb_evaluations,
+        'nb_blocs': len(blocs),
+        'nb_blocs_elagues': nb_blocs_elagues,
+        'nb_remunerations_elaguees': nb_remunerations_elaguees,
+    }
+    for objectif in OBJECTIFS_CONJOINTS:
+        meilleur = meilleurs[objectif]
+        if 'remuneration' not in meilleur:
+            resultat[objectif] = None
+            continue
+        meilleur['scenario'] = optimiseur.calculer_scenario(
+            meilleur['remuneration'], per_montant=meilleur['per'], madelin_montant=meilleur['madelin'],
+            versement_pee=meilleur['versement_pee'], girardin_montant=meilleur['girardin'], **kwargs
+        )
+        resultat[objectif] = meilleur
+
+    return resultat
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Optimisation en lot de dossiers clients (CSV) répartie sur plusieurs processus
+"""
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from fiscal_base import STRATEGIES_OPTIMISATION
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+
+# Colonnes du CSV de profils clients et valeurs par défaut (None : obligatoire)
+COLONNES_PROFIL = {
+    'client': None,
+    'forme_juridique': 'all',
+    'resultat': None,
+    'charges': 0,
+    'parts': 1,
+    'plafond_per': None,
+    'per_max': 0,
+    'madelin_max': 0,
+    'girardin_max': 0,
+    'versement_pee': 0,
+    'type_activite': 'BIC - Prestations de services',
+    'annee_fiscale': None,
+}
+
+# Colonnes de la synthèse : une ligne par client et par forme juridique
+COLONNES_SYNTHESE = [
+    'client', 'forme_juridique', 'remuneration_optimale', 'net_disponible_immediat', 'patrimoine_total',
+    'ir', 'is', 'dividendes_nets', 'taux_prelevement_global', 'nb_evaluations'
+]
+
+
+def lire_profils(flux):
+    """Lit les profils clients d'un CSV et retourne la liste des tâches (client × forme juridique)
+
+    La colonne forme_juridique accepte une forme de FORMES_JURIDIQUES ou 'all'
+    (toutes les formes). L'ordre des tâches suit l'ordre du fichier puis celui
+    de FORMES_JURIDIQUES.
+    """
+    taches = []
+    for numero_ligne, ligne in enumerate(csv.DictReader(flux), start=2):
+        profil = {}
+        for colonne, defaut in COLONNES_PROFIL.items():
+            valeur = (ligne.get(colonne) or '').strip()
+            if not valeur:
+                if defaut is None and colonne not in ('plafond_per', 'annee_fiscale'):
+                    raise ValueError(f"Ligne {numero_ligne} : colonne '{colonne}' obligatoire")
+                valeur = defaut
+            profil[colonne] = valeur
+
+        for colonne in ('resultat', 'charges', 'parts', 'plafond_per', 'per_max', 'madelin_max',
+                        'girardin_max', 'versement_pee'):
+            if profil[colonne] is not None:
+                profil[colonne] = float(profil[colonne])
+
+        if profil['forme_juridique'] == 'all':
+            formes = FORMES_JURIDIQUES
+        elif profil['forme_juridique'] in FORMES_JURIDIQUES:
+            formes = [profil['forme_juridique']]
+        else:
+            raise ValueError(f"Ligne {numero_ligne} : forme juridique '{profil['forme_juridique']}' non supportée. "
+                             f"Choix disponibles: {FORMES_JURIDIQUES + ['all']}")
+
+        taches.extend(dict(profil, forme_juridique=forme) for forme in formes)
+    return taches
+
+
+def optimiser_profil(tache, pas=2500, strategie='balayage'):
+    """Optimise un client pour une forme juridique et retourne sa ligne de synthèse"""
+    optimiseur = creer_optimiseur(
+        tache['forme_juridique'],
+        resultat_avant_remuneration=int(tache['resultat']),
+        charges_existantes=int(tache['charges']),
+        parts_fiscales=tache['parts'],
+        plafond_per_disponible=tache['plafond_per'],
+        pack_fiscal=tache['annee_fiscale']
+    )
+    kwargs = {'type_activite': tache['type_activite']} if tache['forme_juridique'] == 'Micro-entreprise' else {}
+    meilleur, _ = optimiseur.optimiser(
+        pas=pas, per_max=tache['per_max'], madelin_max=tache['madelin_max'], girardin_max=tache['girardin_max'],
+        versement_pee=tache['versement_pee'], colonnaire=True, strategie=strategie, **kwargs
+    )
+
+    synthese = dict.fromkeys(COLONNES_SYNTHESE, '')
+    synthese.update({
+        'client': tache['client'],
+        'forme_juridique': tache['forme_juridique'],
+        'nb_evaluations': optimiseur.derniere_optimisation['nb_evaluations'],
+    })
+    if meilleur is not None:
+        synthese.update({
+            'remuneration_optimale': meilleur['remuneration_brute'],
+            'net_disponible_immediat': round(meilleur['net_disponible_immediat'], 2),
+            'patrimoine_total': round(meilleur['patrimoine_total'], 2),
+            'ir': round(meilleur['ir_final'], 2),
+            'is': round(meilleur.get('is_sarl', 0) + meilleur.get('is_holding', 0), 2),
+            'dividendes_nets': round(meilleur.get('dividendes_nets', 0), 2),
+            'taux_prelevement_global': round(meilleur['taux_prelevement_global'], 2),
+        })
+    return synthese
+
+
+def _optimiser_tache(arguments):
+    """Point d'entrée des processus du pool (arguments sérialisables)"""
+    return optimiser_profil(*arguments)
+
+
+def optimiser_lot(taches, pas=2500, strategie='balayage', jobs=None, chunksize=None):
+    """Optimise toutes les tâches et retourne les synthèses dans l'ordre des tâches
+
+    Avec jobs=1 le calcul reste dans le processus courant. Sinon les tâches sont
+    distribuées par paquets de `chunksize` (par défaut environ 4 paquets par
+    processus) sur un ProcessPoolExecutor ; map() conserve l'ordre des tâches.
+    """
+    if strategie not in STRATEGIES_OPTIMISATION:
+        raise ValueError(f"Stratégie d'optimisation '{strategie}' non supportée. Choix disponibles: {STRATEGIES_OPTIMISATION}")
+
+    jobs = jobs or os.cpu_count() or 1
+    arguments = [(tache, pas, strategie) for tache in taches]
+    if jobs == 1 or len(arguments) <= 1:
+        return [_optimiser_tache(argument) for argument in arguments]
+
+    jobs = min(jobs, len(arguments))
+    chunksize = chunksize or max(1, len(arguments) // (4 * jobs))
+    with ProcessPoolExecutor(max_workers=jobs) as executeur:
+        return list(executeur.map(_optimiser_tache, arguments, chunksize=chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimisation fiscale en lot de dossiers clients (CSV)')
+    parser.add_argument('profils',
+                        help=f"CSV des profils clients (colonnes: {', '.join(COLONNES_PROFIL)})")
+    parser.add_argument('--sortie', '-o',
+                        help='Fichier CSV de synthèse (défaut: sortie standard)')
+    parser.add_argument('--pas', type=int, default=2500,
+                        help='Pas de calcul (défaut: 2500)')
+    parser.add_argument('--strategie', choices=STRATEGIES_OPTIMISATION, default='balayage',
+                        help='Stratégie d\'optimisation (défaut: balayage)')
+    parser.add_argument('--jobs', '-j', type=int,
+                        help='Nombre de processus (défaut: nombre de cœurs)')
+    parser.add_argument('--chunksize', type=int,
+                        help='Tâches envoyées par paquet à chaque processus (défaut: automatique)')
+
+    args = parser.parse_args()
+
+    try:
+        with open(args.profils, newline='', encoding='utf-8') as flux:
+            taches = lire_profils(flux)
+    except (OSError, ValueError) as erreur:
+        print(f"Erreur: {erreur}", file=sys.stderr)
+        return 1
+
+    syntheses = optimiser_lot(taches, args.pas, args.strategie, args.jobs, args.chunksize)
+
+    sortie = open(args.sortie, 'w', newline='', encoding='utf-8') if args.sortie else sys.stdout
+    try:
+        writer = csv.DictWriter(sortie, fieldnames=COLONNES_SYNTHESE)
+        writer.writeheader()
+        writer.writerows(syntheses)
+    finally:
+        if args.sortie:
+            sortie.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
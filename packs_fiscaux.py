@@ -0,0 +1,168 @@
+"""
+Packs de paramètres fiscaux versionnés (une année fiscale par fichier de donnees_fiscales/)
+"""
+
+import hashlib
+import json
+import math
+import os
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+from bareme import BaremeCompile
+
+# Répertoire des fichiers de paramètres (un fichier <annee>.json par année fiscale)
+REPERTOIRE_PACKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'donnees_fiscales')
+
+# Années fiscales fournies avec l'application
+PACKS_DISPONIBLES = sorted(os.path.splitext(nom)[0] for nom in os.listdir(REPERTOIRE_PACKS) if nom.endswith('.json'))
+
+# Année fiscale des constantes de parametres_fiscaux et des optimiseurs créés sans pack
+ANNEE_FISCALE_DEFAUT = '2024'
+
+# Packs déjà construits, par empreinte (retrouver un pack à partir d'une clé de cache)
+_PACKS_PAR_EMPREINTE = {}
+
+
+def _figer(valeur):
+    """Copie immuable d'une valeur JSON (dict -> MappingProxyType, liste -> tuple)"""
+    if isinstance(valeur, dict):
+        return MappingProxyType({cle: _figer(sous_valeur) for cle, sous_valeur in valeur.items()})
+    if isinstance(valeur, list):
+        return tuple(_figer(sous_valeur) for sous_valeur in valeur)
+    return valeur
+
+
+def _tranches(tranches):
+    """Tranches du fichier ([limite, taux], limite null pour la dernière) au format TRANCHES_IR"""
+    return tuple(MappingProxyType({'limite': float('inf') if limite is None else limite, 'taux': taux})
+                 for limite, taux in tranches)
+
+
+class PackFiscal:
+    """Paramètres fiscaux d'une année, immuables et hachables
+
+    Les valeurs du fichier sont exposées sous le nom des constantes de
+    parametres_fiscaux (pack.PASS, pack.TAUX_FLAT_TAX...). Les tables dérivées
+    sont calculées une seule fois au chargement : barèmes compilés (BAREME_IR,
+    BAREME_IS), multiples du PASS (MULTIPLES_PASS : plafond d'abondement PEE,
+    seuils des allocations familiales...), versement PEE maximal abondé et
+    vecteur des taux TNS. L'empreinte (SHA-256 des valeurs canoniques, hors
+    description) sert d'égalité, de hachage et de clé de cache : deux packs
+    aux mêmes valeurs sont interchangeables, quel que soit leur nom.
+    """
+
+    def __init__(self, nom, valeurs):
+        canonique = json.dumps(valeurs, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        donnees = json.loads(canonique)
+        definir = object.__setattr__.__get__(self)
+
+        definir('nom', str(nom))
+        definir('description', donnees.pop('description', str(nom)))
+        definir('_canonique', canonique)
+        chiffres = json.dumps(donnees, sort_keys=True, separators=(',', ':'))
+        definir('empreinte', hashlib.sha256(chiffres.encode('utf-8')).hexdigest()[:16])
+
+        multiples_pass = donnees.pop('MULTIPLES_PASS')
+        tranches_ir = donnees.pop('TRANCHES_IR')
+        tranches_is = donnees.pop('TRANCHES_IS')
+        for cle, valeur in donnees.items():
+            definir(cle, _figer(valeur))
+
+        definir('TRANCHES_IR', _tranches(tranches_ir))
+        definir('TRANCHES_IS', _tranches(tranches_is))
+        definir('BAREME_IR', BaremeCompile.depuis_limites(self.TRANCHES_IR))
+        definir('BAREME_IS', BaremeCompile.depuis_largeurs(self.TRANCHES_IS))
+        definir('MULTIPLES_PASS', _figer(multiples_pass))
+        for cle, multiple in multiples_pass.items():
+            definir(cle, int(self.PASS * multiple))
+
+        # Pour compatibilité - par défaut on prend les services
+        definir('MICRO_BIC', self.MICRO_BIC_SERVICES)
+        definir('VERSEMENT_MAX_ABONDE', math.ceil(self.PLAFOND_ABONDEMENT_PEE / self.TAUX_ABONDEMENT_MAX))
+        definir('LIGNES_COTISATIONS_TNS', tuple(self.TAUX_COTISATIONS_TNS))
+        taux_tns = np.array(list(self.TAUX_COTISATIONS_TNS.values()))
+        taux_tns.flags.writeable = False
+        definir('TAUX_COTISATIONS_TNS_VECTEUR', taux_tns)
+
+        _PACKS_PAR_EMPREINTE.setdefault(self.empreinte, self)
+
+    def __setattr__(self, nom, valeur):
+        raise AttributeError("PackFiscal est immuable : utiliser modifier() pour un pack personnalisé")
+
+    def __delattr__(self, nom):
+        raise AttributeError("PackFiscal est immuable")
+
+    def __eq__(self, autre):
+        return isinstance(autre, PackFiscal) and self.empreinte == autre.empreinte
+
+    def __hash__(self):
+        return hash(self.empreinte)
+
+    def __reduce__(self):
+        return (PackFiscal, (self.nom, self.valeurs()))
+
+    def __repr__(self):
+        return f"PackFiscal({self.nom!r}, empreinte={self.empreinte!r})"
+
+    def valeurs(self):
+        """Valeurs du fichier (copie modifiable, format de donnees_fiscales/)"""
+        return json.loads(self._canonique)
+
+    def modifier(self, nom='personnalise', **modifications):
+        """Pack personnalisé : ce pack avec quelques valeurs remplacées
+
+        Les clés sont celles du fichier (PASS, TRANCHES_IR, MICRO_BNC...) ;
+        les tables dérivées sont recalculées. Une clé inconnue est refusée.
+        """
+        valeurs = self.valeurs()
+        inconnues = [cle for cle in modifications if cle not in valeurs]
+        if inconnues:
+            raise ValueError(f"Paramètres {inconnues} non supportés. Choix disponibles: {sorted(valeurs)}")
+        valeurs.update(modifications)
+        return PackFiscal(nom, valeurs)
+
+
+def charger_pack(annee):
+    """Pack d'une année fiscale de donnees_fiscales/ ou d'un fichier JSON (chargé une seule fois)"""
+    return _charger_pack(str(annee))
+
+
+@lru_cache(maxsize=None)
+def _charger_pack(annee):
+    if annee in PACKS_DISPONIBLES:
+        chemin = os.path.join(REPERTOIRE_PACKS, f"{annee}.json")
+    elif annee.endswith('.json') and os.path.isfile(annee):
+        chemin = annee
+    else:
+        raise ValueError(f"Année fiscale '{annee}' non supportée. Choix disponibles: {PACKS_DISPONIBLES}")
+    with open(chemin, encoding='utf-8') as fichier:
+        return PackFiscal(os.path.splitext(os.path.basename(chemin))[0], json.load(fichier))
+
+
+def pack_par_empreinte(empreinte):
+    """Pack dont l'empreinte est donnée : packs fournis ou déjà construits dans ce processus"""
+    if empreinte not in _PACKS_PAR_EMPREINTE:
+        for annee in PACKS_DISPONIBLES:
+            charger_pack(annee)
+    try:
+        return _PACKS_PAR_EMPREINTE[empreinte]
+    except KeyError:
+        raise ValueError(f"Aucun pack fiscal d'empreinte '{empreinte}' dans ce processus") from None
+
+
+def resoudre_pack(pack):
+    """PackFiscal à partir d'un pack, d'une année ('2024', 2024) ou d'une empreinte (None : année par défaut)"""
+    if isinstance(pack, PackFiscal):
+        return pack
+    if pack is None:
+        return charger_pack(ANNEE_FISCALE_DEFAUT)
+    if str(pack) in PACKS_DISPONIBLES or str(pack).endswith('.json'):
+        return charger_pack(pack)
+    try:
+        return pack_par_empreinte(str(pack))
+    except ValueError:
+        raise ValueError(f"Pack fiscal '{pack}' non supporté. Choix disponibles: {PACKS_DISPONIBLES}, "
+                         f"un fichier JSON ou l'empreinte d'un pack") from None
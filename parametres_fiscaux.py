@@ -1,94 +1,77 @@
 """
 Paramètres fiscaux centralisés pour toutes les formes juridiques
-Année fiscale 2024
+Constantes de l'année fiscale par défaut (2024), issues de son pack (packs_fiscaux)
 """
 
-# Barème IR 2024 (par part fiscale)
-TRANCHES_IR = [
-    {'limite': 11294, 'taux': 0},
-    {'limite': 28797, 'taux': 0.11},
-    {'limite': 82341, 'taux': 0.30},
-    {'limite': 177106, 'taux': 0.41},
-    {'limite': float('inf'), 'taux': 0.45}
-]
-
-# Tranches IS 2024
-TRANCHES_IS = [
-    {'limite': 42500, 'taux': 0.15},
-    {'limite': float('inf'), 'taux': 0.25}
-]
+import numpy as np
+
+from packs_fiscaux import ANNEE_FISCALE_DEFAUT, PackFiscal, charger_pack, resoudre_pack, PACKS_DISPONIBLES
+
+# Pack de l'année fiscale par défaut : les constantes ci-dessous en sont issues.
+# Pour une autre année, passer un pack (charger_pack('2025')) aux optimiseurs.
+PACK_FISCAL_DEFAUT = charger_pack(ANNEE_FISCALE_DEFAUT)
+_pack = PACK_FISCAL_DEFAUT
+
+# Barème IR (par part fiscale), tranches IS et barèmes compilés
+TRANCHES_IR = _pack.TRANCHES_IR
+TRANCHES_IS = _pack.TRANCHES_IS
+BAREME_IR = _pack.BAREME_IR
+BAREME_IS = _pack.BAREME_IS
 
 # Cotisations TNS (SARL gérant majoritaire)
-TAUX_COTISATIONS_TNS = {
-    'maladie': 0.065,
-    'allocations_familiales': 0.031,
-    'retraite_base': 0.1775,
-    'retraite_complementaire': 0.07,
-    'invalidite_deces': 0.013,
-    'csg_crds': 0.097,
-    'formation': 0.0025
-}
+TAUX_COTISATIONS_TNS = _pack.TAUX_COTISATIONS_TNS
 
 # Cotisations assimilé salarié (SAS)
-TAUX_COTISATIONS_SALARIE = 0.22  # Approximation cotisations salariales
-TAUX_COTISATIONS_PATRONALES = 0.42  # Approximation cotisations patronales
-
-# Micro-entreprise BIC - Activités de vente
-MICRO_BIC_VENTE = {
-    'seuil': 188700,
-    'abattement': 0.71,  # 71% d'abattement
-    'cotisations': 0.126  # 12.6% de cotisations sociales
-}
+TAUX_COTISATIONS_SALARIE = _pack.TAUX_COTISATIONS_SALARIE  # Approximation cotisations salariales
+TAUX_COTISATIONS_PATRONALES = _pack.TAUX_COTISATIONS_PATRONALES  # Approximation cotisations patronales
 
-# Micro-entreprise BIC - Prestations de services
-MICRO_BIC_SERVICES = {
-    'seuil': 77700,
-    'abattement': 0.50,  # 50% d'abattement
-    'cotisations': 0.212  # 21.2% de cotisations sociales
-}
+# Micro-entreprise : BIC vente, BIC prestations de services, BNC (professions libérales)
+MICRO_BIC_VENTE = _pack.MICRO_BIC_VENTE
+MICRO_BIC_SERVICES = _pack.MICRO_BIC_SERVICES
+MICRO_BNC = _pack.MICRO_BNC
 
 # Pour compatibilité - par défaut on prend les services
 MICRO_BIC = MICRO_BIC_SERVICES
 
-# Micro-entreprise BNC (Bénéfices Non Commerciaux)
-# Professions libérales
-MICRO_BNC = {
-    'seuil': 77700,
-    'abattement': 0.34,  # 34% d'abattement
-    'cotisations': 0.246  # 24.6% de cotisations sociales
-}
-
 # Dividendes et flat tax
-TAUX_FLAT_TAX = 0.30
-TAUX_PRELEVEMENTS_SOCIAUX_DIVIDENDES = 0.172
-TAUX_EXONERATION_MERE_FILLE = 0.95  # Régime mère-fille
+TAUX_FLAT_TAX = _pack.TAUX_FLAT_TAX
+TAUX_PRELEVEMENTS_SOCIAUX_DIVIDENDES = _pack.TAUX_PRELEVEMENTS_SOCIAUX_DIVIDENDES
+TAUX_EXONERATION_MERE_FILLE = _pack.TAUX_EXONERATION_MERE_FILLE  # Régime mère-fille
 
 # Abattements et plafonds
-ABATTEMENT_FRAIS_PRO = 0.10  # 10%
-PLAFOND_ABATTEMENT_FRAIS_PRO = 13522  # 2024
+ABATTEMENT_FRAIS_PRO = _pack.ABATTEMENT_FRAIS_PRO
+PLAFOND_ABATTEMENT_FRAIS_PRO = _pack.PLAFOND_ABATTEMENT_FRAIS_PRO
 
 # Dispositifs d'optimisation fiscale
-PLAFOND_PER = 32419  # Plan Épargne Retraite (8 x PASS 2024)
-PLAFOND_MADELIN_TNS = 84000  # Madelin Retraite TNS 2024
-TAUX_GIRARDIN_INDUSTRIEL = 1.10  # 110% de réduction d'impôt
+PLAFOND_PER = _pack.PLAFOND_PER  # Plan Épargne Retraite
+PLAFOND_MADELIN_TNS = _pack.PLAFOND_MADELIN_TNS  # Madelin Retraite TNS
+TAUX_GIRARDIN_INDUSTRIEL = _pack.TAUX_GIRARDIN_INDUSTRIEL  # Réduction d'impôt en % de l'investissement
 
 # PEE + PERCO (Épargne salariale et retraite)
-PASS = 46368  # Plafond Annuel Sécurité Sociale 2024
-PLAFOND_ABONDEMENT_PEE = int(PASS * 0.16)  # 16% du PASS = 7,418€ (plafond PERCO)
-TAUX_ABONDEMENT_MAX = 3.0  # 300% du versement salarié
-LIMITE_VERSEMENT_PEE_SALARIE = 0.25  # 25% de la rémunération brute
-TAUX_CSG_CRDS_ABONDEMENT = 0.097  # 9.7% sur l'abondement
-
-# Plafonds retraite et allocations familiales
-PLAFOND_RETRAITE_BASE = 46368  # 1 PASS 2024
-SEUIL_ALLOCATIONS_FAMILIALES_REDUIT = 162288  # 3.5 PASS 2024
+PASS = _pack.PASS  # Plafond Annuel Sécurité Sociale
+PLAFOND_ABONDEMENT_PEE = _pack.PLAFOND_ABONDEMENT_PEE  # 16% du PASS (plafond PERCO)
+TAUX_ABONDEMENT_MAX = _pack.TAUX_ABONDEMENT_MAX  # 300% du versement salarié
+LIMITE_VERSEMENT_PEE_SALARIE = _pack.LIMITE_VERSEMENT_PEE_SALARIE  # 25% de la rémunération brute
+TAUX_CSG_CRDS_ABONDEMENT = _pack.TAUX_CSG_CRDS_ABONDEMENT  # CSG/CRDS sur l'abondement
+
+# Plafond PER de l'année N : 10% des revenus professionnels N-1, entre 10% du PASS et PLAFOND_PER
+TAUX_PLAFOND_PER = _pack.TAUX_PLAFOND_PER
+PLANCHER_PER = _pack.PLANCHER_PER
+ANNEES_REPORT_PER = _pack.ANNEES_REPORT_PER  # Plafonds non utilisés reportables sur les 3 années suivantes
+
+# Plafonds retraite et allocations familiales (multiples du PASS)
+PLAFOND_RETRAITE_BASE = _pack.PLAFOND_RETRAITE_BASE  # 1 PASS
+SEUIL_ALLOCATIONS_FAMILIALES_REDUIT = _pack.SEUIL_ALLOCATIONS_FAMILIALES_REDUIT  # 3.5 PASS
+SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION = _pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION  # 1 PASS (taux nul en dessous)
+SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN = _pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN  # 1.4 PASS (taux plein au-delà)
+TAUX_ASSIETTE_COTISATIONS_TNS = _pack.TAUX_ASSIETTE_COTISATIONS_TNS  # Assiette TNS après abattement 10% frais pro
 
 # Taux d'économie approximatifs pour les calculs
-TAUX_ECONOMIE_PER = 0.30  # Approximation économie fiscale PER
-TAUX_ECONOMIE_IS_MADELIN = 0.25  # Économie IS pour charge Madelin Retraite
+TAUX_ECONOMIE_PER = _pack.TAUX_ECONOMIE_PER  # Approximation économie fiscale PER
+TAUX_ECONOMIE_IS_MADELIN = _pack.TAUX_ECONOMIE_IS_MADELIN  # Économie IS pour charge Madelin Retraite
 
 # ACRE (Aide à la Création ou à la Reprise d'une Entreprise)
-TAUX_REDUCTION_ACRE = 0.50  # 50% de réduction des cotisations sociales la 1ère année
+TAUX_REDUCTION_ACRE = _pack.TAUX_REDUCTION_ACRE  # Réduction des cotisations sociales la 1ère année
 
 # Configuration par forme juridique
 FORMES_JURIDIQUES_CONFIG = {
@@ -126,38 +109,101 @@ def get_optimisations_disponibles(forme_juridique):
 # NOTE: Les fonctions calculer_ir() et calculer_is() sont définies dans fiscal_base.py
 # pour éviter la duplication de code. Utilisez les méthodes de la classe OptimisationFiscale.
 
-def calculer_cotisations_tns(remuneration_brute):
-    """Calcule les cotisations TNS"""
-    assiette = remuneration_brute * 0.9  # Abattement 10% frais pro
+def calculer_cotisations_tns(remuneration_brute, details=True, pack=None):
+    """Calcule les cotisations TNS
 
-    cotisations = {}
+    Retourne (total, détail par cotisation) ; avec details=False le détail
+    n'est pas construit et vaut None. `pack` : PackFiscal de l'année
+    (PACK_FISCAL_DEFAUT si absent).
+    """
+    pack = pack or PACK_FISCAL_DEFAUT
+    assiette = remuneration_brute * pack.TAUX_ASSIETTE_COTISATIONS_TNS  # Abattement 10% frais pro
+
+    cotisations = {} if details else None
     total = 0
 
-    for nom, taux in TAUX_COTISATIONS_TNS.items():
+    for nom, taux in pack.TAUX_COTISATIONS_TNS.items():
         if nom == 'retraite_base':
-            base = min(assiette, PLAFOND_RETRAITE_BASE)
-            cotisations[nom] = base * taux
+            base = min(assiette, pack.PLAFOND_RETRAITE_BASE)
+            montant = base * taux
         elif nom == 'allocations_familiales':
-            # Barème progressif 2024 :
-            # 0% jusqu'à 46,368€ (1 PASS)
-            # Progressif de 46,368€ à 64,915€ (1.4 PASS)
-            # 3.1% au-delà de 64,915€
-            PASS_1 = 46368  # 1 PASS
-            PASS_1_4 = 64915  # 1.4 PASS
+            # Barème progressif :
+            # 0% jusqu'à 1 PASS
+            # Progressif de 1 PASS à 1.4 PASS
+            # Taux plein au-delà de 1.4 PASS
+            PASS_1 = pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION  # 1 PASS
+            PASS_1_4 = pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN  # 1.4 PASS
 
             if assiette <= PASS_1:
                 # Exonération totale en dessous de 1 PASS
-                cotisations[nom] = 0
+                montant = 0
             elif assiette <= PASS_1_4:
                 # Taux progressif entre 1 et 1.4 PASS
-                taux_progressif = 0.031 * (assiette - PASS_1) / (PASS_1_4 - PASS_1)
-                cotisations[nom] = assiette * taux_progressif
+                taux_progressif = taux * (assiette - PASS_1) / (PASS_1_4 - PASS_1)
+                montant = assiette * taux_progressif
             else:
                 # Taux plein au-delà de 1.4 PASS
-                cotisations[nom] = assiette * 0.031
+                montant = assiette * taux
         else:
-            cotisations[nom] = assiette * taux
+            montant = assiette * taux
+
+        if details:
+            cotisations[nom] = montant
+        total += montant
+
+    return total, cotisations
+
+
+# Ordre des colonnes de la matrice retournée par calculer_cotisations_tns_vectorise()
+LIGNES_COTISATIONS_TNS = list(_pack.LIGNES_COTISATIONS_TNS)
+
+
+def calculer_cotisations_tns_vectorise(remunerations_brutes, pack=None):
+    """Version vectorisée de calculer_cotisations_tns() pour un tableau de rémunérations brutes
+
+    Retourne (totaux, cotisations par ligne) : la matrice a une colonne par
+    cotisation, dans l'ordre de LIGNES_COTISATIONS_TNS (forme remunerations.shape + (7,)).
+    Le plafond de la retraite de base et la rampe des allocations familiales
+    entre 1 et 1.4 PASS sont appliqués colonne par colonne, sans boucle par rémunération.
+    """
+    pack = pack or PACK_FISCAL_DEFAUT
+    lignes = pack.LIGNES_COTISATIONS_TNS
+    assiettes = np.asarray(remunerations_brutes, dtype=float)[..., None] * pack.TAUX_ASSIETTE_COTISATIONS_TNS
+    bases = np.repeat(assiettes, len(lignes), axis=-1)
+
+    retraite_base = lignes.index('retraite_base')
+    bases[..., retraite_base] = np.minimum(bases[..., retraite_base], pack.PLAFOND_RETRAITE_BASE)
+
+    # Allocations familiales : taux nul jusqu'à 1 PASS, progressif jusqu'à 1.4 PASS, plein au-delà
+    allocations_familiales = lignes.index('allocations_familiales')
+    bases[..., allocations_familiales] *= np.clip(
+        (bases[..., allocations_familiales] - pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION)
+        / (pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN - pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION), 0, 1
+    )
+
+    cotisations = bases * pack.TAUX_COTISATIONS_TNS_VECTEUR
+    return cotisations.sum(axis=-1), cotisations
+
+
+def derivee_cotisations_tns_vectorisee(remunerations_brutes, pack=None):
+    """Dérivée des cotisations TNS par rapport à la rémunération brute (taux marginal, tableau)
+
+    Forme fermée de calculer_cotisations_tns_vectorise() : taux de chaque ligne
+    sur l'assiette, la retraite de base s'annulant au-delà de son plafond et la
+    rampe des allocations familiales (a × taux × (a - 1 PASS) / 0.4 PASS)
+    ayant pour dérivée taux × (2a - 1 PASS) / 0.4 PASS entre 1 et 1.4 PASS.
+    """
+    pack = pack or PACK_FISCAL_DEFAUT
+    taux_tns = pack.TAUX_COTISATIONS_TNS
+    assiettes = np.asarray(remunerations_brutes, dtype=float) * pack.TAUX_ASSIETTE_COTISATIONS_TNS
+
+    taux_lineaires = sum(taux for nom, taux in taux_tns.items()
+                         if nom not in ('retraite_base', 'allocations_familiales'))
+    retraite_base = np.where(assiettes < pack.PLAFOND_RETRAITE_BASE, taux_tns['retraite_base'], 0)
 
-        total += cotisations[nom]
+    exoneration = pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION
+    taux_plein = pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN
+    rampe = np.where(assiettes < taux_plein, (2 * assiettes - exoneration) / (taux_plein - exoneration), 1)
+    allocations_familiales = taux_tns['allocations_familiales'] * np.where(assiettes <= exoneration, 0, rampe)
 
-    return total, cotisations
\ No newline at end of file
+    return (taux_lineaires + retraite_base + allocations_familiales) * pack.TAUX_ASSIETTE_COTISATIONS_TNS
@@ -0,0 +1,195 @@
+"""
+Profilage à la demande des optimiseurs : compteurs d'appels et durée de chaque étape de optimiser()
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+import formes_juridiques  # noqa: F401 - charge toutes les sous-classes d'OptimisationFiscale
+from fiscal_base import OptimisationFiscale
+
+# Étapes de optimiser() et méthodes des optimiseurs chronométrées pour chacune
+ETAPES_OPTIMISATION = {
+    'generation_plage': ['get_range_remuneration'],
+    'scenario_base': ['calculer_scenario_base_en_cache', 'calculer_scenario_base',
+                      'calculer_base_vectorisee_en_cache', 'calculer_base_vectorisee'],
+    'optimisations_personnelles': ['appliquer_optimisations_personnelles', 'appliquer_optimisations_vectorisees'],
+    'filtre_validite': ['is_scenario_valid', 'masque_valide_vectorise'],
+    'selection_optimum': ['_recalculer_meilleur', 'metrique_vectorisee'],
+}
+
+# Méthodes dont les appels sont comptés ; pour les versions vectorisées, le nombre de valeurs aussi
+METHODES_COMPTEES = ['calculer_ir', 'calculer_is', 'calculer_cotisations_tns',
+                     'calculer_ir_vectorise', 'calculer_is_vectorise', 'calculer_cotisations_tns_vectorise']
+
+# État du profilage du fil d'exécution courant (rapport actif et pile des étapes en cours)
+_etat = threading.local()
+
+# Méthodes d'origine remplacées pendant un profilage (restaurées quand plus aucun n'est actif)
+_verrou = threading.Lock()
+_originaux = []
+_nb_profilages = 0
+
+
+class RapportProfilage:
+    """Compteurs et durées relevés pendant un ou plusieurs blocs profiler()
+
+    Les durées d'étapes sont exclusives : le temps d'une étape appelée depuis
+    une autre (scénario de base recalculé pendant la sélection de l'optimum)
+    n'est compté qu'une fois, dans l'étape la plus interne. Le temps hors
+    étapes (boucles, assemblage des résultats, écriture) est dans 'autres_s'.
+    Les sections (section()) chronomètrent des blocs de code appelant, par
+    exemple la construction d'un graphique.
+    """
+
+    def __init__(self):
+        self.duree_totale_s = 0.0
+        self.etapes = {etape: {'appels': 0, 'duree_s': 0.0} for etape in ETAPES_OPTIMISATION}
+        self.compteurs = {nom: {'appels': 0, 'valeurs': 0} for nom in METHODES_COMPTEES}
+        self.sections = {}
+
+    @contextmanager
+    def section(self, nom):
+        """Chronomètre un bloc de code (les durées d'une même section s'additionnent)"""
+        debut = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.sections[nom] = self.sections.get(nom, 0.0) + time.perf_counter() - debut
+
+    def en_dict(self):
+        """Rapport structuré : durée totale, sections, étapes, temps hors étapes et compteurs"""
+        duree_etapes = sum(etape['duree_s'] for etape in self.etapes.values())
+        return {
+            'duree_totale_s': self.duree_totale_s,
+            'sections': dict(self.sections),
+            'etapes': {etape: dict(mesure) for etape, mesure in self.etapes.items()},
+            'autres_s': max(0.0, self.duree_totale_s - duree_etapes),
+            'compteurs': {nom: dict(compteur) for nom, compteur in self.compteurs.items()},
+        }
+
+    def formater(self):
+        """Rapport en texte (une ligne par section, étape et compteur)"""
+        rapport = self.en_dict()
+        lignes = [f"Profilage : {rapport['duree_totale_s'] * 1e3:,.1f} ms profilées"]
+        for nom, duree in rapport['sections'].items():
+            lignes.append(f"  section {nom:<36} {duree * 1e3:>10,.1f} ms")
+        for etape, mesure in rapport['etapes'].items():
+            lignes.append(f"  étape   {etape:<36} {mesure['duree_s'] * 1e3:>10,.1f} ms  {mesure['appels']:>10,} appels")
+        lignes.append(f"  {'hors étapes':<44} {rapport['autres_s'] * 1e3:>10,.1f} ms")
+        for nom, compteur in rapport['compteurs'].items():
+            valeurs = f"  {compteur['valeurs']:>10,} valeurs" if nom.endswith('_vectorise') else ''
+            lignes.append(f"  appels  {nom:<36} {compteur['appels']:>13,}{valeurs}")
+        return '\n'.join(lignes)
+
+
+def _envelopper_etape(etape, methode):
+    """Méthode chronométrée dans `etape` lorsque le fil courant est profilé"""
+    @wraps(methode)
+    def enveloppe(*args, **kwargs):
+        rapport = getattr(_etat, 'rapport', None)
+        if rapport is None:
+            return methode(*args, **kwargs)
+        pile = _etat.pile
+        parent = pile[-1] if pile else None
+        cadre = [etape, 0.0]  # étape et durée des étapes imbriquées
+        pile.append(cadre)
+        debut = time.perf_counter()
+        try:
+            return methode(*args, **kwargs)
+        finally:
+            duree = time.perf_counter() - debut
+            pile.pop()
+            mesure = rapport.etapes[etape]
+            mesure['duree_s'] += duree - cadre[1]
+            if parent is None or parent[0] != etape:
+                mesure['appels'] += 1
+            if parent is not None:
+                parent[1] += duree
+    return enveloppe
+
+
+def _envelopper_compteur(nom, methode):
+    """Méthode dont les appels (et valeurs pour une version vectorisée) sont comptés"""
+    vectorisee = nom.endswith('_vectorise')
+
+    @wraps(methode)
+    def enveloppe(self, valeurs, *args, **kwargs):
+        rapport = getattr(_etat, 'rapport', None)
+        if rapport is not None:
+            compteur = rapport.compteurs[nom]
+            compteur['appels'] += 1
+            if vectorisee:
+                compteur['valeurs'] += int(np.size(valeurs))
+        return methode(self, valeurs, *args, **kwargs)
+    return enveloppe
+
+
+def _classes_optimiseurs(classe=OptimisationFiscale):
+    """OptimisationFiscale et toutes ses sous-classes"""
+    classes = [classe]
+    for sous_classe in classe.__subclasses__():
+        classes.extend(_classes_optimiseurs(sous_classe))
+    return classes
+
+
+def _installer():
+    """Remplace les méthodes instrumentées (au premier profilage actif seulement)"""
+    global _nb_profilages
+    with _verrou:
+        _nb_profilages += 1
+        if _nb_profilages > 1:
+            return
+        enveloppes = [(nom, lambda methode, etape=etape: _envelopper_etape(etape, methode))
+                      for etape, noms in ETAPES_OPTIMISATION.items() for nom in noms]
+        enveloppes += [(nom, lambda methode, nom=nom: _envelopper_compteur(nom, methode)) for nom in METHODES_COMPTEES]
+        for classe in _classes_optimiseurs():
+            for nom, envelopper in enveloppes:
+                if nom in vars(classe):
+                    original = vars(classe)[nom]
+                    _originaux.append((classe, nom, original))
+                    setattr(classe, nom, envelopper(original))
+
+
+def _desinstaller():
+    """Restaure les méthodes d'origine quand le dernier profilage actif se termine"""
+    global _nb_profilages
+    with _verrou:
+        _nb_profilages -= 1
+        if _nb_profilages:
+            return
+        while _originaux:
+            classe, nom, original = _originaux.pop()
+            setattr(classe, nom, original)
+
+
+@contextmanager
+def profiler(actif=True, rapport=None):
+    """Profile les optimiseurs appelés dans le bloc par le fil d'exécution courant
+
+    Retourne (as) un RapportProfilage, nouveau ou `rapport` pour cumuler
+    plusieurs blocs. Les méthodes instrumentées ne sont remplacées que pendant
+    le bloc : hors profilage, les optimiseurs exécutent leurs méthodes d'origine
+    (aucun surcoût). Avec actif=False, rien n'est instrumenté et seules les
+    sections du rapport peuvent être chronométrées. Pendant un profilage, les
+    autres fils (sessions de l'interface) ne sont pas comptés.
+    """
+    rapport = rapport if rapport is not None else RapportProfilage()
+    if not actif:
+        yield rapport
+        return
+
+    _installer()
+    precedent = (getattr(_etat, 'rapport', None), getattr(_etat, 'pile', None))
+    _etat.rapport, _etat.pile = rapport, []
+    debut = time.perf_counter()
+    try:
+        yield rapport
+    finally:
+        rapport.duree_totale_s += time.perf_counter() - debut
+        _etat.rapport, _etat.pile = precedent
+        _desinstaller()
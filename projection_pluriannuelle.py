@@ -0,0 +1,244 @@
+"""
+Projection pluriannuelle : trajectoire de rémunération optimale avec reports de plafonds PER,
+ACRE la première année et trésorerie conservée dans la holding
+"""
+
+import numpy as np
+
+from comparaison_formes import parametres_scenario
+from formes_juridiques import creer_optimiseur
+from packs_fiscaux import resoudre_pack
+
+# Horizons de projection acceptés (en années)
+HORIZONS_PROJECTION = list(range(3, 11))
+
+
+def valeurs_annuelles(valeur, nb_annees, nom):
+    """Valeur de chaque année : un nombre est répété, une liste doit couvrir tout l'horizon"""
+    if np.ndim(valeur) == 0:
+        return [valeur] * nb_annees
+    if len(valeur) != nb_annees:
+        raise ValueError(f"'{nom}' : {len(valeur)} valeurs pour un horizon de {nb_annees} ans")
+    return list(valeur)
+
+
+def plafond_per_genere(revenus_imposables, pack=None):
+    """Plafond PER ouvert pour l'année suivante par les revenus professionnels de l'année"""
+    pack = resoudre_pack(pack)
+    return np.clip(np.asarray(revenus_imposables, dtype=float) * pack.TAUX_PLAFOND_PER, pack.PLANCHER_PER,
+                   pack.PLAFOND_PER)
+
+
+def consommer_plafonds(millesimes, versements):
+    """Impute des versements PER sur les millésimes de plafond, du plus ancien au plus récent
+
+    `millesimes` a pour dernière dimension (plafond de l'année, report N-1,
+    N-2...) ; `versements` est diffusé avec les autres dimensions. Retourne les
+    plafonds restants.
+    """
+    reste = np.array(versements, copy=True)
+    restants = np.array(np.broadcast_to(millesimes, reste.shape + np.shape(millesimes)[-1:]))
+    for indice in reversed(range(restants.shape[-1])):
+        impute = np.minimum(restants[..., indice], reste)
+        restants[..., indice] -= impute
+        reste -= impute
+    return restants
+
+
+def bits_millesime(nb_millesimes):
+    """Bits de la clé d'état disponibles pour chaque millésime"""
+    return 64 // nb_millesimes
+
+
+def _cles_etats(millesimes):
+    """Encode chaque état (millésimes en unités de pas_plafond, bits_millesime() bits chacun) en un entier unique"""
+    bits = bits_millesime(millesimes.shape[-1])
+    cles = np.zeros(millesimes.shape[:-1], dtype=np.int64)
+    for indice in range(millesimes.shape[-1]):
+        cles = (cles << bits) | millesimes[..., indice]
+    return cles
+
+
+def optimiser_trajectoire(forme_juridique, resultats, charges=0, parts_fiscales=1, nb_annees=None, per_max=0,
+                          plafonds_per=None, madelin_max=0, girardin_max=0, versement_pee=0, pas=2500,
+                          pas_plafond=500, type_activite='BIC - Prestations de services', acre=False,
+                          taux_distribution_holding=1.0, rendement_holding=0.0, nb_etats_max=5000, pack_fiscal=None):
+    """Optimise la rémunération de chaque année d'un plan de 3 à 10 ans par programmation dynamique
+
+    `resultats`, `charges`, `per_max`, `madelin_max`, `girardin_max` et
+    `versement_pee` sont un nombre (identique chaque année) ou une liste par
+    année ; de même `pack_fiscal` (paramètres fiscaux, voir packs_fiscaux) :
+    un pack, une année ('2025') ou une liste par année du plan. L'état d'une année est le vecteur des plafonds PER encore
+    disponibles (plafond de l'année, issu de 10% des revenus de l'année
+    précédente, et reports non utilisés des ANNEES_REPORT_PER années
+    précédentes selon le pack de l'année, 3 en 2024), discrétisé au pas
+    `pas_plafond`. Le versement PER de l'année est min(per_max, plafond
+    disponible), imputé d'abord sur les reports les plus anciens ; le millésime
+    le plus ancien expire en fin d'année. `plafonds_per` donne l'état initial
+    (un nombre : plafond de la première année, ou jusqu'à ANNEES_REPORT_PER + 1
+    millésimes).
+
+    Chaque année est évaluée en un seul lot vectorisé : rémunérations × plafonds
+    disponibles distincts des états atteignables. La récurrence arrière
+    V(t, état) = max sur la rémunération de [valeur de l'année + V(t+1, état
+    suivant)] évite d'énumérer toutes les trajectoires. Si plus de
+    `nb_etats_max` états sont atteignables une année, leurs millésimes sont
+    arrondis par défaut à un multiple double du pas, jusqu'à repasser sous la
+    limite (plafonds sous-estimés, jamais surestimés).
+
+    La valeur d'une année est la métrique de la forme (patrimoine total, net
+    final pour la micro-entreprise). L'ACRE ne s'applique que la première
+    année. Pour la SARL + Holding, seule la part `taux_distribution_holding`
+    des dividendes de la holding est distribuée ; le reste est conservé en
+    trésorerie, capitalisé au taux `rendement_holding` jusqu'à la fin du plan
+    et valorisé net de la flat tax du pack de l'année où il est conservé.
+    Une année déficitaire (charges supérieures au résultat) n'a ni
+    rémunération ni versement : sa valeur est nulle et les plafonds PER
+    vieillissent normalement.
+
+    Retourne {'annees': [par année : 'annee', 'remuneration',
+    'plafond_per_disponible', 'versement_per', 'plafonds_per' (millésimes en
+    début d'année), 'plafond_per_genere', 'valeur', 'tresorerie_holding',
+    'scenario' (None pour une année déficitaire)], 'valeur_totale', 'nb_etats' et 'pas_etats' (par année : pas
+    effectif des millésimes après agrégation), 'nb_evaluations'}.
+    """
+    if nb_annees is None:
+        nb_annees = 5 if np.ndim(resultats) == 0 else len(resultats)
+    if nb_annees not in HORIZONS_PROJECTION:
+        raise ValueError(f"Horizon de {nb_annees} ans non supporté. Choix disponibles: {HORIZONS_PROJECTION}")
+
+    annuels = {nom: valeurs_annuelles(valeur, nb_annees, nom) for nom, valeur in (
+        ('resultats', resultats), ('charges', charges), ('per_max', per_max), ('madelin_max', madelin_max),
+        ('girardin_max', girardin_max), ('versement_pee', versement_pee))}
+    packs = [resoudre_pack(pack) for pack in valeurs_annuelles(pack_fiscal, nb_annees, 'pack_fiscal')]
+
+    # Millésimes suivis : plafond de l'année et reports, autant que le pack de l'année le plus long en admet
+    nb_millesimes = max(pack.ANNEES_REPORT_PER for pack in packs) + 1
+    millesimes_initiaux = np.zeros(nb_millesimes)
+    if plafonds_per is None:
+        millesimes_initiaux[0] = packs[0].PLAFOND_PER
+    else:
+        plafonds_per = np.atleast_1d(np.asarray(plafonds_per, dtype=float))
+        if len(plafonds_per) > packs[0].ANNEES_REPORT_PER + 1:
+            raise ValueError(f"Au plus {packs[0].ANNEES_REPORT_PER + 1} millésimes de plafond PER (année puis reports)")
+        millesimes_initiaux[:len(plafonds_per)] = plafonds_per
+    etats = np.floor(millesimes_initiaux / pas_plafond).astype(np.int64)[None, :]
+    if max(etats.max(), max(pack.PLAFOND_PER for pack in packs) / pas_plafond) >= 1 << bits_millesime(nb_millesimes):
+        raise ValueError(f"Pas de plafond {pas_plafond}€ trop fin pour les plafonds PER fournis")
+
+    # Passe avant : lot de chaque année sur les états atteignables et transitions
+    annees = []
+    for annee in range(nb_annees):
+        optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=annuels['resultats'][annee],
+                                      charges_existantes=annuels['charges'][annee], parts_fiscales=parts_fiscales,
+                                      plafond_per_disponible=np.inf, pack_fiscal=packs[annee])
+        remunerations = np.asarray(list(optimiseur.get_range_remuneration(pas)), dtype=float)
+        scenario_kwargs = parametres_scenario(optimiseur, annuels['per_max'][annee], annuels['madelin_max'][annee],
+                                              annuels['girardin_max'][annee], annuels['versement_pee'][annee],
+                                              type_activite, acre and annee == 0)
+        per_montant = scenario_kwargs.pop('per_montant')
+        girardin_montant = scenario_kwargs.pop('girardin_montant')
+        deficitaire = not len(remunerations)
+        if deficitaire:
+            # Charges supérieures au résultat : seule la rémunération nulle, sans versement, est évaluée
+            remunerations = np.zeros(1)
+            per_montant = girardin_montant = 0
+
+        disponibles, indices_disponibles = np.unique(etats.sum(axis=1), return_inverse=True)
+        colonnes_base = optimiseur.calculer_base_vectorisee_en_cache(remunerations, **scenario_kwargs)
+        colonnes = optimiseur.appliquer_optimisations_vectorisees(
+            colonnes_base, np.minimum(per_montant, disponibles * pas_plafond)[:, None], girardin_montant)
+
+        forme = (len(disponibles), len(remunerations))
+        valeurs = np.broadcast_to(optimiseur.metrique_vectorisee(colonnes), forme)
+        conservee = np.zeros(len(remunerations))
+        if 'dividendes_holding' in colonnes and taux_distribution_holding < 1:
+            conservee = (1 - taux_distribution_holding) * colonnes['dividendes_holding']
+            capitalisation = (1 + rendement_holding) ** (nb_annees - 1 - annee)
+            valeurs = valeurs + conservee * capitalisation * (1 - optimiseur.pack.TAUX_FLAT_TAX) \
+                - (1 - taux_distribution_holding) * colonnes['dividendes_nets']
+        valeurs = np.where(np.broadcast_to(optimiseur.masque_valide_vectorise(colonnes), forme), valeurs, -np.inf)
+        if deficitaire:
+            # Rien n'est perçu : le déficit reste dans la société (valeur nulle, rien de conservé)
+            valeurs = np.zeros(forme)
+            conservee = np.zeros(len(remunerations))
+
+        versements = np.broadcast_to(colonnes['per_deduction'], forme)
+        unites_versees = np.minimum(np.ceil(versements / pas_plafond - 1e-9).astype(np.int64),
+                                    disponibles[:, None])
+        generes = plafond_per_genere(colonnes['revenu_imposable'], optimiseur.pack) * np.ones(len(remunerations))
+
+        donnees = {'etats': etats, 'remunerations': remunerations, 'optimiseur': optimiseur, 'deficitaire': deficitaire,
+                   'scenario_kwargs': dict(scenario_kwargs, per_montant=per_montant, girardin_montant=girardin_montant),
+                   'valeurs': valeurs[indices_disponibles], 'indices_disponibles': indices_disponibles,
+                   'versements': versements, 'generes': generes, 'conservee': conservee * np.ones(len(remunerations))}
+
+        if annee < nb_annees - 1:
+            # Millésimes restants après versement, puis vieillissement : le plus ancien expire, ainsi que
+            # les reports au-delà de ceux qu'admet le pack de l'année suivante
+            restants = consommer_plafonds(etats[:, None, :], unites_versees[indices_disponibles])
+            suivants = np.empty(restants.shape, dtype=np.int64)
+            suivants[..., 0] = np.floor(generes / pas_plafond).astype(np.int64)[None, :]
+            suivants[..., 1:] = restants[..., :-1]
+            suivants[..., packs[annee + 1].ANNEES_REPORT_PER + 1:] = 0
+            cles, premiers, successeurs = np.unique(_cles_etats(suivants).ravel(), return_index=True,
+                                                    return_inverse=True)
+            # Agrégation prudente : au-delà de nb_etats_max, millésimes arrondis à un pas double, par défaut
+            facteur = 1
+            while len(cles) > nb_etats_max:
+                facteur *= 2
+                suivants = suivants // facteur * facteur
+                cles, premiers, successeurs = np.unique(_cles_etats(suivants).ravel(), return_index=True,
+                                                        return_inverse=True)
+            donnees['successeurs'] = successeurs.reshape(len(etats), len(remunerations))
+            donnees['pas_etats_suivants'] = pas_plafond * facteur
+            etats = suivants.reshape(-1, nb_millesimes)[premiers]
+        annees.append(donnees)
+
+    # Passe arrière : valeur de chaque état atteignable et meilleure rémunération
+    valeur_suivante = None
+    for donnees in reversed(annees):
+        totaux = donnees['valeurs'] if valeur_suivante is None else \
+            donnees['valeurs'] + valeur_suivante[donnees['successeurs']]
+        donnees['choix'] = np.argmax(totaux, axis=1)
+        valeur_suivante = totaux[np.arange(len(totaux)), donnees['choix']]
+
+    # Reconstruction de la trajectoire depuis l'état initial
+    trajectoire = []
+    etat = 0
+    tresorerie_holding = 0.0
+    for annee, donnees in enumerate(annees):
+        choix = donnees['choix'][etat]
+        remuneration = donnees['remunerations'][choix].item()
+        millesimes = donnees['etats'][etat] * pas_plafond
+        plafond_disponible = float(millesimes.sum())
+
+        optimiseur = donnees['optimiseur']
+        optimiseur_annee = creer_optimiseur(forme_juridique, resultat_avant_remuneration=optimiseur.resultat_initial,
+                                            charges_existantes=optimiseur.charges, parts_fiscales=parts_fiscales,
+                                            plafond_per_disponible=plafond_disponible, pack_fiscal=optimiseur.pack)
+        tresorerie_holding = tresorerie_holding * (1 + rendement_holding) + donnees['conservee'][choix].item()
+
+        trajectoire.append({
+            'annee': annee + 1,
+            'remuneration': remuneration,
+            'plafond_per_disponible': plafond_disponible,
+            'versement_per': donnees['versements'][donnees['indices_disponibles'][etat], choix].item(),
+            'plafonds_per': millesimes.tolist(),
+            'plafond_per_genere': donnees['generes'][choix].item(),
+            'valeur': donnees['valeurs'][etat, choix].item(),
+            'tresorerie_holding': tresorerie_holding,
+            'scenario': None if donnees['deficitaire'] else optimiseur_annee.calculer_scenario(
+                remuneration, **donnees['scenario_kwargs']),
+        })
+        if 'successeurs' in donnees:
+            etat = donnees['successeurs'][etat, choix]
+
+    return {
+        'annees': trajectoire,
+        'valeur_totale': float(valeur_suivante[0]),
+        'nb_etats': [len(donnees['etats']) for donnees in annees],
+        'pas_etats': [pas_plafond] + [donnees['pas_etats_suivants'] for donnees in annees[:-1]],
+        'nb_evaluations': sum(len(np.unique(donnees['indices_disponibles'])) * len(donnees['remunerations'])
+                              for donnees in annees),
+    }
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Service HTTP/JSON d'optimisation (asyncio) : requêtes identiques fusionnées, calculs sur un pool de processus,
+lots de profils clients et réponses compactes (optionnellement en colonnes)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from cache_persistant import ouvrir_cache
+from fiscal_base import STRATEGIES_OPTIMISATION
+from fiscal_microentreprise import TYPES_ACTIVITE
+from formes_juridiques import FORMES_JURIDIQUES
+from packs_fiscaux import resoudre_pack
+from service_optimisation import (normaliser_parametres, cle_canonique, executer_optimisation,
+                                  executer_optimisation_persistante, optimiseur_depuis_parametres, CACHE_DISQUE_CHEMIN)
+
+HOTE_DEFAUT = '127.0.0.1'
+PORT_DEFAUT = 8600
+
+# Taille maximale du corps d'une requête (octets)
+TAILLE_MAX_CORPS = 16 * 2**20
+
+# Paquets envoyés au pool par processus pour un lot (équilibre entre processus et coût des échanges)
+PAQUETS_PAR_PROCESSUS = 4
+
+# Champs d'un profil (corps de /optimiser, éléments de /lot) et valeurs par défaut (None : obligatoire)
+CHAMPS_PROFIL = {
+    'forme_juridique': None,
+    'resultat': None,
+    'charges': 0,
+    'parts': 1,
+    'plafond_per': None,
+    'per_max': 0,
+    'madelin_max': 0,
+    'girardin_max': 0,
+    'versement_pee': 0,
+    'pas': 2500,
+    'strategie': 'balayage',
+    'type_activite': 'BIC - Prestations de services',
+    'acre': False,
+    'annee_fiscale': None,
+}
+
+# Champs dont la valeur None est admise (plafond PER calculé, année fiscale par défaut)
+CHAMPS_FACULTATIFS = ('plafond_per', 'annee_fiscale')
+
+# Champs propres à /scenario : rémunération évaluée et montants des optimisations
+CHAMPS_SCENARIO = {
+    'remuneration': None,
+    'per_montant': 0,
+    'madelin_montant': 0,
+    'girardin_montant': 0,
+}
+
+RAISONS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class ErreurRequete(Exception):
+    """Requête invalide : statut HTTP et message renvoyés au client"""
+
+    def __init__(self, statut, message):
+        super().__init__(statut, message)
+        self.statut = statut
+        self.message = message
+
+
+def lire_champs(objet, champs):
+    """Champs d'un objet JSON complétés par leurs valeurs par défaut
+
+    ValueError si l'objet contient un champ inconnu ou s'il manque un champ obligatoire.
+    """
+    if not isinstance(objet, dict):
+        raise ValueError("Le corps de la requête doit être un objet JSON")
+    inconnus = sorted(set(objet) - set(champs))
+    if inconnus:
+        raise ValueError(f"Champ '{inconnus[0]}' non supporté. Choix disponibles: {list(champs)}")
+    valeurs = dict(champs, **objet)
+    for champ, defaut in champs.items():
+        if defaut is None and valeurs[champ] is None and champ not in CHAMPS_FACULTATIFS:
+            raise ValueError(f"Champ '{champ}' obligatoire")
+    return valeurs
+
+
+def verifier_nombres_finis(valeurs):
+    """ValueError si une valeur numérique n'est pas finie (Infinity, NaN, 1e400 en JSON)"""
+    for nom, valeur in valeurs.items():
+        if isinstance(valeur, float) and not math.isfinite(valeur):
+            raise ValueError(f"Champ '{nom}' invalide ({valeur}) : nombre fini attendu")
+
+
+def parametres_profil(profil):
+    """Paramètres normalisés d'un profil (forme, stratégie, nombres, type d'activité et pack fiscal vérifiés)"""
+    if profil['forme_juridique'] not in FORMES_JURIDIQUES:
+        raise ValueError(f"Forme juridique '{profil['forme_juridique']}' non supportée. "
+                         f"Choix disponibles: {FORMES_JURIDIQUES}")
+    if profil['strategie'] not in STRATEGIES_OPTIMISATION:
+        raise ValueError(f"Stratégie '{profil['strategie']}' non supportée. "
+                         f"Choix disponibles: {STRATEGIES_OPTIMISATION}")
+    micro = profil['forme_juridique'] == 'Micro-entreprise'
+    if micro and profil['type_activite'] not in TYPES_ACTIVITE:
+        raise ValueError(f"Type d'activité '{profil['type_activite']}' non supporté. "
+                         f"Choix disponibles: {TYPES_ACTIVITE}")
+    verifier_nombres_finis(profil)
+    parametres = normaliser_parametres(
+        profil['forme_juridique'], profil['resultat'], profil['charges'], profil['parts'], profil['plafond_per'],
+        per_max=profil['per_max'], madelin_max=profil['madelin_max'], girardin_max=profil['girardin_max'],
+        versement_pee=profil['versement_pee'], pas=profil['pas'], strategie=profil['strategie'],
+        type_activite=profil['type_activite'] if micro else None, acre=profil['acre'],
+        pack_fiscal=resoudre_pack(profil['annee_fiscale'])
+    )
+    verifier_nombres_finis(parametres)
+    if not parametres['parts'] > 0:
+        raise ValueError(f"Nombre de parts fiscales invalide ({profil['parts']}) : il doit être strictement positif")
+    if parametres['pas'] is not None and parametres['pas'] <= 0:
+        raise ValueError(f"Pas de balayage invalide ({profil['pas']}) : il doit être strictement positif")
+    return parametres
+
+
+def compacter_scenario(scenario):
+    """Scénario sans les détails par tranche ou par cotisation (clés *_detail)"""
+    if scenario is None:
+        return None
+    return {nom: valeur for nom, valeur in scenario.items() if not nom.endswith('_detail')}
+
+
+@lru_cache(maxsize=None)
+def _cache_processus(chemin_cache):
+    """Cache persistant d'un processus du pool (None si désactivé)"""
+    return ouvrir_cache(chemin_cache)
+
+
+def executer_tache(tache, chemin_cache=''):
+    """Calcule une tâche ('optimiser' ou 'scenario', paramètres normalisés, année fiscale, options)
+
+    Retourne un dictionnaire sérialisable : pour 'optimiser', nombre
+    d'évaluations, meilleur scénario et scénario de référence compacts, et
+    colonnes des scénarios si les options les demandent (True : toutes, ou
+    liste de noms) ; pour 'scenario', le scénario compact.
+    """
+    nature, parametres, annee_fiscale, options = tache
+    # Enregistre le pack dans ce processus (les paramètres ne portent que son empreinte)
+    resoudre_pack(annee_fiscale)
+
+    if nature == 'scenario':
+        optimiseur = optimiseur_depuis_parametres(parametres)
+        kwargs = dict(options)
+        if parametres['forme_juridique'] == 'Micro-entreprise':
+            kwargs.update(type_activite=parametres['type_activite'], acre=parametres['acre'])
+        return {'scenario': compacter_scenario(optimiseur.calculer_scenario(details=False, **kwargs))}
+
+    cache = _cache_processus(chemin_cache)
+    if cache is not None:
+        optimiseur, meilleur, scenarios, reference = executer_optimisation_persistante(parametres, cache)
+    else:
+        optimiseur, meilleur, scenarios, reference = executer_optimisation(parametres)
+    resultat = {
+        'nb_evaluations': optimiseur.derniere_optimisation['nb_evaluations'],
+        'meilleur': compacter_scenario(meilleur),
+        'reference': compacter_scenario(reference),
+    }
+    if options:
+        noms = list(scenarios.colonnes) if options is True else options
+        inconnues = [nom for nom in noms if nom not in scenarios]
+        if inconnues:
+            raise ValueError(f"Colonne '{inconnues[0]}' non supportée. Choix disponibles: {list(scenarios.colonnes)}")
+        resultat['scenarios'] = {'remuneration': scenarios.remunerations.tolist(),
+                                 **{nom: scenarios.colonne(nom).tolist() for nom in noms}}
+    return resultat
+
+
+def _executer_paquet(taches, chemin_cache):
+    """Point d'entrée des processus du pool : un résultat (ou une ValueError) par tâche du paquet"""
+    resultats = []
+    for tache in taches:
+        try:
+            resultats.append(executer_tache(tache, chemin_cache))
+        except (ValueError, TypeError) as erreur:
+            resultats.append(ValueError(str(erreur)))
+    return resultats
+
+
+def _valeur_json(valeur):
+    """Scalaires NumPy des scénarios convertis en nombres Python"""
+    return valeur.item()
+
+
+def encoder_json(objet):
+    return json.dumps(objet, separators=(',', ':'), ensure_ascii=False, default=_valeur_json).encode()
+
+
+class ServiceOptimisation:
+    """Service d'optimisation : routes JSON, fusion des requêtes en vol et pool de processus
+
+    Les calculs (optimisations, scénarios) sont exécutés par un
+    ProcessPoolExecutor de `jobs` processus ; une requête identique à une
+    requête encore en cours de calcul (même clé canonique) attend son résultat
+    au lieu de relancer le calcul. Les profils d'un lot sont envoyés au pool
+    par paquets (PAQUETS_PAR_PROCESSUS par processus). Les optimisations sont
+    servies par le cache persistant `chemin_cache` (partagé avec l'interface ;
+    chaîne vide : désactivé).
+
+    Routes :
+      GET  /sante          état du service
+      GET  /statistiques   requêtes, calculs lancés, requêtes fusionnées, calculs en vol
+      POST /optimiser      profil (CHAMPS_PROFIL) ; "scenarios": true ou liste de colonnes
+      POST /scenario       profil et CHAMPS_SCENARIO : un scénario à une rémunération donnée
+      POST /lot            {"profils": [...], "defauts": {...}, "colonnes": false}
+    """
+
+    ROUTES = {
+        '/sante': ('GET', 'route_sante'),
+        '/statistiques': ('GET', 'route_statistiques'),
+        '/optimiser': ('POST', 'route_optimiser'),
+        '/scenario': ('POST', 'route_scenario'),
+        '/lot': ('POST', 'route_lot'),
+    }
+
+    def __init__(self, jobs=None, chemin_cache=CACHE_DISQUE_CHEMIN):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.chemin_cache = chemin_cache or ''
+        self.executeur = None
+        self.serveur = None
+        self.connexions = {}
+        self.en_vol = {}
+        self.statistiques = {'requetes': 0, 'calculs': 0, 'fusionnees': 0}
+
+    def demarrer(self):
+        if self.executeur is None:
+            self.executeur = ProcessPoolExecutor(max_workers=self.jobs)
+
+    def arreter(self):
+        if self.executeur is not None:
+            self.executeur.shutdown()
+            self.executeur = None
+
+    async def calculer(self, taches):
+        """Résultats (ou exceptions) d'une liste de (clé, tâche), dans l'ordre
+
+        Les tâches déjà en vol sont fusionnées ; les autres sont envoyées au
+        pool par paquets. Un client qui abandonne n'annule pas un calcul
+        attendu par d'autres.
+        """
+        boucle = asyncio.get_running_loop()
+        attentes, nouvelles = [], []
+        for cle, tache in taches:
+            future = self.en_vol.get(cle)
+            if future is None:
+                future = boucle.create_future()
+                self.en_vol[cle] = future
+                nouvelles.append((cle, tache, future))
+                self.statistiques['calculs'] += 1
+            else:
+                self.statistiques['fusionnees'] += 1
+            attentes.append(future)
+
+        taille_paquet = max(1, len(nouvelles) // (PAQUETS_PAR_PROCESSUS * self.jobs))
+        for debut in range(0, len(nouvelles), taille_paquet):
+            boucle.create_task(self._executer_paquet(nouvelles[debut:debut + taille_paquet]))
+        return await asyncio.gather(*(asyncio.shield(future) for future in attentes), return_exceptions=True)
+
+    async def _executer_paquet(self, paquet):
+        boucle = asyncio.get_running_loop()
+        try:
+            resultats = await boucle.run_in_executor(self.executeur, _executer_paquet,
+                                                     [tache for _, tache, _ in paquet], self.chemin_cache)
+        except Exception as erreur:  # pool interrompu : chaque requête du paquet reçoit l'erreur
+            resultats = [erreur] * len(paquet)
+        for (cle, _, future), resultat in zip(paquet, resultats):
+            del self.en_vol[cle]
+            if isinstance(resultat, Exception):
+                future.set_exception(resultat)
+            else:
+                future.set_result(resultat)
+
+    async def traiter(self, methode, chemin, corps=b''):
+        """Traite une requête et retourne (statut HTTP, objet JSON de la réponse)"""
+        self.statistiques['requetes'] += 1
+        route = self.ROUTES.get(chemin.split('?', 1)[0])
+        try:
+            if route is None:
+                raise ErreurRequete(404, f"Route '{chemin}' non supportée. Choix disponibles: {list(self.ROUTES)}")
+            if methode != route[0]:
+                raise ErreurRequete(405, f"Méthode {methode} non supportée pour {chemin} (attendue: {route[0]})")
+            objet = None
+            if methode == 'POST':
+                try:
+                    objet = json.loads(corps or b'{}')
+                except ValueError as erreur:
+                    raise ErreurRequete(400, f"Corps JSON invalide ({erreur})") from None
+            return 200, await getattr(self, route[1])(objet)
+        except ErreurRequete as erreur:
+            return erreur.statut, {'erreur': erreur.message}
+        except Exception as erreur:
+            # Erreur imprévue : le client reçoit une réponse et la connexion reste servie
+            print(f"Erreur: {methode} {chemin} ({type(erreur).__name__}: {erreur})", file=sys.stderr)
+            return 500, {'erreur': f"Erreur interne ({type(erreur).__name__}: {erreur})"}
+
+    async def route_sante(self, _):
+        return {'statut': 'ok', 'processus': self.jobs}
+
+    async def route_statistiques(self, _):
+        return dict(self.statistiques, en_vol=len(self.en_vol))
+
+    def _tache_optimiser(self, objet):
+        """(clé, tâche) d'un profil à optimiser ; ValueError si le profil est invalide"""
+        if not isinstance(objet, dict):
+            raise ValueError("Un profil doit être un objet JSON")
+        options = objet.get('scenarios', False)
+        profil = lire_champs({nom: valeur for nom, valeur in objet.items() if nom != 'scenarios'}, CHAMPS_PROFIL)
+        parametres = parametres_profil(profil)
+        cle = cle_canonique({'nature': 'optimiser', 'parametres': parametres, 'options': options})
+        return cle, ('optimiser', parametres, profil['annee_fiscale'], options)
+
+    @staticmethod
+    def _resultat(resultat):
+        if isinstance(resultat, ValueError):
+            raise ErreurRequete(400, str(resultat))
+        if isinstance(resultat, Exception):
+            raise ErreurRequete(500, f"Calcul impossible ({resultat})")
+        return resultat
+
+    async def route_optimiser(self, objet):
+        try:
+            cle, tache = self._tache_optimiser(objet)
+        except (ValueError, TypeError, OverflowError) as erreur:
+            raise ErreurRequete(400, str(erreur)) from None
+        resultat, = await self.calculer([(cle, tache)])
+        return dict(self._resultat(resultat), cle=cle_canonique(tache[1]))
+
+    async def route_scenario(self, objet):
+        try:
+            champs = lire_champs(objet, {**CHAMPS_PROFIL, **CHAMPS_SCENARIO})
+            parametres = parametres_profil(champs)
+            kwargs = {'remuneration': float(champs['remuneration']), 'per_montant': float(champs['per_montant']),
+                      'madelin_montant': float(champs['madelin_montant']),
+                      'girardin_montant': float(champs['girardin_montant']),
+                      'versement_pee': parametres['versement_pee']}
+            verifier_nombres_finis(kwargs)
+        except (ValueError, TypeError, OverflowError) as erreur:
+            raise ErreurRequete(400, str(erreur)) from None
+        cle = cle_canonique({'nature': 'scenario', 'parametres': parametres, 'options': kwargs})
+        resultat, = await self.calculer([(cle, ('scenario', parametres, champs['annee_fiscale'], kwargs))])
+        return self._resultat(resultat)
+
+    async def route_lot(self, objet):
+        """Optimise chaque profil (défauts communs fusionnés) ; une erreur par profil invalide
+
+        Réponse {"resultats": [...]} dans l'ordre des profils, ou avec
+        "colonnes": true, {"colonnes": {champ: [valeur par profil]}} : client,
+        forme juridique, nombre d'évaluations, erreur et champs numériques du
+        meilleur scénario.
+        """
+        if not isinstance(objet, dict) or not isinstance(objet.get('profils'), list):
+            raise ErreurRequete(400, "Le corps d'un lot doit contenir 'profils' (liste de profils)")
+        defauts = objet.get('defauts') or {}
+        if not isinstance(defauts, dict):
+            raise ErreurRequete(400, "'defauts' doit être un objet JSON")
+        resultats = [None] * len(objet['profils'])
+        taches, indices = [], []
+        for indice, profil in enumerate(objet['profils']):
+            profil = dict(defauts, **profil) if isinstance(profil, dict) else profil
+            client = profil.pop('client', None) if isinstance(profil, dict) else None
+            resultats[indice] = {'client': client}
+            try:
+                taches.append(self._tache_optimiser(profil))
+                indices.append(indice)
+                resultats[indice]['forme_juridique'] = profil['forme_juridique']
+            except (ValueError, TypeError, OverflowError) as erreur:
+                resultats[indice]['erreur'] = str(erreur)
+
+        for indice, resultat in zip(indices, await self.calculer(taches)):
+            try:
+                resultats[indice].update(self._resultat(resultat))
+            except ErreurRequete as erreur:
+                resultats[indice]['erreur'] = erreur.message
+
+        if not objet.get('colonnes'):
+            return {'resultats': resultats}
+        return {'colonnes': resultats_en_colonnes(resultats)}
+
+    async def connexion(self, lecteur, ecrivain):
+        """Sert les requêtes d'une connexion (HTTP/1.1, connexion persistante sauf 'Connection: close')"""
+        self.connexions[ecrivain] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    requete = await lire_requete(lecteur)
+                except ErreurRequete as erreur:
+                    ecrivain.write(reponse_http(erreur.statut, {'erreur': erreur.message}, garder=False))
+                    break
+                if requete is None:
+                    break
+                methode, chemin, entetes, corps = requete
+                statut, objet = await self.traiter(methode, chemin, corps)
+                garder = entetes.get('connection', '').lower() != 'close'
+                ecrivain.write(reponse_http(statut, objet, garder))
+                await ecrivain.drain()
+                if not garder:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.connexions[ecrivain]
+            ecrivain.close()
+
+    async def servir(self, hote=HOTE_DEFAUT, port=PORT_DEFAUT):
+        """Démarre le pool et le serveur HTTP ; retourne le serveur asyncio (port 0 : port libre)"""
+        self.demarrer()
+        self.serveur = await asyncio.start_server(self.connexion, hote, port)
+        return self.serveur
+
+    async def fermer(self):
+        """Ferme le serveur et les connexions ouvertes, attend la fin de leur traitement puis arrête le pool"""
+        if self.serveur is not None:
+            self.serveur.close()
+            taches = list(self.connexions.values())
+            for ecrivain in list(self.connexions):
+                ecrivain.close()
+            await asyncio.gather(*taches, return_exceptions=True)
+            await self.serveur.wait_closed()
+            self.serveur = None
+        self.arreter()
+
+
+def resultats_en_colonnes(resultats):
+    """Résultats d'un lot en colonnes : client, forme, évaluations, erreur puis champs numériques du meilleur"""
+    champs = []
+    for resultat in resultats:
+        for nom, valeur in (resultat.get('meilleur') or {}).items():
+            if isinstance(valeur, (int, float)) and not isinstance(valeur, bool) and nom not in champs:
+                champs.append(nom)
+    colonnes = {nom: [resultat.get(nom) for resultat in resultats]
+                for nom in ('client', 'forme_juridique', 'nb_evaluations', 'erreur')}
+    for nom in champs:
+        colonnes[nom] = [(resultat.get('meilleur') or {}).get(nom) for resultat in resultats]
+    return colonnes
+
+
+async def lire_requete(lecteur):
+    """Lit une requête HTTP ; retourne (méthode, chemin, entêtes, corps) ou None en fin de connexion"""
+    ligne = await lecteur.readline()
+    if not ligne:
+        return None
+    try:
+        methode, chemin, _ = ligne.decode('latin-1').split()
+    except ValueError:
+        raise ErreurRequete(400, "Ligne de requête HTTP invalide") from None
+    entetes = {}
+    while True:
+        ligne = await lecteur.readline()
+        if ligne in (b'\r\n', b'\n', b''):
+            break
+        nom, _, valeur = ligne.decode('latin-1').partition(':')
+        entetes[nom.strip().lower()] = valeur.strip()
+    valeur = entetes.get('content-length') or '0'
+    if not (valeur.isascii() and valeur.isdigit()):
+        raise ErreurRequete(400, f"Entête Content-Length invalide ('{valeur}')")
+    longueur = int(valeur)
+    if longueur > TAILLE_MAX_CORPS:
+        raise ErreurRequete(413, f"Corps de {longueur} octets (maximum {TAILLE_MAX_CORPS})")
+    corps = await lecteur.readexactly(longueur) if longueur else b''
+    return methode, chemin, entetes, corps
+
+
+def reponse_http(statut, objet, garder=True):
+    """Réponse HTTP/1.1 JSON compacte"""
+    corps = encoder_json(objet)
+    entete = (f"HTTP/1.1 {statut} {RAISONS_HTTP.get(statut, '')}\r\n"
+              f"Content-Type: application/json; charset=utf-8\r\n"
+              f"Content-Length: {len(corps)}\r\n"
+              f"Connection: {'keep-alive' if garder else 'close'}\r\n\r\n")
+    return entete.encode('latin-1') + corps
+
+
+async def requete_http(lecteur, ecrivain, methode, chemin, objet=None):
+    """Client : envoie une requête JSON sur une connexion ouverte (persistante) et retourne (statut, objet)"""
+    corps = encoder_json(objet) if objet is not None else b''
+    ecrivain.write(f"{methode} {chemin} HTTP/1.1\r\nHost: service\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(corps)}\r\n\r\n".encode('latin-1') + corps)
+    await ecrivain.drain()
+    statut = int((await lecteur.readline()).split()[1])
+    longueur = 0
+    while True:
+        ligne = await lecteur.readline()
+        if ligne in (b'\r\n', b'\n', b''):
+            break
+        nom, _, valeur = ligne.decode('latin-1').partition(':')
+        if nom.strip().lower() == 'content-length':
+            longueur = int(valeur)
+    return statut, json.loads(await lecteur.readexactly(longueur))
+
+
+async def _servir(args):
+    service = ServiceOptimisation(args.jobs, args.cache)
+    serveur = await service.servir(args.hote, args.port)
+    hote, port = serveur.sockets[0].getsockname()[:2]
+    print(f"Service d'optimisation sur http://{hote}:{port} ({service.jobs} processus)", file=sys.stderr)
+    try:
+        await serveur.serve_forever()
+    finally:
+        await service.fermer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Service HTTP/JSON d\'optimisation fiscale')
+    parser.add_argument('--hote', default=HOTE_DEFAUT,
+                        help=f'Adresse d\'écoute (défaut: {HOTE_DEFAUT})')
+    parser.add_argument('--port', type=int, default=PORT_DEFAUT,
+                        help=f'Port d\'écoute (défaut: {PORT_DEFAUT})')
+    parser.add_argument('--jobs', '-j', type=int,
+                        help='Nombre de processus de calcul (défaut: nombre de CPU)')
+    parser.add_argument('--cache', default=CACHE_DISQUE_CHEMIN,
+                        help='Cache persistant des optimisations (défaut: celui de l\'interface ; vide : désactivé)')
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(_servir(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
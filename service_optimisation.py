@@ -0,0 +1,253 @@
+"""
+Service d'optimisation : paramètres normalisés, clé canonique et exécution d'une optimisation
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+
+from cache_persistant import ouvrir_cache
+from formes_juridiques import creer_optimiseur
+from grille_scenarios import ScenarioGrid
+from packs_fiscaux import resoudre_pack
+
+# Cache de l'interface : nombre d'optimisations conservées et durée de vie (secondes)
+CACHE_MAX_ENTREES = 256
+CACHE_TTL = 3600
+
+# Cache persistant des optimisations, partagé entre processus et redémarrages (variable vide : désactivé)
+CACHE_DISQUE_CHEMIN = os.environ.get('OPTIMISATION_CACHE_DISQUE',
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_resultats.sqlite'))
+CACHE_DISQUE_TAILLE_MAX = 256 * 2**20
+
+# Modules dont dépendent les résultats : leur contenu fait partie de la clé du cache persistant
+MODULES_CALCUL = ['parametres_fiscaux.py', 'packs_fiscaux.py', 'bareme.py', 'fiscal_base.py', 'fiscal_sarl.py',
+                  'fiscal_sas.py', 'fiscal_sarl_holding.py', 'fiscal_microentreprise.py', 'formes_juridiques.py',
+                  'grille_scenarios.py', 'strategies_optimisation.py', 'service_optimisation.py']
+
+# Résultat précalculé des paramètres par défaut de l'interface, affiché avant le premier calcul
+FICHIER_INSTANTANE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instantane_defaut.json')
+
+
+def normaliser_parametres(forme_juridique, resultat, charges=0, parts=1, plafond_per=None, per_max=0,
+                          madelin_max=0, girardin_max=0, versement_pee=0, pas=2500, strategie='balayage',
+                          type_activite=None, acre=False, pack_fiscal=None):
+    """Retourne les paramètres d'une optimisation sous forme canonique
+
+    Les montants sont convertis en nombres et les paramètres sans effet sont
+    neutralisés (type d'activité et ACRE hors micro-entreprise, pas pour la
+    stratégie des points de rupture) : deux demandes équivalentes donnent
+    exactement les mêmes paramètres, donc la même clé. Le pack fiscal (pack,
+    année ou empreinte ; année par défaut si absent) est représenté par son
+    empreinte : deux années différentes ne partagent jamais une clé.
+    """
+    micro = forme_juridique == 'Micro-entreprise'
+    return {
+        'forme_juridique': forme_juridique,
+        'resultat': int(resultat),
+        'charges': int(charges),
+        'parts': float(parts),
+        'plafond_per': None if plafond_per is None else float(plafond_per),
+        'per_max': float(per_max or 0),
+        'madelin_max': float(madelin_max or 0),
+        'girardin_max': float(girardin_max or 0),
+        'versement_pee': float(versement_pee or 0),
+        'pas': None if strategie == 'points_rupture' else int(pas),
+        'strategie': strategie,
+        'type_activite': type_activite if micro else None,
+        'acre': bool(acre) if micro else False,
+        'pack_fiscal': resoudre_pack(pack_fiscal).empreinte,
+    }
+
+
+def cle_canonique(parametres):
+    """Empreinte SHA-256 de paramètres normalisés (JSON trié, indépendant de l'ordre des clés)"""
+    return hashlib.sha256(json.dumps(parametres, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def executer_optimisation(parametres):
+    """Exécute l'optimisation décrite par des paramètres normalisés
+
+    Retourne (optimiseur, meilleur scénario, scénarios en ScenarioGrid, scénario
+    de référence sans optimisation à la même rémunération). Le meilleur scénario
+    vaut None si aucun scénario n'est valide.
+    """
+    optimiseur = optimiseur_depuis_parametres(parametres)
+
+    kwargs = {}
+    if parametres['forme_juridique'] == 'Micro-entreprise':
+        kwargs = {'type_activite': parametres['type_activite'], 'acre': parametres['acre']}
+
+    meilleur, scenarios = optimiseur.optimiser(
+        pas=parametres['pas'] or 5000,
+        strategie=parametres['strategie'],
+        per_max=parametres['per_max'],
+        madelin_max=parametres['madelin_max'],
+        girardin_max=parametres['girardin_max'],
+        versement_pee=parametres['versement_pee'],
+        colonnaire=True,
+        **kwargs
+    )
+
+    scenario_reference = None
+    if meilleur is not None:
+        # Totaux seulement, sans détails ni optimisations personnelles
+        kwargs.pop('acre', None)
+        scenario_reference = optimiseur.calculer_scenario(meilleur['remuneration_brute'], details=False, **kwargs)
+
+    return optimiseur, meilleur, scenarios, scenario_reference
+
+
+def optimiseur_depuis_parametres(parametres):
+    """Optimiseur (sans calcul) de paramètres normalisés"""
+    return creer_optimiseur(
+        parametres['forme_juridique'],
+        resultat_avant_remuneration=parametres['resultat'],
+        charges_existantes=parametres['charges'],
+        parts_fiscales=parametres['parts'],
+        plafond_per_disponible=parametres['plafond_per'],
+        pack_fiscal=parametres['pack_fiscal']
+    )
+
+
+@lru_cache(maxsize=None)
+def empreinte_calculs():
+    """Empreinte SHA-256 du code de calcul (MODULES_CALCUL) : change à chaque modification des calculs"""
+    empreinte = hashlib.sha256()
+    repertoire = os.path.dirname(os.path.abspath(__file__))
+    for module in MODULES_CALCUL:
+        with open(os.path.join(repertoire, module), 'rb') as fichier:
+            empreinte.update(fichier.read())
+    return empreinte.hexdigest()
+
+
+def cle_cache_disque(parametres):
+    """Clé du cache persistant : clé canonique des paramètres (pack fiscal compris) et empreinte du code"""
+    return hashlib.sha256(f"{empreinte_calculs()}:{cle_canonique(parametres)}".encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def cache_disque():
+    """Cache persistant partagé du processus (None si désactivé)"""
+    return ouvrir_cache(CACHE_DISQUE_CHEMIN, CACHE_DISQUE_TAILLE_MAX)
+
+
+def executer_optimisation_persistante(parametres, cache=None):
+    """executer_optimisation() servie par le cache persistant quand le résultat y est déjà
+
+    Le meilleur scénario, les colonnes des scénarios et le scénario de
+    référence sont enregistrés sous cle_cache_disque() ; à la lecture,
+    l'optimiseur est recréé sans calcul et la ScenarioGrid reconstruite sur
+    ses colonnes. `cache` : CachePersistant (défaut : cache_disque()).
+    """
+    cache = cache if cache is not None else cache_disque()
+    if cache is None:
+        return executer_optimisation(parametres)
+
+    cle = cle_cache_disque(parametres)
+    entree = cache.lire(cle)
+    if entree is not None:
+        optimiseur = optimiseur_depuis_parametres(parametres)
+        optimiseur.derniere_optimisation = entree['derniere_optimisation']
+        scenarios = ScenarioGrid(optimiseur, entree['remunerations'], entree['colonnes'], entree['scenario_kwargs'])
+        return optimiseur, entree['meilleur'], scenarios, entree['scenario_reference']
+
+    optimiseur, meilleur, scenarios, scenario_reference = executer_optimisation(parametres)
+    cache.ecrire(cle, {
+        'meilleur': meilleur,
+        'scenario_reference': scenario_reference,
+        'derniere_optimisation': optimiseur.derniere_optimisation,
+        'remunerations': scenarios.remunerations,
+        'colonnes': scenarios.colonnes,
+        'scenario_kwargs': scenarios.scenario_kwargs,
+    })
+    return optimiseur, meilleur, scenarios, scenario_reference
+
+
+def parametres_comparaison(parametres):
+    """Paramètres de comparer_formes() déduits de paramètres normalisés (indépendants de la forme choisie)"""
+    return {
+        'resultat_avant_remuneration': parametres['resultat'],
+        'charges_existantes': parametres['charges'],
+        'parts_fiscales': parametres['parts'],
+        'plafond_per_disponible': parametres['plafond_per'],
+        'per_max': parametres['per_max'],
+        'madelin_max': parametres['madelin_max'],
+        'girardin_max': parametres['girardin_max'],
+        'versement_pee': parametres['versement_pee'],
+        'pas': parametres['pas'] or 2500,
+        'type_activite': parametres['type_activite'] or 'BIC - Prestations de services',
+        'acre': parametres['acre'],
+        'pack_fiscal': parametres['pack_fiscal'],
+    }
+
+
+def executer_comparaison(parametres_formes):
+    """Compare toutes les formes juridiques (voir comparaison_formes.comparer_formes())"""
+    from comparaison_formes import comparer_formes
+    return comparer_formes(**parametres_formes)
+
+
+def parametres_defaut_interface(pack_fiscal=None):
+    """Paramètres normalisés du premier affichage de l'interface
+
+    SARL + Holding, 300 000 € de résultat, 50 000 € de charges, 2 parts, sans
+    optimisation personnelle, balayage au pas de 1 000 €.
+    """
+    pack = resoudre_pack(pack_fiscal)
+    return normaliser_parametres('SARL + Holding', 300000, 50000, 2.0, pack.PLAFOND_PER, pas=1000, pack_fiscal=pack)
+
+
+def generer_instantane(parametres, chemin=FICHIER_INSTANTANE):
+    """Enregistre en JSON le meilleur scénario et le scénario de référence d'une optimisation
+
+    L'instantané est indexé par la clé canonique des paramètres (empreinte du
+    pack fiscal comprise) : il n'est plus servi dès qu'un paramètre ou une
+    donnée fiscale change.
+    """
+    optimiseur, meilleur, _, scenario_reference = executer_optimisation(parametres)
+    contenu = {
+        'cle': cle_canonique(parametres),
+        'parametres': parametres,
+        'nb_evaluations': optimiseur.derniere_optimisation['nb_evaluations'],
+        'meilleur': meilleur,
+        'scenario_reference': scenario_reference,
+    }
+    with open(chemin, 'w', encoding='utf-8') as fichier:
+        # Scalaires NumPy convertis en nombres Python
+        json.dump(contenu, fichier, indent=1, ensure_ascii=False, default=lambda valeur: valeur.item())
+        fichier.write('\n')
+    _lire_instantane.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _lire_instantane(chemin):
+    """Contenu d'un instantané (lu une fois par processus ; None si le fichier n'existe pas)"""
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def charger_instantane(cle, chemin=FICHIER_INSTANTANE):
+    """Instantané précalculé si sa clé canonique est `cle`, sinon None"""
+    instantane = _lire_instantane(chemin)
+    return instantane if instantane is not None and instantane['cle'] == cle else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Régénère le résultat précalculé des paramètres par défaut de l\'interface')
+    parser.add_argument('-o', '--output', default=FICHIER_INSTANTANE,
+                        help='Fichier JSON de l\'instantané (défaut: instantane_defaut.json)')
+    parser.add_argument('--annee', help='Année fiscale (défaut: année par défaut des packs)')
+
+    args = parser.parse_args()
+    generer_instantane(parametres_defaut_interface(args.annee), args.output)
+    print(f"Instantané écrit dans {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Stratégies de recherche de la rémunération optimale
+Alternatives au balayage de toute la plage de rémunération avec un pas fixe
+"""
+
+import math
+
+import numpy as np
+
+
+class EvaluateurLot:
+    """Évalue des lots de rémunérations avec les paramètres d'un scénario et compte les évaluations"""
+
+    def __init__(self, optimiseur, scenario_kwargs):
+        self.optimiseur = optimiseur
+        self.scenario_kwargs = scenario_kwargs
+        self.nb_evaluations = 0
+
+    def __call__(self, remunerations):
+        remunerations = np.asarray(remunerations)
+        self.nb_evaluations += remunerations.size
+        return self.optimiseur.evaluer_lot(remunerations, **self.scenario_kwargs)
+
+
+def fusionner_colonnes(remunerations, colonnes, nouvelles_remunerations, nouvelles_colonnes):
+    """Fusionne deux lots évalués et les trie par rémunération croissante (sans doublon)"""
+    toutes = np.concatenate((remunerations, nouvelles_remunerations))
+    toutes, indices = np.unique(toutes, return_index=True)
+    return toutes, {
+        nom: np.concatenate((valeurs, nouvelles_colonnes[nom]))[indices]
+        for nom, valeurs in colonnes.items()
+    }
+
+
+def _resoudre_seuils(evaluer, seuils_rupture, borne_min, borne_max):
+    """Pour chaque seuil, plus petite rémunération entière dont la colonne dépasse le seuil
+
+    Chaque colonne étant monotone et linéaire par morceaux, on encadre la
+    rémunération cherchée en évaluant à chaque itération, pour tous les seuils
+    à la fois, les deux entiers autour de l'interpolation linéaire et le milieu
+    de l'intervalle : un morceau linéaire est résolu en une itération et
+    l'intervalle est au moins divisé par deux sinon.
+    """
+    noms = []
+    signes = []
+    cibles = []
+    for nom, croissante, seuils in seuils_rupture:
+        signe = 1.0 if croissante else -1.0
+        for seuil in seuils:
+            noms.append(nom)
+            signes.append(signe)
+            cibles.append(signe * seuil)
+    if not noms:
+        return np.array([], dtype=np.int64)
+
+    noms = np.array(noms)
+    signes = np.array(signes)
+    cibles = np.array(cibles)
+
+    def valeurs_colonnes(colonnes, indices_seuils, indices_points):
+        valeurs = np.empty(len(indices_seuils))
+        for nom in np.unique(noms[indices_seuils]):
+            masque = noms[indices_seuils] == nom
+            valeurs[masque] = colonnes[nom][indices_points[masque]]
+        return signes[indices_seuils] * valeurs
+
+    # Invariant : valeur(bas) <= cible < valeur(haut)
+    extremites = evaluer(np.array([borne_min, borne_max]))
+    tous = np.arange(len(cibles))
+    valeurs_bas = valeurs_colonnes(extremites, tous, np.zeros(len(cibles), dtype=int))
+    valeurs_haut = valeurs_colonnes(extremites, tous, np.ones(len(cibles), dtype=int))
+    encadres = (valeurs_bas <= cibles) & (cibles < valeurs_haut)
+
+    noms, signes, cibles = noms[encadres], signes[encadres], cibles[encadres]
+    valeurs_bas, valeurs_haut = valeurs_bas[encadres], valeurs_haut[encadres]
+    bas = np.full(len(cibles), borne_min, dtype=np.int64)
+    haut = np.full(len(cibles), borne_max, dtype=np.int64)
+
+    actifs = np.flatnonzero(haut - bas > 1)
+    while len(actifs):
+        b, h = bas[actifs], haut[actifs]
+        interpolation = b + (cibles[actifs] - valeurs_bas[actifs]) * (h - b) / (valeurs_haut[actifs] - valeurs_bas[actifs])
+        points = np.stack((np.floor(interpolation), np.floor(interpolation) + 1, (b + h) // 2), axis=1)
+        points = np.clip(points, (b + 1)[:, None], (h - 1)[:, None]).astype(np.int64)
+
+        colonnes = evaluer(points.ravel())
+        for j in range(points.shape[1]):
+            indices_points = np.arange(len(actifs)) * points.shape[1] + j
+            valeurs = valeurs_colonnes(colonnes, actifs, indices_points)
+            sous_cible = valeurs <= cibles[actifs]
+            remonte = sous_cible & (points[:, j] > bas[actifs])
+            bas[actifs[remonte]] = points[remonte, j]
+            valeurs_bas[actifs[remonte]] = valeurs[remonte]
+            descend = ~sous_cible & (points[:, j] < haut[actifs])
+            haut[actifs[descend]] = points[descend, j]
+            valeurs_haut[actifs[descend]] = valeurs[descend]
+
+        actifs = actifs[haut[actifs] - bas[actifs] > 1]
+
+    return haut
+
+
+def _sommets_quadratiques(evaluer, metrique, remunerations, valeurs, intervalles):
+    """Rémunérations entières autour du maximum de chaque segment quadratique
+
+    Entre deux candidats consécutifs situés dans un intervalle non linéaire, la
+    métrique est un polynôme de degré 2 : on l'interpole sur les deux extrémités
+    et le milieu, puis on retient les entiers encadrant le sommet s'il est
+    concave et intérieur.
+    """
+    x0, x2 = remunerations[:-1], remunerations[1:]
+    milieux = (x0 + x2) / 2
+    dans_intervalle = np.zeros(len(x0), dtype=bool)
+    for debut, fin in intervalles:
+        dans_intervalle |= (milieux > debut) & (milieux < fin)
+    segments = np.flatnonzero(dans_intervalle & (x2 - x0 > 2))
+    if not len(segments):
+        return np.array([], dtype=np.int64), None
+
+    x0, x2 = x0[segments], x2[segments]
+    y0, y2 = valeurs[segments], valeurs[segments + 1]
+    x1 = (x0 + x2) // 2
+    colonnes_milieux = evaluer(x1)
+    y1 = metrique(colonnes_milieux)
+
+    x0, x1, x2 = x0.astype(float), x1.astype(float), x2.astype(float)
+    denominateur = (x0 - x1) * (x0 - x2) * (x1 - x2)
+    a = (x2 * (y1 - y0) + x1 * (y0 - y2) + x0 * (y2 - y1)) / denominateur
+    b = (x2 ** 2 * (y0 - y1) + x1 ** 2 * (y2 - y0) + x0 ** 2 * (y1 - y2)) / denominateur
+    concaves = a < 0
+    sommets = -b[concaves] / (2 * a[concaves])
+    interieurs = (sommets > x0[concaves]) & (sommets < x2[concaves])
+    sommets = sommets[interieurs]
+
+    points = np.concatenate((x1.astype(np.int64), np.floor(sommets).astype(np.int64), np.ceil(sommets).astype(np.int64)))
+    return points, (x1.astype(np.int64), colonnes_milieux)
+
+
+def _frontieres_validite(evaluer, masque_valide, remunerations, valides):
+    """Rémunérations entières de part et d'autre de chaque changement de validité entre deux candidats"""
+    changements = np.flatnonzero(valides[:-1] != valides[1:])
+    bas = remunerations[changements].astype(np.int64)
+    haut = remunerations[changements + 1].astype(np.int64)
+    valide_bas = valides[changements]
+
+    actifs = np.flatnonzero(haut - bas > 1)
+    while len(actifs):
+        milieux = (bas[actifs] + haut[actifs]) // 2
+        valides_milieux = masque_valide(evaluer(milieux))
+        cote_bas = valides_milieux == valide_bas[actifs]
+        bas[actifs[cote_bas]] = milieux[cote_bas]
+        haut[actifs[~cote_bas]] = milieux[~cote_bas]
+        actifs = actifs[haut[actifs] - bas[actifs] > 1]
+
+    return np.concatenate((bas, haut))
+
+
+def rechercher_points_rupture(optimiseur, scenario_kwargs):
+    """Optimum exact à l'euro par énumération des points de rupture de la forme juridique
+
+    Toutes les composantes du total net (barèmes IR et IS, plafonds, abattements,
+    PEE, Girardin) sont linéaires par morceaux en la rémunération, sauf la rampe
+    des allocations familiales qui est quadratique : le maximum est donc atteint
+    en un point de rupture, une extrémité de la plage, un sommet de segment
+    quadratique ou une frontière de validité. Seuls ces points sont évalués.
+
+    Retourne (rémunérations évaluées triées, colonnes, nombre d'évaluations).
+    """
+    evaluer = EvaluateurLot(optimiseur, scenario_kwargs)
+    plage = optimiseur.get_range_remuneration(1)
+    if not len(plage):
+        # Plage vide (charges supérieures au résultat) : aucun scénario, comme le balayage
+        remunerations = np.empty(0, dtype=np.int64)
+        return remunerations, evaluer(remunerations), evaluer.nb_evaluations
+    borne_min, borne_max = int(plage[0]), int(plage[-1])
+
+    # 1. Points de rupture connus directement et seuils de colonnes monotones
+    candidats = [borne_min, borne_max]
+    for point in optimiseur.get_points_rupture(**scenario_kwargs):
+        candidats += [math.floor(point), math.ceil(point)]
+    if borne_max > borne_min:
+        for remuneration in _resoudre_seuils(evaluer, optimiseur.get_seuils_rupture(**scenario_kwargs),
+                                             borne_min, borne_max):
+            candidats += [remuneration - 1, remuneration]
+    remunerations = np.unique(np.clip(np.array(candidats, dtype=np.int64), borne_min, borne_max))
+    colonnes = evaluer(remunerations)
+
+    # 2. Sommets des segments quadratiques
+    points, evaluation_milieux = _sommets_quadratiques(
+        evaluer, optimiseur.metrique_vectorisee, remunerations, optimiseur.metrique_vectorisee(colonnes),
+        optimiseur.get_intervalles_non_lineaires(**scenario_kwargs)
+    )
+    if evaluation_milieux is not None:
+        remunerations, colonnes = fusionner_colonnes(remunerations, colonnes, *evaluation_milieux)
+        nouveaux = np.setdiff1d(points, remunerations)
+        if len(nouveaux):
+            remunerations, colonnes = fusionner_colonnes(remunerations, colonnes, nouveaux, evaluer(nouveaux))
+
+    # 3. Frontières de validité (ex. dividendes qui deviennent négatifs)
+    valides = optimiseur.masque_valide_vectorise(colonnes)
+    nouveaux = np.setdiff1d(_frontieres_validite(evaluer, optimiseur.masque_valide_vectorise, remunerations, valides),
+                            remunerations)
+    if len(nouveaux):
+        remunerations, colonnes = fusionner_colonnes(remunerations, colonnes, nouveaux, evaluer(nouveaux))
+
+    return remunerations, colonnes, evaluer.nb_evaluations
+
+
+def rechercher_adaptatif(optimiseur, scenario_kwargs, pas, precision=1, nb_intervalles=3, subdivisions=10):
+    """Balayage grossier puis raffinement récursif autour des meilleurs candidats
+
+    Le balayage initial utilise le pas `pas` sur la plage de rémunération. À
+    chaque itération, les `nb_intervalles` meilleurs maxima locaux (et non les
+    seuls meilleurs points, pour ne pas rester sur un maximum local) sont
+    raffinés : l'intervalle entre leurs voisins est redécoupé en `subdivisions`
+    pas, jusqu'à ce que leurs voisins soient à moins de `precision` euros.
+
+    Retourne (rémunérations évaluées triées, colonnes, nombre d'évaluations).
+    """
+    evaluer = EvaluateurLot(optimiseur, scenario_kwargs)
+    plage_complete = optimiseur.get_range_remuneration(1)
+    if not len(plage_complete):
+        # Plage vide (charges supérieures au résultat) : aucun scénario, comme le balayage
+        remunerations = np.empty(0, dtype=np.int64)
+        return remunerations, evaluer(remunerations), evaluer.nb_evaluations
+    borne_min, borne_max = int(plage_complete[0]), int(plage_complete[-1])
+
+    remunerations = np.unique(np.append(np.asarray(list(optimiseur.get_range_remuneration(pas)), dtype=np.int64),
+                                        [borne_min, borne_max]))
+    colonnes = evaluer(remunerations)
+    precision = max(1, int(precision))
+
+    while len(remunerations) > 1:
+        valeurs = np.where(optimiseur.masque_valide_vectorise(colonnes),
+                           optimiseur.metrique_vectorisee(colonnes), -np.inf)
+        if not np.isfinite(valeurs).any():
+            break
+
+        # Maxima locaux (les extrémités ne sont comparées qu'à leur unique voisin)
+        voisins = np.concatenate(([-np.inf], valeurs, [-np.inf]))
+        maxima = np.flatnonzero((valeurs >= voisins[:-2]) & (valeurs >= voisins[2:]) & np.isfinite(valeurs))
+        meilleurs = maxima[np.argsort(-valeurs[maxima], kind='stable')[:nb_intervalles]]
+
+        gauches = remunerations[np.maximum(meilleurs - 1, 0)]
+        droites = remunerations[np.minimum(meilleurs + 1, len(remunerations) - 1)]
+        a_raffiner = np.maximum(remunerations[meilleurs] - gauches, droites - remunerations[meilleurs]) > precision
+        if not a_raffiner.any():
+            break
+
+        nouveaux = np.concatenate([
+            np.round(np.linspace(gauche, droite, 2 * subdivisions + 1)).astype(np.int64)
+            for gauche, droite in zip(gauches[a_raffiner], droites[a_raffiner])
+        ])
+        nouveaux = np.setdiff1d(nouveaux, remunerations)
+        if not len(nouveaux):
+            break
+        remunerations, colonnes = fusionner_colonnes(remunerations, colonnes, nouveaux, evaluer(nouveaux))
+
+    return remunerations, colonnes, evaluer.nb_evaluations
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Vérifie les barèmes compilés IR / IS contre un parcours des tranches de parametres_fiscaux
+"""
+
+import numpy as np
+import pytest
+
+from bareme import BaremeCompile
+from parametres_fiscaux import BAREME_IR, BAREME_IS, TRANCHES_IR, TRANCHES_IS
+
+
+def ir_par_tranches(revenu_par_part):
+    impot, debut = 0, 0
+    for tranche in TRANCHES_IR:
+        impot += max(0, min(revenu_par_part, tranche['limite']) - debut) * tranche['taux']
+        debut = tranche['limite']
+    return impot
+
+
+def is_par_tranches(benefice):
+    impot = 0
+    for tranche in TRANCHES_IS:
+        montant = max(0, min(benefice, tranche['limite']))
+        impot += montant * tranche['taux']
+        benefice -= montant
+    return impot
+
+
+MONTANTS = [-100, 0, 5000, 11294, 11295, 28797, 42500, 60000, 82341, 177106, 500000]
+
+
+def test_impot_identique_au_parcours_des_tranches():
+    for parts in (1, 2.5):
+        for montant in MONTANTS:
+            assert BAREME_IR.impot(montant, parts) == pytest.approx(ir_par_tranches(montant / parts) * parts)
+        np.testing.assert_allclose(BAREME_IR.impot_vectorise(MONTANTS, parts),
+                                   [ir_par_tranches(montant / parts) * parts for montant in MONTANTS])
+    np.testing.assert_allclose(BAREME_IS.impot_vectorise(MONTANTS), [is_par_tranches(montant) for montant in MONTANTS])
+
+
+def test_taux_marginal_et_inverse():
+    assert BAREME_IR.taux_marginal(11293) == 0
+    assert BAREME_IR.taux_marginal(11294) == 0.11
+    np.testing.assert_array_equal(BAREME_IR.taux_marginal(np.array([50000, 150000]), 2), [0.11, 0.30])
+    assert BAREME_IS.taux_marginal(42500) == 0.25
+
+    revenus = np.array([30000, 60000, 150000, 400000])
+    np.testing.assert_allclose(BAREME_IR.montant_pour_impot(BAREME_IR.impot_vectorise(revenus, 2), 2), revenus)
+    assert BAREME_IR.montant_pour_impot(0, 2) == pytest.approx(11294 * 2)
+
+
+def test_bareme_immuable_et_hashable():
+    with pytest.raises(AttributeError):
+        BAREME_IR.taux = None
+    with pytest.raises(ValueError):
+        BAREME_IR.seuils[0] = 1
+    assert BaremeCompile.depuis_limites(TRANCHES_IR) == BAREME_IR
+    assert hash(BaremeCompile.depuis_largeurs(TRANCHES_IS)) == hash(BAREME_IS)
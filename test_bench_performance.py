@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Vérifie le benchmark : couverture des formes et modes, détection des régressions
+malgré une machine plus lente, et référence JSON (sans chronométrage réel)
+"""
+
+import json
+
+from bench_performance import (cas_benchmark, comparer_a_reference, enregistrer_reference, charger_reference, seuil_cas,
+                               CAS_DEMARRAGE)
+from fiscal_base import STRATEGIES_OPTIMISATION
+from formes_juridiques import FORMES_JURIDIQUES
+
+
+def test_cas_couvrent_formes_et_modes():
+    noms = [nom for nom, _, _ in cas_benchmark()]
+
+    assert len(noms) == len(set(noms))
+    for forme in FORMES_JURIDIQUES:
+        for methode in ('calculer_scenario_base', 'appliquer_optimisations_personnelles', 'calculer_scenario'):
+            assert any(nom.startswith(forme + '/') and nom.endswith('/' + methode) for nom in noms)
+        for strategie in STRATEGIES_OPTIMISATION:
+            assert any(nom.startswith(forme + '/') and f"optimiser[{strategie},colonnaire]" in nom for nom in noms)
+        assert f"app/{forme}/create_scenarios_dataframe" in noms and f"app/{forme}/create_optimization_chart" in noms
+    assert CAS_DEMARRAGE in noms
+
+    nom, appel, avant = cas_benchmark('SARL/resultat=100000/optimiser[balayage]/pas=25000')[0]
+    avant()
+    appel()
+
+
+def test_regression_detectee_malgre_la_derive():
+    reference = {'seuils': {'defaut': 1.5, 'app/': 2.5}, 'marge_absolue_s': 1e-5, 'etalon_s': 0.002,
+                 'mesures': {'a': 0.010, 'b': 0.020, 'c': 0.030, 'app/d': 0.040, 'e': 1e-6, 'f': 0.05, 'g': 0.06}}
+    # Machine deux fois plus lente (étalon compris) et deux fois plus lente encore pendant la mesure
+    resultats = {'etalon_s': 0.004, 'mesures': {'a': 0.040, 'b': 0.080, 'c': 0.240, 'app/d': 0.320,
+                                                'e': 1e-5, 'f': 0.2, 'g': 0.24, 'nouveau': 0.001}}
+
+    lignes, derive = comparer_a_reference(resultats, reference)
+    statuts = {ligne['cas']: ligne['statut'] for ligne in lignes}
+
+    assert derive == 2.0
+    assert statuts == {'a': 'ok', 'b': 'ok', 'c': 'regression', 'app/d': 'ok', 'e': 'ok', 'f': 'ok', 'g': 'ok',
+                       'nouveau': 'nouveau'}
+    assert seuil_cas('app/d', reference['seuils']) == 2.5 and seuil_cas('a', reference['seuils']) == 1.5
+
+
+def test_reference_conserve_seuils_et_cas_non_mesures(tmp_path):
+    chemin = str(tmp_path / 'reference.json')
+    enregistrer_reference({'etalon_s': 0.002, 'mesures': {'a': 0.01, 'b': 0.02}}, chemin)
+    reference = charger_reference(chemin)
+    reference['seuils']['a'] = 3.0
+    with open(chemin, 'w', encoding='utf-8') as fichier:
+        json.dump(reference, fichier)
+
+    # Mesure partielle sur une machine deux fois plus rapide
+    enregistrer_reference({'etalon_s': 0.001, 'mesures': {'a': 0.004}}, chemin, charger_reference(chemin))
+    reference = charger_reference(chemin)
+
+    assert reference['seuils']['a'] == 3.0 and reference['etalon_s'] == 0.001
+    assert reference['mesures'] == {'a': 0.004, 'b': 0.01}
+    assert charger_reference(str(tmp_path / 'absente.json')) is None
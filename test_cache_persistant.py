@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Vérifie le cache persistant : éviction LRU bornée en taille, lectures et écritures concurrentes
+de plusieurs processus, et optimisations servies à l'identique depuis le cache
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cache_persistant import CachePersistant, ouvrir_cache
+from service_optimisation import (normaliser_parametres, executer_optimisation, executer_optimisation_persistante,
+                                  cle_cache_disque)
+
+
+def test_eviction_lru(tmp_path):
+    cache = CachePersistant(str(tmp_path / 'cache.sqlite'), taille_max=2500)
+    for cle in ('a', 'b'):
+        assert cache.ecrire(cle, bytes(1000))
+    assert cache.lire('a') == bytes(1000)
+
+    cache.ecrire('c', bytes(1000))
+
+    assert cache.lire('b') is None and cache.lire('a') is not None and cache.lire('c') is not None
+    assert cache.statistiques()['entrees'] == 2 and cache.statistiques()['taille'] <= 2500
+    assert not cache.ecrire('trop_grand', bytes(3000))
+    cache.vider()
+    assert cache.statistiques()['entrees'] == 0
+
+
+def _travailler(chemin, graine):
+    """Écritures et lectures aléatoires d'un processus ; retourne le nombre de valeurs incorrectes"""
+    cache = CachePersistant(chemin, taille_max=20 * 8000)
+    aleatoire = random.Random(graine)
+    incorrectes = 0
+    for _ in range(60):
+        cle = f"k{aleatoire.randrange(40)}"
+        if aleatoire.random() < 0.5:
+            cache.ecrire(cle, np.full(1000, int(cle[1:])))
+        else:
+            valeur = cache.lire(cle)
+            incorrectes += valeur is not None and not (valeur == int(cle[1:])).all()
+    return incorrectes
+
+
+def test_processus_concurrents(tmp_path, capfd):
+    chemin = str(tmp_path / 'cache.sqlite')
+
+    with ProcessPoolExecutor(4) as executeur:
+        incorrectes = list(executeur.map(_travailler, [chemin] * 4, range(4)))
+
+    assert incorrectes == [0, 0, 0, 0]
+    assert 'impossible' not in capfd.readouterr().err
+    statistiques = CachePersistant(chemin).statistiques()
+    assert 0 < statistiques['entrees'] and statistiques['taille'] <= 20 * 8000
+
+
+def test_optimisation_servie_par_le_cache(tmp_path, capfd):
+    cache = ouvrir_cache(str(tmp_path / 'sous_repertoire' / 'cache.sqlite'))
+    parametres = normaliser_parametres('SARL + Holding', 250000, 30000, 1.5, per_max=4000, pas=5000)
+    _, attendu, scenarios_attendus, reference_attendue = executer_optimisation(parametres)
+
+    executer_optimisation_persistante(parametres, cache)
+    optimiseur, meilleur, scenarios, reference = executer_optimisation_persistante(parametres, cache)
+
+    assert cache.lire(cle_cache_disque(parametres)) is not None and cache.statistiques()['entrees'] == 1
+    assert meilleur == attendu and reference == reference_attendue
+    assert optimiseur.derniere_optimisation['nb_evaluations'] > 0
+    assert np.array_equal(scenarios.colonne('total_net'), scenarios_attendus.colonne('total_net'))
+    assert scenarios[0] == scenarios_attendus[0]
+    assert cle_cache_disque(dict(parametres, pack_fiscal='2025')) != cle_cache_disque(parametres)
+
+    # Base inutilisable (répertoire à la place du fichier) : calcul sans cache, erreur signalée
+    os.makedirs(tmp_path / 'repertoire.sqlite')
+    _, meilleur, _, _ = executer_optimisation_persistante(parametres, CachePersistant(str(tmp_path / 'repertoire.sqlite')))
+    assert meilleur == attendu and 'impossible' in capfd.readouterr().err
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Vérifie que la comparaison en une passe retrouve l'optimum de chaque forme juridique
+"""
+
+import numpy as np
+import pytest
+
+from comparaison_formes import comparer_formes, parametres_scenario, trouver_seuils_rentabilite, valeurs_optimales
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+
+CLIENT = {'resultat_avant_remuneration': 150000, 'charges_existantes': 20000, 'parts_fiscales': 2,
+          'plafond_per_disponible': 10000}
+ENVELOPPES = {'per_max': 5000, 'madelin_max': 3000, 'girardin_max': 2000, 'versement_pee': 1500}
+
+
+@pytest.fixture(scope='module')
+def comparaison():
+    return comparer_formes(**CLIENT, **ENVELOPPES, pas=2500)
+
+
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+def test_optimum_identique_a_l_optimiseur_de_la_forme(comparaison, forme_juridique):
+    optimiseur = creer_optimiseur(forme_juridique, **CLIENT)
+    scenario_kwargs = parametres_scenario(optimiseur, **ENVELOPPES)
+    per_montant = scenario_kwargs.pop('per_montant')
+    madelin_montant = scenario_kwargs.pop('madelin_montant')
+    girardin_montant = scenario_kwargs.pop('girardin_montant')
+    meilleur, _ = optimiseur.optimiser(pas=2500, per_max=per_montant, madelin_max=madelin_montant,
+                                       girardin_max=girardin_montant, colonnaire=True, **scenario_kwargs)
+
+    resultat_forme = comparaison['formes'][forme_juridique]
+    assert resultat_forme['meilleur'] == meilleur
+    assert resultat_forme['valeur'] == pytest.approx(meilleur['patrimoine_total'])
+    assert np.nanmax(resultat_forme['courbe']) == pytest.approx(resultat_forme['valeur'])
+
+
+def test_courbes_alignees_sur_la_grille_commune(comparaison):
+    grille = comparaison['remunerations']
+    assert grille[0] == 0 and grille[-1] == 130000
+    for resultat_forme in comparaison['formes'].values():
+        assert resultat_forme['courbe'].shape == grille.shape
+    # Le salaire brut SAS est limité par les cotisations patronales : pas de valeur en fin de grille
+    assert np.isnan(comparaison['formes']['SAS']['courbe'][-1])
+    valeurs = [comparaison['formes'][forme]['valeur'] for forme in comparaison['classement']]
+    assert valeurs == sorted(valeurs, reverse=True)
+
+
+def test_meme_metrique_pour_toutes_les_formes(comparaison):
+    # Le PER de la micro-entreprise compte dans son patrimoine comme pour les sociétés : net final (charges et IR
+    # déduits une seule fois) plus l'économie d'IR du versement
+    assert comparaison['formes']['Micro-entreprise']['valeur'] == pytest.approx(
+        comparaison['formes']['Micro-entreprise']['meilleur']['patrimoine_total'])
+    micro = comparer_formes(**CLIENT, per_max=5000, pas=2500, formes=['Micro-entreprise'])['formes']['Micro-entreprise']
+    scenario = micro['meilleur']
+    assert scenario['per_deduction'] == 5000
+    assert micro['valeur'] == pytest.approx(scenario['net_final'] + scenario['ir_base'] - scenario['ir_final'])
+
+    sans_enveloppes = comparer_formes(70000, charges_existantes=20000, pas=2500)
+    micro = sans_enveloppes['formes']['Micro-entreprise']
+    assert micro['valeur'] == pytest.approx(micro['meilleur']['net_final'])
+    assert sans_enveloppes['classement'].index('SARL') < sans_enveloppes['classement'].index('Micro-entreprise')
+
+    disponible = comparer_formes(**CLIENT, **ENVELOPPES, pas=2500, metrique='net_disponible_immediat')
+    assert disponible['metrique'] == 'net_disponible_immediat'
+    for resultat_forme in disponible['formes'].values():
+        assert resultat_forme['valeur'] == pytest.approx(resultat_forme['meilleur']['net_disponible_immediat'])
+        assert resultat_forme['valeur'] == pytest.approx(np.nanmax(resultat_forme['scenarios'].colonne(
+            'net_disponible_immediat')))
+
+    with pytest.raises(ValueError, match='non supportée'):
+        comparer_formes(**CLIENT, pas=2500, metrique='net_final')
+
+
+def test_seuils_de_rentabilite_encadres_par_changement_de_signe():
+    parametres = {'charges_existantes': 40000, 'per_max': 10000, 'madelin_max': 10000, 'versement_pee': 2000}
+    formes = ['SAS', 'Micro-entreprise']
+    seuils = trouver_seuils_rentabilite(50000, 300000, parts_fiscales=[1, 2], precision=100, formes=formes,
+                                        **parametres)
+
+    assert [croisement['parts_fiscales'] for croisement in seuils['croisements']] == [1, 2]
+    for croisement in seuils['croisements']:
+        assert (croisement['forme_avant'], croisement['forme_apres']) == ('SAS', 'Micro-entreprise')
+        avant = valeurs_optimales(croisement['resultat'] - 100, formes, parts_fiscales=croisement['parts_fiscales'],
+                                  pas=1000, **parametres)
+        apres = valeurs_optimales(croisement['resultat'] + 100, formes, parts_fiscales=croisement['parts_fiscales'],
+                                  pas=1000, **parametres)
+        assert avant['SAS'] > avant['Micro-entreprise']
+        assert apres['SAS'] < apres['Micro-entreprise']
+        # Au seuil, les deux formes valent le patrimoine de la micro-entreprise (IR et charges déduits une fois)
+        micro = creer_optimiseur('Micro-entreprise', resultat_avant_remuneration=croisement['resultat'],
+                                 charges_existantes=parametres['charges_existantes'],
+                                 parts_fiscales=croisement['parts_fiscales'])
+        scenario = micro.calculer_scenario(croisement['resultat'], **parametres_scenario(
+            micro, **{nom: valeur for nom, valeur in parametres.items() if nom != 'charges_existantes'}))
+        assert croisement['valeur'] == pytest.approx(scenario['patrimoine_total'], abs=100)
+
+    for serie in seuils['series']:
+        assert np.all(np.diff(serie['resultats']) > 0)
+        assert all(valeurs.shape == serie['resultats'].shape for valeurs in serie['valeurs'].values())
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Vérifie que les cotisations TNS vectorisées reproduisent calculer_cotisations_tns() ligne par ligne
+"""
+
+import numpy as np
+
+from parametres_fiscaux import (calculer_cotisations_tns, calculer_cotisations_tns_vectorise,
+                                LIGNES_COTISATIONS_TNS, PLAFOND_RETRAITE_BASE,
+                                SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION, SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN)
+
+
+def test_cotisations_vectorisees_identiques_au_calcul_scalaire():
+    # Autour des seuils d'assiette (90% de la rémunération) : retraite de base et allocations familiales
+    seuils = np.array([PLAFOND_RETRAITE_BASE, SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION,
+                       SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN]) / 0.9
+    remunerations = np.concatenate(([0, 1000, 30000, 60000, 250000], seuils, seuils - 1, seuils + 1))
+
+    totaux, cotisations = calculer_cotisations_tns_vectorise(remunerations)
+
+    assert cotisations.shape == (len(remunerations), len(LIGNES_COTISATIONS_TNS))
+    for indice, remuneration in enumerate(remunerations):
+        total, detail = calculer_cotisations_tns(remuneration)
+        assert abs(totaux[indice] - total) < 1e-6
+        np.testing.assert_allclose(cotisations[indice], [detail[nom] for nom in LIGNES_COTISATIONS_TNS], atol=1e-6)
+
+
+def test_cotisations_vectorisees_conservent_la_forme():
+    remunerations = np.arange(0, 120000, 10000.).reshape(3, 4)
+    totaux, cotisations = calculer_cotisations_tns_vectorise(remunerations)
+    assert totaux.shape == (3, 4)
+    assert cotisations.shape == (3, 4, len(LIGNES_COTISATIONS_TNS))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Vérifie l'export en flux : mêmes scénarios et même optimum que optimiser() pour chaque forme,
+sortie gzip, fichiers Parquet et Arrow identiques au CSV, grille de profils sur plusieurs processus
+"""
+
+import csv
+import gzip
+
+import numpy as np
+import pytest
+
+from export_donnees import (generer_lots, lot_depuis_scenarios, suivre_optimum, ouvrir_sortie, ecrire_csv,
+                            ecrire_colonnes, schema_export, colonnes_scenario, lire_plage, grille_taches,
+                            evaluer_taches, chemin_par_forme)
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES, SARLHolding
+
+
+@pytest.mark.parametrize('forme', FORMES_JURIDIQUES)
+def test_flux_identique_a_optimiser(forme):
+    optimiseur = creer_optimiseur(forme, resultat_avant_remuneration=200000, charges_existantes=20000, parts_fiscales=1.5)
+    _, tous_scenarios = optimiseur.optimiser(pas=1000, per_max=5000, madelin_max=3000)
+    attendu = lot_depuis_scenarios(optimiseur, [s for s in tous_scenarios if 30000 <= s['remuneration_brute']])
+
+    suivi = {}
+    lots = list(suivre_optimum(generer_lots(optimiseur, 30000, None, 1000, taille_lot=7,
+                                            per_montant=5000, madelin_montant=3000), suivi))
+
+    assert suivi['nb_scenarios'] == len(attendu['metrique'])
+    for nom in colonnes_scenario(forme) + ['metrique']:
+        assert np.concatenate([lot[nom] for lot in lots]) == pytest.approx(attendu[nom])
+    meilleur = int(np.argmax(attendu['metrique']))
+    assert suivi['optimum']['remuneration_brute'] == attendu['remuneration_brute'][meilleur]
+
+
+def test_sortie_gzip(tmp_path):
+    optimiseur = SARLHolding(resultat_avant_remuneration=100000, charges_existantes=10000)
+    chemin = str(tmp_path / 'scenarios.csv.gz')
+
+    with ouvrir_sortie(chemin) as flux:
+        suivi = ecrire_csv(generer_lots(optimiseur, 0, 90000, 5000), flux, schema_export('SARL + Holding'))
+
+    with gzip.open(chemin, 'rt', encoding='utf-8') as fichier:
+        lignes = fichier.read().splitlines()
+    assert lignes[0].startswith('Remuneration_Brute,Total_Net')
+    assert len(lignes) == suivi['nb_scenarios'] + 1 and lignes[1].startswith('0,')
+
+
+@pytest.mark.parametrize('format_output', ['parquet', 'arrow'])
+def test_sortie_colonnes(tmp_path, format_output):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    optimiseur = SARLHolding(resultat_avant_remuneration=150000, charges_existantes=10000)
+    schema = schema_export('SARL + Holding')
+    chemin_csv, chemin = str(tmp_path / 'scenarios.csv'), str(tmp_path / f'scenarios.{format_output}')
+
+    with ouvrir_sortie(chemin_csv) as flux:
+        ecrire_csv(generer_lots(optimiseur, 0, 140000, 500, per_montant=4000), flux, schema)
+    suivi = ecrire_colonnes(generer_lots(optimiseur, 0, 140000, 500, taille_lot=50, per_montant=4000),
+                            chemin, format_output, schema)
+
+    if format_output == 'parquet':
+        table = pq.read_table(chemin)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(chemin)).read_all()
+    with open(chemin_csv, encoding='utf-8') as fichier:
+        lignes = [ligne.split(',') for ligne in fichier.read().splitlines()[1:]]
+
+    assert table.column_names == [colonne[0] for colonne in schema]
+    assert table.num_rows == len(lignes) == suivi['nb_scenarios']
+    assert table.schema.field('Remuneration_Brute').type == pa.int64()
+    for indice, nom in enumerate(table.column_names):
+        assert table.column(nom).to_pylist() == pytest.approx([float(ligne[indice]) for ligne in lignes])
+    meilleure = max(range(len(lignes)), key=lambda i: (float(lignes[i][1]), -i))
+    assert suivi['optimum']['remuneration_brute'] == int(lignes[meilleure][0])
+
+
+def test_schemas_par_forme():
+    entetes = {forme: [colonne[0] for colonne in schema_export(forme)] for forme in FORMES_JURIDIQUES}
+
+    assert entetes['SARL + Holding'] == [
+        'Remuneration_Brute', 'Total_Net', 'Remuneration_Nette', 'Dividendes_Nets', 'Cotisations_TNS', 'IR',
+        'IS_SARL', 'IS_Holding', 'Flat_Tax', 'Total_Cotisations', 'Net_Disponible', 'Verification_Somme',
+        'Taux_Prelevement_%'
+    ]
+    assert 'Cotisations_TNS' not in entetes['SAS'] and 'Cotisations_Patronales' in entetes['SAS']
+    assert 'Dividendes_Nets' not in entetes['Micro-entreprise'] and 'IS_Holding' not in entetes['SARL']
+    assert [colonne[0] for colonne in schema_export('SARL', profils=True)][:3] == ['Resultat', 'Charges', 'Parts']
+    with pytest.raises(ValueError, match="Choix disponibles"):
+        schema_export('EURL')
+
+
+def test_grille_sur_plusieurs_processus(tmp_path):
+    assert lire_plage('100000:200000:50000', int) == [100000, 150000, 200000]
+    assert lire_plage('1:2:0.5') == [1.0, 1.5, 2.0] and lire_plage('1,2.5') == [1.0, 2.5]
+    assert chemin_par_forme('sortie.csv.gz', 'SARL + Holding') == 'sortie_sarl_holding.csv.gz'
+
+    taches = grille_taches(['SARL', 'SAS'], [120000, 180000], [0, 20000], [1.0, 2.0])
+    parametres = dict(min_salaire=0, max_salaire=None, pas=10000, per=2000, madelin=0, girardin=0,
+                      type_activite='BIC - Prestations de services', stream=True, profils=True)
+    assert len(taches) == 16 and [tache['forme_juridique'] for tache in taches[7:9]] == ['SARL', 'SAS']
+
+    for forme in ('SARL', 'SAS'):
+        contenus = []
+        for jobs in (1, 3):
+            chemin = str(tmp_path / f'{forme}_{jobs}.csv')
+            lots = (lot for tache, lots in evaluer_taches(taches, parametres, jobs)
+                    if tache['forme_juridique'] == forme for lot in lots)
+            with ouvrir_sortie(chemin) as flux:
+                ecrire_csv(lots, flux, schema_export(forme, profils=True))
+            with open(chemin, encoding='utf-8') as fichier:
+                contenus.append(list(csv.DictReader(fichier)))
+        assert contenus[0] == contenus[1]
+        assert {(ligne['Resultat'], ligne['Charges'], ligne['Parts']) for ligne in contenus[0]} == \
+            {(str(r), str(c), str(p)) for r in (120000, 180000) for c in (0, 20000) for p in (1.0, 2.0)}
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Vérifie que l'évaluation vectorisée (optimiser(colonnaire=True)) reproduit
+exactement les scénarios calculés un par un
+"""
+
+import numpy as np
+import pytest
+
+from fiscal_base import vider_caches_bases, CacheLRU, taille_colonnes
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+
+PARAMETRES_OPTIMISATION = [
+    {},
+    {'per_max': 10000, 'madelin_max': 5000, 'girardin_max': 3000, 'versement_pee': 2000},
+    {'per_max': 40000, 'girardin_max': 50000, 'versement_pee': 100, 'acre': True},
+]
+
+
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+@pytest.mark.parametrize('resultat, charges, parts', [(100000, 20000, 2), (300000, 50000, 1), (1500000, 0, 3)])
+def test_grille_identique_aux_scenarios(forme_juridique, resultat, charges, parts):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultat,
+                                  charges_existantes=charges, parts_fiscales=parts,
+                                  plafond_per_disponible=20000)
+    for parametres in PARAMETRES_OPTIMISATION:
+        meilleur, scenarios = optimiseur.optimiser(pas=997, **parametres)
+        meilleur_grille, grille = optimiseur.optimiser(pas=997, colonnaire=True, **parametres)
+
+        assert len(grille) == len(scenarios)
+        assert meilleur_grille == meilleur
+        for nom in ['remuneration_brute', 'total_net', 'net_disponible_immediat', 'patrimoine_total',
+                    'ir_final', 'is_sarl', 'flat_tax', 'dividendes_nets', 'taux_prelevement_global']:
+            attendu = [scenario.get(nom, 0) for scenario in scenarios]
+            assert grille.colonne(nom) == pytest.approx(attendu, abs=1e-6)
+
+
+def test_materialisation_paresseuse_des_lignes():
+    optimiseur = creer_optimiseur('SARL + Holding')
+    _, scenarios = optimiseur.optimiser(pas=5000, per_max=5000)
+    _, grille = optimiseur.optimiser(pas=5000, per_max=5000, colonnaire=True)
+
+    assert grille.ligne(3, details=False) == scenarios[3]
+    assert grille.ligne(-1, details=False) == scenarios[-1]
+    assert grille[3]['ir_detail']
+    assert grille.colonne('is_total') is grille.colonne('is_sarl')
+    with pytest.raises(IndexError):
+        grille[len(grille)]
+
+
+def test_details_recalcules_pour_le_meilleur_scenario_seulement():
+    optimiseur = creer_optimiseur('SARL')
+    meilleur, scenarios = optimiseur.optimiser(pas=10000, per_max=5000)
+
+    assert meilleur in scenarios
+    assert meilleur['ir_detail'] and meilleur['is_detail'] and meilleur['cotisations_detail']
+    legers = [scenario for scenario in scenarios if scenario is not meilleur]
+    assert all(scenario['ir_detail'] is None and scenario['cotisations_detail'] is None for scenario in legers)
+    assert meilleur == optimiseur.calculer_scenario(meilleur['remuneration_brute'], per_montant=5000,
+                                                    madelin_montant=0, girardin_montant=0, versement_pee=0, acre=False)
+
+
+def test_bases_reutilisees_quand_seuls_per_et_girardin_changent(monkeypatch):
+    vider_caches_bases()
+    optimiseur = creer_optimiseur('SARL + Holding', resultat_avant_remuneration=150000)
+    appels = []
+    calculer_base_vectorisee = optimiseur.calculer_base_vectorisee
+    monkeypatch.setattr(optimiseur, 'calculer_base_vectorisee',
+                        lambda *args, **kwargs: appels.append(kwargs) or calculer_base_vectorisee(*args, **kwargs))
+
+    meilleur, grille = optimiseur.optimiser(pas=5000, per_max=5000, madelin_max=3000, colonnaire=True)
+    meilleur_girardin, grille_girardin = optimiseur.optimiser(pas=5000, per_max=8000, girardin_max=2000,
+                                                              madelin_max=3000, colonnaire=True)
+    assert len(appels) == 1
+    optimiseur.optimiser(pas=5000, per_max=8000, madelin_max=4000, colonnaire=True)
+    assert len(appels) == 2
+
+    # Les résultats issus du cache sont identiques à un calcul sans cache
+    vider_caches_bases()
+    sans_cache = creer_optimiseur('SARL + Holding', resultat_avant_remuneration=150000)
+    assert sans_cache.optimiser(pas=5000, per_max=8000, girardin_max=2000, madelin_max=3000)[0] == meilleur_girardin
+    vider_caches_bases()
+    attendu = sans_cache.calculer_scenario(50000, per_montant=8000, madelin_montant=3000)
+
+    # Modifier un scénario servi par le cache (détails imbriqués compris) ne modifie pas le cache
+    en_cache = optimiseur.calculer_scenario(50000, per_montant=8000, madelin_montant=3000)
+    assert en_cache == attendu
+    en_cache['is_detail'].clear()
+    en_cache['cotisations_detail'].clear()
+    en_cache['optimisations'].clear()
+    assert optimiseur.calculer_scenario(50000, per_montant=8000, madelin_montant=3000) == attendu
+    assert attendu['is_detail'] and attendu['cotisations_detail']
+
+
+def test_cache_colonnes_borne_en_octets():
+    cache = CacheLRU(32, octets_max=3000, taille=taille_colonnes)
+    for cle in 'abc':
+        cache.obtenir(cle, lambda: {'total_net': np.zeros(100)})  # 800 octets
+    cache.obtenir('a', lambda: None)
+    cache.obtenir('d', lambda: {'total_net': np.zeros(100)})
+
+    assert list(cache.entrees) == ['c', 'a', 'd'] and cache.octets == 2400
+    grand = cache.obtenir('e', lambda: {'total_net': np.zeros(1000)})
+    assert len(grand['total_net']) == 1000 and 'e' not in cache.entrees and cache.octets == 2400
+    cache.vider()
+    assert cache.octets == 0 and len(cache) == 0
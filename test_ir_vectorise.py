@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Vérifie que le noyau IR vectorisé reproduit calculer_ir() tranche par tranche
+"""
+
+import numpy as np
+
+from formes_juridiques import SARL
+
+
+def test_ir_vectorise_identique_au_calcul_scalaire():
+    revenus = np.array([-5000, 0, 11294, 15000, 28797, 50000, 82341, 120000, 177106, 400000])
+    for parts in (1, 1.5, 2, 3.5):
+        sarl = SARL(parts_fiscales=parts)
+        attendu = [sarl.calculer_ir(revenu)[0] for revenu in revenus]
+        np.testing.assert_allclose(sarl.calculer_ir_vectorise(revenus), attendu, atol=1e-6)
+
+
+def test_ir_vectorise_accepte_un_scalaire():
+    sarl = SARL(parts_fiscales=2)
+    assert abs(float(sarl.calculer_ir_vectorise(90000)) - sarl.calculer_ir(90000)[0]) < 1e-6
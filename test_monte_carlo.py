@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Vérifie que le mode Monte Carlo reproduit calculer_scenario() tirage par tirage
+"""
+
+import numpy as np
+import pytest
+
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from monte_carlo import simuler_monte_carlo, tirer_echantillons
+
+RESULTAT = {'loi': 'normale', 'moyenne': 200000, 'ecart_type': 40000}
+CHARGES = {'loi': 'triangulaire', 'min': 10000, 'mode': 30000, 'max': 60000}
+
+
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+def test_metriques_identiques_aux_scenarios(forme_juridique):
+    kwargs = {'type_activite': 'BNC'} if forme_juridique == 'Micro-entreprise' else {'versement_pee': 1000,
+                                                                                     'madelin_montant': 2000}
+    simulation = simuler_monte_carlo(forme_juridique, RESULTAT, CHARGES, nb_tirages=300, nb_remunerations=50,
+                                     taille_paquet=128, graine=3, per_montant=5000, girardin_montant=1000, **kwargs)
+    resultats, charges = simulation['tirages']['resultat'], simulation['tirages']['charges']
+
+    for tirage in range(0, 300, 61):
+        optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultats[tirage],
+                                      charges_existantes=charges[tirage])
+        for indice in range(0, len(simulation['remunerations']), 7):
+            remuneration = resultats[tirage] if forme_juridique == 'Micro-entreprise' else simulation['remunerations'][indice]
+            scenario = optimiseur.calculer_scenario(remuneration, per_montant=5000, girardin_montant=1000, **kwargs)
+            attendu = optimiseur.get_metric_for_optimization(scenario) + min(scenario.get('flat_tax', 0), 0)
+            assert simulation['metriques'][tirage, indice] == pytest.approx(attendu, abs=1e-6)
+
+
+def test_tirages_certains_donnent_l_optimum_deterministe():
+    optimiseur = creer_optimiseur('SARL', resultat_avant_remuneration=200000, charges_existantes=30000)
+    meilleur, _ = optimiseur.optimiser(pas=1000)
+    simulation = simuler_monte_carlo('SARL', 200000, 30000, nb_tirages=10,
+                                     remunerations=np.arange(0, 170001, 1000))
+
+    assert simulation['optimum_esperance']['remuneration'] == meilleur['remuneration_brute']
+    assert simulation['optimum_esperance']['esperance'] == pytest.approx(meilleur['total_net'])
+    assert simulation['optimum_prudent'] == simulation['optimum_esperance']
+    assert np.all(simulation['ecart_type'] < 1e-6)
+
+
+def test_prudence_face_a_l_incertitude():
+    simulation = simuler_monte_carlo('SARL', RESULTAT, CHARGES, graine=0)
+    quantiles = simulation['quantiles']
+
+    assert simulation['metriques'].shape == (10000, 200)
+    assert np.all(quantiles[0.05] <= quantiles[0.25]) and np.all(quantiles[0.25] <= quantiles[0.5])
+    assert simulation['optimum_prudent']['quantile'] >= simulation['optimum_esperance']['quantile']
+    assert simulation['optimum_esperance']['esperance'] >= simulation['optimum_prudent']['esperance']
+
+
+def test_lois_de_tirage():
+    generateur = np.random.default_rng(0)
+    lognormale = tirer_echantillons({'loi': 'lognormale', 'moyenne': 100000, 'ecart_type': 20000}, 200000, generateur)
+    assert lognormale.mean() == pytest.approx(100000, rel=0.01)
+    assert lognormale.std() == pytest.approx(20000, rel=0.02)
+    with pytest.raises(ValueError, match='non supportée'):
+        tirer_echantillons({'loi': 'pareto'}, 10, generateur)
+    with pytest.raises(ValueError, match='manquants'):
+        tirer_echantillons({'loi': 'uniforme', 'min': 0}, 10, generateur)
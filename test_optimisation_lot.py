@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Vérifie l'optimisation en lot : lecture des profils, ordre déterministe et parallélisme
+"""
+
+import io
+
+import pytest
+
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from optimisation_lot import lire_profils, optimiser_lot
+
+PROFILS_CSV = """client,forme_juridique,resultat,charges,parts,plafond_per,per_max,madelin_max,girardin_max,versement_pee
+dupont,all,120000,20000,2,10000,5000,2000,1000,1000
+martin,SAS,80000,,1.5,,,,,
+"""
+
+
+def test_lire_profils_developpe_toutes_les_formes():
+    taches = lire_profils(io.StringIO(PROFILS_CSV))
+
+    assert [(tache['client'], tache['forme_juridique']) for tache in taches] == \
+        [('dupont', forme) for forme in FORMES_JURIDIQUES] + [('martin', 'SAS')]
+    assert taches[-1]['charges'] == 0 and taches[-1]['plafond_per'] is None
+
+
+def test_lire_profils_forme_inconnue():
+    with pytest.raises(ValueError):
+        lire_profils(io.StringIO("client,forme_juridique,resultat\nx,EURL,100000\n"))
+
+
+def test_lot_parallele_identique_au_lot_sequentiel():
+    taches = lire_profils(io.StringIO(PROFILS_CSV))
+
+    sequentiel = optimiser_lot(taches, pas=5000, jobs=1)
+    parallele = optimiser_lot(taches, pas=5000, jobs=2, chunksize=2)
+
+    assert parallele == sequentiel
+    sas = creer_optimiseur('SAS', resultat_avant_remuneration=80000, charges_existantes=0, parts_fiscales=1.5)
+    meilleur, _ = sas.optimiser(pas=5000)
+    assert sequentiel[-1]['remuneration_optimale'] == meilleur['remuneration_brute']
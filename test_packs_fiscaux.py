@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Vérifie les packs de paramètres fiscaux : valeurs 2024 inchangées, immuabilité,
+empreinte et évaluation de plusieurs années dans le même processus
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+import parametres_fiscaux
+from bareme import BaremeCompile
+from fiscal_base import vider_caches_bases
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from packs_fiscaux import PackFiscal, charger_pack, resoudre_pack, PACKS_DISPONIBLES
+from service_optimisation import normaliser_parametres, cle_canonique
+
+
+def test_pack_2024_identique_aux_constantes():
+    pack = charger_pack('2024')
+
+    assert pack is parametres_fiscaux.PACK_FISCAL_DEFAUT is resoudre_pack(None) is charger_pack(2024)
+    assert (pack.PLAFOND_ABONDEMENT_PEE, pack.VERSEMENT_MAX_ABONDE, pack.PLANCHER_PER) == (7418, 2473, 4636)
+    assert (pack.SEUIL_ALLOCATIONS_FAMILIALES_EXONERATION, pack.SEUIL_ALLOCATIONS_FAMILIALES_TAUX_PLEIN,
+            pack.SEUIL_ALLOCATIONS_FAMILIALES_REDUIT, pack.PLAFOND_RETRAITE_BASE) == (46368, 64915, 162288, 46368)
+    assert pack.BAREME_IR == BaremeCompile([0, 11294, 28797, 82341, 177106], [0, 0.11, 0.30, 0.41, 0.45])
+    assert pack.BAREME_IS == BaremeCompile([0, 42500], [0.15, 0.25])
+    assert parametres_fiscaux.MICRO_BNC['cotisations'] == 0.246
+    assert PACKS_DISPONIBLES == ['2023', '2024', '2025']
+
+
+def test_pack_immuable_et_hachable():
+    pack = charger_pack('2025')
+
+    with pytest.raises(AttributeError):
+        pack.PASS = 0
+    with pytest.raises(TypeError):
+        pack.MICRO_BNC['cotisations'] = 0
+    with pytest.raises(ValueError):
+        pack.TAUX_COTISATIONS_TNS_VECTEUR[0] = 0
+
+    copie = PackFiscal('copie', pack.valeurs())
+    assert copie == pack and hash(copie) == hash(pack) and copie is not pack
+    assert pickle.loads(pickle.dumps(pack)) == pack
+    assert resoudre_pack(pack.empreinte) is pack
+    assert len({charger_pack(annee) for annee in PACKS_DISPONIBLES}) == 3
+
+    personnalise = pack.modifier(PASS=50000)
+    assert personnalise != pack
+    assert personnalise.PLAFOND_ABONDEMENT_PEE == 8000 and pack.PLAFOND_ABONDEMENT_PEE == 7536
+    with pytest.raises(ValueError, match="Choix disponibles"):
+        pack.modifier(PAS_UN_PARAMETRE=1)
+
+
+def test_plusieurs_annees_dans_le_meme_processus():
+    vider_caches_bases()
+    parametres = dict(resultat_avant_remuneration=250000, charges_existantes=30000, parts_fiscales=2)
+    remunerations = np.arange(0, 200001, 25000)
+
+    for forme in FORMES_JURIDIQUES:
+        resultats = {}
+        for annee in ['2024', '2023', '2025', '2024']:
+            optimiseur = creer_optimiseur(forme, pack_fiscal=annee, **parametres)
+            scenario = optimiseur.calculer_scenario(60000, per_montant=5000, details=False)
+            lot = optimiseur.evaluer_lot(remunerations, per_montant=5000)
+            # Lot vectorisé et scénario scalaire avec le même pack, malgré les caches partagés
+            attendu = optimiseur.calculer_scenario(50000, per_montant=5000, details=False)
+            assert lot['ir_final'][2] == pytest.approx(attendu['ir_final'])
+            resultats.setdefault(annee, []).append(scenario['ir_final'])
+
+        # Le pack par défaut est 2024, les autres années donnent un IR différent
+        assert resultats['2024'][0] == resultats['2024'][1]
+        assert resultats['2024'][0] == creer_optimiseur(forme, **parametres).calculer_scenario(
+            60000, per_montant=5000, details=False)['ir_final']
+        assert resultats['2023'][0] != resultats['2024'][0] != resultats['2025'][0]
+
+
+def test_cle_canonique_depend_du_pack():
+    cles = {cle_canonique(normaliser_parametres('SARL', 150000, pack_fiscal=annee)) for annee in PACKS_DISPONIBLES}
+
+    assert len(cles) == 3
+    assert cle_canonique(normaliser_parametres('SARL', 150000)) == \
+        cle_canonique(normaliser_parametres('SARL', 150000, pack_fiscal=charger_pack('2024')))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Vérifie le profilage : étapes et compteurs relevés, méthodes d'origine restaurées
+en sortie (aucun surcoût hors profilage) et résultats inchangés
+"""
+
+import pytest
+
+from fiscal_base import OptimisationFiscale, vider_caches_bases
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES, SARLHolding
+from profilage import profiler, ETAPES_OPTIMISATION, METHODES_COMPTEES
+
+
+@pytest.mark.parametrize('colonnaire', [False, True])
+def test_rapport_etapes_et_compteurs(colonnaire):
+    optimiseur = SARLHolding(resultat_avant_remuneration=200000, charges_existantes=20000)
+    vider_caches_bases()
+
+    with profiler() as rapport:
+        optimiseur.optimiser(pas=5000, per_max=3000, colonnaire=colonnaire)
+    profil = rapport.en_dict()
+
+    assert set(profil['etapes']) == set(ETAPES_OPTIMISATION) and set(profil['compteurs']) == set(METHODES_COMPTEES)
+    assert all(mesure['appels'] >= 1 for mesure in profil['etapes'].values())
+    duree_etapes = sum(mesure['duree_s'] for mesure in profil['etapes'].values())
+    assert duree_etapes <= profil['duree_totale_s']
+    assert profil['autres_s'] == pytest.approx(profil['duree_totale_s'] - duree_etapes)
+    if colonnaire:
+        assert profil['compteurs']['calculer_ir_vectorise']['valeurs'] >= optimiseur.derniere_optimisation['nb_evaluations']
+    else:
+        assert profil['etapes']['scenario_base']['appels'] >= optimiseur.derniere_optimisation['nb_evaluations']
+        assert profil['compteurs']['calculer_ir']['appels'] >= optimiseur.derniere_optimisation['nb_evaluations']
+    assert 'scenario_base' in rapport.formater()
+
+
+def test_methodes_restaurees_et_resultats_inchanges():
+    classes = [OptimisationFiscale] + [type(creer_optimiseur(forme, resultat_avant_remuneration=100000))
+                                       for forme in FORMES_JURIDIQUES]
+    originaux = {(classe, nom): classe.__dict__[nom] for classe in classes
+                 for nom in vars(classe) if nom in METHODES_COMPTEES or nom == 'calculer_scenario_base'}
+
+    for forme in FORMES_JURIDIQUES:
+        optimiseur = creer_optimiseur(forme, resultat_avant_remuneration=150000, charges_existantes=10000)
+        attendu, _ = optimiseur.optimiser(pas=5000)
+        vider_caches_bases()
+        with profiler() as rapport, profiler(rapport=rapport):
+            meilleur, _ = optimiseur.optimiser(pas=5000)
+        assert meilleur == attendu
+        assert rapport.en_dict()['compteurs']['calculer_ir']['appels'] > 0
+
+    assert all(classe.__dict__[nom] is original for (classe, nom), original in originaux.items())
+    with profiler(actif=False) as rapport, rapport.section('inactif'):
+        SARLHolding(resultat_avant_remuneration=150000).optimiser(pas=5000)
+    assert rapport.en_dict()['compteurs']['calculer_ir']['appels'] == 0 and 'inactif' in rapport.sections
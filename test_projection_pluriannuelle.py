@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Vérifie la programmation dynamique pluriannuelle contre l'énumération de toutes les trajectoires
+"""
+
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from formes_juridiques import creer_optimiseur
+from packs_fiscaux import resoudre_pack
+from parametres_fiscaux import PLAFOND_PER, PLANCHER_PER
+from projection_pluriannuelle import consommer_plafonds, optimiser_trajectoire
+
+RESULTATS = [90000, 140000, 200000]
+PER_MAX = [0, 3000, 40000]
+
+
+def valeur_trajectoire(forme_juridique, remunerations, plafonds):
+    """Rejoue une trajectoire scénario par scénario avec les reports PER (plus ancien d'abord)"""
+    total = 0
+    for annee, remuneration in enumerate(remunerations):
+        optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=RESULTATS[annee],
+                                      charges_existantes=10000, plafond_per_disponible=sum(plafonds))
+        scenario = optimiseur.calculer_scenario(remuneration, per_montant=PER_MAX[annee],
+                                                acre=annee == 0)
+        if not optimiseur.is_scenario_valid(scenario):
+            return -math.inf
+        total += optimiseur.get_metric_for_optimization(scenario)
+
+        reste = math.ceil(scenario['per_deduction'] - 1e-9)
+        for indice in reversed(range(len(plafonds))):
+            impute = min(plafonds[indice], reste)
+            plafonds[indice] -= impute
+            reste -= impute
+        genere = math.floor(min(max(scenario['revenu_imposable'] * 0.10, PLANCHER_PER), PLAFOND_PER))
+        plafonds = [genere] + plafonds[:-1]
+    return total
+
+
+@pytest.mark.parametrize('forme_juridique', ['SARL', 'SAS'])
+def test_programmation_dynamique_egale_a_l_enumeration(forme_juridique):
+    plan = optimiser_trajectoire(forme_juridique, RESULTATS, charges=10000, per_max=PER_MAX,
+                                 plafonds_per=[2000, 1500, 1000, 500], pas=20000, pas_plafond=1)
+
+    grilles = [creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultat,
+                                charges_existantes=10000).get_range_remuneration(20000) for resultat in RESULTATS]
+    meilleure = max(valeur_trajectoire(forme_juridique, trajectoire, [2000, 1500, 1000, 500])
+                    for trajectoire in itertools.product(*grilles))
+
+    assert plan['valeur_totale'] == pytest.approx(meilleure)
+    assert plan['valeur_totale'] == pytest.approx(
+        valeur_trajectoire(forme_juridique, [annee['remuneration'] for annee in plan['annees']], [2000, 1500, 1000, 500]))
+    assert plan['valeur_totale'] == pytest.approx(sum(annee['valeur'] for annee in plan['annees']))
+
+
+def test_acre_premiere_annee_et_tresorerie_holding():
+    micro = optimiser_trajectoire('Micro-entreprise', 60000, nb_annees=3, acre=True)
+    assert [annee['scenario']['acre_reduction'] > 0 for annee in micro['annees']] == [True, False, False]
+
+    distribue = optimiser_trajectoire('SARL + Holding', 200000, charges=20000, nb_annees=3, pas=10000)
+    conserve = optimiser_trajectoire('SARL + Holding', 200000, charges=20000, nb_annees=3, pas=10000,
+                                     taux_distribution_holding=0.0, rendement_holding=0.05)
+    assert all(annee['tresorerie_holding'] == 0 for annee in distribue['annees'])
+    tresoreries = [annee['tresorerie_holding'] for annee in conserve['annees']]
+    assert tresoreries == sorted(tresoreries) and tresoreries[0] > 0
+    assert conserve['valeur_totale'] > distribue['valeur_totale']
+
+
+def test_reports_per_imputes_du_plus_ancien_au_plus_recent():
+    restants = consommer_plafonds(np.array([[10, 20, 30, 40]]), np.array([[0, 50, 95, 200]]))
+    assert restants.tolist() == [[[10, 20, 30, 40], [10, 20, 20, 0], [5, 0, 0, 0], [0, 0, 0, 0]]]
+    with pytest.raises(ValueError, match='non supporté'):
+        optimiser_trajectoire('SARL', 100000, nb_annees=12)
+
+
+def test_reports_et_flat_tax_du_pack_de_chaque_annee():
+    # Un seul an de report à partir de la deuxième année : le report N-2 initial expire un an plus tôt
+    report_court = resoudre_pack(None).modifier('report_court', ANNEES_REPORT_PER=1)
+    parametres = dict(nb_annees=3, charges=10000, per_max=[0, 40000, 40000], plafonds_per=[0, 0, 3000], pas=20000)
+    defaut = optimiser_trajectoire('SARL', 150000, **parametres)
+    court = optimiser_trajectoire('SARL', 150000, pack_fiscal=[None, report_court, report_court], **parametres)
+    assert defaut['annees'][1]['plafonds_per'][3] == 3000 and court['annees'][1]['plafonds_per'][2:] == [0, 0]
+    assert defaut['annees'][1]['plafond_per_disponible'] - court['annees'][1]['plafond_per_disponible'] == 3000
+
+    # Trésorerie conservée une année valorisée avec la flat tax de cette année, pas de la dernière
+    flat_tax = resoudre_pack(None).modifier('flat_tax', TAUX_FLAT_TAX=0.5)
+    parametres = dict(charges=20000, nb_annees=3, pas=10000, taux_distribution_holding=0.0)
+    defaut = optimiser_trajectoire('SARL + Holding', 200000, **parametres)
+    derniere = optimiser_trajectoire('SARL + Holding', 200000, pack_fiscal=[None, None, flat_tax], **parametres)
+    assert [annee['valeur'] for annee in derniere['annees'][:2]] == [annee['valeur'] for annee in defaut['annees'][:2]]
+    assert derniere['annees'][2]['valeur'] < defaut['annees'][2]['valeur']
+
+
+@pytest.mark.parametrize('forme_juridique', ['SARL', 'SAS', 'SARL + Holding'])
+def test_annee_deficitaire_sans_remuneration(forme_juridique):
+    projection = optimiser_trajectoire(forme_juridique, [100000, 20000, 100000], charges=30000, per_max=10000,
+                                       pas=5000, taux_distribution_holding=0.5)
+    avant, deficit, apres = projection['annees']
+
+    assert (deficit['remuneration'], deficit['versement_per'], deficit['valeur']) == (0.0, 0.0, 0.0)
+    assert deficit['scenario'] is None and deficit['tresorerie_holding'] == avant['tresorerie_holding']
+    # Les plafonds PER vieillissent malgré le déficit
+    assert apres['plafonds_per'][1:] == deficit['plafonds_per'][:-1]
+    assert avant['valeur'] > 0 and apres['valeur'] > 0
+    assert projection['valeur_totale'] == pytest.approx(sum(annee['valeur'] for annee in projection['annees']))
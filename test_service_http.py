@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Vérifie le service HTTP d'optimisation : fusion des requêtes identiques en vol, résultats
+identiques au service d'optimisation, lots en colonnes avec erreurs par profil, et test de charge
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from charge_service_http import executer_charge
+from service_http import ServiceOptimisation, requete_http, executer_tache, parametres_profil, lire_champs, CHAMPS_PROFIL
+from service_optimisation import normaliser_parametres, executer_optimisation
+
+PROFIL = {'forme_juridique': 'SARL + Holding', 'resultat': 200000, 'charges': 20000, 'parts': 2, 'per_max': 3000,
+          'pas': 5000}
+
+
+def _executer(coroutine_service):
+    """Exécute coroutine_service(service, port) sur un service démarré (2 processus, sans cache persistant)"""
+    async def executer():
+        service = ServiceOptimisation(jobs=2, chemin_cache='')
+        serveur = await service.servir('127.0.0.1', 0)
+        try:
+            return await coroutine_service(service, serveur.sockets[0].getsockname()[1])
+        finally:
+            await service.fermer()
+    return asyncio.run(executer())
+
+
+def test_requetes_identiques_fusionnees():
+    async def scenario(service, _):
+        corps = json.dumps(PROFIL).encode()
+        reponses = await asyncio.gather(*(service.traiter('POST', '/optimiser', corps) for _ in range(5)),
+                                        service.traiter('POST', '/optimiser', json.dumps(dict(PROFIL, parts=1)).encode()))
+        return reponses, dict(service.statistiques), len(service.en_vol)
+
+    reponses, statistiques, en_vol = _executer(scenario)
+
+    assert [statut for statut, _ in reponses] == [200] * 6
+    assert all(reponse == reponses[0][1] for _, reponse in reponses[:5]) and reponses[5][1] != reponses[0][1]
+    assert statistiques['calculs'] == 2 and statistiques['fusionnees'] == 4 and en_vol == 0
+
+
+def test_aller_retour_http_identique_au_service():
+    async def scenario(_, port):
+        lecteur, ecrivain = await asyncio.open_connection('127.0.0.1', port)
+        reponses = [await requete_http(lecteur, ecrivain, 'POST', '/optimiser', dict(PROFIL, scenarios=['total_net'])),
+                    await requete_http(lecteur, ecrivain, 'POST', '/scenario', dict(PROFIL, remuneration=40000)),
+                    await requete_http(lecteur, ecrivain, 'GET', '/inconnue'),
+                    await requete_http(lecteur, ecrivain, 'POST', '/optimiser', dict(PROFIL, forme_juridique='SCI')),
+                    await requete_http(lecteur, ecrivain, 'POST', '/optimiser', dict(PROFIL, champ_inconnu=1)),
+                    await requete_http(lecteur, ecrivain, 'GET', '/optimiser')]
+        ecrivain.close()
+        await ecrivain.wait_closed()
+        return reponses
+
+    (statut, optimisation), (_, scenario), *erreurs = _executer(scenario)
+    parametres = normaliser_parametres('SARL + Holding', 200000, 20000, 2, per_max=3000, pas=5000)
+    optimiseur, meilleur, scenarios, reference = executer_optimisation(parametres)
+
+    assert statut == 200 and optimisation['nb_evaluations'] == optimiseur.derniere_optimisation['nb_evaluations']
+    assert optimisation['meilleur']['total_net'] == pytest.approx(meilleur['total_net'])
+    assert optimisation['reference']['total_net'] == pytest.approx(reference['total_net'])
+    assert optimisation['scenarios']['total_net'] == pytest.approx(scenarios.colonne('total_net').tolist())
+    assert not any(nom.endswith('_detail') for nom in optimisation['meilleur'])
+    assert scenario['scenario']['total_net'] == pytest.approx(
+        optimiseur.calculer_scenario(40000, details=False)['total_net'])
+    assert [statut for statut, _ in erreurs] == [404, 400, 400, 405]
+    assert 'non supportée' in erreurs[1][1]['erreur'] and 'champ_inconnu' in erreurs[2][1]['erreur']
+
+
+def test_entrees_invalides_rejetees():
+    async def scenario(service, port):
+        reponses = []
+        for longueur in ('abc', '-5'):
+            lecteur, ecrivain = await asyncio.open_connection('127.0.0.1', port)
+            ecrivain.write(f"POST /optimiser HTTP/1.1\r\nContent-Length: {longueur}\r\n\r\n".encode('latin-1'))
+            await ecrivain.drain()
+            reponses.append(await lecteur.read())
+            ecrivain.close()
+            await ecrivain.wait_closed()
+        for profil in ({'forme_juridique': 'SAS', 'resultat': 100000, 'parts': 0},
+                       {'forme_juridique': 'SAS', 'resultat': 100000, 'parts': -1},
+                       {'forme_juridique': 'Micro-entreprise', 'resultat': 60000, 'type_activite': 'Agricole'}):
+            reponses.append(await service.traiter('POST', '/optimiser', json.dumps(profil).encode()))
+        return reponses
+
+    *brutes, parts_nulles, parts_negatives, activite = _executer(scenario)
+
+    for brute in brutes:
+        entete, _, corps = brute.partition(b'\r\n\r\n')
+        assert entete.startswith(b'HTTP/1.1 400') and 'Content-Length' in json.loads(corps)['erreur']
+    assert parts_nulles[0] == parts_negatives[0] == 400 and 'parts' in parts_nulles[1]['erreur']
+    assert activite[0] == 400 and 'non supporté' in activite[1]['erreur']
+
+
+def test_nombres_non_finis_pas_invalides_et_erreur_imprevue():
+    async def scenario(service, port):
+        sas = {'forme_juridique': 'SAS', 'resultat': 100000, 'pas': 10000}
+        reponses = [await service.traiter('POST', '/optimiser', json.dumps(dict(sas, **champ)).encode())
+                    for champ in ({'resultat': float('inf')}, {'charges': float('-inf')}, {'pas': float('nan')},
+                                  {'per_max': float('inf')}, {'pas': 0}, {'pas': -5})]
+        reponses.append(await service.traiter('POST', '/optimiser', b'{"forme_juridique": "SAS", "resultat": 1e400}'))
+        reponses.append(await service.traiter('POST', '/scenario',
+                                              json.dumps(dict(sas, remuneration=10 ** 400)).encode()))
+        reponses.append(await service.traiter('POST', '/lot', json.dumps(
+            {'profils': [dict(sas, resultat=float('inf')), sas]}).encode()))
+
+        async def route_defaillante(_):
+            raise RuntimeError('panne')
+        service.route_sante = route_defaillante
+        lecteur, ecrivain = await asyncio.open_connection('127.0.0.1', port)
+        reponses += [await requete_http(lecteur, ecrivain, 'GET', '/sante'),
+                     await requete_http(lecteur, ecrivain, 'GET', '/statistiques')]
+        ecrivain.close()
+        await ecrivain.wait_closed()
+        return reponses
+
+    *invalides, lot, panne, suivante = _executer(scenario)
+
+    assert [statut for statut, _ in invalides] == [400] * 8
+    assert 'resultat' in invalides[0][1]['erreur'] and 'per_max' in invalides[3][1]['erreur']
+    assert 'Pas' in invalides[4][1]['erreur'] and 'Pas' in invalides[5][1]['erreur']
+    assert lot[0] == 200 and 'fini' in lot[1]['resultats'][0]['erreur']
+    assert lot[1]['resultats'][1]['meilleur'] is not None
+    # Erreur imprévue : réponse 500 et connexion toujours servie
+    assert panne[0] == 500 and 'panne' in panne[1]['erreur'] and suivante[0] == 200
+
+
+def test_lot_en_colonnes_avec_profil_invalide():
+    async def scenario(service, _):
+        corps = {'defauts': {'charges': 10000, 'pas': 10000}, 'colonnes': True,
+                 'profils': [{'client': 'A', 'forme_juridique': 'SAS', 'resultat': 150000},
+                             {'client': 'B', 'forme_juridique': 'Micro-entreprise'},
+                             {'client': 'C', 'forme_juridique': 'Micro-entreprise', 'resultat': 60000}]}
+        return await service.traiter('POST', '/lot', json.dumps(corps).encode())
+
+    statut, reponse = _executer(scenario)
+    colonnes = reponse['colonnes']
+
+    assert statut == 200 and colonnes['client'] == ['A', 'B', 'C']
+    assert colonnes['erreur'][0] is None and 'resultat' in colonnes['erreur'][1] and colonnes['erreur'][2] is None
+    attendu = executer_tache(('optimiser', parametres_profil(lire_champs(
+        {'forme_juridique': 'SAS', 'resultat': 150000, 'charges': 10000, 'pas': 10000}, CHAMPS_PROFIL)), None, False))
+    assert colonnes['total_net'][0] == pytest.approx(attendu['meilleur']['total_net'])
+    assert colonnes['total_net'][1] is None and colonnes['nb_evaluations'][2] > 0
+
+
+def test_charge():
+    async def scenario(_, port):
+        return await executer_charge('127.0.0.1', port, connexions=4, requetes=24, profils=6)
+
+    rapport = _executer(scenario)
+
+    assert rapport['erreurs'] == [] and len(rapport['latences_s']) == 24
+    assert 0 < rapport['percentiles_s'][50] <= rapport['percentiles_s'][99] <= rapport['max_s']
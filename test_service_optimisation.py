@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Vérifie la normalisation des paramètres, la clé canonique, l'exécution du service d'optimisation
+et l'instantané des paramètres par défaut (à jour, servi pour sa clé seulement, affiché au démarrage)
+"""
+
+import json
+
+from bench_performance import premier_affichage
+from formes_juridiques import creer_optimiseur
+from service_optimisation import (normaliser_parametres, cle_canonique, executer_optimisation, parametres_defaut_interface,
+                                  generer_instantane, charger_instantane, FICHIER_INSTANTANE)
+
+
+def test_cle_canonique_ignore_les_parametres_sans_effet():
+    sas = normaliser_parametres('SAS', 120000, 20000, 2, per_max=5000, strategie='points_rupture', pas=1000,
+                                type_activite='BNC - Professions libérales', acre=True)
+    equivalent = normaliser_parametres('SAS', 120000.0, 20000, 2.0, per_max=5000.0, strategie='points_rupture',
+                                       pas=10000)
+
+    assert cle_canonique(sas) == cle_canonique(equivalent)
+    assert cle_canonique(sas) != cle_canonique(dict(sas, per_max=6000.0))
+    assert cle_canonique(dict(reversed(list(sas.items())))) == cle_canonique(sas)
+
+
+def test_executer_optimisation_identique_a_l_optimiseur():
+    parametres = normaliser_parametres('SARL', 150000, 10000, 1.5, 8000, per_max=5000, girardin_max=2000, pas=5000)
+
+    optimiseur, meilleur, scenarios, reference = executer_optimisation(parametres)
+
+    attendu, _ = creer_optimiseur('SARL', resultat_avant_remuneration=150000, charges_existantes=10000,
+                                  parts_fiscales=1.5, plafond_per_disponible=8000).optimiser(
+        pas=5000, per_max=5000, girardin_max=2000)
+    assert meilleur == attendu
+    assert 0 < len(scenarios) <= optimiseur.derniere_optimisation['nb_evaluations']
+    assert reference['remuneration_brute'] == meilleur['remuneration_brute']
+    assert reference['per_deduction'] == 0
+
+
+def test_instantane_a_jour(tmp_path):
+    chemin = str(tmp_path / 'instantane.json')
+    generer_instantane(parametres_defaut_interface(), chemin)
+
+    with open(chemin, encoding='utf-8') as fichier:
+        attendu = json.load(fichier)
+    with open(FICHIER_INSTANTANE, encoding='utf-8') as fichier:
+        livre = json.load(fichier)
+    # En cas d'échec : python service_optimisation.py (régénère instantane_defaut.json)
+    assert livre == attendu
+
+
+def test_instantane_servi_pour_sa_cle_seulement(tmp_path):
+    chemin = str(tmp_path / 'instantane.json')
+    parametres = normaliser_parametres('SARL', 150000, 10000, pas=5000)
+    generer_instantane(parametres, chemin)
+
+    instantane = charger_instantane(cle_canonique(parametres), chemin)
+    assert instantane['meilleur']['total_net'] > 0 and instantane['parametres'] == parametres
+    assert charger_instantane(cle_canonique(dict(parametres, charges=20000)), chemin) is None
+    assert charger_instantane(cle_canonique(parametres), str(tmp_path / 'absent.json')) is None
+
+
+def test_premier_affichage_sans_modules_lourds():
+    affichage = premier_affichage()
+    with open(FICHIER_INSTANTANE, encoding='utf-8') as fichier:
+        instantane = json.load(fichier)
+
+    assert affichage['exceptions'] == [] and affichage['modules_charges'] == []
+    assert f"{instantane['meilleur']['net_disponible_immediat']:,.0f}€" in affichage['metriques']
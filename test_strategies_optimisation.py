@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Vérifie que les stratégies d'optimisation retrouvent l'optimum d'un balayage à l'euro
+"""
+
+import numpy as np
+import pytest
+
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from optimisation_conjointe import OBJECTIFS_CONJOINTS, _bornes_superieures, _evaluer_enveloppes_personnelles
+
+PROFILS = [
+    # (résultat, charges, parts, plafond PER disponible, paramètres d'optimisation)
+    (120000, 20000, 2, 20000, {}),
+    (90000, 0, 1.5, 20000, {'per_max': 10000, 'madelin_max': 5000, 'girardin_max': 3000, 'versement_pee': 2000}),
+    (60000, 0, 1.5, 20000, {'girardin_max': 8000, 'versement_pee': 2473}),
+    (150000, 30000, 1, 5000, {'per_max': 30000, 'girardin_max': 20000, 'versement_pee': 500}),
+]
+
+# Formes dont la plage de rémunération est vide quand les charges dépassent le résultat
+SOCIETES = [forme for forme in FORMES_JURIDIQUES if forme != 'Micro-entreprise']
+
+
+def optimum_balayage_euro(optimiseur, parametres):
+    meilleur, _ = optimiseur.optimiser(pas=1, colonnaire=True, **parametres)
+    return optimiseur.get_metric_for_optimization(meilleur)
+
+
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+@pytest.mark.parametrize('resultat, charges, parts, plafond_per, parametres', PROFILS)
+def test_points_rupture_optimum_exact(forme_juridique, resultat, charges, parts, plafond_per, parametres):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultat, charges_existantes=charges,
+                                  parts_fiscales=parts, plafond_per_disponible=plafond_per)
+    attendu = optimum_balayage_euro(optimiseur, parametres)
+
+    meilleur, scenarios = optimiseur.optimiser(strategie='points_rupture', **parametres)
+
+    assert optimiseur.get_metric_for_optimization(meilleur) == pytest.approx(attendu, abs=1e-6)
+    assert optimiseur.derniere_optimisation['strategie'] == 'points_rupture'
+    assert optimiseur.derniere_optimisation['nb_evaluations'] < 400
+    assert meilleur in scenarios
+
+
+@pytest.mark.parametrize('forme_juridique', SOCIETES)
+def test_points_rupture_plage_vide(forme_juridique):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=50000, charges_existantes=60000)
+
+    assert optimiseur.optimiser(strategie='points_rupture') == optimiseur.optimiser() == (None, [])
+    meilleur, grille = optimiseur.optimiser(strategie='points_rupture', colonnaire=True)
+    assert meilleur is None and len(grille.remunerations) == 0
+    assert optimiseur.derniere_optimisation['nb_evaluations'] == 0
+
+
+def test_strategie_inconnue():
+    with pytest.raises(ValueError):
+        creer_optimiseur('SARL').optimiser(strategie='inconnue')
+
+
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+@pytest.mark.parametrize('resultat, charges, parts, plafond_per, parametres', PROFILS)
+def test_adaptatif_atteint_la_precision_euro(forme_juridique, resultat, charges, parts, plafond_per, parametres):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=resultat, charges_existantes=charges,
+                                  parts_fiscales=parts, plafond_per_disponible=plafond_per)
+    attendu = optimum_balayage_euro(optimiseur, parametres)
+    nb_balayage_grossier = len(optimiseur.get_range_remuneration(2500))
+
+    meilleur, grille = optimiseur.optimiser(strategie='adaptatif', pas=2500, colonnaire=True, **parametres)
+
+    assert optimiseur.get_metric_for_optimization(meilleur) == pytest.approx(attendu, abs=1e-6)
+    assert optimiseur.derniere_optimisation['nb_evaluations'] <= nb_balayage_grossier + 250
+    assert list(grille.remunerations) == sorted(grille.remunerations)
+
+
+@pytest.mark.parametrize('forme_juridique', SOCIETES)
+def test_adaptatif_plage_vide(forme_juridique):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=50000, charges_existantes=60000)
+
+    assert optimiseur.optimiser(strategie='adaptatif', pas=2500) == optimiseur.optimiser(pas=2500) == (None, [])
+    meilleur, grille = optimiseur.optimiser(strategie='adaptatif', pas=2500, colonnaire=True)
+    assert meilleur is None and len(grille.remunerations) == 0
+    assert optimiseur.derniere_optimisation['nb_evaluations'] == 0
+
+
+@pytest.mark.parametrize('forme_juridique', SOCIETES)
+def test_optimisation_conjointe_plage_vide(forme_juridique):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=50000, charges_existantes=60000)
+
+    resultat = optimiseur.optimiser_conjoint(girardin_max=4000)
+
+    assert all(resultat[objectif] is None for objectif in OBJECTIFS_CONJOINTS)
+    assert resultat['nb_evaluations'] == 0 and optimiseur.derniere_optimisation['nb_evaluations'] == 0
+
+
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+def test_optimisation_conjointe_domine_la_force_brute(forme_juridique):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=90000, parts_fiscales=1.5,
+                                  plafond_per_disponible=10000)
+    resultat = optimiseur.optimiser_conjoint(girardin_max=4000, pas_madelin=5000, pas_pee=1000)
+
+    # Force brute sur les mêmes blocs (Madelin, PEE) avec PER et Girardin discrétisés
+    optimisations = optimiseur.get_optimisations_disponibles()
+    remunerations = np.asarray(list(optimiseur.get_range_remuneration(5000)))
+    montants_madelin = np.arange(0, 10001, 5000.) if 'madelin' in optimisations else np.zeros(1)
+    versements_pee = np.arange(0, 2001, 1000.) if 'pee' in optimisations else np.zeros(1)
+    montants_per = np.arange(0, 10001, 500.)[:, None] if 'per' in optimisations else np.zeros((1, 1))
+    montants_girardin = np.arange(0, 4001, 250.)[None, :] if 'girardin' in optimisations else np.zeros((1, 1))
+    attendus = {objectif: -np.inf for objectif in OBJECTIFS_CONJOINTS}
+    for madelin in montants_madelin:
+        for versement_pee in versements_pee:
+            base = optimiseur.calculer_base_vectorisee(remunerations, madelin_montant=madelin,
+                                                       versement_pee=versement_pee)
+            colonnes = optimiseur.appliquer_optimisations_vectorisees(
+                {nom: valeurs[:, None, None] for nom, valeurs in base.items()}, montants_per, montants_girardin)
+            valides = optimiseur.masque_valide_vectorise(colonnes)
+            for objectif in OBJECTIFS_CONJOINTS:
+                attendus[objectif] = max(attendus[objectif], np.max(np.where(valides, colonnes[objectif], -np.inf)))
+
+    for objectif in OBJECTIFS_CONJOINTS:
+        optimum = resultat[objectif]
+        assert optimum['valeur'] >= attendus[objectif] - 1e-6
+        assert optimum['scenario'][objectif] == pytest.approx(optimum['valeur'], abs=1e-6)
+    assert optimiseur.derniere_optimisation['strategie'] == 'conjointe'
+
+
+@pytest.mark.parametrize('forme_juridique', ['SARL', 'SARL + Holding'])
+def test_majorants_valides_et_elagage_effectif(forme_juridique):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=200000)
+    base = optimiseur.calculer_base_vectorisee(np.arange(0, 150001, 5000), madelin_montant=2000, versement_pee=1000)
+    bornes = _bornes_superieures(optimiseur, base, optimiseur.plafond_per_disponible, 5000.)
+    colonnes, _, _ = _evaluer_enveloppes_personnelles(optimiseur, base, optimiseur.plafond_per_disponible, 5000.)
+
+    for objectif in OBJECTIFS_CONJOINTS:
+        assert np.all(colonnes[objectif].max(axis=(1, 2)) <= bornes[objectif] + 1e-6)
+    resultat = optimiseur.optimiser_conjoint(girardin_max=5000)
+    assert resultat['nb_blocs_elagues'] > 0
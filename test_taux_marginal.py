@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Vérifie que le taux marginal effectif analytique correspond à la variation
+des prélèvements calculée par différences finies
+"""
+
+import numpy as np
+import pytest
+
+from formes_juridiques import creer_optimiseur, FORMES_JURIDIQUES
+from packs_fiscaux import resoudre_pack
+
+# Pack modifié : les dérivées doivent suivre le pack de l'optimiseur, pas les constantes par défaut
+PACK_MODIFIE = resoudre_pack(None).modifier('taux_modifies', TAUX_FLAT_TAX=0.5, TAUX_COTISATIONS_SALARIE=0.3)
+
+PRELEVEMENTS = ['cotisations_tns', 'cotisations_salariales', 'cotisations_patronales', 'cotisations_sociales',
+                'ir_final', 'is_sarl', 'is_holding', 'flat_tax']
+
+
+def prelevements(colonnes):
+    return sum(colonnes.get(nom, 0) for nom in PRELEVEMENTS)
+
+
+@pytest.mark.parametrize('pack_fiscal', [None, PACK_MODIFIE], ids=['defaut', 'modifie'])
+@pytest.mark.parametrize('forme_juridique', FORMES_JURIDIQUES)
+@pytest.mark.parametrize('parametres', [
+    {},
+    {'per_montant': 10000, 'girardin_montant': 3000, 'versement_pee': 2000, 'madelin_montant': 5000},
+    {'per_montant': 40000, 'versement_pee': 8000, 'acre': True},
+])
+def test_taux_marginal_egal_aux_differences_finies(forme_juridique, parametres, pack_fiscal):
+    optimiseur = creer_optimiseur(forme_juridique, resultat_avant_remuneration=250000, charges_existantes=20000,
+                                  parts_fiscales=2, plafond_per_disponible=20000, pack_fiscal=pack_fiscal)
+    parametres = {nom: valeur for nom, valeur in parametres.items()
+                  if forme_juridique == 'Micro-entreprise' or nom != 'acre'}
+    remunerations = np.random.default_rng(0).uniform(0, 200000, 500)
+    pas = 0.01
+
+    colonnes = optimiseur.evaluer_lot(remunerations, **parametres)
+    apres = (prelevements(optimiseur.evaluer_lot(remunerations + pas, **parametres)) - prelevements(colonnes)) / pas
+    avant = (prelevements(colonnes) - prelevements(optimiseur.evaluer_lot(remunerations - pas, **parametres))) / pas
+
+    scenario_kwargs = {nom: valeur for nom, valeur in parametres.items() if nom not in ('per_montant', 'girardin_montant')}
+    taux = optimiseur.taux_marginal_vectorise(colonnes, **scenario_kwargs)
+
+    # Points hors des ruptures de pente (dérivées à gauche et à droite égales)
+    lisses = np.abs(apres - avant) < 1e-5
+    assert lisses.sum() > 450
+    assert taux['total'][lisses] == pytest.approx(apres[lisses] * 100, abs=1e-4)
+    assert taux['total'] == pytest.approx(sum(taux[nom] for nom in ('cotisations', 'ir', 'is', 'is_holding', 'flat_tax')))
+
+
+def test_taux_marginal_nul_a_l_optimum_interieur():
+    optimiseur = creer_optimiseur('SARL + Holding', resultat_avant_remuneration=200000)
+    meilleur, grille = optimiseur.optimiser(pas=10000, per_max=5000, versement_pee=1000, colonnaire=True)
+    taux = grille.taux_marginal()['total']
+    indice = int(np.flatnonzero(grille.remunerations == meilleur['remuneration_brute'])[0])
+
+    assert taux.shape == grille.remunerations.shape
+    # Avant l'optimum une rémunération supplémentaire réduit les prélèvements, après elle les augmente
+    assert taux[indice - 1] < 0 < taux[indice + 1]